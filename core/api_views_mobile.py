@@ -10,16 +10,36 @@ from rest_framework.parsers import MultiPartParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.db.models import Q, F, Count, Sum
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Q, F, Count, Sum, Prefetch
+from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
+from io import BytesIO
 import uuid
 
 from .models import (
     OrdreDeTravail, Intervention, Asset, RapportExecution, 
-    Reponse, FichierMedia, DemandeReparation, ProfilUtilisateur
+    Reponse, FichierMedia, DemandeReparation, ProfilUtilisateur,
+    PointDeControle, ElementSupprime, TeleversementMedia
+)
+from .utils.acces import droits
+from .utils.brouillons import materialiser_brouillon
+from .utils.gamme_utils import get_gamme_version
+from .utils.media_processor import creer_media
+from .utils.validation_utils import points_obligatoires_manquants
+from .utils.televersement_utils import (
+    ErreurTeleversement, taille_morceau_defaut, nb_morceaux, morceaux_recus,
+    media_existant, ecrire_morceau, finaliser_televersement, supprimer_morceaux
+)
+from .utils.sync_utils import (
+    appliquer_rapports, appliquer_reponses, appliquer_demandes,
+    STATUT_ERREUR, STATUT_DEJA_TRAITE
 )
 from .serializers_mobile import (
+    annoter_ordres_travail_mobile, construire_operations_execution, reponses_execution_queryset,
     OrdreDeTravailMobileSerializer, InterventionMobileSerializer,
     AssetMobileSerializer, RapportExecutionMobileSerializer,
     ReponseMobileSerializer, FichierMediaMobileSerializer,
@@ -105,10 +125,7 @@ class MobileAuthViewSet(viewsets.ViewSet):
         """
         Retourne les permissions de l'utilisateur pour l'app mobile
         """
-        try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
+        role = droits(user).role
         
         permissions = {
             'can_create_ot': role in ['MANAGER', 'ADMIN'],
@@ -133,6 +150,7 @@ class OrdreDeTravailMobileViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['statut', 'priorite', 'type_OT', 'asset']
+    pagination_cle = ('date_creation', 'id')
     
     def get_queryset(self):
         """
@@ -140,25 +158,11 @@ class OrdreDeTravailMobileViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         
-        try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
+        # Managers : tous les OT ; autres rôles : OT assignés (à eux ou à
+        # leurs équipes) ou créés
+        queryset = droits(user).ordres_visibles(OrdreDeTravail.objects.all())
         
-        if role in ['MANAGER', 'ADMIN']:
-            # Managers voient tous les OT
-            return OrdreDeTravail.objects.all().select_related(
-                'intervention', 'asset', 'statut', 'cree_par', 'assigne_a_technicien'
-            ).order_by('-date_creation')
-        else:
-            # Techniciens voient leurs OT assignés
-            return OrdreDeTravail.objects.filter(
-                Q(assigne_a_technicien=user) | 
-                Q(assigne_a_equipe__membres=user) |
-                Q(cree_par=user)
-            ).select_related(
-                'intervention', 'asset', 'statut', 'cree_par', 'assigne_a_technicien'
-            ).order_by('-date_creation')
+        return annoter_ordres_travail_mobile(queryset).order_by('-date_creation')
     
     @action(detail=True, methods=['post'])
     def commencer(self, request, pk=None):
@@ -226,28 +230,34 @@ class OrdreDeTravailMobileViewSet(viewsets.ModelViewSet):
                 'demandes_bloquantes': [d.numero_demande for d in demandes_bloquantes]
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Vérifier les points obligatoires
-        points_manquants = self._check_points_obligatoires(ordre, rapport)
-        
-        if points_manquants:
-            return Response({
-                'error': 'Points obligatoires manquants',
-                'points_manquants': points_manquants
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Finaliser
-        rapport.statut_rapport = 'FINALISE'
-        rapport.date_execution_fin = timezone.now()
-        rapport.commentaire_global = request.data.get('commentaire_global', '')
-        rapport.save()
-        
-        ordre.date_fin_reelle = timezone.now()
-        # Changer le statut vers "Terminé"
-        from .models import StatutWorkflow
-        statut_termine = StatutWorkflow.objects.filter(nom='TERMINE').first()
-        if statut_termine:
-            ordre.statut = statut_termine
-        ordre.save()
+        # Le brouillon web éventuel devient des réponses dans la transaction
+        # de finalisation : annulées (brouillon conservé) si elle est refusée
+        with transaction.atomic():
+            materialiser_brouillon(rapport, request.user)
+            
+            # Vérifier les points obligatoires
+            points_manquants = self._check_points_obligatoires(ordre, rapport)
+            
+            if points_manquants:
+                transaction.set_rollback(True)
+                return Response({
+                    'error': 'Points obligatoires manquants',
+                    'points_manquants': points_manquants
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Finaliser
+            rapport.statut_rapport = 'FINALISE'
+            rapport.date_execution_fin = timezone.now()
+            rapport.commentaire_global = request.data.get('commentaire_global', '')
+            rapport.save()
+            
+            ordre.date_fin_reelle = timezone.now()
+            # Changer le statut vers "Terminé"
+            from .models import StatutWorkflow
+            statut_termine = StatutWorkflow.objects.filter(nom='TERMINE').first()
+            if statut_termine:
+                ordre.statut = statut_termine
+            ordre.save()
         
         return Response({
             'message': 'Intervention finalisée avec succès',
@@ -266,55 +276,25 @@ class OrdreDeTravailMobileViewSet(viewsets.ModelViewSet):
                 'error': 'Permission refusée'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Récupérer le rapport
-        try:
-            rapport = RapportExecution.objects.get(ordre_de_travail=ordre)
-        except RapportExecution.DoesNotExist:
+        # Récupérer le rapport avec ses réponses et leurs médias
+        rapport = RapportExecution.objects.filter(
+            ordre_de_travail=ordre
+        ).select_related('cree_par').prefetch_related(
+            Prefetch('reponses', queryset=reponses_execution_queryset())
+        ).first()
+        if rapport is None:
             rapport = RapportExecution.objects.create(
                 ordre_de_travail=ordre,
                 cree_par=request.user
             )
         
-        # Préparer les données pour mobile
-        operations = ordre.intervention.operations.all().order_by('ordre')
-        operations_data = []
-        
-        for operation in operations:
-            points_data = []
-            for point in operation.points_de_controle.all().order_by('ordre'):
-                # Récupérer la réponse existante
-                try:
-                    reponse = rapport.reponses.get(point_de_controle=point)
-                    reponse_data = ReponseMobileSerializer(reponse).data
-                except Reponse.DoesNotExist:
-                    reponse_data = None
-                
-                point_data = {
-                    'id': point.id,
-                    'label': point.label,
-                    'type_champ': point.type_champ,
-                    'aide': point.aide,
-                    'options': point.options.split(';') if point.options else [],
-                    'est_obligatoire': point.est_obligatoire,
-                    'permettre_photo': point.permettre_photo,
-                    'permettre_audio': point.permettre_audio,
-                    'permettre_video': point.permettre_video,
-                    'peut_demander_reparation': getattr(point, 'peut_demander_reparation', False),
-                    'types_fichiers_autorises': getattr(point, 'types_fichiers_autorises', '').split(',') if getattr(point, 'types_fichiers_autorises', '') else [],
-                    'reponse': reponse_data
-                }
-                points_data.append(point_data)
-            
-            operations_data.append({
-                'id': operation.id,
-                'nom': operation.nom,
-                'ordre': operation.ordre,
-                'points_de_controle': points_data
-            })
+        # Checklist de l'intervention (en cache) fusionnée avec les réponses
+        context = {'request': request}
+        operations_data = construire_operations_execution(ordre, rapport.reponses.all(), context)
         
         return Response({
-            'ordre_de_travail': OrdreDeTravailMobileSerializer(ordre).data,
-            'rapport': RapportExecutionMobileSerializer(rapport).data,
+            'ordre_de_travail': OrdreDeTravailMobileSerializer(ordre, context=context).data,
+            'rapport': RapportExecutionMobileSerializer(rapport, context=context).data,
             'operations': operations_data
         })
     
@@ -326,29 +306,30 @@ class OrdreDeTravailMobileViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Tâches assignées
-        taches = OrdreDeTravail.objects.filter(
-            Q(assigne_a_technicien=user) | 
-            Q(assigne_a_equipe__membres=user)
-        ).exclude(
-            statut__est_statut_final=True
-        ).select_related(
-            'intervention', 'asset', 'statut'
-        ).order_by('date_prevue_debut')
+        taches = list(annoter_ordres_travail_mobile(
+            OrdreDeTravail.objects.filter(
+                droits(user).filtre_assignes()
+            ).exclude(
+                statut__est_statut_final=True
+            )
+        ).order_by('date_prevue_debut'))
         
-        # Statistiques
+        # Statistiques calculées sur la liste déjà chargée
+        now = timezone.localtime()
+        semaine = now.isocalendar()[1]
         stats = {
-            'total': taches.count(),
-            'en_retard': taches.filter(date_prevue_debut__lt=timezone.now()).count(),
-            'aujourdhui': taches.filter(
-                date_prevue_debut__date=timezone.now().date()
-            ).count(),
-            'cette_semaine': taches.filter(
-                date_prevue_debut__week=timezone.now().isocalendar()[1]
-            ).count()
+            'total': len(taches),
+            'en_retard': sum(1 for t in taches if t.date_prevue_debut < now),
+            'aujourdhui': sum(
+                1 for t in taches if timezone.localtime(t.date_prevue_debut).date() == now.date()
+            ),
+            'cette_semaine': sum(
+                1 for t in taches if timezone.localtime(t.date_prevue_debut).isocalendar()[1] == semaine
+            )
         }
         
         return Response({
-            'taches': OrdreDeTravailMobileSerializer(taches, many=True).data,
+            'taches': OrdreDeTravailMobileSerializer(taches, many=True, context={'request': request}).data,
             'statistiques': stats
         })
     
@@ -356,32 +337,13 @@ class OrdreDeTravailMobileViewSet(viewsets.ModelViewSet):
         """
         Vérifie si un utilisateur peut exécuter un OT
         """
-        try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
-        
-        return (
-            ordre.assigne_a_technicien == user or
-            (ordre.assigne_a_equipe and user in ordre.assigne_a_equipe.membres.all()) or
-            role in ['MANAGER', 'ADMIN']
-        )
+        return droits(user).peut_executer(ordre)
     
     def _check_points_obligatoires(self, ordre, rapport):
         """
-        Vérifie les points obligatoires manquants
+        Vérifie les points obligatoires manquants (voir utils.validation_utils)
         """
-        points_manquants = []
-        
-        for operation in ordre.intervention.operations.all():
-            for point in operation.points_de_controle.filter(est_obligatoire=True):
-                if not rapport.reponses.filter(point_de_controle=point).exists():
-                    points_manquants.append({
-                        'operation': operation.nom,
-                        'point': point.label
-                    })
-        
-        return points_manquants
+        return points_obligatoires_manquants(ordre, rapport)
 
 # ==============================================================================
 # API RÉPONSES MOBILE
@@ -395,6 +357,9 @@ class ReponseMobileViewSet(viewsets.ModelViewSet):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
     parser_classes = [JSONParser, MultiPartParser]
+    # Ordre imposé par la pagination par clé : pas d'OrderingFilter
+    filter_backends = [DjangoFilterBackend]
+    pagination_cle = ('date_reponse', 'id')
     
     def get_queryset(self):
         rapport_id = self.request.query_params.get('rapport_id')
@@ -520,18 +485,7 @@ class ReponseMobileViewSet(viewsets.ModelViewSet):
         """
         Vérifie si un utilisateur peut modifier un rapport
         """
-        ordre = rapport.ordre_de_travail
-        
-        try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
-        
-        return (
-            ordre.assigne_a_technicien == user or
-            (ordre.assigne_a_equipe and user in ordre.assigne_a_equipe.membres.all()) or
-            role in ['MANAGER', 'ADMIN']
-        )
+        return droits(user).peut_executer(rapport.ordre_de_travail)
 
 # ==============================================================================
 # API MÉDIAS MOBILE
@@ -545,6 +499,9 @@ class FichierMediaMobileViewSet(viewsets.ModelViewSet):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, JSONParser]
+    # Ordre imposé par la pagination par clé : pas d'OrderingFilter
+    filter_backends = [DjangoFilterBackend]
+    pagination_cle = ('date_upload', 'id')
     
     def get_queryset(self):
         reponse_id = self.request.query_params.get('reponse_id')
@@ -580,7 +537,7 @@ class FichierMediaMobileViewSet(viewsets.ModelViewSet):
         
         # Validation du type de fichier
         point = reponse.point_de_controle
-        if not self._validate_file_type(fichier, point, type_fichier):
+        if not self._validate_file_type(fichier.name, point, type_fichier):
             return Response({
                 'error': 'Type de fichier non autorisé'
             }, status=status.HTTP_400_BAD_REQUEST)
@@ -592,13 +549,11 @@ class FichierMediaMobileViewSet(viewsets.ModelViewSet):
                 'error': f'Fichier trop volumineux. Maximum: {max_size // (1024*1024)}MB'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Créer le fichier média
-        fichier_media = FichierMedia.objects.create(
+        # Créer le fichier média (contenu écrit une seule fois par empreinte)
+        fichier_media = creer_media(
+            fichier,
             reponse=reponse,
-            type_fichier=type_fichier,
-            fichier=fichier,
-            nom_original=fichier.name,
-            taille_octets=fichier.size
+            type_fichier=type_fichier
         )
         
         return Response(
@@ -606,11 +561,11 @@ class FichierMediaMobileViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
     
-    def _validate_file_type(self, fichier, point, type_fichier):
+    def _validate_file_type(self, nom_fichier, point, type_fichier):
         """
         Valide le type de fichier selon les permissions du point
         """
-        file_ext = fichier.name.split('.')[-1].upper() if '.' in fichier.name else ''
+        file_ext = nom_fichier.split('.')[-1].upper() if '.' in nom_fichier else ''
         
         # Vérifier les autorisations de média
         if type_fichier == 'PHOTO' and not point.permettre_photo:
@@ -632,19 +587,192 @@ class FichierMediaMobileViewSet(viewsets.ModelViewSet):
         """
         Vérifie si un utilisateur peut modifier un rapport
         """
-        ordre = rapport.ordre_de_travail
-        
+        return droits(user).peut_executer(rapport.ordre_de_travail)
+
+# ==============================================================================
+# API UPLOADS REPRENABLES
+# ==============================================================================
+
+class TeleversementMobileViewSet(viewsets.ViewSet):
+    """
+    Upload reprenable de médias volumineux en plusieurs morceaux
+
+    POST   televersements/                      initialisation
+    GET    televersements/<id>/                 morceaux déjà reçus
+    PUT    televersements/<id>/morceaux/<n>/    envoi du morceau n (corps brut)
+    POST   televersements/<id>/finaliser/       assemblage et création du média
+    DELETE televersements/<id>/                 abandon
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    _validate_file_type = FichierMediaMobileViewSet._validate_file_type
+    _can_edit_rapport = FichierMediaMobileViewSet._can_edit_rapport
+
+    def _get_televersement(self, request, pk):
         try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
-        
-        return (
-            ordre.assigne_a_technicien == user or
-            (ordre.assigne_a_equipe and user in ordre.assigne_a_equipe.membres.all()) or
-            role in ['MANAGER', 'ADMIN']
+            return TeleversementMedia.objects.select_related('reponse').get(pk=pk, utilisateur=request.user)
+        except (TeleversementMedia.DoesNotExist, DjangoValidationError):
+            return None
+
+    def _etat(self, televersement):
+        return {
+            'upload_id': str(televersement.pk),
+            'statut': televersement.statut,
+            'taille_totale': televersement.taille_totale,
+            'taille_morceau': televersement.taille_morceau,
+            'nb_morceaux': televersement.nb_morceaux,
+            'morceaux_recus': morceaux_recus(televersement),
+        }
+
+    def create(self, request):
+        """
+        Initialise un upload : {reponse_id, nom_fichier, taille, type_fichier?, sha256?}
+        """
+        reponse_id = request.data.get('reponse_id')
+        nom_fichier = request.data.get('nom_fichier')
+        type_fichier = request.data.get('type_fichier', 'PHOTO')
+        empreinte = (request.data.get('sha256') or '').lower()
+
+        try:
+            taille = int(request.data.get('taille'))
+        except (TypeError, ValueError):
+            taille = None
+
+        if not reponse_id or not nom_fichier or not taille or taille < 0:
+            return Response({
+                'error': 'reponse_id, nom_fichier et taille requis'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            reponse = Reponse.objects.select_related(
+                'point_de_controle', 'rapport_execution__ordre_de_travail'
+            ).get(id=reponse_id)
+        except (Reponse.DoesNotExist, ValueError):
+            return Response({
+                'error': 'Réponse introuvable'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if not self._can_edit_rapport(request.user, reponse.rapport_execution):
+            return Response({
+                'error': 'Permission refusée'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        point = reponse.point_de_controle
+        if not self._validate_file_type(nom_fichier, point, type_fichier):
+            return Response({
+                'error': 'Type de fichier non autorisé'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        max_size = getattr(point, 'taille_max_fichier_mb', 10) * 1024 * 1024
+        if taille > max_size:
+            return Response({
+                'error': f'Fichier trop volumineux. Maximum: {max_size // (1024*1024)}MB'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Contenu déjà présent sur la réponse : rien à envoyer
+        existant = media_existant(reponse.id, empreinte)
+        if existant:
+            return Response({
+                'doublon': True,
+                'media': FichierMediaMobileSerializer(existant, context={'request': request}).data
+            })
+
+        taille_morceau = taille_morceau_defaut()
+        televersement = TeleversementMedia.objects.create(
+            utilisateur=request.user,
+            reponse=reponse,
+            type_fichier=type_fichier,
+            nom_original=nom_fichier,
+            taille_totale=taille,
+            taille_morceau=taille_morceau,
+            nb_morceaux=nb_morceaux(taille, taille_morceau),
+            empreinte_attendue=empreinte,
+        )
+
+        return Response(
+            dict(self._etat(televersement), doublon=False),
+            status=status.HTTP_201_CREATED
         )
 
+    def retrieve(self, request, pk=None):
+        """
+        État d'un upload, pour reprendre après une coupure
+        """
+        televersement = self._get_televersement(request, pk)
+        if televersement is None:
+            return Response({'error': 'Téléversement introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._etat(televersement))
+
+    @action(detail=True, methods=['put'], url_path=r'morceaux/(?P<index>\d+)')
+    def morceau(self, request, pk=None, index=None):
+        """
+        Reçoit un morceau (corps brut de la requête), écrit sur disque au fil de l'eau
+        """
+        televersement = self._get_televersement(request, pk)
+        if televersement is None:
+            return Response({'error': 'Téléversement introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        if televersement.statut != 'EN_COURS':
+            return Response({
+                'error': f'Téléversement {televersement.get_statut_display().lower()}'
+            }, status=status.HTTP_409_CONFLICT)
+
+        try:
+            taille = ecrire_morceau(televersement, int(index), request.stream or BytesIO())
+        except ErreurTeleversement as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Activité récente : pas de purge de l'upload en cours
+        TeleversementMedia.objects.filter(pk=televersement.pk).update(date_derniere_maj=timezone.now())
+        return Response({'index': int(index), 'taille': taille})
+
+    @action(detail=True, methods=['post'])
+    def finaliser(self, request, pk=None):
+        """
+        Assemble les morceaux et crée le média
+        """
+        televersement = self._get_televersement(request, pk)
+        if televersement is None:
+            return Response({'error': 'Téléversement introuvable'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Finalisation rejouée (réponse perdue) : même résultat
+        if televersement.statut == 'TERMINE' and televersement.fichier_media_id:
+            return Response({
+                'doublon': False,
+                'media': FichierMediaMobileSerializer(
+                    televersement.fichier_media, context={'request': request}
+                ).data
+            })
+        if televersement.statut != 'EN_COURS':
+            return Response({'error': 'Téléversement annulé'}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            media, doublon = finaliser_televersement(televersement)
+        except ErreurTeleversement as e:
+            return Response(
+                dict(self._etat(televersement), error=str(e)),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'doublon': doublon,
+            'media': FichierMediaMobileSerializer(media, context={'request': request}).data
+        }, status=status.HTTP_200_OK if doublon else status.HTTP_201_CREATED)
+
+    def destroy(self, request, pk=None):
+        """
+        Abandonne un upload et supprime les morceaux reçus
+        """
+        televersement = self._get_televersement(request, pk)
+        if televersement is None:
+            return Response({'error': 'Téléversement introuvable'}, status=status.HTTP_404_NOT_FOUND)
+
+        supprimer_morceaux(televersement)
+        if televersement.statut == 'EN_COURS':
+            televersement.statut = 'ANNULE'
+            televersement.save(update_fields=['statut', 'date_derniere_maj'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 # ==============================================================================
 # API DEMANDES DE RÉPARATION MOBILE
 # ==============================================================================
@@ -658,14 +786,12 @@ class DemandeReparationMobileViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['statut', 'priorite', 'assignee_a']
+    pagination_cle = ('date_creation', 'id')
     
     def get_queryset(self):
         user = self.request.user
         
-        try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
+        role = droits(user).role
         
         if role in ['MANAGER', 'ADMIN']:
             return DemandeReparation.objects.all().select_related(
@@ -736,10 +862,7 @@ class DemandeReparationMobileViewSet(viewsets.ModelViewSet):
                 'error': 'La demande doit être validée pour commencer'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            role = request.user.profil.role
-        except:
-            role = 'OPERATEUR'
+        role = droits(request.user).role
         
         if demande.assignee_a != request.user and role not in ['MANAGER', 'ADMIN']:
             return Response({
@@ -767,10 +890,7 @@ class DemandeReparationMobileViewSet(viewsets.ModelViewSet):
                 'error': 'La réparation doit être en cours'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            role = request.user.profil.role
-        except:
-            role = 'OPERATEUR'
+        role = droits(request.user).role
         
         if demande.assignee_a != request.user and role not in ['MANAGER', 'ADMIN']:
             return Response({
@@ -792,16 +912,7 @@ class DemandeReparationMobileViewSet(viewsets.ModelViewSet):
         """
         Vérifie si un utilisateur peut créer une demande de réparation
         """
-        try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
-        
-        return (
-            ordre.assigne_a_technicien == user or
-            (ordre.assigne_a_equipe and user in ordre.assigne_a_equipe.membres.all()) or
-            role in ['MANAGER', 'ADMIN']
-        )
+        return droits(user).peut_executer(ordre)
 
 # ==============================================================================
 # API SYNCHRONISATION MOBILE
@@ -814,6 +925,9 @@ class SynchronisationMobileViewSet(viewsets.ViewSet):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
     
+    # Modifications appliquées par lot via core.utils.sync_utils
+    MODIFICATIONS_PAR_LOT = (('reponse', 'create_or_update'), ('demande_reparation', 'create'))
+    
     @action(detail=False, methods=['get'])
     def donnees_initiales(self, request):
         """
@@ -822,22 +936,24 @@ class SynchronisationMobileViewSet(viewsets.ViewSet):
         user = request.user
         
         # OT assignés à l'utilisateur
-        mes_ot = OrdreDeTravail.objects.filter(
-            Q(assigne_a_technicien=user) | 
-            Q(assigne_a_equipe__membres=user)
-        ).exclude(
-            statut__est_statut_final=True
-        ).select_related('intervention', 'asset', 'statut')
+        mes_ot = annoter_ordres_travail_mobile(
+            OrdreDeTravail.objects.filter(
+                droits(user).filtre_assignes()
+            ).exclude(
+                statut__est_statut_final=True
+            )
+        )
+        mes_ot_ids = mes_ot.values('id')
         
         # Interventions associées
         interventions = Intervention.objects.filter(
-            ordredetravail__in=mes_ot
+            ordredetravail__in=mes_ot_ids
         ).distinct().prefetch_related('operations__points_de_controle')
         
         # Assets associés
         assets = Asset.objects.filter(
-            ordredetravail__in=mes_ot
-        ).distinct()
+            ordredetravail__in=mes_ot_ids
+        ).distinct().select_related('categorie')
         
         # Demandes de réparation
         demandes = DemandeReparation.objects.filter(
@@ -846,7 +962,7 @@ class SynchronisationMobileViewSet(viewsets.ViewSet):
         
         return Response({
             'timestamp': timezone.now().isoformat(),
-            'ordres_travail': OrdreDeTravailMobileSerializer(mes_ot, many=True).data,
+            'ordres_travail': OrdreDeTravailMobileSerializer(mes_ot, many=True, context={'request': request}).data,
             'interventions': InterventionMobileSerializer(interventions, many=True).data,
             'assets': AssetMobileSerializer(assets, many=True).data,
             'demandes_reparation': DemandeReparationMobileSerializer(demandes, many=True).data,
@@ -857,24 +973,50 @@ class SynchronisationMobileViewSet(viewsets.ViewSet):
     def synchroniser_modifications(self, request):
         """
         Synchronise les modifications faites en mode offline
+
+        Les réponses et demandes de réparation sont appliquées par lot ; une
+        modification portant une `cle_idempotence` déjà reçue est ignorée.
         """
         modifications = request.data.get('modifications', [])
-        resultats = []
-        
-        for modif in modifications:
+        resultats = [None] * len(modifications)
+        lots = {'reponse': [], 'demande_reparation': []}
+        
+        for index, modif in enumerate(modifications):
+            type_objet = modif.get('type')
+            if (type_objet, modif.get('action')) in self.MODIFICATIONS_PAR_LOT:
+                data = dict(modif.get('data') or {})
+                if modif.get('cle_idempotence'):
+                    data.setdefault('cle_idempotence', modif['cle_idempotence'])
+                lots[type_objet].append((index, data))
+                continue
+            
             try:
                 resultat = self._traiter_modification(modif, request.user)
-                resultats.append({
+                resultats[index] = {
                     'id_local': modif.get('id_local'),
                     'success': True,
                     'data': resultat
-                })
+                }
             except Exception as e:
-                resultats.append({
+                resultats[index] = {
                     'id_local': modif.get('id_local'),
                     'success': False,
                     'error': str(e)
-                })
+                }
+        
+        for type_objet, appliquer in (('reponse', appliquer_reponses),
+                                      ('demande_reparation', appliquer_demandes)):
+            lot = lots[type_objet]
+            if not lot:
+                continue
+            for (index, _), resultat in zip(lot, appliquer([data for _, data in lot], request.user)):
+                resultats[index] = {
+                    'id_local': modifications[index].get('id_local'),
+                    'success': resultat['statut'] != STATUT_ERREUR,
+                    'data': resultat,
+                }
+                if 'error' in resultat:
+                    resultats[index]['error'] = resultat['error']
         
         return Response({
             'resultats': resultats,
@@ -883,49 +1025,17 @@ class SynchronisationMobileViewSet(viewsets.ViewSet):
     
     def _traiter_modification(self, modif, user):
         """
-        Traite une modification offline
+        Traite une modification offline unitaire
         """
         type_objet = modif.get('type')
         action = modif.get('action')
         data = modif.get('data')
         
-        if type_objet == 'reponse' and action == 'create_or_update':
-            return self._sync_reponse(data, user)
-        elif type_objet == 'media' and action == 'create':
+        if type_objet == 'media' and action == 'create':
             return self._sync_media(data, user)
-        elif type_objet == 'demande_reparation' and action == 'create':
-            return self._sync_demande_reparation(data, user)
         else:
             raise ValueError(f"Type de modification non supporté: {type_objet}/{action}")
     
-    def _sync_reponse(self, data, user):
-        """
-        Synchronise une réponse
-        """
-        rapport_id = data.get('rapport_execution')
-        point_id = data.get('point_de_controle')
-        valeur = data.get('valeur')
-        
-        rapport = RapportExecution.objects.get(id=rapport_id)
-        point = PointDeControle.objects.get(id=point_id)
-        
-        reponse, created = Reponse.objects.get_or_create(
-            rapport_execution=rapport,
-            point_de_controle=point,
-            defaults={
-                'valeur': valeur,
-                'saisi_par': user
-            }
-        )
-        
-        if not created:
-            reponse.valeur = valeur
-            reponse.saisi_par = user
-            reponse.date_reponse = timezone.now()
-            reponse.save()
-        
-        return ReponseMobileSerializer(reponse).data
-    
     def _sync_media(self, data, user):
         """
         Synchronise un média (placeholder - nécessite traitement spécial pour les fichiers)
@@ -934,176 +1044,159 @@ class SynchronisationMobileViewSet(viewsets.ViewSet):
         # Nécessite une approche spéciale pour les fichiers binaires
         pass
     
-    def _sync_demande_reparation(self, data, user):
-        """
-        Synchronise une demande de réparation
+    @action(detail=False, methods=['get'])
+    def pull_data(self, request):
         """
-        ordre_id = data.get('ordre_de_travail')
-        point_id = data.get('point_de_controle')
-        
-        ordre = OrdreDeTravail.objects.get(id=ordre_id)
-        point = PointDeControle.objects.get(id=point_id)
-        
-        demande = DemandeReparation.objects.create(
-            ordre_de_travail=ordre,
-            point_de_controle=point,
-            titre=data.get('titre'),
-            description=data.get('description'),
-            priorite=data.get('priorite', 2),
-            cree_par=user
-        )
-        
-        return DemandeReparationMobileSerializer(demande).data
+        Synchronisation différentielle des données de l'utilisateur
 
-# ==============================================================================
-# API ASSETS MOBILE
-# ==============================================================================
+        Paramètres:
+            cursor (ou last_sync): curseur ISO 8601 renvoyé par le précédent
+                appel. Absent ou trop ancien => synchronisation complète.
 
-class AssetMobileViewSet(viewsets.ReadOnlyModelViewSet):
-    """
-    API lecture seule pour les assets sur mobile
-    """
-    serializer_class = AssetMobileSerializer
-    authentication_classes = [TokenAuthentication]
-    permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['statut', 'criticite', 'categorie']
-    
-    def get_queryset(self):
-        return Asset.objects.all().select_related('categorie')
-    
-    @action(detail=True, methods=['get'])
-    def qr_scan(self, request, pk=None):
-        """
-        Récupère les infos d'un asset scanné via QR code
-        """
-        asset = self.get_object()
-        
-        # OT en cours sur cet asset
-        ot_en_cours = OrdreDeTravail.objects.filter(
-            asset=asset,
-            statut__est_statut_final=False
-        ).select_related('intervention', 'statut', 'assigne_a_technicien')
-        
-        # Dernière maintenance
-        derniere_maintenance = OrdreDeTravail.objects.filter(
-            asset=asset,
-            statut__est_statut_final=True
-        ).order_by('-date_fin_reelle').first()
-        
-        return Response({
-            'asset': AssetMobileSerializer(asset).data,
-            'ordres_travail_actifs': OrdreDeTravailMobileSerializer(ot_en_cours, many=True).data,
-            'derniere_maintenance': OrdreDeTravailMobileSerializer(derniere_maintenance).data if derniere_maintenance else None,
-            'peut_creer_ot': self._peut_creer_ot(request.user)
-        })
-    
-    def _peut_creer_ot(self, user):
+        Seuls les objets modifiés depuis le curseur sont renvoyés, ainsi que
+        les identifiants supprimés (`suppressions`) et la liste complète des
+        OT encore assignés (`ordres_travail_ids`) pour que le client retire
+        ceux qui ont été réassignés.
         """
-        Vérifie si l'utilisateur peut créer des OT
-        """
-        try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
-        
-        return role in ['MANAGER', 'ADMIN']
-    
-# Améliorations suggérées pour le backend mobile
+        user = request.user
+        now = timezone.now()
 
-# 1. Ajouter dans api_views_mobile.py - ViewSet de synchronisation manquant
+        cursor_param = request.query_params.get('cursor') or request.query_params.get('last_sync')
+        since = None
+        if cursor_param:
+            try:
+                since = parse_datetime(cursor_param)
+            except ValueError:
+                since = None
+            if since is None:
+                return Response({
+                    'success': False,
+                    'error': 'Curseur de synchronisation invalide'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
 
-class SynchronisationMobileViewSet(viewsets.ViewSet):
-    """
-    API de synchronisation pour l'application mobile
-    """
-    authentication_classes = [TokenAuthentication]
-    permission_classes = [IsAuthenticated]
-    
-    @action(detail=False, methods=['get'])
-    def pull_data(self, request):
-        """
-        Télécharge toutes les données nécessaires pour l'utilisateur
-        """
-        user = request.user
-        last_sync = request.query_params.get('last_sync')
-        
-        # Récupérer les OT assignés
-        ot_filter = Q(assigne_a_technicien=user)
-        if hasattr(user, 'profil') and hasattr(user.profil, 'equipe_id'):
-            ot_filter |= Q(assigne_a_equipe_id=user.profil.equipe_id)
-        
-        if last_sync:
-            ot_filter &= Q(date_derniere_maj__gte=last_sync)
-        
-        ordres_travail = OrdreDeTravail.objects.filter(ot_filter).select_related(
-            'intervention', 'asset', 'statut'
+        # Au-delà de la rétention des traces de suppression, le delta ne
+        # peut plus être garanti complet : on repart d'une synchro complète
+        retention = timedelta(days=getattr(settings, 'GMAO_SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+        full_sync = since is None or since < now - retention
+
+        if not full_sync:
+            # Fenêtre de recouvrement pour les transactions encore en cours
+            # au moment du précédent curseur
+            since -= timedelta(seconds=getattr(settings, 'GMAO_SYNC_OVERLAP_SECONDS', 2))
+
+        # Périmètre : OT assignés au technicien ou à l'une de ses équipes
+        ot_scope = OrdreDeTravail.objects.filter(droits(user).filtre_assignes())
+
+        ordres_travail_ids = list(ot_scope.values_list('id', flat=True))
+        ordres_travail = annoter_ordres_travail_mobile(
+            OrdreDeTravail.objects.filter(id__in=ordres_travail_ids)
         )
-        
-        # Récupérer les interventions associées
-        intervention_ids = ordres_travail.values_list('intervention_id', flat=True)
-        interventions = Intervention.objects.filter(
-            id__in=intervention_ids
-        ).prefetch_related('operations__points_de_controle')
-        
-        # Récupérer les assets
-        asset_ids = ordres_travail.values_list('asset_id', flat=True)
+
+        if not full_sync:
+            ordres_travail = ordres_travail.filter(date_derniere_maj__gte=since)
+        ordres_travail = list(ordres_travail)
+
+        # Interventions et assets du périmètre
+        scope_refs = OrdreDeTravail.objects.filter(id__in=ordres_travail_ids)
+        intervention_ids = set(scope_refs.values_list('intervention_id', flat=True))
+        asset_ids = set(scope_refs.values_list('asset_id', flat=True))
+
+        interventions = Intervention.objects.filter(id__in=intervention_ids)
         assets = Asset.objects.filter(id__in=asset_ids)
+
+        if not full_sync:
+            # Une intervention est renvoyée (complète) si elle, une de ses
+            # opérations ou un de ses points a changé, ou si un OT modifié
+            # y fait référence
+            interventions = interventions.filter(
+                Q(date_derniere_maj__gte=since) |
+                Q(operations__date_derniere_maj__gte=since) |
+                Q(operations__points_de_controle__date_derniere_maj__gte=since) |
+                Q(id__in=[ot.intervention_id for ot in ordres_travail])
+            ).distinct()
+            assets = assets.filter(
+                Q(date_derniere_maj__gte=since) |
+                Q(id__in=[ot.asset_id for ot in ordres_travail])
+            )
+
+        interventions = list(interventions.prefetch_related('operations__points_de_controle'))
+        assets = list(assets.select_related('categorie'))
+
+        # Gammes figées référencées par les OT renvoyés (servies depuis le cache)
+        gammes = {
+            str(version_id): get_gamme_version(version_id)
+            for version_id in {ot.version_intervention_id for ot in ordres_travail} - {None}
+        }
         
+        # Suppressions intervenues depuis le curseur
+        suppressions = {code: [] for code, _ in ElementSupprime.TYPE_OBJET_CHOIX}
+        if not full_sync:
+            for type_objet, objet_id in ElementSupprime.objects.filter(
+                date_suppression__gte=since
+            ).values_list('type_objet', 'objet_id'):
+                suppressions[type_objet].append(objet_id)
+
+        context = {'request': request}
         return Response({
             'success': True,
-            'timestamp': timezone.now(),
+            'timestamp': now,
+            'cursor': now.isoformat(),
+            'full_sync': full_sync,
+            'ordres_travail_ids': ordres_travail_ids,
             'data': {
-                'ordres_travail': OrdreDeTravailMobileSerializer(ordres_travail, many=True, context={'request': request}).data,
-                'interventions': InterventionMobileSerializer(interventions, many=True, context={'request': request}).data,
-                'assets': AssetMobileSerializer(assets, many=True, context={'request': request}).data,
+                'ordres_travail': OrdreDeTravailMobileSerializer(ordres_travail, many=True, context=context).data,
+                'interventions': InterventionMobileSerializer(interventions, many=True, context=context).data,
+                'assets': AssetMobileSerializer(assets, many=True, context=context).data,
+                'gammes': gammes,
             },
+            'suppressions': suppressions,
             'counts': {
-                'ordres_travail': ordres_travail.count(),
-                'interventions': interventions.count(),
-                'assets': assets.count(),
+                'ordres_travail': len(ordres_travail),
+                'interventions': len(interventions),
+                'assets': len(assets),
+                'suppressions': sum(len(ids) for ids in suppressions.values()),
             }
         })
     
     @action(detail=False, methods=['post'])
     def push_data(self, request):
         """
-        Upload des données modifiées depuis le mobile
+        Upload groupé des données modifiées depuis le mobile
+
+        Chaque type est appliqué par lot (voir core.utils.sync_utils) ; les
+        éléments portant une `cle_idempotence` déjà reçue sont ignorés, un
+        envoi rejoué ne modifie donc rien.
         """
         data = request.data
         results = {
             'success': True,
             'processed': 0,
             'errors': [],
-            'warnings': []
+            'warnings': [],
+            'resultats': {},
         }
         
-        # Traiter les rapports d'exécution
-        if 'rapports_execution' in data:
-            for rapport_data in data['rapports_execution']:
-                try:
-                    self._process_rapport_execution(rapport_data, request.user)
-                    results['processed'] += 1
-                except Exception as e:
-                    results['errors'].append(f"Rapport {rapport_data.get('id', 'N/A')}: {str(e)}")
-        
-        # Traiter les réponses
-        if 'reponses' in data:
-            for reponse_data in data['reponses']:
-                try:
-                    self._process_reponse(reponse_data, request.user)
-                    results['processed'] += 1
-                except Exception as e:
-                    results['errors'].append(f"Réponse {reponse_data.get('id', 'N/A')}: {str(e)}")
-        
-        # Traiter les demandes de réparation
-        if 'demandes_reparation' in data:
-            for demande_data in data['demandes_reparation']:
-                try:
-                    self._process_demande_reparation(demande_data, request.user)
+        rapports, reponses_rapports = appliquer_rapports(data.get('rapports_execution') or [], request.user)
+        reponses = appliquer_reponses(data.get('reponses') or [], request.user)
+        demandes = appliquer_demandes(data.get('demandes_reparation') or [], request.user)
+        
+        results['resultats'] = {
+            'rapports_execution': rapports,
+            'reponses': reponses_rapports + reponses,
+            'demandes_reparation': demandes,
+        }
+        
+        for libelle, resultats in (('Rapport', rapports), ('Réponse', reponses_rapports + reponses),
+                                   ('Demande', demandes)):
+            for resultat in resultats:
+                if resultat['statut'] == STATUT_ERREUR:
+                    results['errors'].append(f"{libelle} {resultat['cle'] or 'N/A'}: {resultat['error']}")
+                elif resultat['statut'] == STATUT_DEJA_TRAITE:
+                    results['warnings'].append(f"{libelle} {resultat['cle']}: déjà synchronisé")
+                else:
                     results['processed'] += 1
-                except Exception as e:
-                    results['errors'].append(f"Demande {demande_data.get('id', 'N/A')}: {str(e)}")
         
         if results['errors']:
             results['success'] = len(results['errors']) < results['processed']
@@ -1118,10 +1211,7 @@ class SynchronisationMobileViewSet(viewsets.ViewSet):
         user = request.user
         
         # Compter les OT assignés
-        ot_count = OrdreDeTravail.objects.filter(
-            Q(assigne_a_technicien=user) | 
-            Q(assigne_a_equipe__membres=user)
-        ).count()
+        ot_count = OrdreDeTravail.objects.filter(droits(user).filtre_assignes()).count()
         
         # Compter les rapports en cours
         rapports_en_cours = RapportExecution.objects.filter(
@@ -1141,21 +1231,60 @@ class SynchronisationMobileViewSet(viewsets.ViewSet):
             'derniere_activite': derniere_activite.date_derniere_maj if derniere_activite else None,
             'server_time': timezone.now(),
         })
+
+# ==============================================================================
+# API ASSETS MOBILE
+# ==============================================================================
+
+class AssetMobileViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API lecture seule pour les assets sur mobile
+    """
+    serializer_class = AssetMobileSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['statut', 'criticite', 'categorie']
+    pagination_cle = ('id',)
     
-    def _process_rapport_execution(self, data, user):
-        """Traite un rapport d'exécution"""
-        # Logique de traitement
-        pass
+    def get_queryset(self):
+        return Asset.objects.all().select_related('categorie')
     
-    def _process_reponse(self, data, user):
-        """Traite une réponse"""
-        # Logique de traitement
-        pass
+    @action(detail=True, methods=['get'])
+    def qr_scan(self, request, pk=None):
+        """
+        Récupère les infos d'un asset scanné via QR code
+        """
+        asset = self.get_object()
+        
+        # OT en cours sur cet asset
+        ot_en_cours = OrdreDeTravail.objects.filter(
+            asset=asset,
+            statut__est_statut_final=False
+        ).select_related('intervention', 'statut', 'assigne_a_technicien')
+        
+        # Dernière maintenance
+        derniere_maintenance = OrdreDeTravail.objects.filter(
+            asset=asset,
+            statut__est_statut_final=True
+        ).order_by('-date_fin_reelle').first()
+        
+        return Response({
+            'asset': AssetMobileSerializer(asset).data,
+            'ordres_travail_actifs': OrdreDeTravailMobileSerializer(ot_en_cours, many=True).data,
+            'derniere_maintenance': OrdreDeTravailMobileSerializer(derniere_maintenance).data if derniere_maintenance else None,
+            'peut_creer_ot': self._peut_creer_ot(request.user)
+        })
     
-    def _process_demande_reparation(self, data, user):
-        """Traite une demande de réparation"""
-        # Logique de traitement
-        pass
+    def _peut_creer_ot(self, user):
+        """
+        Vérifie si l'utilisateur peut créer des OT
+        """
+        role = droits(user).role
+        
+        return role in ['MANAGER', 'ADMIN']
+    
+# Améliorations suggérées pour le backend mobile
 
 # 2. Ajouter endpoint pour les statistiques mobile
 
@@ -1167,11 +1296,7 @@ def dashboard_stats(self, request):
     user = request.user
     
     # OT assignés
-    ot_filter = Q(assigne_a_technicien=user)
-    if hasattr(user, 'profil') and hasattr(user.profil, 'equipe_id'):
-        ot_filter |= Q(assigne_a_equipe_id=user.profil.equipe_id)
-    
-    ordres_travail = OrdreDeTravail.objects.filter(ot_filter)
+    ordres_travail = OrdreDeTravail.objects.filter(droits(user).filtre_assignes())
     
     stats = {
         'taches_assignees': ordres_travail.count(),
@@ -1203,7 +1328,7 @@ def notifications(self, request):
     
     # Nouveaux OT assignés
     nouveaux_ot = OrdreDeTravail.objects.filter(
-        Q(assigne_a_technicien=user) | Q(assigne_a_equipe__membres=user),
+        droits(user).filtre_assignes(),
         date_creation__gte=timezone.now() - timedelta(days=7)
     ).order_by('-date_creation')[:limit]
     
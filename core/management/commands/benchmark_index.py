@@ -0,0 +1,221 @@
+# Fichier: core/management/commands/benchmark_index.py
+
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import (
+    Asset, CategorieAsset, DemandeReparation, Equipe, Intervention, Notification,
+    Operation, OrdreDeTravail, PointDeControle, StatutWorkflow
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Index composites et partiels évalués (migration 0018_index_composites)
+MODELES_INDEXES = (Asset, OrdreDeTravail, DemandeReparation, Notification)
+STATUTS_DEMANDE_BLOQUANTS = ['EN_ATTENTE', 'VALIDEE', 'EN_COURS']
+
+
+class Annulation(Exception):
+    """Levée en fin de mesure pour annuler la transaction"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesure les requêtes fréquentes (plans et durées) avec et sans les index composites, '
+        'sur un jeu de données généré dans une transaction annulée en fin de mesure'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nb-ot', type=int, default=50000, help='Nombre d\'OT générés')
+        parser.add_argument('--repetitions', type=int, default=20, help='Exécutions par requête (médiane)')
+        parser.add_argument('--sans-plans', action='store_true', help='N\'afficher que les durées')
+
+    def handle(self, *args, **options):
+        if options['nb_ot'] < 100:
+            raise CommandError("--nb-ot doit valoir au moins 100")
+        random.seed(42)
+
+        try:
+            with transaction.atomic():
+                donnees = self._generer(options['nb_ot'])
+                requetes = self._requetes(donnees)
+
+                avec = self._mesurer(requetes, options['repetitions'])
+                self._supprimer_index()
+                sans = self._mesurer(requetes, options['repetitions'])
+
+                self._afficher(requetes, sans, avec, not options['sans_plans'])
+                raise Annulation
+        except Annulation:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("Mesure terminée, jeu de données et index restaurés"))
+
+    # ==========================================================================
+    # JEU DE DONNÉES
+    # ==========================================================================
+
+    def _generer(self, nb_ot):
+        self.stdout.write(f"Génération de {nb_ot} OT...")
+        maintenant = timezone.now()
+
+        techniciens = User.objects.bulk_create([
+            User(username=f'bench_tech_{i}', password='!') for i in range(50)
+        ])
+        equipes = Equipe.objects.bulk_create([Equipe(nom=f'Bench équipe {i}') for i in range(10)])
+        statuts_ouverts = StatutWorkflow.objects.bulk_create([
+            StatutWorkflow(nom=f'Bench {nom}') for nom in ('Planifié', 'Assigné', 'En cours', 'En attente')
+        ])
+        statuts_finaux = StatutWorkflow.objects.bulk_create([
+            StatutWorkflow(nom=f'Bench {nom}', est_statut_final=True) for nom in ('Terminé', 'Annulé')
+        ])
+        categorie = CategorieAsset.objects.create(nom='Bench catégorie')
+        assets = Asset.objects.bulk_create([
+            Asset(
+                nom=f'Bench asset {i}', categorie=categorie,
+                statut=random.choice(['EN_SERVICE'] * 8 + ['EN_PANNE', 'EN_MAINTENANCE']),
+                criticite=random.randint(1, 4),
+            )
+            for i in range(max(nb_ot // 10, 1))
+        ])
+        intervention = Intervention.objects.create(nom='Bench intervention')
+        operation = Operation.objects.create(intervention=intervention, nom='Bench opération', ordre=1)
+        point = PointDeControle.objects.create(operation=operation, label='Bench point', ordre=1)
+
+        ordres = []
+        for i in range(nb_ot):
+            # 80 % d'OT terminés : l'historique domine les tables réelles
+            termine = random.random() < 0.8
+            creation = maintenant - timedelta(minutes=random.randint(0, 2 * 365 * 24 * 60))
+            ordres.append(OrdreDeTravail(
+                titre=f'Bench OT {i}', intervention=intervention, asset=random.choice(assets),
+                statut=random.choice(statuts_finaux if termine else statuts_ouverts),
+                assigne_a_technicien=random.choice(techniciens) if random.random() < 0.7 else None,
+                assigne_a_equipe=random.choice(equipes) if random.random() < 0.3 else None,
+                date_creation=creation,
+                date_prevue_debut=creation + timedelta(days=random.randint(0, 30)),
+                date_fin_reelle=creation + timedelta(days=random.randint(1, 40)) if termine else None,
+            ))
+        ordres = OrdreDeTravail.objects.bulk_create(ordres, batch_size=2000)
+
+        DemandeReparation.objects.bulk_create([
+            DemandeReparation(
+                numero_demande=f'BENCH-{i}', ordre_de_travail=random.choice(ordres),
+                point_de_controle=point, titre='Bench demande', description='',
+                statut=random.choice(['TERMINEE'] * 6 + STATUTS_DEMANDE_BLOQUANTS + ['REJETEE']),
+                bloque_cloture_ot=random.random() < 0.1,
+                date_creation=maintenant - timedelta(hours=random.randint(0, 2 * 365 * 24)),
+            )
+            for i in range(nb_ot // 5)
+        ], batch_size=2000)
+
+        Notification.objects.bulk_create([
+            Notification(
+                utilisateur=random.choice(techniciens), titre='Bench', message='',
+                lue=random.random() < 0.9,
+                date_creation=maintenant - timedelta(minutes=random.randint(0, 365 * 24 * 60)),
+            )
+            for _ in range(nb_ot)
+        ], batch_size=2000)
+
+        self._analyser()
+        milieu = OrdreDeTravail.objects.filter(titre__startswith='Bench').order_by('-date_creation', '-id')[nb_ot // 2]
+        return {
+            'maintenant': maintenant,
+            'technicien': techniciens[0],
+            'equipe': equipes[0],
+            'asset': assets[0],
+            'ordre': ordres[0],
+            'milieu': milieu,
+        }
+
+    def _analyser(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    # ==========================================================================
+    # REQUÊTES MESURÉES (reprises de views.py, api_views_mobile.py, middleware.py)
+    # ==========================================================================
+
+    def _requetes(self, d):
+        milieu = d['milieu']
+        return [
+            ("Mes tâches d'un technicien (OT non terminés par date prévue)",
+             OrdreDeTravail.objects.filter(assigne_a_technicien=d['technicien'])
+             .exclude(statut__est_statut_final=True).order_by('date_prevue_debut')[:50], list),
+            ("Tâches d'une équipe",
+             OrdreDeTravail.objects.filter(assigne_a_equipe=d['equipe'])
+             .exclude(statut__est_statut_final=True).order_by('date_prevue_debut')[:50], list),
+            ("OT en retard (notifications)",
+             OrdreDeTravail.objects.filter(
+                 date_prevue_debut__lt=d['maintenant'] - timedelta(hours=1), statut__est_statut_final=False
+             ), lambda qs: qs.count()),
+            ("Page profonde de la liste des OT (pagination par clé)",
+             OrdreDeTravail.objects.filter(
+                 Q(date_creation__lt=milieu.date_creation) | Q(date_creation=milieu.date_creation, id__lt=milieu.pk)
+             ).order_by('-date_creation', '-id')[:20], list),
+            ("Dernière maintenance d'un asset",
+             OrdreDeTravail.objects.filter(asset=d['asset'], statut__est_statut_final=True)
+             .order_by('-date_fin_reelle')[:1], list),
+            ("Demandes bloquant la clôture d'un OT",
+             DemandeReparation.objects.filter(
+                 ordre_de_travail=d['ordre'], bloque_cloture_ot=True, statut__in=STATUTS_DEMANDE_BLOQUANTS
+             ), lambda qs: qs.exists()),
+            ("Demandes en attente depuis 24 h",
+             DemandeReparation.objects.filter(
+                 statut='EN_ATTENTE', date_creation__lt=d['maintenant'] - timedelta(hours=24)
+             ), lambda qs: qs.count()),
+            ("Dernières notifications d'un utilisateur",
+             Notification.objects.filter(utilisateur=d['technicien']).order_by('-date_creation')[:20], list),
+            ("Notifications non lues d'un utilisateur",
+             Notification.objects.filter(utilisateur=d['technicien'], lue=False), lambda qs: qs.count()),
+            ("Assets critiques en panne",
+             Asset.objects.filter(statut='EN_PANNE', criticite__gte=3), lambda qs: qs.count()),
+        ]
+
+    def _mesurer(self, requetes, repetitions):
+        resultats = []
+        for nom, queryset, executer in requetes:
+            durees = []
+            for _ in range(repetitions):
+                debut = time.perf_counter()
+                executer(queryset._chain())
+                durees.append((time.perf_counter() - debut) * 1000)
+            resultats.append((statistics.median(durees), queryset.explain()))
+        return resultats
+
+    def _supprimer_index(self):
+        with connection.cursor() as cursor:
+            for modele in MODELES_INDEXES:
+                for index in modele._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+        self._analyser()
+
+    # ==========================================================================
+    # RAPPORT
+    # ==========================================================================
+
+    def _afficher(self, requetes, sans, avec, plans):
+        self.stdout.write('')
+        self.stdout.write(f"{'Requête':<62} {'sans index':>11} {'avec index':>11} {'gain':>7}")
+        for (nom, _, _), (duree_sans, _), (duree_avec, _) in zip(requetes, sans, avec):
+            gain = duree_sans / duree_avec if duree_avec else 0
+            self.stdout.write(f"{nom:<62} {duree_sans:>9.2f}ms {duree_avec:>9.2f}ms {gain:>6.1f}x")
+
+        if plans:
+            for (nom, _, _), (_, plan_sans), (_, plan_avec) in zip(requetes, sans, avec):
+                self.stdout.write('')
+                self.stdout.write(self.style.MIGRATE_HEADING(nom))
+                self.stdout.write('  Sans index :')
+                self.stdout.write('\n'.join(f'    {ligne}' for ligne in plan_sans.splitlines()))
+                self.stdout.write('  Avec index :')
+                self.stdout.write('\n'.join(f'    {ligne}' for ligne in plan_avec.splitlines()))
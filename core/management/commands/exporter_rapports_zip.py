@@ -0,0 +1,49 @@
+# Fichier: core/management/commands/exporter_rapports_zip.py
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from core.utils.export_rapports import flux_zip_rapports, lire_filtre, rapports_a_exporter
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Exporte dans une archive ZIP les rapports finalisés (PDF et médias) d\'une zone, période, intervention ou type d\'OT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help='Chemin de l\'archive ZIP à écrire')
+        parser.add_argument('--zone', help='Identifiant de la ZoneGeographique des assets')
+        parser.add_argument('--intervention', help='Identifiant de l\'intervention')
+        parser.add_argument('--type-ot', dest='type_ot', help='Type d\'OT (type_OT)')
+        parser.add_argument('--debut', help='Fin d\'exécution à partir du (AAAA-MM-JJ)')
+        parser.add_argument('--fin', help='Fin d\'exécution jusqu\'au (AAAA-MM-JJ)')
+
+    def handle(self, *args, **options):
+        try:
+            filtre = lire_filtre(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        rapports = rapports_a_exporter(**filtre)
+        nb_rapports = rapports.count()
+        if not nb_rapports:
+            raise CommandError("Aucun rapport finalisé pour ce filtre")
+
+        # Écriture dans un temporaire : l'archive n'apparaît que complète
+        sortie = options['sortie']
+        temporaire = f"{sortie}.tmp"
+        taille = 0
+        try:
+            with open(temporaire, 'wb') as archive:
+                for bloc in flux_zip_rapports(rapports):
+                    archive.write(bloc)
+                    taille += len(bloc)
+            os.replace(temporaire, sortie)
+        finally:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+
+        message = f"{nb_rapports} rapport(s) exporté(s) dans {sortie} ({taille} octets)"
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,60 @@
+# Fichier: core/management/commands/generer_rapports_pdf.py
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from core.models import RapportExecution
+from core.utils.rapport_pdf import generer_pdf_rapports, pdf_disponible, STATUTS_FIGES
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Génère les PDF des rapports finalisés d\'une zone et/ou d\'un mois, en parallèle'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--zone',
+            type=int,
+            help='Identifiant de la ZoneGeographique des assets',
+        )
+        parser.add_argument(
+            '--mois',
+            help='Mois de fin d\'exécution, au format AAAA-MM',
+        )
+        parser.add_argument(
+            '--processus',
+            type=int,
+            default=None,
+            help='Taille du pool de processus (nombre de cœurs par défaut, 1 sans pool)',
+        )
+
+    def handle(self, *args, **options):
+        if not pdf_disponible():
+            raise CommandError("WeasyPrint n'est pas installé")
+
+        rapports = RapportExecution.objects.filter(statut_rapport__in=STATUTS_FIGES)
+        if options['zone']:
+            rapports = rapports.filter(ordre_de_travail__asset__zone_geographique_id=options['zone'])
+        if options['mois']:
+            try:
+                mois = datetime.strptime(options['mois'], '%Y-%m')
+            except ValueError:
+                raise CommandError("Mois invalide, format attendu : AAAA-MM")
+            rapports = rapports.filter(
+                date_execution_fin__year=mois.year, date_execution_fin__month=mois.month
+            )
+
+        def rapport(rapport_id, chemin, erreur):
+            if erreur is not None:
+                self.stderr.write(f"Rapport {rapport_id} : {erreur}")
+
+        nb_ok, nb_erreurs = generer_pdf_rapports(
+            rapports.order_by('pk').values_list('pk', flat=True),
+            processus=options['processus'],
+            rapport=rapport,
+        )
+
+        message = f"{nb_ok} PDF disponible(s), {nb_erreurs} en erreur"
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,33 @@
+# Fichier: core/management/commands/purger_suppressions.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.utils import timezone
+from core.models import ElementSupprime, CleIdempotenceSync
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Purge les traces de suppression et clés d\'idempotence plus anciennes que la rétention de synchronisation mobile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jours',
+            type=int,
+            default=getattr(settings, 'GMAO_SYNC_TOMBSTONE_RETENTION_DAYS', 30),
+            help='Âge maximal des traces conservées, en jours',
+        )
+
+    def handle(self, *args, **options):
+        # Les clients dont le curseur dépasse cette rétention repartent d'une
+        # synchronisation complète : les traces plus anciennes sont inutiles
+        limite = timezone.now() - timedelta(days=options['jours'])
+        nb_supprimes, _ = ElementSupprime.objects.filter(date_suppression__lt=limite).delete()
+        nb_cles, _ = CleIdempotenceSync.objects.filter(date_creation__lt=limite).delete()
+
+        message = f"{nb_supprimes} trace(s) de suppression et {nb_cles} clé(s) d'idempotence purgée(s)"
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
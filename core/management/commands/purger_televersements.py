@@ -0,0 +1,38 @@
+# Fichier: core/management/commands/purger_televersements.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.utils import timezone
+from core.models import TeleversementMedia
+from core.utils.televersement_utils import supprimer_morceaux
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Supprime les uploads en plusieurs morceaux abandonnés et leurs morceaux sur disque'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--heures',
+            type=int,
+            default=getattr(settings, 'GMAO_UPLOAD_EXPIRATION_HOURS', 48),
+            help='Inactivité au-delà de laquelle un upload est purgé, en heures',
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(hours=options['heures'])
+        expires = TeleversementMedia.objects.filter(date_derniere_maj__lt=limite)
+
+        nb_non_termines = 0
+        for televersement in expires.exclude(statut='TERMINE').iterator():
+            supprimer_morceaux(televersement)
+            nb_non_termines += 1
+
+        nb_supprimes, _ = expires.delete()
+
+        message = f"{nb_supprimes} téléversement(s) purgé(s), dont {nb_non_termines} non terminé(s)"
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,17 @@
+# Fichier: core/management/commands/recalculer_compteurs.py
+
+from django.core.management.base import BaseCommand
+from core.utils.compteurs import recalculer_compteurs
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Reconstruit les compteurs du tableau de bord (après des mises à jour en masse ou un import)'
+
+    def handle(self, *args, **options):
+        nb_lignes = recalculer_compteurs()
+
+        message = f"{nb_lignes} compteur(s) du tableau de bord recalculé(s)"
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,19 @@
+# Fichier: core/management/commands/reindexer_recherche.py
+
+from django.core.management.base import BaseCommand
+from core.utils.recherche import reindexer_tout
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Reconstruit l\'index de recherche (après des mises à jour en masse ou un import)'
+
+    def handle(self, *args, **options):
+        totaux = reindexer_tout()
+
+        message = "Index de recherche reconstruit : " + ', '.join(
+            f"{nombre} {type_objet}" for type_objet, nombre in totaux.items()
+        )
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,79 @@
+# Fichier: core/management/commands/traiter_medias.py
+
+from django.core.management.base import BaseCommand
+from core.models import FichierMedia, ContenuMedia
+from core.utils.media_processor import (
+    traiter_file_attente, STATUT_EN_ATTENTE, STATUT_EN_COURS, STATUT_ERREUR
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Vide la file d\'attente des médias par lots (vignettes, empreinte, GPS EXIF, compression)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lot',
+            type=int,
+            default=None,
+            help='Nombre de médias par lot (GMAO_MEDIA_BATCH_SIZE par défaut)',
+        )
+        parser.add_argument(
+            '--processus',
+            type=int,
+            default=None,
+            help='Taille du pool de processus (nombre de cœurs par défaut, 1 sans pool)',
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=None,
+            help='Nombre maximal de médias traités (toute la file par défaut)',
+        )
+        parser.add_argument(
+            '--relancer-en-cours',
+            action='store_true',
+            help='Reprend les médias bloqués EN_COURS (traitement interrompu par un arrêt du serveur)',
+        )
+        parser.add_argument(
+            '--relancer-erreurs',
+            action='store_true',
+            help='Retente les médias en erreur',
+        )
+
+    def handle(self, *args, **options):
+        a_relancer = []
+        if options['relancer_en_cours']:
+            a_relancer.append(STATUT_EN_COURS)
+        if options['relancer_erreurs']:
+            a_relancer.append(STATUT_ERREUR)
+        if a_relancer:
+            ContenuMedia.objects.filter(statut_traitement__in=a_relancer).update(
+                statut_traitement=STATUT_EN_ATTENTE
+            )
+            FichierMedia.objects.filter(statut_traitement__in=a_relancer).update(
+                statut_traitement=STATUT_EN_ATTENTE
+            )
+
+        def rapport(metriques):
+            self.stdout.write(
+                f"Lot jusqu'à l'id {metriques['dernier_id']} : {metriques['medias']} média(s), "
+                f"{metriques['contenus']} contenu(s) traité(s), {metriques['erreurs']} erreur(s), "
+                f"{metriques['octets_avant']} -> {metriques['octets_apres']} octets, "
+                f"{metriques['duree']:.2f}s ({metriques['debit']:.1f} média(s)/s)"
+            )
+
+        totaux = traiter_file_attente(
+            taille_lot=options['lot'],
+            processus=options['processus'],
+            limite=options['limite'],
+            rapport=rapport,
+        )
+
+        message = (
+            f"{totaux['medias']} média(s) traité(s), {totaux['erreurs']} en erreur, "
+            f"{totaux['debit']:.1f} média(s)/s"
+        )
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
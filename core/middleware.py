@@ -146,49 +146,13 @@ def nettoyer_anciennes_notifications():
 @shared_task
 def compresser_medias():
     """
-    Compresse les médias volumineux en arrière-plan
+    Vide la file d'attente des médias (vignettes, GPS EXIF, compression)
+    par lots, avec un pool de processus
     """
-    from .models import FichierMedia
-    from PIL import Image
-    import os
-    
-    if not settings.MEDIA_COMPRESSION.get('ENABLE_IMAGE_COMPRESSION', False):
-        return "Compression désactivée"
-    
-    # Traiter les images non compressées
-    images_a_compresser = FichierMedia.objects.filter(
-        type_fichier='PHOTO',
-        taille_octets__gt=1024*1024,  # Plus de 1MB
-    ).exclude(
-        nom_original__contains='_compressed'
-    )[:10]  # Traiter 10 images par batch
-    
-    compressed_count = 0
-    
-    for media in images_a_compresser:
-        try:
-            if media.fichier and os.path.exists(media.fichier.path):
-                # Ouvrir et compresser l'image
-                with Image.open(media.fichier.path) as img:
-                    # Redimensionner si nécessaire
-                    max_size = settings.MEDIA_COMPRESSION.get('MAX_IMAGE_RESOLUTION', (1920, 1080))
-                    if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                    
-                    # Sauvegarder avec compression
-                    quality = settings.MEDIA_COMPRESSION.get('IMAGE_QUALITY', 85)
-                    img.save(media.fichier.path, optimize=True, quality=quality)
-                    
-                    # Mettre à jour la taille
-                    media.taille_octets = os.path.getsize(media.fichier.path)
-                    media.nom_original = f"{media.nom_original}_compressed"
-                    media.save()
-                    
-                    compressed_count += 1
-        except Exception as e:
-            print(f"Erreur compression {media.id}: {e}")
-    
-    return f"Compressé {compressed_count} images"
+    from .utils.media_processor import traiter_file_attente
+
+    totaux = traiter_file_attente()
+    return f"Traité {totaux['medias']} médias ({totaux['erreurs']} erreurs, {totaux['debit']:.1f}/s)"
 
 @shared_task
 def synchroniser_donnees_iot():
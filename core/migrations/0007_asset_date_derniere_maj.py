@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_FTTh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='date_derniere_maj',
+            field=models.DateTimeField(auto_now=True, help_text="Date de dernière modification de l'asset"),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.utils.geo_utils import encode_geohash
+
+
+def remplir_geohash(apps, schema_editor):
+    """
+    Calcule le geohash des assets déjà géolocalisés
+    """
+    Asset = apps.get_model('core', 'Asset')
+    precision = getattr(settings, 'GMAO_GEOHASH_PRECISION', 9)
+
+    lot = []
+    assets = Asset.objects.filter(
+        latitude__isnull=False,
+        longitude__isnull=False
+    ).only('id', 'latitude', 'longitude')
+
+    for asset in assets.iterator(chunk_size=2000):
+        asset.geohash = encode_geohash(asset.latitude, asset.longitude, precision)
+        lot.append(asset)
+        if len(lot) >= 2000:
+            Asset.objects.bulk_update(lot, ['geohash'])
+            lot = []
+
+    if lot:
+        Asset.objects.bulk_update(lot, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_asset_date_derniere_maj'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Geohash de la position (index de recherche de proximité)', max_length=12),
+        ),
+        migrations.RunPython(remplir_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_asset_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElementSupprime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(choices=[('ORDRE_TRAVAIL', 'Ordre de Travail'), ('INTERVENTION', 'Intervention'), ('OPERATION', 'Opération'), ('POINT_CONTROLE', 'Point de contrôle'), ('ASSET', 'Asset')], max_length=50)),
+                ('objet_id', models.PositiveIntegerField(help_text="ID de l'objet supprimé")),
+                ('date_suppression', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Élément supprimé',
+                'verbose_name_plural': 'Éléments supprimés',
+                'ordering': ['date_suppression'],
+            },
+        ),
+        migrations.AddField(
+            model_name='intervention',
+            name='date_derniere_maj',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='operation',
+            name='date_derniere_maj',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='ordredetravail',
+            name='date_derniere_maj',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='pointdecontrole',
+            name='date_derniere_maj',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='date_derniere_maj',
+            field=models.DateTimeField(auto_now=True, db_index=True, help_text="Date de dernière modification de l'asset"),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_sync_differentielle'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CleIdempotenceSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=100)),
+                ('type_objet', models.CharField(choices=[('RAPPORT', "Rapport d'exécution"), ('REPONSE', 'Réponse'), ('DEMANDE_REPARATION', 'Demande de réparation')], max_length=50)),
+                ('objet_id', models.PositiveIntegerField(help_text="ID de l'objet créé ou modifié")),
+                ('date_creation', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cles_sync', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': "Clé d'idempotence",
+                'verbose_name_plural': "Clés d'idempotence",
+                'unique_together': {('utilisateur', 'cle')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_cle_idempotence_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionIntervention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveIntegerField()),
+                ('contenu', models.JSONField(help_text='Gamme compilée (voir core.utils.gamme_utils)')),
+                ('empreinte', models.CharField(help_text='Empreinte MD5 du contenu', max_length=32)),
+                ('date_creation', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('intervention', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='core.intervention')),
+            ],
+            options={
+                'verbose_name': "Version d'intervention",
+                'verbose_name_plural': "Versions d'intervention",
+                'ordering': ['intervention', '-numero'],
+                'unique_together': {('intervention', 'numero')},
+            },
+        ),
+        migrations.AddField(
+            model_name='ordredetravail',
+            name='version_intervention',
+            field=models.ForeignKey(blank=True, help_text='Version figée de la gamme utilisée par cet OT', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ordres_de_travail', to='core.versionintervention'),
+        ),
+    ]
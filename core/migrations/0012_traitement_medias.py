@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_version_intervention'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fichiermedia',
+            name='statut_traitement',
+            field=models.CharField(choices=[('EN_ATTENTE', 'En attente de traitement'), ('EN_COURS', 'Traitement en cours'), ('TERMINE', 'Traité'), ('ERREUR', 'Erreur de traitement')], db_index=True, default='EN_ATTENTE', max_length=20),
+        ),
+    ]
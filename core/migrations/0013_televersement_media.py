@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:25
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_traitement_medias'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeleversementMedia',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('type_fichier', models.CharField(choices=[('PHOTO', 'Photographie'), ('AUDIO', 'Enregistrement audio'), ('VIDEO', 'Enregistrement vidéo'), ('DOCUMENT', 'Document (PDF, Word, etc.)'), ('SCHEMA', 'Schéma technique'), ('SIGNATURE', 'Signature électronique')], max_length=20)),
+                ('nom_original', models.CharField(max_length=255)),
+                ('taille_totale', models.PositiveBigIntegerField()),
+                ('taille_morceau', models.PositiveIntegerField()),
+                ('nb_morceaux', models.PositiveIntegerField()),
+                ('empreinte_attendue', models.CharField(blank=True, help_text='SHA-256 annoncé par le client, vérifié à la finalisation', max_length=64)),
+                ('statut', models.CharField(choices=[('EN_COURS', 'En cours'), ('TERMINE', 'Terminé'), ('ANNULE', 'Annulé')], default='EN_COURS', max_length=20)),
+                ('date_creation', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('date_derniere_maj', models.DateTimeField(auto_now=True)),
+                ('fichier_media', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='televersements', to='core.fichiermedia')),
+                ('reponse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='televersements', to='core.reponse')),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='televersements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Téléversement de média',
+                'verbose_name_plural': 'Téléversements de médias',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_televersement_media'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContenuMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte', models.CharField(help_text='SHA-256 du fichier reçu', max_length=64, unique=True)),
+                ('fichier', models.FileField(max_length=255, upload_to='media_contenus/')),
+                ('taille_originale', models.PositiveBigIntegerField()),
+                ('nb_references', models.PositiveIntegerField(default=0)),
+                ('statut_traitement', models.CharField(choices=[('EN_ATTENTE', 'En attente de traitement'), ('EN_COURS', 'Traitement en cours'), ('TERMINE', 'Traité'), ('ERREUR', 'Erreur de traitement')], default='EN_ATTENTE', max_length=20)),
+                ('resultats', models.JSONField(default=dict, help_text='Résultat du traitement, recopié sur chaque référence')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Contenu de média',
+                'verbose_name_plural': 'Contenus de médias',
+            },
+        ),
+        migrations.AlterField(
+            model_name='fichiermedia',
+            name='hash_fichier',
+            field=models.CharField(blank=True, db_index=True, help_text="Hash SHA-256 du fichier pour vérifier l'intégrité", max_length=64),
+        ),
+    ]
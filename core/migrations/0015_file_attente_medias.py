@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:05
+
+from django.db import migrations
+
+
+def mettre_en_file_historique(apps, schema_editor):
+    """
+    Les médias antérieurs au traitement en arrière-plan sont restés au
+    statut par défaut EN_COURS sans jamais avoir été traités : ils entrent
+    dans la file d'attente (commande traiter_medias)
+    """
+    FichierMedia = apps.get_model('core', 'FichierMedia')
+    FichierMedia.objects.filter(
+        statut_traitement='EN_COURS', traite_automatiquement=False, hash_fichier=''
+    ).update(statut_traitement='EN_ATTENTE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_contenu_media'),
+    ]
+
+    operations = [
+        migrations.RunPython(mettre_en_file_historique, migrations.RunPython.noop),
+    ]
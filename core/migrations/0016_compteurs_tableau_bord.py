@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+def initialiser_compteurs(apps, schema_editor):
+    from core.utils.compteurs import recalculer_compteurs
+    recalculer_compteurs(lambda nom: apps.get_model('core', nom))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_file_attente_medias'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ordredetravail',
+            name='date_prevue_debut',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.CreateModel(
+            name='CompteurTableauBord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('portee', models.CharField(choices=[('GLOBAL', 'Global'), ('UTILISATEUR', 'Utilisateur'), ('EQUIPE', 'Équipe')], max_length=20)),
+                ('cible_id', models.PositiveIntegerField(default=0, help_text='Utilisateur ou équipe (0 pour GLOBAL)')),
+                ('nom', models.CharField(max_length=50)),
+                ('valeur', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Compteur du tableau de bord',
+                'verbose_name_plural': 'Compteurs du tableau de bord',
+                'unique_together': {('portee', 'cible_id', 'nom')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StatistiqueJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('portee', models.CharField(choices=[('GLOBAL', 'Global'), ('UTILISATEUR', 'Utilisateur'), ('EQUIPE', 'Équipe')], max_length=20)),
+                ('cible_id', models.PositiveIntegerField(default=0, help_text='Utilisateur ou équipe (0 pour GLOBAL)')),
+                ('nom', models.CharField(max_length=50)),
+                ('valeur', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Statistique journalière',
+                'verbose_name_plural': 'Statistiques journalières',
+                'unique_together': {('portee', 'cible_id', 'nom', 'jour')},
+            },
+        ),
+        migrations.RunPython(initialiser_compteurs, migrations.RunPython.noop),
+    ]
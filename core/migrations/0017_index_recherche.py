@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+def creer_index_moteur(apps, schema_editor):
+    from core.utils.recherche import creer_structures
+    creer_structures(schema_editor)
+
+
+def supprimer_index_moteur(apps, schema_editor):
+    from core.utils.recherche import supprimer_structures
+    supprimer_structures(schema_editor)
+
+
+def indexer_existant(apps, schema_editor):
+    from core.utils.recherche import reindexer_tout
+    reindexer_tout(lambda nom: apps.get_model('core', nom))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_compteurs_tableau_bord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexRecherche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(choices=[('ot', 'Ordre de travail'), ('asset', 'Asset'), ('intervention', 'Intervention'), ('demande', 'Demande de réparation'), ('media', 'Fichier média')], max_length=20)),
+                ('objet_id', models.PositiveIntegerField()),
+                ('texte', models.TextField()),
+            ],
+            options={
+                'verbose_name': "Entrée de l'index de recherche",
+                'verbose_name_plural': 'Index de recherche',
+                'unique_together': {('type_objet', 'objet_id')},
+            },
+        ),
+        migrations.RunPython(creer_index_moteur, supprimer_index_moteur),
+        migrations.RunPython(indexer_existant, migrations.RunPython.noop),
+    ]
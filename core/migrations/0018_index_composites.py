@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_index_recherche'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['statut', 'criticite'], name='asset_statut_criticite_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandereparation',
+            index=models.Index(condition=models.Q(('bloque_cloture_ot', True)), fields=['ordre_de_travail', 'statut'], name='dr_bloquante_ot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandereparation',
+            index=models.Index(fields=['statut', 'date_creation'], name='dr_statut_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandereparation',
+            index=models.Index(fields=['date_creation', 'id'], name='dr_creation_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fichiermedia',
+            index=models.Index(fields=['reponse', 'date_upload', 'id'], name='media_reponse_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['utilisateur', 'date_creation'], name='notif_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordredetravail',
+            index=models.Index(fields=['statut', 'date_prevue_debut'], name='ot_statut_prevu_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordredetravail',
+            index=models.Index(fields=['date_creation', 'id'], name='ot_creation_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordredetravail',
+            index=models.Index(fields=['asset', 'date_fin_reelle'], name='ot_asset_fin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reponse',
+            index=models.Index(fields=['rapport_execution', 'date_reponse', 'id'], name='reponse_rapport_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_index_composites'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rapportexecution',
+            name='version_reponses',
+            field=models.PositiveIntegerField(default=0, help_text='Incrémentée à chaque sauvegarde modifiant les réponses (sauvegarde automatique)'),
+        ),
+    ]
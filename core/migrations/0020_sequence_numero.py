@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:35
+
+import re
+
+from django.db import migrations, models
+
+
+def initialiser_sequences(apps, schema_editor):
+    """
+    Reprend, par année, le plus grand numéro de demande déjà attribué
+    """
+    DemandeReparation = apps.get_model('core', 'DemandeReparation')
+    SequenceNumero = apps.get_model('core', 'SequenceNumero')
+    format_numero = re.compile(r'^DR-(\d{4})-(\d+)$')
+
+    derniers = {}
+    numeros = DemandeReparation.objects.values_list('numero_demande', flat=True)
+    for numero in numeros.iterator(chunk_size=2000):
+        correspondance = format_numero.match(numero or '')
+        if correspondance:
+            annee, valeur = int(correspondance.group(1)), int(correspondance.group(2))
+            derniers[annee] = max(derniers.get(annee, 0), valeur)
+
+    SequenceNumero.objects.bulk_create([
+        SequenceNumero(prefixe='DR', annee=annee, dernier=dernier)
+        for annee, dernier in derniers.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_version_reponses_rapport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceNumero',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefixe', models.CharField(max_length=10)),
+                ('annee', models.PositiveIntegerField()),
+                ('dernier', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Séquence de numérotation',
+                'verbose_name_plural': 'Séquences de numérotation',
+                'unique_together': {('prefixe', 'annee')},
+            },
+        ),
+        migrations.RunPython(initialiser_sequences, migrations.RunPython.noop),
+    ]
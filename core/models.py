@@ -1,6 +1,7 @@
 # Fichier : core/models.py - Version Corrigée et Complète
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.utils import timezone
@@ -8,6 +9,10 @@ import uuid
 import json
 from math import radians, cos, sin, asin, sqrt
 import json
+from .utils.geo_utils import (
+    encode_geohash, geohash_neighbours, precision_for_radius,
+    haversine_distances, metres_to_degrees, GEOHASH_PREFIX_END
+)
 # ==============================================================================
 # AXE 0 : GESTION DES UTILISATEURS & COMPÉTENCES
 # ==============================================================================
@@ -94,7 +99,23 @@ class CategorieAsset(models.Model):
     def __str__(self):
         return self.nom
 
-class Asset(models.Model):
+class EnregistrementCompteurs:
+    """
+    Enregistrement transactionnel des objets suivis par les compteurs du
+    tableau de bord (core.utils.compteurs)
+
+    L'état en base avant modification est relu verrouillé (pre_save) et la
+    différence appliquée (post_save) dans la même transaction : deux
+    enregistrements simultanés du même objet sont appliqués l'un après
+    l'autre, chacun sur l'état laissé par le précédent.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class Asset(EnregistrementCompteurs, models.Model):
     STATUT_ASSET_CHOIX = [
         ('EN_SERVICE', 'En service'), 
         ('EN_PANNE', 'En panne'), 
@@ -173,6 +194,25 @@ class Asset(models.Model):
     
     # Géométrie (pour les câbles)
     geometrie_geojson = models.JSONField(null=True, blank=True, help_text="Géométrie de l'asset (point, ligne, polygone)")
+
+    # Horodatage de modification (sert aux en-têtes Last-Modified/ETag des tuiles carte)
+    date_derniere_maj = models.DateTimeField(auto_now=True, db_index=True, help_text="Date de dernière modification de l'asset")
+
+    # Index spatial : geohash de la position, recalculé à chaque sauvegarde
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        default='',
+        db_index=True,
+        help_text="Geohash de la position (index de recherche de proximité)"
+    )
+
+    class Meta:
+        indexes = [
+            # Assets en panne / critiques (tableau de bord, carte)
+            models.Index(fields=['statut', 'criticite'], name='asset_statut_criticite_idx'),
+        ]
+
     @property
     def point_geojson(self):
         """
@@ -282,33 +322,110 @@ class Asset(models.Model):
         if self.latitude and self.longitude:
             self.geometrie_geojson = self.point_geojson
     
+    def update_geohash(self):
+        """
+        Recalcule le geohash à partir des coordonnées
+        """
+        if self.latitude is not None and self.longitude is not None:
+            precision = getattr(settings, 'GMAO_GEOHASH_PRECISION', 9)
+            self.geohash = encode_geohash(self.latitude, self.longitude, precision)
+        else:
+            self.geohash = ''
+    
     def save(self, *args, **kwargs):
         """
-        Override save pour mettre à jour automatiquement la géométrie
+        Override save pour mettre à jour automatiquement la géométrie et l'index spatial
         """
         # Mettre à jour la géométrie si on a des coordonnées
         if self.latitude and self.longitude and not self.geometrie_geojson:
             self.update_geometrie_from_coordinates()
         
+        self.update_geohash()
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        
         super().save(*args, **kwargs)
     
+    @classmethod
+    def geohash_filter(cls, latitude, longitude, radius_meters):
+        """
+        Construit le filtre Q des cellules geohash couvrant un rayon donné
+        
+        Chaque cellule est traduite en intervalle [préfixe, préfixe + '{') : la
+        base parcourt l'index de la colonne geohash au lieu de la table entière.
+        """
+        precision = min(
+            precision_for_radius(radius_meters, latitude),
+            getattr(settings, 'GMAO_GEOHASH_PRECISION', 9)
+        )
+        centre = encode_geohash(latitude, longitude, precision)
+        
+        filtre = models.Q()
+        for cellule in geohash_neighbours(centre):
+            filtre |= models.Q(geohash__gte=cellule, geohash__lt=cellule + GEOHASH_PREFIX_END)
+        return filtre
+    
     @classmethod
     def find_nearby(cls, latitude, longitude, radius_meters=1000):
         """
         Trouve les assets dans un rayon donné
-        Utilise une approximation simple sans GDAL
+        Pré-filtre sur l'index geohash, puis affine sur l'emprise du cercle
         """
-        # Calcul approximatif (1 degré ≈ 111 km)
-        delta_lat = radius_meters / 111000
-        delta_lng = radius_meters / (111000 * cos(radians(float(latitude))))
+        latitude, longitude = float(latitude), float(longitude)
+        delta_lat, delta_lng = metres_to_degrees(radius_meters, latitude)
         
         return cls.objects.filter(
+            cls.geohash_filter(latitude, longitude, radius_meters),
             latitude__range=(latitude - delta_lat, latitude + delta_lat),
             longitude__range=(longitude - delta_lng, longitude + delta_lng),
             latitude__isnull=False,
             longitude__isnull=False
         )
     
+    @classmethod
+    def find_nearest(cls, latitude, longitude, k=10, radius_meters=1000, queryset=None):
+        """
+        Recherche des k plus proches voisins dans un rayon donné
+        
+        Les candidats sont lus en une requête légère (id, latitude, longitude),
+        les distances calculées en bloc, puis seuls les k retenus sont chargés.
+        
+        Args:
+            latitude, longitude: Point de recherche
+            k: Nombre maximum d'assets retournés
+            radius_meters: Rayon de recherche en mètres
+            queryset: QuerySet de base optionnel (select_related, filtres...)
+            
+        Returns:
+            list: Assets triés par distance croissante, avec un attribut `distance` (m)
+        """
+        candidats = list(
+            cls.find_nearby(latitude, longitude, radius_meters).values_list('id', 'latitude', 'longitude')
+        )
+        if not candidats:
+            return []
+        
+        ids, latitudes, longitudes = zip(*candidats)
+        distances = haversine_distances(latitude, longitude, latitudes, longitudes)
+        
+        plus_proches = sorted(
+            (distance, asset_id) for asset_id, distance in zip(ids, distances)
+            if distance <= radius_meters
+        )[:k]
+        
+        base = queryset if queryset is not None else cls.objects.all()
+        assets = base.in_bulk([asset_id for _, asset_id in plus_proches])
+        
+        resultats = []
+        for distance, asset_id in plus_proches:
+            asset = assets.get(asset_id)
+            if asset is not None:
+                asset.distance = distance
+                resultats.append(asset)
+        return resultats
+    
     def __str__(self):
         location_info = ""
         if self.is_geolocated:
@@ -432,7 +549,7 @@ class PieceDetachee(models.Model):
 # AXE 3 : GESTION DES GAMMES DE MAINTENANCE (TEMPLATES)
 # ==============================================================================
 
-class Intervention(models.Model):
+class Intervention(EnregistrementCompteurs, models.Model):
     STATUT_CHOIX = [
         ('DRAFT', 'Brouillon'),
         ('VALIDATED', 'Validé'),
@@ -446,6 +563,7 @@ class Intervention(models.Model):
     techniciens_requis = models.PositiveIntegerField(default=1, help_text="Nombre de techniciens nécessaires.")
     competences_requises = models.ManyToManyField(Competence, blank=True, help_text="Compétences suggérées pour réaliser cette intervention.")
     pieces_necessaires = models.ManyToManyField(PieceDetachee, blank=True, help_text="Nomenclature des pièces habituellement nécessaires.")
+    date_derniere_maj = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return self.nom
@@ -454,6 +572,7 @@ class Operation(models.Model):
     intervention = models.ForeignKey(Intervention, on_delete=models.CASCADE, related_name='operations')
     nom = models.CharField(max_length=255)
     ordre = models.PositiveIntegerField(default=1)
+    date_derniere_maj = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         ordering = ['ordre']
@@ -507,12 +626,39 @@ class PointDeControle(models.Model):
         default=10,
         help_text="Taille maximale autorisée pour les fichiers en MB"
     )
+    date_derniere_maj = models.DateTimeField(auto_now=True, db_index=True)
+
     class Meta:
         ordering = ['ordre']
         
     def __str__(self):
         return self.label
 
+
+class VersionIntervention(models.Model):
+    """
+    Gamme compilée et figée d'une intervention validée
+
+    Le contenu (opérations ordonnées, points, options analysées, graphe des
+    dépendances) est calculé une fois à la validation puis servi depuis le
+    cache. Les OT référencent la version en vigueur à leur création.
+    """
+    intervention = models.ForeignKey(Intervention, on_delete=models.CASCADE, related_name='versions')
+    numero = models.PositiveIntegerField()
+    contenu = models.JSONField(help_text="Gamme compilée (voir core.utils.gamme_utils)")
+    empreinte = models.CharField(max_length=32, help_text="Empreinte MD5 du contenu")
+    date_creation = models.DateTimeField(default=timezone.now)
+    cree_par = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        ordering = ['intervention', '-numero']
+        unique_together = ('intervention', 'numero')
+        verbose_name = "Version d'intervention"
+        verbose_name_plural = "Versions d'intervention"
+
+    def __str__(self):
+        return f"{self.intervention.nom} v{self.numero}"
+
 # ==============================================================================
 # AXE 4 : GESTION DES WORKFLOWS & STATUTS DYNAMIQUES
 # ==============================================================================
@@ -540,7 +686,7 @@ class PlanMaintenancePreventive(models.Model):
     def __str__(self):
         return f"Plan préventif pour {self.asset_concerne.nom}"
 
-class OrdreDeTravail(models.Model):
+class OrdreDeTravail(EnregistrementCompteurs, models.Model):
     TYPE_OT_CHOIX = [
         ('PREVENTIVE', 'Préventive'),
         ('CORRECTIVE', 'Corrective'),
@@ -562,11 +708,30 @@ class OrdreDeTravail(models.Model):
     statut = models.ForeignKey(StatutWorkflow, on_delete=models.SET_NULL, null=True, blank=True)
     priorite = models.PositiveIntegerField(choices=[(1, 'Basse'), (2, 'Normale'), (3, 'Haute'), (4, 'Urgente')], default=2)
     date_creation = models.DateTimeField(default=timezone.now)
-    date_prevue_debut = models.DateTimeField()
+    date_prevue_debut = models.DateTimeField(db_index=True)
     date_debut_reel = models.DateTimeField(null=True, blank=True, help_text="Date et heure réelles du début de l'intervention.")
     date_fin_reelle = models.DateTimeField(null=True, blank=True, help_text="Date et heure réelles de la fin de l'intervention.")
     cout_main_oeuvre_reel = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     cout_pieces_reel = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    date_derniere_maj = models.DateTimeField(auto_now=True, db_index=True)
+    version_intervention = models.ForeignKey(
+        VersionIntervention,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='ordres_de_travail',
+        help_text="Version figée de la gamme utilisée par cet OT"
+    )
+
+    class Meta:
+        indexes = [
+            # OT en retard : statuts non finaux, date prévue dépassée
+            models.Index(fields=['statut', 'date_prevue_debut'], name='ot_statut_prevu_idx'),
+            # Pagination par clé (core.utils.pagination)
+            models.Index(fields=['date_creation', 'id'], name='ot_creation_id_idx'),
+            # Dernière maintenance d'un asset
+            models.Index(fields=['asset', 'date_fin_reelle'], name='ot_asset_fin_idx'),
+        ]
 
     def __str__(self):
         return f"OT-{self.id}: {self.titre}"
@@ -576,6 +741,11 @@ class OrdreDeTravail(models.Model):
         # Si aucun statut n'est défini, on prend le premier statut non-final
         if not self.statut:
             self.statut = StatutWorkflow.objects.filter(est_statut_final=False).first()
+        # Figer la dernière version validée de la gamme à la création
+        if self._state.adding and not self.version_intervention_id and self.intervention_id:
+            self.version_intervention = VersionIntervention.objects.filter(
+                intervention_id=self.intervention_id
+            ).order_by('-numero').first()
         super().save(*args, **kwargs)
 
 # ==============================================================================
@@ -598,6 +768,10 @@ class RapportExecution(models.Model):
     date_execution_fin = models.DateTimeField(null=True, blank=True)
     cree_par = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='rapports_crees')
     commentaire_global = models.TextField(blank=True, null=True, help_text="Commentaire général sur l'intervention.")
+    version_reponses = models.PositiveIntegerField(
+        default=0,
+        help_text="Incrémentée à chaque sauvegarde modifiant les réponses (sauvegarde automatique)"
+    )
     
     def __str__(self):
         return f"Rapport OT-{self.ordre_de_travail.id}"
@@ -630,6 +804,10 @@ class Reponse(models.Model):
     
     class Meta:
         unique_together = ('rapport_execution', 'point_de_controle')
+        indexes = [
+            # Réponses d'un rapport en pagination par clé (API mobile)
+            models.Index(fields=['rapport_execution', 'date_reponse', 'id'], name='reponse_rapport_date_idx'),
+        ]
     
     def __str__(self):
         return f"Réponse à '{self.point_de_controle.label}': {self.valeur}"
@@ -715,6 +893,7 @@ class FichierMedia(models.Model):
     hash_fichier = models.CharField(
         max_length=64, 
         blank=True,
+        db_index=True,
         help_text="Hash SHA-256 du fichier pour vérifier l'intégrité"
     )
     taille_originale = models.BigIntegerField(null=True)
@@ -723,7 +902,18 @@ class FichierMedia(models.Model):
     duree_seconde = models.IntegerField(null=True)  # Pour audio/vidéo
     coordonnees_gps = models.JSONField(null=True)
     metadonnees = models.JSONField(default=dict)
-    statut_traitement = models.CharField(max_length=20, default='EN_COURS')
+    STATUT_TRAITEMENT_CHOIX = [
+        ('EN_ATTENTE', 'En attente de traitement'),
+        ('EN_COURS', 'Traitement en cours'),
+        ('TERMINE', 'Traité'),
+        ('ERREUR', 'Erreur de traitement'),
+    ]
+    statut_traitement = models.CharField(
+        max_length=20,
+        choices=STATUT_TRAITEMENT_CHOIX,
+        default='EN_ATTENTE',
+        db_index=True
+    )
     uploade_par = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -735,6 +925,10 @@ class FichierMedia(models.Model):
     class Meta:
         verbose_name = "Média enrichi"
         verbose_name_plural = "Médias enrichis"
+        indexes = [
+            # Médias d'une réponse en pagination par clé (API mobile)
+            models.Index(fields=['reponse', 'date_upload', 'id'], name='media_reponse_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.type_fichier} - {self.nom_original}"
@@ -748,6 +942,84 @@ class AnnotationMedia(models.Model):
     couleur = models.CharField(max_length=7, default='#FF0000')
     utilisateur = models.ForeignKey(User, on_delete=models.CASCADE)
     date_creation = models.DateTimeField(auto_now_add=True)
+
+
+class ContenuMedia(models.Model):
+    """
+    Contenu d'un média, stocké une seule fois par empreinte SHA-256
+
+    Les FichierMedia de même hash_fichier partagent ce fichier, ses vignettes
+    et le résultat de son traitement. Le fichier est supprimé quand la
+    dernière référence disparaît.
+    """
+    empreinte = models.CharField(max_length=64, unique=True, help_text="SHA-256 du fichier reçu")
+    fichier = models.FileField(upload_to='media_contenus/', max_length=255)
+    taille_originale = models.PositiveBigIntegerField()
+    nb_references = models.PositiveIntegerField(default=0)
+    statut_traitement = models.CharField(
+        max_length=20,
+        choices=FichierMedia.STATUT_TRAITEMENT_CHOIX,
+        default='EN_ATTENTE'
+    )
+    resultats = models.JSONField(default=dict, help_text="Résultat du traitement, recopié sur chaque référence")
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Contenu de média"
+        verbose_name_plural = "Contenus de médias"
+
+    def __str__(self):
+        return f"{self.empreinte[:12]} ({self.nb_references} référence(s))"
+
+
+class TeleversementMedia(models.Model):
+    """
+    Upload reprenable d'un média en plusieurs morceaux (application mobile)
+
+    Les morceaux sont écrits sur disque au fil de l'eau ; la finalisation
+    les assemble directement dans MEDIA_ROOT et crée le FichierMedia.
+    """
+    STATUT_CHOIX = [
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+        ('ANNULE', 'Annulé'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='televersements'
+    )
+    reponse = models.ForeignKey(Reponse, on_delete=models.CASCADE, related_name='televersements')
+    type_fichier = models.CharField(max_length=20, choices=FichierMedia.TYPE_MEDIA_CHOIX)
+    nom_original = models.CharField(max_length=255)
+    taille_totale = models.PositiveBigIntegerField()
+    taille_morceau = models.PositiveIntegerField()
+    nb_morceaux = models.PositiveIntegerField()
+    empreinte_attendue = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="SHA-256 annoncé par le client, vérifié à la finalisation"
+    )
+    statut = models.CharField(max_length=20, choices=STATUT_CHOIX, default='EN_COURS')
+    fichier_media = models.ForeignKey(
+        FichierMedia,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='televersements'
+    )
+    date_creation = models.DateTimeField(auto_now_add=True, db_index=True)
+    date_derniere_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Téléversement de média"
+        verbose_name_plural = "Téléversements de médias"
+
+    def __str__(self):
+        return f"{self.nom_original} ({self.get_statut_display()})"
+
 # ==============================================================================
 # AXE 7 : ACTIONS Brouillon Intervention
 # ==============================================================================
@@ -817,6 +1089,10 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-date_creation']
+        indexes = [
+            # Dernières notifications et non lues d'un utilisateur
+            models.Index(fields=['utilisateur', 'date_creation'], name='notif_user_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titre} - {self.utilisateur.username}"
@@ -845,7 +1121,48 @@ class ParametreUtilisateur(models.Model):
 # NOUVEAU MODÈLE : DEMANDES DE RÉPARATION
 # ==============================================================================
 
-class DemandeReparation(models.Model):
+class SequenceNumero(models.Model):
+    """
+    Dernier numéro attribué par préfixe et par année (ex. DR 2025 → 42)
+
+    Incrémenté par une seule mise à jour atomique (F('dernier') + 1) : la
+    ligne reste verrouillée jusqu'à la fin de la transaction, deux
+    créations simultanées obtiennent donc des numéros distincts, sans
+    compter la table numérotée.
+    """
+
+    prefixe = models.CharField(max_length=10)
+    annee = models.PositiveIntegerField()
+    dernier = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('prefixe', 'annee')
+        verbose_name = "Séquence de numérotation"
+        verbose_name_plural = "Séquences de numérotation"
+
+    def __str__(self):
+        return f"{self.prefixe}-{self.annee} : {self.dernier}"
+
+    @classmethod
+    def suivant(cls, prefixe, annee):
+        """
+        Réserve le numéro suivant (à appeler dans la transaction qui
+        l'enregistre, pour ne pas laisser de trou en cas d'échec)
+        """
+        filtre = {'prefixe': prefixe, 'annee': annee}
+        with transaction.atomic():
+            if not cls.objects.filter(**filtre).update(dernier=F('dernier') + 1):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(dernier=1, **filtre)
+                    return 1
+                except IntegrityError:
+                    # Séquence créée en parallèle
+                    cls.objects.filter(**filtre).update(dernier=F('dernier') + 1)
+            return cls.objects.filter(**filtre).values_list('dernier', flat=True).get()
+
+
+class DemandeReparation(EnregistrementCompteurs, models.Model):
     """
     Gestion des demandes de réparation liées aux points de contrôle
     """
@@ -1022,6 +1339,17 @@ class DemandeReparation(models.Model):
         ordering = ['-date_creation']
         verbose_name = "Demande de réparation"
         verbose_name_plural = "Demandes de réparation"
+        indexes = [
+            # Demandes bloquant la clôture d'un OT (index partiel : peu de lignes)
+            models.Index(
+                fields=['ordre_de_travail', 'statut'], name='dr_bloquante_ot_idx',
+                condition=models.Q(bloque_cloture_ot=True),
+            ),
+            # Demandes en attente depuis plus de 24 h (notifications)
+            models.Index(fields=['statut', 'date_creation'], name='dr_statut_creation_idx'),
+            # Pagination par clé (core.utils.pagination)
+            models.Index(fields=['date_creation', 'id'], name='dr_creation_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.numero_demande} - {self.titre}"
@@ -1029,15 +1357,13 @@ class DemandeReparation(models.Model):
     def save(self, *args, **kwargs):
         """Génération automatique du numéro de demande"""
         if not self.numero_demande:
-            # Générer un numéro unique
+            # Numéro réservé dans la séquence de l'année (unique même en
+            # cas de créations simultanées)
             annee = timezone.now().year
-            
-            # Compter les demandes de cette année
-            count = DemandeReparation.objects.filter(
-                date_creation__year=annee
-            ).count() + 1
-            
-            self.numero_demande = f"DR-{annee}-{count:03d}"
+            with transaction.atomic():
+                self.numero_demande = f"DR-{annee}-{SequenceNumero.suivant('DR', annee):03d}"
+                super().save(*args, **kwargs)
+            return
         
         super().save(*args, **kwargs)
     
@@ -1148,4 +1474,153 @@ class HistoriqueModification(models.Model):
 
 
 
-    
\ No newline at end of file
+    
+
+class ElementSupprime(models.Model):
+    """
+    Trace minimale (tombstone) d'un objet supprimé
+
+    Permet à la synchronisation différentielle mobile de signaler aux clients
+    les objets qui ont disparu depuis leur dernier curseur.
+    """
+
+    TYPE_OBJET_CHOIX = [
+        ('ORDRE_TRAVAIL', 'Ordre de Travail'),
+        ('INTERVENTION', 'Intervention'),
+        ('OPERATION', 'Opération'),
+        ('POINT_CONTROLE', 'Point de contrôle'),
+        ('ASSET', 'Asset'),
+    ]
+
+    type_objet = models.CharField(max_length=50, choices=TYPE_OBJET_CHOIX)
+    objet_id = models.PositiveIntegerField(help_text="ID de l'objet supprimé")
+    date_suppression = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['date_suppression']
+        verbose_name = "Élément supprimé"
+        verbose_name_plural = "Éléments supprimés"
+
+    def __str__(self):
+        return f"{self.type_objet} #{self.objet_id} supprimé le {self.date_suppression}"
+
+
+class CleIdempotenceSync(models.Model):
+    """
+    Clé d'idempotence d'un élément envoyé par l'application mobile
+
+    Un envoi rejoué (coupure réseau, nouvel essai) porte les mêmes clés : les
+    éléments déjà appliqués sont reconnus et ne sont pas traités deux fois.
+    """
+
+    TYPE_OBJET_CHOIX = [
+        ('RAPPORT', "Rapport d'exécution"),
+        ('REPONSE', 'Réponse'),
+        ('DEMANDE_REPARATION', 'Demande de réparation'),
+    ]
+
+    utilisateur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cles_sync')
+    cle = models.CharField(max_length=100)
+    type_objet = models.CharField(max_length=50, choices=TYPE_OBJET_CHOIX)
+    objet_id = models.PositiveIntegerField(help_text="ID de l'objet créé ou modifié")
+    date_creation = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ('utilisateur', 'cle')
+        verbose_name = "Clé d'idempotence"
+        verbose_name_plural = "Clés d'idempotence"
+
+    def __str__(self):
+        return f"{self.utilisateur_id}:{self.cle} -> {self.type_objet} #{self.objet_id}"
+
+
+# ==============================================================================
+# COMPTEURS DU TABLEAU DE BORD
+# ==============================================================================
+
+PORTEE_COMPTEUR_CHOIX = [
+    ('GLOBAL', 'Global'),
+    ('UTILISATEUR', 'Utilisateur'),
+    ('EQUIPE', 'Équipe'),
+]
+
+
+class CompteurTableauBord(models.Model):
+    """
+    Compteur dénormalisé du tableau de bord (OT actifs, assets en panne...)
+
+    Tenu à jour par incréments à chaque enregistrement ou suppression des
+    objets comptés (core.utils.compteurs) : le tableau de bord lit quelques
+    lignes au lieu de compter les tables.
+    """
+
+    portee = models.CharField(max_length=20, choices=PORTEE_COMPTEUR_CHOIX)
+    cible_id = models.PositiveIntegerField(default=0, help_text="Utilisateur ou équipe (0 pour GLOBAL)")
+    nom = models.CharField(max_length=50)
+    valeur = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('portee', 'cible_id', 'nom')
+        verbose_name = "Compteur du tableau de bord"
+        verbose_name_plural = "Compteurs du tableau de bord"
+
+    def __str__(self):
+        return f"{self.portee}:{self.cible_id} {self.nom} = {self.valeur}"
+
+
+class StatistiqueJournaliere(models.Model):
+    """
+    Compteur du tableau de bord ventilé par jour (OT prévus, OT terminés...)
+
+    Sert aux indicateurs datés (en retard, aujourd'hui) et à l'évolution
+    sur 7 jours, sans fonction SQL de date propre au moteur.
+    """
+
+    jour = models.DateField()
+    portee = models.CharField(max_length=20, choices=PORTEE_COMPTEUR_CHOIX)
+    cible_id = models.PositiveIntegerField(default=0, help_text="Utilisateur ou équipe (0 pour GLOBAL)")
+    nom = models.CharField(max_length=50)
+    valeur = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('portee', 'cible_id', 'nom', 'jour')
+        verbose_name = "Statistique journalière"
+        verbose_name_plural = "Statistiques journalières"
+
+    def __str__(self):
+        return f"{self.jour} {self.portee}:{self.cible_id} {self.nom} = {self.valeur}"
+
+
+# ==============================================================================
+# INDEX DE RECHERCHE
+# ==============================================================================
+
+class IndexRecherche(models.Model):
+    """
+    Texte de recherche d'un objet (OT, asset, intervention, demande, média)
+
+    Texte normalisé (minuscules, sans accents ni ponctuation) tenu à jour
+    par signaux (core.utils.recherche). Sous SQLite, une table FTS5
+    synchronisée par triggers l'indexe ; sous PostgreSQL, un index
+    trigramme (pg_trgm).
+    """
+
+    TYPE_OBJET_CHOIX = [
+        ('ot', 'Ordre de travail'),
+        ('asset', 'Asset'),
+        ('intervention', 'Intervention'),
+        ('demande', 'Demande de réparation'),
+        ('media', 'Fichier média'),
+    ]
+
+    type_objet = models.CharField(max_length=20, choices=TYPE_OBJET_CHOIX)
+    objet_id = models.PositiveIntegerField()
+    texte = models.TextField()
+
+    class Meta:
+        unique_together = ('type_objet', 'objet_id')
+        verbose_name = "Entrée de l'index de recherche"
+        verbose_name_plural = "Index de recherche"
+
+    def __str__(self):
+        return f"{self.type_objet} {self.objet_id}"
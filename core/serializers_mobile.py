@@ -3,11 +3,15 @@
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from .models import (
     OrdreDeTravail, Intervention, Operation, PointDeControle,
     Asset, RapportExecution, Reponse, FichierMedia, 
     DemandeReparation, ProfilUtilisateur, StatutWorkflow
 )
+from .utils.acces import droits
+from .utils.gamme_utils import operations_ordre
 
 # ==============================================================================
 # SERIALIZERS DE BASE
@@ -168,6 +172,69 @@ class InterventionMobileSerializer(serializers.ModelSerializer):
 # SERIALIZERS ORDRES DE TRAVAIL
 # ==============================================================================
 
+STATUTS_DEMANDE_BLOQUANTS = ['EN_ATTENTE', 'VALIDEE', 'EN_COURS']
+
+
+def _sous_requete_count(queryset, group_by):
+    """
+    Sous-requête scalaire COUNT(*) corrélée, 0 si aucune ligne
+    """
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group_by).annotate(n=Count('pk')).values('n')[:1],
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def annoter_ordres_travail_mobile(queryset):
+    """
+    Prépare un queryset d'OT pour OrdreDeTravailMobileSerializer
+
+    Les compteurs (progression, demandes de réparation) sont calculés par
+    sous-requêtes et les relations imbriquées chargées d'avance : la
+    sérialisation s'exécute en un nombre constant de requêtes, quel que soit
+    le nombre d'OT. L'appartenance à l'équipe assignée est vérifiée en
+    mémoire (core.utils.acces).
+
+    Args:
+        queryset: QuerySet d'OrdreDeTravail déjà filtré
+    """
+    queryset = queryset.select_related(
+        'intervention', 'asset__categorie', 'statut',
+        'cree_par', 'assigne_a_technicien', 'assigne_a_equipe'
+    ).prefetch_related(
+        'intervention__operations__points_de_controle'
+    ).annotate(
+        nb_points_total=_sous_requete_count(
+            PointDeControle.objects.filter(operation__intervention=OuterRef('intervention_id')),
+            'operation__intervention'
+        ),
+        nb_points_remplis=_sous_requete_count(
+            Reponse.objects.filter(
+                rapport_execution__ordre_de_travail=OuterRef('pk'),
+                point_de_controle__operation__intervention=OuterRef('intervention_id')
+            ),
+            'rapport_execution'
+        ),
+        nb_demandes=_sous_requete_count(
+            DemandeReparation.objects.filter(ordre_de_travail=OuterRef('pk')),
+            'ordre_de_travail'
+        ),
+        nb_demandes_bloquantes=_sous_requete_count(
+            DemandeReparation.objects.filter(
+                ordre_de_travail=OuterRef('pk'),
+                bloque_cloture_ot=True,
+                statut__in=STATUTS_DEMANDE_BLOQUANTS
+            ),
+            'ordre_de_travail'
+        ),
+    )
+
+    return queryset
+
+
 class OrdreDeTravailMobileSerializer(serializers.ModelSerializer):
     """
     Serializer pour les ordres de travail mobile
@@ -205,7 +272,7 @@ class OrdreDeTravailMobileSerializer(serializers.ModelSerializer):
             'intervention', 'asset', 'statut',
             'cree_par_nom', 'assigne_a_nom', 'equipe_nom',
             'duree_reelle', 'est_en_retard', 'peut_etre_execute', 'progression',
-            'nb_demandes_reparation', 'demandes_bloquantes'
+            'nb_demandes_reparation', 'demandes_bloquantes', 'version_intervention'
         ]
     
     def get_duree_reelle(self, obj):
@@ -234,59 +301,49 @@ class OrdreDeTravailMobileSerializer(serializers.ModelSerializer):
         if not request or not request.user.is_authenticated:
             return False
         
-        user = request.user
-        try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
-        
-        return (
-            obj.assigne_a_technicien == user or
-            (obj.assigne_a_equipe and user in obj.assigne_a_equipe.membres.all()) or
-            role in ['MANAGER', 'ADMIN']
-        )
+        # Rôle et équipes chargés une fois pour toute la liste
+        return droits(request.user).peut_executer(obj)
     
     def get_progression(self, obj):
         """
         Calcule la progression de l'exécution
         """
-        try:
-            rapport = obj.rapport
-            if not rapport:
-                return 0
-            
-            # Calculer le pourcentage de points de contrôle remplis
-            total_points = 0
-            points_remplis = 0
-            
-            for operation in obj.intervention.operations.all():
-                for point in operation.points_de_controle.all():
-                    total_points += 1
-                    if rapport.reponses.filter(point_de_controle=point).exists():
-                        points_remplis += 1
-            
-            if total_points > 0:
-                return round((points_remplis / total_points) * 100)
-            return 0
-            
-        except:
-            return 0
+        total_points = getattr(obj, 'nb_points_total', None)
+        points_remplis = getattr(obj, 'nb_points_remplis', None)
+        
+        if total_points is None:
+            total_points = PointDeControle.objects.filter(
+                operation__intervention_id=obj.intervention_id
+            ).count()
+            points_remplis = Reponse.objects.filter(
+                rapport_execution__ordre_de_travail=obj,
+                point_de_controle__operation__intervention_id=obj.intervention_id
+            ).count()
+        
+        if total_points > 0:
+            return round((points_remplis / total_points) * 100)
+        return 0
     
     def get_nb_demandes_reparation(self, obj):
         """
         Nombre de demandes de réparation
         """
-        return obj.demandes_reparation.count()
+        nb_demandes = getattr(obj, 'nb_demandes', None)
+        if nb_demandes is None:
+            nb_demandes = obj.demandes_reparation.count()
+        return nb_demandes
     
     def get_demandes_bloquantes(self, obj):
         """
         Demandes de réparation qui bloquent la clôture
         """
-        demandes = obj.demandes_reparation.filter(
-            bloque_cloture_ot=True,
-            statut__in=['EN_ATTENTE', 'VALIDEE', 'EN_COURS']
-        )
-        return demandes.count()
+        nb_bloquantes = getattr(obj, 'nb_demandes_bloquantes', None)
+        if nb_bloquantes is None:
+            nb_bloquantes = obj.demandes_reparation.filter(
+                bloque_cloture_ot=True,
+                statut__in=STATUTS_DEMANDE_BLOQUANTS
+            ).count()
+        return nb_bloquantes
 
 # ==============================================================================
 # SERIALIZERS EXÉCUTION
@@ -304,7 +361,7 @@ class FichierMediaMobileSerializer(serializers.ModelSerializer):
         model = FichierMedia
         fields = [
             'id', 'type_fichier', 'type_fichier_display', 'nom_original',
-            'taille_octets', 'taille_mb', 'date_upload', 'url'
+            'taille_octets', 'taille_mb', 'date_upload', 'url', 'statut_traitement'
         ]
     
     def get_taille_mb(self, obj):
@@ -399,6 +456,40 @@ class RapportExecutionMobileSerializer(serializers.ModelSerializer):
             return int(delta.total_seconds() / 60)
         return None
 
+# ==============================================================================
+# PAYLOAD D'EXÉCUTION MOBILE
+# ==============================================================================
+
+def reponses_execution_queryset():
+    """
+    Réponses avec les relations lues par ReponseMobileSerializer
+    """
+    return Reponse.objects.select_related(
+        'point_de_controle', 'saisi_par'
+    ).prefetch_related('fichiers_media')
+
+
+def construire_operations_execution(ordre, reponses, context=None):
+    """
+    Fusionne en mémoire la gamme de l'OT et ses réponses
+
+    Args:
+        ordre: OrdreDeTravail exécuté
+        reponses: Réponses du rapport (voir reponses_execution_queryset)
+        context: Contexte des serializers (request pour les URLs des médias)
+    """
+    reponses_par_point = {
+        reponse.point_de_controle_id: ReponseMobileSerializer(reponse, context=context).data
+        for reponse in reponses
+    }
+    return [
+        dict(operation, points_de_controle=[
+            dict(point, reponse=reponses_par_point.get(point['id']))
+            for point in operation['points_de_controle']
+        ])
+        for operation in operations_ordre(ordre)
+    ]
+
 # ==============================================================================
 # SERIALIZERS DEMANDES DE RÉPARATION
 # ==============================================================================
@@ -468,14 +559,9 @@ class DemandeReparationMobileSerializer(serializers.ModelSerializer):
             return False
         
         user = request.user
-        try:
-            role = user.profil.role
-        except:
-            role = 'OPERATEUR'
-        
         return (
             obj.statut == 'VALIDEE' and
-            (obj.assignee_a == user or role in ['MANAGER', 'ADMIN'])
+            (obj.assignee_a_id == user.id or droits(user).est_gestionnaire)
         )
 
 # ==============================================================================
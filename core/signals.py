@@ -0,0 +1,213 @@
+# Fichier : core/signals.py
+
+"""
+Signaux d'invalidation des caches applicatifs, de traçage des suppressions,
+de tenue des compteurs du tableau de bord et de l'index de recherche
+
+Enregistrés au démarrage par CoreConfig.ready().
+"""
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.db import transaction
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+
+from .models import (
+    Asset, OrdreDeTravail, Intervention, Operation, PointDeControle, ElementSupprime,
+    FichierMedia, RapportExecution, DemandeReparation, StatutWorkflow, ProfilUtilisateur
+)
+from .utils.cache_utils import invalidate_namespace, CARTE_STATS_NAMESPACE
+from .utils.stockage_media import liberer_media
+from .utils.rapport_pdf import planifier_pdf
+from .utils.recherche import indexer_objet, desindexer_objet
+from .utils.compteurs import (
+    appliquer, contributions_en_base, contributions_instance, recalculer_compteurs,
+    invalider_portees, GLOBAL
+)
+
+# ==============================================================================
+# CARTE FTTH
+# ==============================================================================
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+def invalider_stats_carte(sender, instance, **kwargs):
+    """
+    Invalide les statistiques de la carte après toute modification d'asset
+    """
+    invalidate_namespace(CARTE_STATS_NAMESPACE)
+
+
+# ==============================================================================
+# SYNCHRONISATION MOBILE
+# ==============================================================================
+
+TYPES_SUPPRESSION = {
+    OrdreDeTravail: 'ORDRE_TRAVAIL',
+    Intervention: 'INTERVENTION',
+    Operation: 'OPERATION',
+    PointDeControle: 'POINT_CONTROLE',
+    Asset: 'ASSET',
+}
+
+
+@receiver(post_delete, sender=OrdreDeTravail)
+@receiver(post_delete, sender=Intervention)
+@receiver(post_delete, sender=Operation)
+@receiver(post_delete, sender=PointDeControle)
+@receiver(post_delete, sender=Asset)
+def tracer_suppression(sender, instance, **kwargs):
+    """
+    Enregistre une trace de suppression pour la synchronisation différentielle
+    """
+    ElementSupprime.objects.create(
+        type_objet=TYPES_SUPPRESSION[sender],
+        objet_id=instance.pk,
+    )
+
+
+# ==============================================================================
+# MÉDIAS
+# ==============================================================================
+
+@receiver(post_delete, sender=FichierMedia)
+def liberer_fichier_media(sender, instance, **kwargs):
+    """
+    Retire la référence du média à son contenu (fichier supprimé à la dernière)
+    """
+    liberer_media(instance)
+
+
+# ==============================================================================
+# RAPPORTS PDF
+# ==============================================================================
+
+@receiver(post_save, sender=RapportExecution)
+def generer_pdf_rapport_fige(sender, instance, **kwargs):
+    """
+    Rend en arrière-plan le PDF d'un rapport finalisé (nouvelle version à
+    chaque modification)
+    """
+    planifier_pdf(instance)
+
+
+# ==============================================================================
+# COMPTEURS DU TABLEAU DE BORD
+# ==============================================================================
+
+@receiver(pre_save, sender=OrdreDeTravail)
+@receiver(pre_save, sender=Asset)
+@receiver(pre_save, sender=Intervention)
+@receiver(pre_save, sender=DemandeReparation)
+def memoriser_contribution(sender, instance, raw=False, **kwargs):
+    """
+    Contribution aux compteurs avant modification (relue en base, ligne
+    verrouillée : voir EnregistrementCompteurs)
+    """
+    if not raw:
+        instance._contribution_compteurs = contributions_en_base(instance)
+
+
+@receiver(post_save, sender=OrdreDeTravail)
+@receiver(post_save, sender=Asset)
+@receiver(post_save, sender=Intervention)
+@receiver(post_save, sender=DemandeReparation)
+def mettre_a_jour_compteurs(sender, instance, raw=False, **kwargs):
+    """
+    Applique aux compteurs la différence de contribution et invalide les
+    statistiques en cache des portées touchées
+    """
+    if not raw:
+        invalider_portees(appliquer(
+            instance.__dict__.pop('_contribution_compteurs', None), contributions_instance(instance)
+        ))
+
+
+@receiver(post_delete, sender=OrdreDeTravail)
+@receiver(post_delete, sender=Asset)
+@receiver(post_delete, sender=Intervention)
+@receiver(post_delete, sender=DemandeReparation)
+def retirer_des_compteurs(sender, instance, **kwargs):
+    avant = instance.__dict__.pop('_contribution_compteurs', None)
+    if avant is None:
+        avant = contributions_instance(instance)
+    invalider_portees(appliquer(avant, None))
+
+
+@receiver(pre_delete, sender=OrdreDeTravail)
+@receiver(pre_delete, sender=Asset)
+@receiver(pre_delete, sender=Intervention)
+@receiver(pre_delete, sender=DemandeReparation)
+def memoriser_contribution_supprimee(sender, instance, **kwargs):
+    """
+    Contribution retirée : celle de la ligne en base, verrouillée dans la
+    transaction de suppression (l'instance peut être périmée)
+    """
+    instance._contribution_compteurs = contributions_en_base(instance)
+
+
+@receiver(pre_save, sender=StatutWorkflow)
+def memoriser_statut_final(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._statut_final_avant = (
+        StatutWorkflow.objects.filter(pk=instance.pk).values_list('est_statut_final', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=StatutWorkflow)
+def recalculer_si_statut_final_change(sender, instance, created, raw=False, **kwargs):
+    """
+    Un statut qui devient (ou cesse d'être) final change le compte de tous
+    ses OT : recalcul complet, rare
+    """
+    avant = instance.__dict__.pop('_statut_final_avant', None)
+    if not raw and not created and avant is not None and avant != instance.est_statut_final:
+        transaction.on_commit(recalculer_compteurs)
+
+
+@receiver(post_delete, sender=StatutWorkflow)
+def recalculer_apres_suppression_statut(sender, instance, **kwargs):
+    """
+    Les OT d'un statut final supprimé redeviennent actifs (SET_NULL, sans signal)
+    """
+    if instance.est_statut_final:
+        transaction.on_commit(recalculer_compteurs)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=ProfilUtilisateur)
+@receiver(post_delete, sender=ProfilUtilisateur)
+def invalider_stats_techniciens(sender, instance, update_fields=None, **kwargs):
+    """
+    Le nombre de techniciens actifs fait partie des statistiques globales
+    (la mise à jour de last_login à chaque connexion est ignorée)
+    """
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalider_portees({GLOBAL})
+
+
+# ==============================================================================
+# INDEX DE RECHERCHE
+# ==============================================================================
+
+@receiver(post_save, sender=OrdreDeTravail)
+@receiver(post_save, sender=Asset)
+@receiver(post_save, sender=Intervention)
+@receiver(post_save, sender=DemandeReparation)
+@receiver(post_save, sender=FichierMedia)
+def indexer_pour_recherche(sender, instance, raw=False, **kwargs):
+    if not raw:
+        indexer_objet(instance)
+
+
+@receiver(post_delete, sender=OrdreDeTravail)
+@receiver(post_delete, sender=Asset)
+@receiver(post_delete, sender=Intervention)
+@receiver(post_delete, sender=DemandeReparation)
+@receiver(post_delete, sender=FichierMedia)
+def retirer_de_la_recherche(sender, instance, **kwargs):
+    desindexer_objet(instance)
@@ -2,6 +2,8 @@
 
 from django import template
 import os
+
+from ..utils.acces import droits
 register = template.Library()
 
 @register.filter
@@ -234,4 +236,9 @@ def pluralize(value):
 @register.filter
 def default_if_none(value, default):
     """Retourne une valeur par défaut si la valeur est None"""
-    return default if value is None else value
\ No newline at end of file
+    return default if value is None else value
+
+@register.filter
+def assigne_a(ordre, user):
+    """Vérifie si l'OT est assigné à l'utilisateur ou à l'une de ses équipes (sans requête par ligne)"""
+    return droits(user).est_assigne(ordre)
@@ -0,0 +1,82 @@
+# Fichier: core/tests/donnees.py
+
+"""
+Données communes aux tests
+
+Un boîtier PB (asset), une intervention « Contrôle PB » avec son opération
+et ses points de contrôle, un OT assigné à un technicien et son rapport
+d'exécution. Chaque test ne précise que ce qu'il fait varier.
+"""
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from core.models import (
+    Asset, CategorieAsset, Intervention, Operation, OrdreDeTravail, PointDeControle,
+    ProfilUtilisateur, RapportExecution
+)
+
+
+def creer_utilisateur(username, role=None, password='pass'):
+    """Utilisateur et, si un rôle est donné, son profil"""
+    user = User.objects.create_user(username=username, password=password)
+    if role:
+        ProfilUtilisateur.objects.update_or_create(user=user, defaults={'role': role})
+    return user
+
+
+def creer_asset(nom='PB 1', **champs):
+    """Asset de la catégorie PB, à Paris par défaut"""
+    if 'categorie' not in champs:
+        champs['categorie'], _ = CategorieAsset.objects.get_or_create(nom='PB')
+    champs.setdefault('latitude', 48.85)
+    champs.setdefault('longitude', 2.35)
+    return Asset.objects.create(nom=nom, **champs)
+
+
+def creer_intervention(nom='Contrôle PB', **champs):
+    return Intervention.objects.create(nom=nom, **champs)
+
+
+def creer_points(operation, nombre, debut=0, **champs):
+    """Points « Point <i> » numérotés à partir de `debut`"""
+    return [
+        PointDeControle.objects.create(operation=operation, label=f'Point {i}', ordre=i, **champs)
+        for i in range(debut, debut + nombre)
+    ]
+
+
+def creer_ordre(intervention, asset, technicien=None, **champs):
+    """OT prévu maintenant, assigné au technicien"""
+    champs.setdefault('titre', 'OT')
+    champs.setdefault('date_prevue_debut', timezone.now())
+    if technicien is not None:
+        champs['assigne_a_technicien'] = technicien
+    return OrdreDeTravail.objects.create(intervention=intervention, asset=asset, **champs)
+
+
+def creer_execution(technicien, nb_points=1, operation='Vérifications', intervention=None, **champs_ordre):
+    """
+    OT prêt à être exécuté : asset, intervention à une opération de
+    `nb_points` points, OT assigné au technicien et son rapport
+
+    Args:
+        intervention: Champs de l'intervention (nom, statut...)
+        champs_ordre: Champs de l'OT (cree_par, type_OT...)
+
+    Returns:
+        dict: asset, intervention, operation, points, ordre, rapport
+    """
+    asset = creer_asset()
+    intervention = creer_intervention(**(intervention or {}))
+    operation = Operation.objects.create(intervention=intervention, nom=operation, ordre=1)
+    points = creer_points(operation, nb_points)
+    ordre = creer_ordre(intervention, asset, technicien, **champs_ordre)
+    return {
+        'asset': asset,
+        'intervention': intervention,
+        'operation': operation,
+        'points': points,
+        'ordre': ordre,
+        'rapport': RapportExecution.objects.create(ordre_de_travail=ordre, cree_par=technicien),
+    }
@@ -0,0 +1,103 @@
+# Fichier: core/tests/test_acces.py
+
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Equipe, OrdreDeTravail
+from core.tests.donnees import creer_asset, creer_intervention, creer_ordre, creer_utilisateur
+from core.utils.acces import droits
+
+
+class DroitsAccesTest(TestCase):
+    """
+    Tests du service de contrôle d'accès aux OT
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.manager = self._utilisateur('manager', 'MANAGER')
+        self.technicien = self._utilisateur('technicien', 'TECHNICIEN')
+        self.membre = self._utilisateur('membre', 'TECHNICIEN')
+        self.operateur = self._utilisateur('operateur', 'OPERATEUR')
+        self.externe = self._utilisateur('externe', 'TECHNICIEN')
+
+        self.equipe = Equipe.objects.create(nom='Équipe Nord')
+        self.equipe.membres.add(self.membre, self.technicien)
+
+        intervention, asset = creer_intervention(), creer_asset()
+
+        # Assigné au technicien et à son équipe : une seule ligne attendue dans les listes
+        self.ot_technicien = creer_ordre(
+            intervention, asset, self.technicien, titre='OT technicien', assigne_a_equipe=self.equipe,
+            cree_par=self.manager
+        )
+        self.ot_equipe = creer_ordre(
+            intervention, asset, titre='OT équipe', assigne_a_equipe=self.equipe, cree_par=self.manager
+        )
+        self.ot_operateur = creer_ordre(intervention, asset, titre='OT créé par un opérateur', cree_par=self.operateur)
+
+    def _utilisateur(self, username, role):
+        # Relu pour partir sans profil en cache
+        return User.objects.get(pk=creer_utilisateur(username, role).pk)
+
+    def test_regles(self):
+        """Exécution : assignés et managers ; visibilité : en plus le créateur"""
+        cas = [
+            (self.manager, self.ot_operateur, True, True),
+            (self.technicien, self.ot_technicien, True, True),
+            (self.membre, self.ot_technicien, True, True),
+            (self.membre, self.ot_operateur, False, False),
+            (self.operateur, self.ot_operateur, False, True),
+            (self.externe, self.ot_equipe, False, False),
+        ]
+        for user, ordre, executer, voir in cas:
+            with self.subTest(user=user.username, ordre=ordre.titre):
+                self.assertEqual(droits(user).peut_executer(ordre), executer)
+                self.assertEqual(droits(user).peut_voir(ordre), voir)
+
+    def test_memorisation(self):
+        """Profil et équipes lus une fois, vérifications suivantes sans requête"""
+        ordres = list(OrdreDeTravail.objects.all())
+        with self.assertNumQueries(2):
+            for _ in range(3):
+                for ordre in ordres:
+                    droits(self.membre).peut_executer(ordre)
+                    droits(self.membre).peut_voir(ordre)
+        self.assertEqual(droits(self.membre).role, 'TECHNICIEN')
+
+    def test_listes_sans_doublon(self):
+        """Les listes filtrent sur les clés de l'OT, sans jointure sur les membres"""
+        visibles = droits(self.technicien).ordres_visibles(OrdreDeTravail.objects.all())
+        self.assertEqual(sorted(ot.pk for ot in visibles), sorted([self.ot_technicien.pk, self.ot_equipe.pk]))
+        self.assertNotIn('core_equipe_membres', str(visibles.query))
+
+        self.assertEqual(droits(self.manager).ordres_visibles(OrdreDeTravail.objects.all()).count(), 3)
+        self.assertEqual(
+            list(droits(self.operateur).ordres_visibles(OrdreDeTravail.objects.all())), [self.ot_operateur]
+        )
+        self.assertFalse(droits(self.externe).ordres_executables(OrdreDeTravail.objects.all()).exists())
+
+    def test_vues(self):
+        """Liste, détail et API mobile appliquent les mêmes règles"""
+        client = Client()
+        client.login(username='membre', password='pass')
+        response = client.get(reverse('liste_ordres_travail'))
+        self.assertEqual(
+            sorted(ot.pk for ot in response.context['ordres_page']),
+            sorted([self.ot_technicien.pk, self.ot_equipe.pk])
+        )
+        self.assertEqual(client.get(reverse('detail_ordre_travail', args=[self.ot_equipe.pk])).status_code, 200)
+        self.assertRedirects(
+            client.get(reverse('detail_ordre_travail', args=[self.ot_operateur.pk])),
+            reverse('liste_ordres_travail'), fetch_redirect_response=False
+        )
+
+        api = APIClient()
+        api.force_authenticate(self.membre)
+        resultats = api.get('/api/mobile/ordres-travail/').json()['results']
+        self.assertEqual(
+            {ot['id']: ot['peut_etre_execute'] for ot in resultats},
+            {self.ot_technicien.pk: True, self.ot_equipe.pk: True}
+        )
@@ -0,0 +1,137 @@
+# Fichier: core/tests/test_brouillons.py
+
+import json
+
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import BrouillonIntervention, DemandeReparation, PointDeControle, Reponse
+from core.tests.donnees import creer_execution, creer_utilisateur
+from core.utils.brouillons import (
+    ConflitBrouillon, enregistrer_brouillon, lire_brouillon, materialiser_brouillon
+)
+
+CACHE_LOCAL = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'brouillons': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'brouillons'},
+}
+
+
+class BrouillonsTest(TestCase):
+    """
+    Tests des brouillons d'exécution (écriture différée des réponses)
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.technicien = creer_utilisateur('technicien', 'TECHNICIEN')
+        donnees = creer_execution(self.technicien, nb_points=3)
+        self.points, self.ordre, self.rapport = donnees['points'], donnees['ordre'], donnees['rapport']
+        # Seul le premier point est obligatoire
+        PointDeControle.objects.filter(pk=self.points[0].pk).update(est_obligatoire=True)
+
+    def _scenario_versions(self):
+        self.assertEqual(enregistrer_brouillon(self.rapport, {self.points[0].pk: 'OK'}), 1)
+        self.assertEqual(enregistrer_brouillon(self.rapport, {self.points[1].pk: '12'}, version_client=1), 2)
+        # Valeurs déjà présentes : pas de nouvelle version
+        self.assertEqual(enregistrer_brouillon(self.rapport, {self.points[1].pk: '12'}, version_client=2), 2)
+
+        with self.assertRaises(ConflitBrouillon) as conflit:
+            enregistrer_brouillon(self.rapport, {self.points[2].pk: 'NOK'}, version_client=1)
+        self.assertEqual(conflit.exception.version, 2)
+        self.assertEqual(
+            conflit.exception.donnees, {str(self.points[0].pk): 'OK', str(self.points[1].pk): '12'}
+        )
+
+        self.assertEqual(lire_brouillon(self.rapport), ({self.points[0].pk: 'OK', self.points[1].pk: '12'}, 2))
+        self.assertFalse(Reponse.objects.exists())
+
+    def test_versions(self):
+        """Fusion, version optimiste et conflit, sans écrire de réponse"""
+        self._scenario_versions()
+        self.assertEqual(BrouillonIntervention.objects.get(rapport_execution=self.rapport).version, 2)
+
+    @override_settings(CACHES=CACHE_LOCAL, GMAO_BROUILLONS_CACHE='brouillons')
+    def test_versions_cache(self):
+        """Mêmes règles avec le brouillon stocké dans un cache"""
+        self._scenario_versions()
+        self.assertFalse(BrouillonIntervention.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            materialiser_brouillon(self.rapport, self.technicien)
+        self.assertEqual(Reponse.objects.count(), 2)
+        self.assertEqual(lire_brouillon(self.rapport), ({}, 0))
+
+    def test_materialisation(self):
+        """Les valeurs explicites priment, les vides du brouillon sont ignorées"""
+        enregistrer_brouillon(self.rapport, {self.points[0].pk: 'OK', self.points[1].pk: ''})
+        resultat = materialiser_brouillon(self.rapport, self.technicien, {self.points[0].pk: 'NOK'})
+
+        self.assertEqual(resultat['crees'], 1)
+        self.assertEqual(Reponse.objects.get().valeur, 'NOK')
+        self.assertFalse(BrouillonIntervention.objects.exists())
+
+    def test_vues(self):
+        """Brouillon JSON, conflit 409 puis finalisation qui enregistre le brouillon"""
+        client = Client()
+        client.login(username='technicien', password='pass')
+        url = f'/ordres-travail/{self.ordre.pk}/save-draft/'
+        brouillon = {f'reponse_{self.points[0].pk}': 'OK'}
+
+        donnees = client.post(url, json.dumps({**brouillon, 'version': 0}), content_type='application/json').json()
+        self.assertEqual((donnees['success'], donnees['version']), (True, 1))
+        self.assertFalse(Reponse.objects.exists())
+
+        response = client.post(url, json.dumps({**brouillon, 'version': 0}), content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['draft'], brouillon)
+
+        donnees = client.get(f'/ordres-travail/{self.ordre.pk}/load-draft/').json()
+        self.assertEqual((donnees['draft'], donnees['version']), (brouillon, 1))
+
+        client.post(reverse('executer_intervention', args=[self.ordre.pk]), {'action': 'finaliser_intervention'})
+        self.rapport.refresh_from_db()
+        self.assertEqual(self.rapport.statut_rapport, 'FINALISE')
+        self.assertEqual(Reponse.objects.get().valeur, 'OK')
+        self.assertFalse(BrouillonIntervention.objects.exists())
+
+    def test_finalisation_refusee(self):
+        """Une finalisation refusée n'écrit aucune réponse et garde la saisie en brouillon"""
+        client = Client()
+        client.login(username='technicien', password='pass')
+        url = reverse('executer_intervention', args=[self.ordre.pk])
+        enregistrer_brouillon(self.rapport, {self.points[1].pk: '12'})
+
+        # Point obligatoire manquant : brouillon complété avec la saisie
+        response = client.post(url, {'action': 'finaliser_intervention', f'reponse_{self.points[2].pk}': 'NOK'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Reponse.objects.exists())
+        self.assertEqual(lire_brouillon(self.rapport)[0], {self.points[1].pk: '12', self.points[2].pk: 'NOK'})
+
+        # Demande bloquante
+        DemandeReparation.objects.create(
+            ordre_de_travail=self.ordre, point_de_controle=self.points[0],
+            titre='Boîtier cassé', description='À remplacer', cree_par=self.technicien
+        )
+        client.post(url, {'action': 'finaliser_intervention', f'reponse_{self.points[0].pk}': 'OK'})
+        self.assertFalse(Reponse.objects.exists())
+        self.assertEqual(lire_brouillon(self.rapport)[0][self.points[0].pk], 'OK')
+        self.rapport.refresh_from_db()
+        self.assertNotEqual(self.rapport.statut_rapport, 'FINALISE')
+
+    def test_finalisation_mobile_refusee(self):
+        """API mobile : le brouillon n'est enregistré que si la finalisation aboutit"""
+        api = APIClient()
+        api.force_authenticate(self.technicien)
+        url = f'/api/mobile/ordres-travail/{self.ordre.pk}/finaliser/'
+        enregistrer_brouillon(self.rapport, {self.points[1].pk: '12'})
+
+        self.assertEqual(api.post(url).status_code, 400)
+        self.assertFalse(Reponse.objects.exists())
+        self.assertEqual(lire_brouillon(self.rapport), ({self.points[1].pk: '12'}, 1))
+
+        enregistrer_brouillon(self.rapport, {self.points[0].pk: 'OK'})
+        self.assertEqual(api.post(url).status_code, 200)
+        self.assertEqual(Reponse.objects.count(), 2)
+        self.assertFalse(BrouillonIntervention.objects.exists())
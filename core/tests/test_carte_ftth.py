@@ -1,14 +1,19 @@
 # Fichier: core/tests/test_carte_ftth.py
 
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.core.cache import cache
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.conf import settings
 from decimal import Decimal
 import json
+from unittest import mock
 
 from core.models import Asset, CategorieAsset
-from core.views import validate_coordinates, calculate_map_center, prepare_asset_geojson
+from core.views import (
+    validate_coordinates, calculate_map_center, prepare_asset_geojson,
+    compute_carte_stats, get_carte_stats, serialize_equipment
+)
 
 
 class ValidateCoordinatesTest(TestCase):
@@ -587,6 +592,307 @@ class SecurityTest(TestCase):
         self.assertNotIn('<script>', data['asset']['nom'])
 
 
+class EquipmentTilesApiTest(TestCase):
+    """
+    Tests pour l'API des tuiles GeoJSON de la carte
+    """
+    
+    def setUp(self):
+        """Création des données de test"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        
+        self.category = CategorieAsset.objects.create(nom='PB')
+        
+        # Trois assets proches à Paris, un à Lyon
+        for i in range(3):
+            Asset.objects.create(
+                nom=f'PB Paris {i}',
+                latitude=48.8566 + i * 0.0001,
+                longitude=2.3522,
+                categorie=self.category
+            )
+        
+        Asset.objects.create(
+            nom='PB Lyon',
+            latitude=45.7640,
+            longitude=4.8357,
+            categorie=self.category
+        )
+        
+        self.bbox_paris = '2.30,48.80,2.40,48.90'
+
+    def test_bbox_high_zoom_returns_features(self):
+        """Test d'une emprise à fort zoom : features individuelles"""
+        response = self.client.get(reverse('equipment_tiles_api'), {
+            'bbox': self.bbox_paris,
+            'zoom': 16
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        
+        self.assertTrue(data['success'])
+        self.assertFalse(data['clustered'])
+        self.assertEqual(data['type'], 'FeatureCollection')
+        self.assertEqual(len(data['features']), 3)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_bbox_low_zoom_returns_clusters(self):
+        """Test d'une emprise à faible zoom : regroupement côté serveur"""
+        response = self.client.get(reverse('equipment_tiles_api'), {
+            'bbox': '-5.0,41.0,10.0,51.5',
+            'zoom': 5
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        
+        self.assertTrue(data['clustered'])
+        self.assertEqual(data['count'], 4)
+        counts = sorted(f['properties']['point_count'] for f in data['features'])
+        self.assertEqual(counts, [1, 3])
+
+    def test_xyz_tile(self):
+        """Test de l'appel par tuile XYZ"""
+        # Tuile z=10 contenant Paris
+        response = self.client.get(reverse('equipment_tile_xyz_api', kwargs={'z': 10, 'x': 518, 'y': 352}))
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['count'], 3)
+
+    def test_etag_revalidation(self):
+        """Test de la revalidation : 304 puis nouvelle version après modification"""
+        url = reverse('equipment_tiles_api')
+        params = {'bbox': self.bbox_paris, 'zoom': 16}
+        
+        etag = self.client.get(url, params)['ETag']
+        
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        Asset.objects.create(
+            nom='PB Paris nouveau',
+            latitude=48.8600,
+            longitude=2.3500,
+            categorie=self.category
+        )
+        
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalid_parameters(self):
+        """Test des paramètres invalides"""
+        url = reverse('equipment_tiles_api')
+        
+        self.assertEqual(self.client.get(url, {'bbox': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'bbox': '2.4,48.9,2.3,48.8'}).status_code, 400)
+        
+        response = self.client.get(reverse('equipment_tile_xyz_api', kwargs={'z': 2, 'x': 9, 'y': 0}))
+        self.assertEqual(response.status_code, 400)
+
+
+class FindNearestTest(TestCase):
+    """
+    Tests pour l'index geohash et la recherche des plus proches voisins
+    """
+    
+    def setUp(self):
+        """Création des données de test"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        
+        self.category = CategorieAsset.objects.create(nom='PTO')
+        
+        # Assets à ~10 m, ~50 m et ~500 m au nord du point de référence
+        self.proche = Asset.objects.create(nom='Proche', latitude=48.85669, longitude=2.3522, categorie=self.category)
+        self.moyen = Asset.objects.create(nom='Moyen', latitude=48.85705, longitude=2.3522, categorie=self.category)
+        self.loin = Asset.objects.create(nom='Loin', latitude=48.86110, longitude=2.3522, categorie=self.category)
+
+    def test_geohash_updated_on_save(self):
+        """Test du recalcul du geohash à la sauvegarde"""
+        self.assertTrue(self.proche.geohash.startswith('u09tv'))
+        
+        self.proche.latitude = Decimal('45.764000')
+        self.proche.longitude = Decimal('4.835700')
+        self.proche.save(update_fields=['latitude', 'longitude'])
+        
+        self.proche.refresh_from_db()
+        self.assertTrue(self.proche.geohash.startswith('u05kq'))
+
+    def test_find_nearest_sorted_within_radius(self):
+        """Test des plus proches voisins triés et bornés au rayon"""
+        resultats = Asset.find_nearest(48.8566, 2.3522, k=10, radius_meters=100)
+        
+        self.assertEqual([a.nom for a in resultats], ['Proche', 'Moyen'])
+        self.assertLess(resultats[0].distance, resultats[1].distance)
+        
+        resultats = Asset.find_nearest(48.8566, 2.3522, k=1, radius_meters=1000)
+        self.assertEqual([a.nom for a in resultats], ['Proche'])
+
+    def test_find_nearby_equipment_api(self):
+        """Test de l'API de proximité"""
+        response = self.client.get(reverse('find_nearby_equipment_api'), {
+            'lat': 48.8566,
+            'lng': 2.3522,
+            'radius': 1000
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['equipments'][0]['name'], 'Proche')
+        self.assertEqual(data['equipments'][-1]['name'], 'Loin')
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class CarteStatsCacheTest(TestCase):
+    """
+    Tests pour les statistiques de la carte mises en cache
+    """
+    
+    def setUp(self):
+        """Création des données de test"""
+        cache.clear()
+        
+        self.category = CategorieAsset.objects.create(nom='PM')
+        
+        Asset.objects.create(nom='PM 1', latitude=48.8566, longitude=2.3522, categorie=self.category, statut='EN_SERVICE')
+        Asset.objects.create(nom='PM 2', latitude=48.8570, longitude=2.3530, categorie=self.category, statut='EN_PANNE')
+        Asset.objects.create(nom='Sans coordonnées', categorie=self.category, statut='EN_PANNE')
+
+    def test_stats_single_query(self):
+        """Test du calcul des statistiques en une seule requête"""
+        with self.assertNumQueries(1):
+            stats = compute_carte_stats()
+        
+        self.assertEqual(stats['total_assets'], 2)
+        self.assertEqual(stats['en_service'], 1)
+        self.assertEqual(stats['en_panne'], 1)
+        self.assertEqual(stats['categories'], [{'nom': 'PM', 'count': 2}])
+
+    def test_stats_cached_and_invalidated(self):
+        """Test de la mise en cache et de l'invalidation sur modification d'asset"""
+        self.assertEqual(get_carte_stats()['total_assets'], 2)
+        
+        # Deuxième appel servi par le cache
+        with self.assertNumQueries(0):
+            get_carte_stats()
+        
+        # La création d'un asset invalide le cache
+        asset = Asset.objects.create(nom='PM 3', latitude=48.8580, longitude=2.3540, categorie=self.category)
+        self.assertEqual(get_carte_stats()['total_assets'], 3)
+        
+        # La suppression aussi
+        asset.delete()
+        self.assertEqual(get_carte_stats()['total_assets'], 2)
+
+
+class EquipmentListApiTest(TestCase):
+    """
+    Tests pour le flux de l'API de liste des équipements
+    """
+    
+    def setUp(self):
+        """Création des données de test"""
+        self.client = Client()
+        self.category = CategorieAsset.objects.create(nom='PB')
+        
+        for i in range(5):
+            Asset.objects.create(
+                nom=f'PB {i}',
+                latitude=48.85 + i * 0.001,
+                longitude=2.35,
+                categorie=self.category
+            )
+
+    def _content(self, response):
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_json_stream(self):
+        """Test du flux JSON complet"""
+        response = self.client.get(reverse('equipment_list_api'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        
+        data = json.loads(self._content(response))
+        self.assertTrue(data['success'])
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(len(data['equipments']), 5)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_cursor_pagination(self):
+        """Test de la pagination par curseur"""
+        url = reverse('equipment_list_api')
+        
+        page1 = json.loads(self._content(self.client.get(url, {'limit': 3})))
+        self.assertEqual(page1['count'], 3)
+        self.assertIsNotNone(page1['next_cursor'])
+        
+        page2 = json.loads(self._content(self.client.get(url, {'limit': 3, 'cursor': page1['next_cursor']})))
+        self.assertEqual(page2['count'], 2)
+        self.assertIsNone(page2['next_cursor'])
+        
+        ids = [e['id'] for e in page1['equipments'] + page2['equipments']]
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_ndjson_stream(self):
+        """Test du format NDJSON"""
+        response = self.client.get(reverse('equipment_list_api'), {'format': 'ndjson'})
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        
+        lignes = [json.loads(l) for l in self._content(response).splitlines()]
+        self.assertEqual(len(lignes), 6)
+        self.assertEqual(lignes[-1]['_meta']['count'], 5)
+
+    def test_erreur_pendant_le_flux(self):
+        """Une erreur en cours de flux est signalée, sans fin de page normale"""
+        appels = []
+
+        def serialiser_puis_echouer(asset):
+            appels.append(asset)
+            if len(appels) == 3:
+                raise RuntimeError('Base indisponible')
+            return serialize_equipment(asset)
+
+        url = reverse('equipment_list_api')
+        with mock.patch('core.views.serialize_equipment', side_effect=serialiser_puis_echouer):
+            data = json.loads(self._content(self.client.get(url)))
+            appels.clear()
+            lignes = [json.loads(l) for l in self._content(self.client.get(url, {'format': 'ndjson'})).splitlines()]
+
+        self.assertFalse(data['success'])
+        self.assertTrue(data['truncated'])
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['next_cursor'], data['equipments'][-1]['id'])
+        self.assertEqual(len(lignes), 3)
+        self.assertIn('error', lignes[-1]['_meta'])
+
+    def test_invalid_parameters(self):
+        """Test des paramètres invalides"""
+        url = reverse('equipment_list_api')
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 'abc'}).status_code, 400)
+
+
 # Utilitaires pour les tests
 class TestHelpers:
     """
@@ -0,0 +1,122 @@
+# Fichier: core/tests/test_gammes.py
+
+from django.test import TestCase, Client, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Operation, PointDeControle, VersionIntervention, RapportExecution
+from core.tests.donnees import creer_asset, creer_intervention, creer_ordre, creer_utilisateur
+from core.utils.gamme_utils import compiler_intervention, publier_version, operations_ordre
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class GammeVersionTest(TestCase):
+    """
+    Tests des gammes d'intervention compilées et figées
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        cache.clear()
+        self.manager = creer_utilisateur('manager', 'MANAGER')
+        self.asset = creer_asset()
+
+        self.intervention = creer_intervention()
+        operation = Operation.objects.create(intervention=self.intervention, nom='Ouverture', ordre=1)
+        self.parent = PointDeControle.objects.create(
+            operation=operation, label='Boîtier conforme', type_champ='SELECT',
+            options='CONFORME; NON CONFORME', est_obligatoire=True, ordre=1
+        )
+        self.enfant = PointDeControle.objects.create(
+            operation=operation, label='Défaut constaté', ordre=2,
+            depend_de=self.parent, condition_affichage='NON CONFORME',
+            types_fichiers_autorises='pdf, jpg'
+        )
+
+    def _creer_ot(self):
+        return creer_ordre(self.intervention, self.asset, self.manager, cree_par=self.manager)
+
+    def test_compilation(self):
+        """Options découpées, dépendances et points obligatoires"""
+        gamme = compiler_intervention(self.intervention)
+
+        points = gamme['operations'][0]['points_de_controle']
+        self.assertEqual(points[0]['options'], ['CONFORME', 'NON CONFORME'])
+        self.assertEqual(points[1]['types_fichiers_autorises'], ['PDF', 'JPG'])
+        self.assertEqual(gamme['dependances'], {str(self.parent.id): [self.enfant.id]})
+        self.assertEqual(gamme['points_obligatoires'], [self.parent.id])
+        self.assertEqual(gamme['nb_points'], 2)
+
+    def test_validation_publie_une_version(self):
+        """valider_intervention fige la gamme"""
+        client = Client()
+        client.login(username='manager', password='pass')
+
+        response = client.post(reverse('valider_intervention', args=[self.intervention.pk]))
+
+        self.assertEqual(response.json()['version'], 1)
+        self.assertEqual(self.intervention.versions.count(), 1)
+
+    def test_version_reutilisee_si_inchangee(self):
+        """Revalider sans modification ne crée pas de version"""
+        premiere = publier_version(self.intervention)
+        seconde = publier_version(self.intervention)
+
+        self.assertEqual(premiere.pk, seconde.pk)
+
+        self.enfant.label = 'Défaut observé'
+        self.enfant.save()
+        troisieme = publier_version(self.intervention)
+
+        self.assertEqual(troisieme.numero, 2)
+
+    def test_ot_fige_sur_sa_version(self):
+        """Un OT garde la gamme en vigueur à sa création"""
+        version = publier_version(self.intervention)
+        ot = self._creer_ot()
+        self.assertEqual(ot.version_intervention, version)
+
+        self.parent.label = 'Libellé modifié après création'
+        self.parent.save()
+        publier_version(self.intervention)
+
+        ot.refresh_from_db()
+        self.assertEqual(operations_ordre(ot)[0]['points_de_controle'][0]['label'], 'Boîtier conforme')
+        self.assertEqual(VersionIntervention.objects.filter(intervention=self.intervention).count(), 2)
+
+    def test_ot_sans_version(self):
+        """Sans version validée, la structure courante est utilisée"""
+        ot = self._creer_ot()
+
+        self.assertIsNone(ot.version_intervention)
+        self.assertEqual(len(operations_ordre(ot)[0]['points_de_controle']), 2)
+
+    def test_pages_ot_depuis_la_gamme(self):
+        """Les pages détail et exécution s'affichent depuis la gamme figée"""
+        publier_version(self.intervention)
+        ot = self._creer_ot()
+        RapportExecution.objects.create(ordre_de_travail=ot, cree_par=self.manager)
+        self.parent.label = 'Libellé modifié après création'
+        self.parent.save()
+        client = Client()
+        client.login(username='manager', password='pass')
+
+        detail = client.get(reverse('detail_ordre_travail', args=[ot.pk]))
+        execution = client.get(reverse('executer_intervention', args=[ot.pk]))
+
+        self.assertContains(detail, '2 points de contrôle')
+        self.assertContains(execution, 'Boîtier conforme')
+        self.assertContains(execution, 'NON CONFORME')
+        self.assertNotContains(execution, 'Libellé modifié après création')
+
+    def test_pull_data_inclut_les_gammes(self):
+        """pull_data renvoie les gammes figées des OT"""
+        version = publier_version(self.intervention)
+        self._creer_ot()
+        client = APIClient()
+        client.force_authenticate(self.manager)
+
+        data = client.get('/api/mobile/sync/pull_data/').json()
+
+        self.assertIn(str(version.id), data['data']['gammes'])
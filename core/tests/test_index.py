@@ -0,0 +1,26 @@
+# Fichier: core/tests/test_index.py
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from core.models import OrdreDeTravail
+
+
+class BenchmarkIndexTest(TestCase):
+    """
+    Tests de la commande benchmark_index
+    """
+
+    def test_mesure_annulee(self):
+        """La mesure laisse la base intacte : ni données générées, ni index supprimés"""
+        sortie = StringIO()
+        call_command('benchmark_index', nb_ot=200, repetitions=1, sans_plans=True, stdout=sortie)
+
+        self.assertIn('OT en retard', sortie.getvalue())
+        self.assertFalse(OrdreDeTravail.objects.filter(titre__startswith='Bench').exists())
+        with connection.cursor() as cursor:
+            contraintes = connection.introspection.get_constraints(cursor, OrdreDeTravail._meta.db_table)
+        self.assertIn('ot_creation_id_idx', contraintes)
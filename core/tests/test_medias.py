@@ -0,0 +1,370 @@
+# Fichier: core/tests/test_medias.py
+
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.test import TestCase, Client, override_settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import PointDeControle, Reponse, FichierMedia, TeleversementMedia, ContenuMedia
+from core.tests.donnees import creer_execution, creer_utilisateur
+from core.utils.media_processor import traiter_media, traiter_file_attente
+from core.utils.televersement_utils import finaliser_televersement
+
+MEDIA_ROOT_TEST = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT_TEST, ignore_errors=True)
+
+
+def image_jpeg(largeur=1200, hauteur=900, gps=None):
+    """Image JPEG générée, avec coordonnées GPS EXIF optionnelles"""
+    image = Image.new('RGB', (largeur, hauteur), (30, 120, 200))
+    exif = Image.Exif()
+    if gps:
+        ifd = exif.get_ifd(0x8825)
+        ifd.update(gps)
+    sortie = BytesIO()
+    image.save(sortie, format='JPEG', quality=100, exif=exif)
+    return sortie.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT_TEST,
+    GMAO_MEDIA_TRAITEMENT_SYNCHRONE=True,
+    GMAO_MEDIA_VIGNETTES=(160, 480),
+)
+class TraitementMediaTest(TestCase):
+    """
+    Tests du traitement des médias en arrière-plan
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.technicien = creer_utilisateur('tech', 'TECHNICIEN')
+        donnees = creer_execution(self.technicien, nb_points=0, operation='Ouverture', cree_par=self.technicien)
+        self.point = PointDeControle.objects.create(
+            operation=donnees['operation'], label='Photo du boîtier', ordre=1,
+            permettre_photo=True, taille_max_fichier_mb=10
+        )
+        self.ot, self.rapport = donnees['ordre'], donnees['rapport']
+
+        self.client = Client()
+        self.client.login(username='tech', password='pass')
+
+    def _upload(self, contenu):
+        return self.client.post(reverse('upload_media_complete'), {
+            'fichier': SimpleUploadedFile('boitier.jpg', contenu, content_type='image/jpeg'),
+            'point_id': self.point.id,
+            'type_fichier': 'PHOTO',
+            'ordre_travail_id': self.ot.id,
+        })
+
+    def test_upload_stocke_brut_sans_traitement(self):
+        """La requête d'upload ne traite pas l'image"""
+        contenu = image_jpeg()
+
+        response = self._upload(contenu)
+
+        self.assertEqual(response.json()['media']['statut_traitement'], 'EN_ATTENTE')
+        media = FichierMedia.objects.get()
+        self.assertEqual(media.statut_traitement, 'EN_ATTENTE')
+        self.assertEqual(media.fichier.size, len(contenu))
+        self.assertEqual(media.resolution, None)
+        self.assertEqual(media.metadonnees, {})
+
+    def test_traitement_apres_validation(self):
+        """Empreinte, vignettes, GPS EXIF et compression après commit"""
+        contenu = image_jpeg(gps={
+            1: 'N', 2: (48.0, 51.0, 36.0),
+            3: 'W', 4: (1.0, 30.0, 0.0),
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(contenu)
+
+        media = FichierMedia.objects.get()
+        self.assertEqual(media.statut_traitement, 'TERMINE')
+        self.assertTrue(media.traite_automatiquement)
+        self.assertEqual(media.hash_fichier, hashlib.sha256(contenu).hexdigest())
+        self.assertEqual(media.resolution, '1200x900')
+        self.assertAlmostEqual(float(media.latitude_capture), 48.86, places=6)
+        self.assertAlmostEqual(float(media.longitude_capture), -1.5, places=6)
+        self.assertEqual(media.taille_originale, len(contenu))
+        self.assertLess(media.taille_compresse, len(contenu))
+
+        vignettes = media.metadonnees['vignettes']
+        self.assertEqual(set(vignettes), {'160', '480'})
+        with default_storage.open(vignettes['160']) as vignette:
+            self.assertEqual(max(Image.open(vignette).size), 160)
+
+    def test_fichier_illisible_en_erreur(self):
+        """Un fichier qui n'est pas une image passe en ERREUR"""
+        reponse = Reponse.objects.create(rapport_execution=self.rapport, point_de_controle=self.point)
+        media = FichierMedia.objects.create(
+            reponse=reponse, type_fichier='PHOTO', nom_original='faux.jpg',
+            fichier=ContentFile(b'pas une image', name='faux.jpg'), taille_octets=13
+        )
+
+        with self.assertLogs('core.utils.media_processor', 'ERROR'):
+            self.assertEqual(traiter_media(media.id), 'ERREUR')
+        self.assertIsNone(traiter_media(media.id))
+
+    def test_commande_reprend_les_medias_en_attente(self):
+        """traiter_medias traite les médias restés en attente"""
+        self._upload(image_jpeg(200, 100))
+
+        call_command('traiter_medias', stdout=StringIO())
+
+        media = FichierMedia.objects.get()
+        self.assertEqual(media.statut_traitement, 'TERMINE')
+        self.assertEqual(len(media.metadonnees['vignettes']), 2)
+        # Image déjà petite : la compression n'est conservée que si elle réduit le fichier
+        self.assertLessEqual(media.taille_compresse, media.taille_originale)
+
+    def test_file_attente_par_lots(self):
+        """La file est vidée par lots, chaque contenu traité une fois"""
+        contenu = image_jpeg()
+        for _ in range(3):
+            self._upload(contenu)
+        self._upload(image_jpeg(300, 200))
+        lots = []
+
+        totaux = traiter_file_attente(taille_lot=2, processus=1, rapport=lots.append)
+
+        # Le troisième upload identique est terminé par propagation dès le premier lot
+        self.assertEqual([lot['medias'] for lot in lots], [2, 1])
+        self.assertEqual(totaux['medias'], 3)
+        self.assertEqual(totaux['contenus'], 2)
+        self.assertEqual(totaux['erreurs'], 0)
+        self.assertLess(totaux['octets_apres'], totaux['octets_avant'])
+        self.assertFalse(FichierMedia.objects.exclude(statut_traitement='TERMINE').exists())
+        self.assertEqual(len({media.fichier.name for media in FichierMedia.objects.all()}), 2)
+        for contenu_media in ContenuMedia.objects.all():
+            # La version compressée remplace l'original, supprimé
+            self.assertTrue(contenu_media.fichier.name.endswith('_compresse.jpg'))
+            self.assertEqual(len(default_storage.listdir(contenu_media.fichier.name.rsplit('/', 1)[0])[1]), 1)
+
+    def test_file_attente_pool_de_processus(self):
+        """Le travail Pillow s'exécute dans des processus séparés"""
+        self._upload(image_jpeg(gps={1: 'N', 2: (48.0, 51.0, 36.0), 3: 'E', 4: (2.0, 21.0, 0.0)}))
+        self._upload(image_jpeg(640, 480))
+
+        totaux = traiter_file_attente(processus=2)
+
+        self.assertEqual(totaux['medias'], 2)
+        self.assertFalse(FichierMedia.objects.exclude(statut_traitement='TERMINE').exists())
+        media = FichierMedia.objects.exclude(latitude_capture=None).get()
+        self.assertAlmostEqual(float(media.latitude_capture), 48.86, places=6)
+
+    def test_file_attente_adopte_les_medias_historiques(self):
+        """Un média antérieur au stockage par contenu est adopté puis traité"""
+        contenu = image_jpeg()
+        reponse = Reponse.objects.create(rapport_execution=self.rapport, point_de_controle=self.point)
+        media = FichierMedia.objects.create(
+            reponse=reponse, type_fichier='PHOTO', nom_original='ancien.jpg',
+            fichier=ContentFile(contenu, name='ancien.jpg'), taille_octets=len(contenu)
+        )
+        ancien_chemin = media.fichier.path
+        fichier_illisible = FichierMedia.objects.create(
+            reponse=reponse, type_fichier='PHOTO', nom_original='faux.jpg',
+            fichier=ContentFile(b'pas une image', name='faux.jpg'), taille_octets=13
+        )
+
+        with self.assertLogs('core.utils.media_processor', 'WARNING'):
+            totaux = traiter_file_attente(processus=1)
+
+        self.assertEqual(totaux['erreurs'], 1)
+        media.refresh_from_db()
+        self.assertEqual(media.statut_traitement, 'TERMINE')
+        self.assertEqual(media.hash_fichier, hashlib.sha256(contenu).hexdigest())
+        self.assertFalse(os.path.exists(ancien_chemin))
+        fichier_illisible.refresh_from_db()
+        self.assertEqual(fichier_illisible.statut_traitement, 'ERREUR')
+
+    def test_commande_affiche_les_metriques_par_lot(self):
+        """traiter_medias rend compte de chaque lot"""
+        for largeur in (200, 300, 400):
+            self._upload(image_jpeg(largeur, 100))
+        sortie = StringIO()
+
+        call_command('traiter_medias', lot=2, processus=1, stdout=sortie)
+
+        lignes = sortie.getvalue().splitlines()
+        self.assertEqual(len([ligne for ligne in lignes if ligne.startswith('Lot ')]), 2)
+        self.assertIn('3 média(s) traité(s), 0 en erreur', lignes[-1])
+
+    def test_suppression_efface_les_vignettes(self):
+        """Les vignettes sont supprimées avec le média"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(image_jpeg())
+        media = FichierMedia.objects.get()
+        vignettes = list(media.metadonnees['vignettes'].values())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            media.delete()
+
+        self.assertFalse(any(default_storage.exists(chemin) for chemin in vignettes))
+
+    def test_contenu_identique_stocke_et_traite_une_fois(self):
+        """Deux uploads identiques partagent fichier, vignettes et traitement"""
+        contenu = image_jpeg()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(contenu)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self._upload(contenu)
+
+        # Contenu déjà traité : le second média est terminé sans traitement
+        self.assertEqual(len(callbacks), 0)
+        premier, second = FichierMedia.objects.order_by('id')
+        self.assertEqual(second.statut_traitement, 'TERMINE')
+        self.assertEqual(premier.fichier.name, second.fichier.name)
+        self.assertEqual(premier.metadonnees, second.metadonnees)
+        stocke = ContenuMedia.objects.get()
+        self.assertEqual(stocke.nb_references, 2)
+
+    def test_fichier_supprime_avec_la_derniere_reference(self):
+        """Supprimer un média ne supprime pas le fichier encore référencé"""
+        contenu = image_jpeg()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(contenu)
+            self._upload(contenu)
+        premier, second = FichierMedia.objects.order_by('id')
+        nom = premier.fichier.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('delete_media_ajax', args=[premier.id]))
+        self.assertTrue(response.json()['success'])
+        self.assertTrue(default_storage.exists(nom))
+        self.assertEqual(ContenuMedia.objects.get().nb_references, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('delete_media_ajax', args=[second.id]))
+        self.assertFalse(default_storage.exists(nom))
+        self.assertFalse(ContenuMedia.objects.exists())
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT_TEST,
+    GMAO_MEDIA_TRAITEMENT_SYNCHRONE=True,
+    GMAO_UPLOAD_CHUNK_SIZE=1000,
+)
+class TeleversementReprenableTest(TestCase):
+    """
+    Tests des uploads reprenables en plusieurs morceaux
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        technicien = creer_utilisateur('tech')
+        donnees = creer_execution(technicien, nb_points=0, operation='Ouverture', cree_par=technicien)
+        point = PointDeControle.objects.create(
+            operation=donnees['operation'], label='Vidéo de l\'épissure', ordre=1, permettre_video=True
+        )
+        self.reponse = Reponse.objects.create(rapport_execution=donnees['rapport'], point_de_controle=point)
+
+        self.contenu = bytes(range(256)) * 10  # 2560 octets : 3 morceaux
+        self.client = APIClient()
+        self.client.force_authenticate(technicien)
+
+    def _initialiser(self, **donnees):
+        return self.client.post('/api/mobile/televersements/', dict({
+            'reponse_id': self.reponse.id,
+            'nom_fichier': 'epissure.mp4',
+            'taille': len(self.contenu),
+            'type_fichier': 'VIDEO',
+            'sha256': hashlib.sha256(self.contenu).hexdigest(),
+        }, **donnees), format='json')
+
+    def _envoyer(self, upload_id, index):
+        morceau = self.contenu[index * 1000:(index + 1) * 1000]
+        return self.client.put(
+            f'/api/mobile/televersements/{upload_id}/morceaux/{index}/',
+            morceau, content_type='application/octet-stream'
+        )
+
+    def test_upload_repris_apres_coupure(self):
+        """Seuls les morceaux manquants sont renvoyés, dans n'importe quel ordre"""
+        upload_id = self._initialiser().json()['upload_id']
+        self._envoyer(upload_id, 2)
+        self._envoyer(upload_id, 0)
+
+        etat = self.client.get(f'/api/mobile/televersements/{upload_id}/').json()
+        self.assertEqual(etat['nb_morceaux'], 3)
+        self.assertEqual(etat['morceaux_recus'], [0, 2])
+
+        incomplet = self.client.post(f'/api/mobile/televersements/{upload_id}/finaliser/')
+        self.assertEqual(incomplet.status_code, 400)
+
+        self._envoyer(upload_id, 1)
+        response = self.client.post(f'/api/mobile/televersements/{upload_id}/finaliser/')
+
+        self.assertEqual(response.status_code, 201)
+        media = FichierMedia.objects.get(pk=response.json()['media']['id'])
+        with media.fichier.open('rb') as fichier:
+            self.assertEqual(fichier.read(), self.contenu)
+        self.assertEqual(media.hash_fichier, hashlib.sha256(self.contenu).hexdigest())
+        self.assertEqual(TeleversementMedia.objects.get(pk=upload_id).statut, 'TERMINE')
+
+    def test_morceau_de_taille_incorrecte_refuse(self):
+        """Un morceau tronqué n'est pas considéré comme reçu"""
+        upload_id = self._initialiser().json()['upload_id']
+
+        response = self.client.put(
+            f'/api/mobile/televersements/{upload_id}/morceaux/0/',
+            self.contenu[:10], content_type='application/octet-stream'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        etat = self.client.get(f'/api/mobile/televersements/{upload_id}/').json()
+        self.assertEqual(etat['morceaux_recus'], [])
+
+    def test_empreinte_differente_refusee(self):
+        """Le fichier assemblé doit correspondre au SHA-256 annoncé"""
+        upload_id = self._initialiser(sha256='0' * 64).json()['upload_id']
+        for index in range(3):
+            self._envoyer(upload_id, index)
+
+        response = self.client.post(f'/api/mobile/televersements/{upload_id}/finaliser/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(FichierMedia.objects.exists())
+
+    def test_doublon_detecte_par_empreinte(self):
+        """Un contenu déjà attaché à la réponse n'est pas renvoyé"""
+        upload_id = self._initialiser().json()['upload_id']
+        for index in range(3):
+            self._envoyer(upload_id, index)
+        media_id = self.client.post(f'/api/mobile/televersements/{upload_id}/finaliser/').json()['media']['id']
+
+        response = self._initialiser()
+
+        self.assertTrue(response.json()['doublon'])
+        self.assertEqual(response.json()['media']['id'], media_id)
+        self.assertEqual(TeleversementMedia.objects.count(), 1)
+
+    def test_finalisation_concurrente_un_seul_media(self):
+        """Une finalisation lancée sur un état périmé renvoie le média déjà créé"""
+        upload_id = self._initialiser().json()['upload_id']
+        for index in range(3):
+            self._envoyer(upload_id, index)
+        # État lu avant que la première finalisation ne s'achève
+        perime = TeleversementMedia.objects.get(pk=upload_id)
+        premiere = self.client.post(f'/api/mobile/televersements/{upload_id}/finaliser/')
+
+        media, doublon = finaliser_televersement(perime)
+
+        self.assertEqual(premiere.status_code, 201)
+        self.assertEqual(media.id, premiere.json()['media']['id'])
+        self.assertFalse(doublon)
+        self.assertEqual(FichierMedia.objects.count(), 1)
@@ -0,0 +1,74 @@
+# Fichier: core/tests/test_numerotation.py
+
+from importlib import import_module
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import DemandeReparation, SequenceNumero
+from core.tests.donnees import creer_execution, creer_utilisateur
+
+
+class NumerotationDemandesTest(TestCase):
+    """
+    Tests de la numérotation des demandes de réparation par séquence annuelle
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.technicien = creer_utilisateur('technicien')
+        donnees = creer_execution(self.technicien)
+        self.point, self.ordre = donnees['points'][0], donnees['ordre']
+        self.annee = timezone.now().year
+
+    def _creer_demande(self):
+        return DemandeReparation.objects.create(
+            ordre_de_travail=self.ordre, point_de_controle=self.point,
+            titre='Boîtier cassé', description='À remplacer', cree_par=self.technicien
+        )
+
+    def test_numeros_consecutifs(self):
+        """Numéros consécutifs, sans doublon après suppression d'une demande"""
+        demandes = [self._creer_demande() for _ in range(3)]
+        self.assertEqual(
+            [demande.numero_demande for demande in demandes],
+            [f'DR-{self.annee}-{numero:03d}' for numero in (1, 2, 3)]
+        )
+
+        # L'ancien comptage redonnait ici le numéro de la dernière demande
+        demandes[0].delete()
+        self.assertEqual(self._creer_demande().numero_demande, f'DR-{self.annee}-004')
+
+    def test_cout_constant(self):
+        """Le nombre de requêtes ne dépend pas du nombre de demandes de l'année"""
+        self._creer_demande()
+        SequenceNumero.objects.filter(prefixe='DR', annee=self.annee).update(dernier=5000)
+        with CaptureQueriesContext(connection) as requetes:
+            demande = self._creer_demande()
+        self.assertEqual(demande.numero_demande, f'DR-{self.annee}-5001')
+        self.assertFalse([
+            requete['sql'] for requete in requetes.captured_queries
+            if 'COUNT' in requete['sql'] and 'core_demandereparation' in requete['sql']
+        ])
+
+        # Réservation : une mise à jour et une lecture (plus les points de sauvegarde)
+        with self.assertNumQueries(4):
+            self.assertEqual(SequenceNumero.suivant('DR', self.annee), 5002)
+
+    def test_sequences_par_annee(self):
+        self.assertEqual(SequenceNumero.suivant('DR', 2020), 1)
+        self.assertEqual(SequenceNumero.suivant('DR', 2021), 1)
+        self.assertEqual(SequenceNumero.suivant('DR', 2020), 2)
+
+    def test_reprise_des_numeros_existants(self):
+        """La migration reprend le plus grand numéro attribué de chaque année"""
+        self._creer_demande()
+        DemandeReparation.objects.update(numero_demande='DR-2024-017')
+        SequenceNumero.objects.all().delete()
+
+        migration = import_module('core.migrations.0020_sequence_numero')
+        migration.initialiser_sequences(apps, None)
+        self.assertEqual(SequenceNumero.suivant('DR', 2024), 18)
@@ -0,0 +1,124 @@
+# Fichier: core/tests/test_pagination.py
+
+from datetime import timedelta
+
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.filters import OrderingFilter
+from rest_framework.test import APIClient
+
+from core.api_views_mobile import FichierMediaMobileViewSet, ReponseMobileViewSet
+from core.models import OrdreDeTravail, Reponse
+from core.tests.donnees import creer_asset, creer_execution, creer_intervention, creer_ordre, creer_utilisateur
+from core.utils.pagination import compter, paginer
+
+
+class PaginationCurseurTest(TestCase):
+    """
+    Tests de la pagination par clé (date_creation, id)
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.manager = creer_utilisateur('manager', 'MANAGER')
+        intervention, asset = creer_intervention(), creer_asset()
+
+        # Dates en partie identiques : l'id départage
+        maintenant = timezone.now()
+        self.ordres = [
+            creer_ordre(
+                intervention, asset, titre=f'OT {i}', cree_par=self.manager,
+                date_prevue_debut=maintenant, date_creation=maintenant - timedelta(hours=i // 2)
+            )
+            for i in range(7)
+        ]
+        self.attendu = [ot.pk for ot in sorted(self.ordres, key=lambda ot: (ot.date_creation, ot.pk), reverse=True)]
+
+    def test_parcours_complet(self):
+        """Pages suivantes puis précédentes, sans doublon ni oubli"""
+        queryset = OrdreDeTravail.objects.all()
+        pages = [paginer(queryset, None, 3)]
+        while pages[-1].has_next:
+            pages.append(paginer(queryset, pages[-1].curseur_suivant, 3))
+
+        self.assertEqual([ot.pk for page in pages for ot in page], self.attendu)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous)
+
+        retour = paginer(queryset, pages[-1].curseur_precedent, 3)
+        self.assertEqual([ot.pk for ot in retour], self.attendu[3:6])
+        self.assertTrue(retour.has_previous)
+        retour = paginer(queryset, retour.curseur_precedent, 3)
+        self.assertEqual([ot.pk for ot in retour], self.attendu[:3])
+        self.assertFalse(retour.has_previous)
+
+    def test_page_profonde_sans_offset(self):
+        """Une page lointaine est lue en une requête, sans OFFSET ni COUNT"""
+        premiere = paginer(OrdreDeTravail.objects.all(), None, 5)
+        with self.assertNumQueries(1) as requetes:
+            paginer(OrdreDeTravail.objects.all(), premiere.curseur_suivant, 5)
+        sql = requetes.captured_queries[0]['sql'].upper()
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT', sql)
+
+    def test_curseur_invalide(self):
+        with self.assertRaises(ValueError):
+            paginer(OrdreDeTravail.objects.all(), 'pas-un-curseur', 3)
+
+    def test_compte_plafonne(self):
+        """Le total est exact sous le plafond, borné au-delà"""
+        self.assertEqual(compter(OrdreDeTravail.objects.all(), plafond=10), (7, True))
+        self.assertEqual(compter(OrdreDeTravail.objects.all(), plafond=5), (5, False))
+
+    def test_api_mobile(self):
+        """L'API suit les liens next et rend le total sur demande"""
+        client = APIClient()
+        client.force_authenticate(self.manager)
+
+        reponse = client.get('/api/mobile/ordres-travail/', {'page_size': 4, 'count': 1}).json()
+        self.assertEqual(reponse['count'], 7)
+        self.assertTrue(reponse['count_exact'])
+        self.assertIsNone(reponse['previous'])
+        ids = [ot['id'] for ot in reponse['results']]
+
+        reponse = client.get(reponse['next']).json()
+        ids += [ot['id'] for ot in reponse['results']]
+        self.assertIsNone(reponse['next'])
+        self.assertEqual(reponse['count'], 7)  # paramètres conservés dans les liens
+        self.assertEqual(ids, self.attendu)
+
+        self.assertEqual(client.get('/api/mobile/ordres-travail/', {'cursor': 'xyz'}).status_code, 404)
+
+    def test_ordre_impose_par_la_cle(self):
+        """Réponses et médias ne proposent pas ?ordering=, que la pagination écraserait"""
+        for vue in (ReponseMobileViewSet, FichierMediaMobileViewSet):
+            self.assertNotIn(OrderingFilter, vue.filter_backends)
+
+        donnees = creer_execution(self.manager, nb_points=3)
+        reponses = [
+            Reponse.objects.create(rapport_execution=donnees['rapport'], point_de_controle=point, valeur='OK')
+            for point in donnees['points']
+        ]
+        client = APIClient()
+        client.force_authenticate(self.manager)
+
+        reponse = client.get('/api/mobile/reponses/', {'rapport_id': donnees['rapport'].pk, 'ordering': 'id'})
+
+        self.assertEqual(
+            [r['id'] for r in reponse.json()['results']],
+            [r.pk for r in sorted(reponses, key=lambda r: (r.date_reponse, r.pk), reverse=True)]
+        )
+
+    @override_settings(GMAO_COMPTE_PLAFOND=5)
+    def test_liste_html(self):
+        """La liste des OT pagine par curseur et plafonne le total"""
+        client = Client()
+        client.login(username='manager', password='pass')
+
+        response = client.get(reverse('liste_ordres_travail'))
+        page = response.context['ordres_page']
+        self.assertEqual([ot.pk for ot in page], self.attendu[:10])
+        self.assertEqual(response.context['nb_ordres'], 5)
+        self.assertFalse(response.context['nb_ordres_exact'])
+        self.assertContains(response, 'Plus de 5 ordres de travail')
@@ -0,0 +1,242 @@
+# Fichier: core/tests/test_rapports_pdf.py
+
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.test import TestCase, Client, override_settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Operation, PointDeControle, RapportExecution, Reponse, FichierMedia
+from core.tests.donnees import (
+    creer_asset, creer_execution, creer_intervention, creer_ordre, creer_points, creer_utilisateur
+)
+from core.utils.rapport_pdf import (
+    chemin_pdf, contexte_rapport, generer_pdf_rapport, pdf_disponible, pdf_en_cache
+)
+
+PDF_ROOT_TEST = tempfile.mkdtemp()
+MEDIA_ROOT_TEST = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(PDF_ROOT_TEST, ignore_errors=True)
+    shutil.rmtree(MEDIA_ROOT_TEST, ignore_errors=True)
+
+
+@override_settings(
+    GMAO_RAPPORTS_PDF_ROOT=PDF_ROOT_TEST,
+    MEDIA_ROOT=MEDIA_ROOT_TEST,
+    GMAO_PDF_GENERATION_SYNCHRONE=True,
+)
+class RapportPdfTest(TestCase):
+    """
+    Tests du rendu PDF des rapports et de son cache disque
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.technicien = creer_utilisateur('tech', 'TECHNICIEN')
+        donnees = creer_execution(self.technicien, nb_points=0, operation='Ouverture', cree_par=self.technicien)
+        self.points = creer_points(donnees['operation'], 3, debut=1)
+        self.ot, self.rapport = donnees['ordre'], donnees['rapport']
+
+        self.client = Client()
+        self.client.login(username='tech', password='pass')
+
+    def _repondre(self, point, nb_photos=0):
+        reponse = Reponse.objects.create(rapport_execution=self.rapport, point_de_controle=point, valeur='OK')
+        for i in range(nb_photos):
+            FichierMedia.objects.create(
+                reponse=reponse, type_fichier='PHOTO', nom_original=f'photo{i}.jpg',
+                fichier=ContentFile(b'photo', name=f'photo{i}.jpg'), taille_octets=5
+            )
+        return reponse
+
+    def _finaliser(self):
+        self.rapport.statut_rapport = 'FINALISE'
+        self.rapport.save()
+
+    def test_contexte_en_requetes_constantes(self):
+        """Réponses, médias et compteurs en un nombre fixe de requêtes"""
+        self._repondre(self.points[0], nb_photos=2)
+        with self.assertNumQueries(3):
+            contexte = contexte_rapport(self.rapport)
+
+        self._repondre(self.points[1], nb_photos=3)
+        self._repondre(self.points[2])
+        with self.assertNumQueries(3):
+            contexte = contexte_rapport(self.rapport)
+
+        self.assertEqual([r['nb_photos'] for r in contexte['reponses_avec_medias']], [2, 3, 0])
+
+    def test_pdf_servi_depuis_le_disque(self):
+        """Un rapport finalisé déjà rendu est servi sans nouveau rendu"""
+        self._finaliser()
+        chemin = chemin_pdf(self.rapport)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        with open(chemin, 'wb') as pdf:
+            pdf.write(b'%PDF-1.7 en cache')
+
+        response = self.client.get(reverse('export_rapport_pdf', args=[self.rapport.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.7 en cache')
+        self.assertIn('rapport_moderne_OT_', response['Content-Disposition'])
+
+    def test_cache_lie_a_la_version_du_rapport(self):
+        """Toute modification du rapport invalide le PDF rendu"""
+        self._finaliser()
+        chemin = chemin_pdf(self.rapport)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        open(chemin, 'wb').close()
+        self.assertEqual(pdf_en_cache(self.rapport), chemin)
+
+        self.rapport.commentaire_global = 'Complément'
+        self.rapport.save()
+
+        self.assertNotEqual(chemin_pdf(self.rapport), chemin)
+        self.assertIsNone(pdf_en_cache(self.rapport))
+
+    def test_pas_de_cache_pour_un_brouillon(self):
+        """Un rapport non finalisé n'est jamais servi depuis le cache"""
+        chemin = chemin_pdf(self.rapport)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        open(chemin, 'wb').close()
+
+        self.assertIsNone(pdf_en_cache(self.rapport))
+        self.assertIsNone(generer_pdf_rapport(self.rapport.pk))
+
+    @skipUnless(pdf_disponible(), "WeasyPrint indisponible")
+    def test_rendu_a_la_finalisation(self):
+        """La finalisation rend le PDF, une seule fois par version"""
+        self._repondre(self.points[0], nb_photos=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._finaliser()
+
+        chemin = pdf_en_cache(self.rapport)
+        self.assertIsNotNone(chemin)
+        with open(chemin, 'rb') as pdf:
+            self.assertTrue(pdf.read().startswith(b'%PDF'))
+        date_rendu = os.path.getmtime(chemin)
+        self.assertEqual(generer_pdf_rapport(self.rapport.pk), chemin)
+        self.assertEqual(os.path.getmtime(chemin), date_rendu)
+
+
+@override_settings(
+    GMAO_RAPPORTS_PDF_ROOT=PDF_ROOT_TEST,
+    MEDIA_ROOT=MEDIA_ROOT_TEST,
+    GMAO_PDF_GENERATION_SYNCHRONE=True,
+    GMAO_EXPORT_ZIP_BLOCK_SIZE=4,
+)
+class ExportRapportsZipTest(TestCase):
+    """
+    Tests de l'export groupé des rapports en ZIP diffusé en flux
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.manager = creer_utilisateur('manager', 'MANAGER')
+        self.technicien = creer_utilisateur('tech', 'TECHNICIEN')
+
+        self.asset = creer_asset()
+        self.intervention = creer_intervention()
+        operation = Operation.objects.create(intervention=self.intervention, nom='Ouverture', ordre=1)
+        self.point = PointDeControle.objects.create(operation=operation, label='Photo', ordre=1)
+
+        self.rapports = [self._rapport('INSPECTION'), self._rapport('CORRECTIVE')]
+
+        self.client = Client()
+        self.client.login(username='manager', password='pass')
+
+    def _rapport(self, type_ot):
+        ot = creer_ordre(self.intervention, self.asset, cree_par=self.manager, type_OT=type_ot)
+        rapport = RapportExecution.objects.create(
+            ordre_de_travail=ot, cree_par=self.manager, statut_rapport='FINALISE',
+            date_execution_fin=timezone.now()
+        )
+        reponse = Reponse.objects.create(rapport_execution=rapport, point_de_controle=self.point)
+        FichierMedia.objects.create(
+            reponse=reponse, type_fichier='PHOTO', nom_original='boîtier ouvert.jpg',
+            fichier=ContentFile(b'photo du boitier', name='boitier.jpg'), taille_octets=16
+        )
+        chemin = chemin_pdf(rapport)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        with open(chemin, 'wb') as pdf:
+            pdf.write(f'%PDF rapport {rapport.pk}'.encode())
+        return rapport
+
+    def _archive(self, response):
+        return zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+
+    def test_archive_diffusee_en_flux(self):
+        """PDF et médias de chaque rapport, archive produite par blocs"""
+        response = self.client.get(reverse('export_rapports_zip'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        blocs = list(response.streaming_content)
+        self.assertGreater(len(blocs), 4)  # au moins un bloc par fichier
+        archive = zipfile.ZipFile(BytesIO(b''.join(blocs)))
+        self.assertIsNone(archive.testzip())
+
+        rapport = self.rapports[0]
+        dossier = f"OT_{rapport.ordre_de_travail_id}"
+        self.assertEqual(archive.read(f"{dossier}/rapport_{dossier}.pdf"), f'%PDF rapport {rapport.pk}'.encode())
+        media = FichierMedia.objects.filter(reponse__rapport_execution=rapport).get()
+        self.assertEqual(archive.read(f"{dossier}/medias/{media.pk}_boîtier_ouvert.jpg"), b'photo du boitier')
+        self.assertEqual(len(archive.namelist()), 4)
+
+    def test_filtre(self):
+        """Seuls les rapports du filtre sont exportés"""
+        response = self.client.get(reverse('export_rapports_zip'), {'type_ot': 'CORRECTIVE'})
+
+        noms = self._archive(response).namelist()
+        self.assertEqual({nom.split('/')[0] for nom in noms}, {f"OT_{self.rapports[1].ordre_de_travail_id}"})
+
+        response = self.client.get(reverse('export_rapports_zip'), {'debut': '2020-13-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+
+    def test_elements_manquants_signales(self):
+        """Un média illisible est listé au lieu d'interrompre l'archive"""
+        media = FichierMedia.objects.filter(reponse__rapport_execution=self.rapports[0]).get()
+        os.remove(media.fichier.path)
+
+        archive = self._archive(self.client.get(reverse('export_rapports_zip')))
+
+        self.assertIn(f"média {media.pk}", archive.read('ELEMENTS_MANQUANTS.txt').decode())
+        self.assertEqual(len(archive.namelist()), 4)
+
+    def test_pdf_supprime_pendant_l_export(self):
+        """Un PDF remplacé entre sa vérification et sa lecture est listé comme manquant"""
+        with mock.patch('core.utils.export_rapports._chemin_pdf', return_value='/inexistant/rapport.pdf'):
+            archive = self._archive(self.client.get(reverse('export_rapports_zip')))
+
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.read('ELEMENTS_MANQUANTS.txt').decode().count('PDF du rapport indisponible'), 2)
+        self.assertEqual(len(archive.namelist()), 3)
+
+    def test_reserve_aux_managers(self):
+        """Un technicien n'a pas accès à l'export groupé"""
+        self.client.login(username='tech', password='pass')
+
+        response = self.client.get(reverse('export_rapports_zip'))
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_commande(self):
+        """La commande écrit la même archive sur disque"""
+        sortie = os.path.join(PDF_ROOT_TEST, 'export.zip')
+
+        call_command('exporter_rapports_zip', sortie, type_ot='INSPECTION', stdout=StringIO())
+
+        with zipfile.ZipFile(sortie) as archive:
+            self.assertEqual(len(archive.namelist()), 2)
@@ -0,0 +1,154 @@
+# Fichier: core/tests/test_recherche.py
+
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.urls import reverse
+
+from core.models import Asset, DemandeReparation, FichierMedia, IndexRecherche, Reponse
+from core.tests.donnees import (
+    creer_asset, creer_execution, creer_intervention, creer_ordre, creer_utilisateur
+)
+from core.utils.recherche import filtrer, identifiants, normaliser
+
+MEDIA_ROOT_TEST = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT_TEST, ignore_errors=True)
+
+
+class IndexRechercheTest(TestCase):
+    """
+    Tests de l'index de recherche plein texte
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.manager = creer_utilisateur('manager', 'MANAGER')
+
+        self.asset = creer_asset('Équipement Fibre Élysée', reference='PB-00123', latitude=48.87, longitude=2.31)
+        self.autre_asset = creer_asset('Armoire Lyon', reference='SRO-7', latitude=None, longitude=None)
+        self.intervention = creer_intervention('Raccordement', description='Soudure des fibres')
+        self.ot = creer_ordre(self.intervention, self.asset, titre='Remplacement cassette', cree_par=self.manager)
+
+        self.client = Client()
+        self.client.login(username='manager', password='pass')
+
+    def test_normalisation(self):
+        """Minuscules, accents et ponctuation retirés"""
+        self.assertEqual(normaliser('Équipement PB-00123 (Élysée)'), 'equipement pb 00123 elysee')
+
+    def test_prefixes_sans_accents(self):
+        """Début de mot, sans tenir compte des accents ni de la casse"""
+        self.assertEqual(identifiants('asset', 'equip', 10), [self.asset.pk])
+        self.assertEqual(identifiants('asset', 'ÉLYS', 10), [self.asset.pk])
+        self.assertEqual(identifiants('asset', 'pb-001', 10), [self.asset.pk])
+        self.assertEqual(identifiants('asset', 'fibre lyon', 10), [])
+        self.assertEqual(identifiants('asset', 'ipement', 10), [])
+
+    def test_ot_par_asset_intervention_et_numero(self):
+        """Un OT se trouve par son titre, son asset, son intervention ou son numéro"""
+        for requete in ('cassette', 'elysee', 'raccord', f'OT-{self.ot.pk}'):
+            self.assertEqual(identifiants('ot', requete, 5), [self.ot.pk], requete)
+
+    def test_index_tenu_a_jour(self):
+        """Modification, renommage d'un asset repris par ses OT, suppression"""
+        entree = IndexRecherche.objects.get(type_objet='ot', objet_id=self.ot.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.asset.nom = 'Chambre Montparnasse'
+            self.asset.save()
+
+        self.assertEqual(identifiants('asset', 'montparnasse', 5), [self.asset.pk])
+        self.assertEqual(identifiants('asset', 'elysee', 5), [])
+        self.assertEqual(identifiants('ot', 'montparnasse', 5), [self.ot.pk])
+        # Ligne réécrite en place : même rang dans la saisie semi-automatique
+        self.assertEqual(IndexRecherche.objects.get(type_objet='ot', objet_id=self.ot.pk).pk, entree.pk)
+
+        self.ot.delete()
+        self.assertEqual(identifiants('ot', 'cassette', 5), [])
+        self.assertFalse(IndexRecherche.objects.filter(type_objet='ot').exists())
+
+    def test_enregistrement_sans_changement(self):
+        """Un enregistrement qui ne change pas le texte n'écrit pas dans l'index"""
+        with CaptureQueriesContext(connection) as requetes:
+            self.asset.statut = 'EN_PANNE'
+            self.asset.save()
+        self.assertFalse([
+            requete['sql'] for requete in requetes.captured_queries
+            if 'core_indexrecherche' in requete['sql'] and not requete['sql'].startswith('SELECT')
+        ])
+
+    def test_filtre_combinable(self):
+        """Le filtre s'ajoute aux autres conditions du QuerySet"""
+        assets = filtrer(Asset.objects.filter(categorie__nom='PB'), 'asset', 'armoire')
+        self.assertEqual(list(assets), [self.autre_asset])
+        self.assertEqual(filtrer(Asset.objects.all(), 'asset', '  ').count(), 2)
+
+    def test_recherche_globale(self):
+        """La recherche globale interroge l'index de chaque type"""
+        response = self.client.get(reverse('recherche_globale'), {'q': 'fibre'})
+
+        types = {(r['type'], r['id']) for r in response.json()['results']}
+        self.assertEqual(types, {
+            ('ordre_travail', self.ot.pk), ('asset', self.asset.pk), ('intervention', self.intervention.pk)
+        })
+
+    @override_settings(MEDIA_ROOT=MEDIA_ROOT_TEST)
+    def test_recherche_globale_restreinte_aux_ot_visibles(self):
+        """Un technicien ne trouve que les demandes et médias de ses OT"""
+        technicien = creer_utilisateur('tech', 'TECHNICIEN')
+        resultats_attendus = set()
+        for intervenant in (technicien, creer_utilisateur('autre', 'TECHNICIEN')):
+            donnees = creer_execution(intervenant)
+            point = donnees['points'][0]
+            demande = DemandeReparation.objects.create(
+                ordre_de_travail=donnees['ordre'], point_de_controle=point,
+                titre='Fibre coupée', description='À ressouder', cree_par=intervenant
+            )
+            reponse = Reponse.objects.create(rapport_execution=donnees['rapport'], point_de_controle=point)
+            media = FichierMedia.objects.create(
+                reponse=reponse, type_fichier='PHOTO', nom_original='fibre.jpg',
+                fichier=ContentFile(b'photo', name='fibre.jpg'), taille_octets=5
+            )
+            if intervenant == technicien:
+                resultats_attendus = {('demande_reparation', demande.pk), ('media', media.pk)}
+
+        client = Client()
+        client.login(username='tech', password='pass')
+        response = client.get(reverse('recherche_globale'), {'q': 'fibre'})
+
+        types = {
+            (r['type'], r['id']) for r in response.json()['results']
+            if r['type'] in ('demande_reparation', 'media')
+        }
+        self.assertEqual(types, resultats_attendus)
+
+        # Le gestionnaire voit tout
+        response = self.client.get(reverse('recherche_globale'), {'q': 'fibre'})
+        self.assertEqual(
+            sum(r['type'] in ('demande_reparation', 'media') for r in response.json()['results']), 4
+        )
+
+    def test_liste_ordres_travail(self):
+        """La liste des OT filtre par l'index"""
+        response = self.client.get(reverse('liste_ordres_travail'), {'search': 'soudure'})
+        self.assertEqual(list(response.context['ordres_page']), [])
+
+        response = self.client.get(reverse('liste_ordres_travail'), {'search': 'Élysée'})
+        self.assertEqual([ot.pk for ot in response.context['ordres_page']], [self.ot.pk])
+
+    def test_reindexation(self):
+        """La commande rattrape les mises à jour en masse"""
+        Asset.objects.filter(pk=self.autre_asset.pk).update(nom='Armoire Marseille')
+        self.assertEqual(identifiants('asset', 'marseille', 5), [])
+
+        call_command('reindexer_recherche', stdout=StringIO())
+
+        self.assertEqual(identifiants('asset', 'marseille', 5), [self.autre_asset.pk])
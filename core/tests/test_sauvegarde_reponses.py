@@ -0,0 +1,78 @@
+# Fichier: core/tests/test_sauvegarde_reponses.py
+
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from core.models import Reponse
+from core.tests.donnees import creer_execution, creer_utilisateur
+from core.utils.sauvegarde_reponses import sauvegarder_reponses
+
+
+class SauvegardeReponsesTest(TestCase):
+    """
+    Tests de la sauvegarde automatique des réponses (écritures groupées et version)
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.technicien = creer_utilisateur('technicien', 'TECHNICIEN')
+        donnees = creer_execution(self.technicien, nb_points=20)
+        self.points, self.ordre, self.rapport = donnees['points'], donnees['ordre'], donnees['rapport']
+
+    def _valeurs(self, valeur):
+        return {point.pk: valeur for point in self.points}
+
+    def test_requetes_constantes(self):
+        """Création puis mise à jour de 20 réponses en un nombre fixe de requêtes"""
+        with self.assertNumQueries(7):
+            resultat = sauvegarder_reponses(self.rapport, self._valeurs('OK'), self.technicien)
+        self.assertEqual((resultat['crees'], resultat['modifiees'], resultat['version']), (20, 0, 1))
+
+        valeurs = self._valeurs('OK')
+        valeurs[self.points[3].pk] = 'NOK'
+        with self.assertNumQueries(7):
+            resultat = sauvegarder_reponses(self.rapport, valeurs, self.technicien)
+        self.assertEqual((resultat['crees'], resultat['modifiees'], resultat['version']), (0, 1, 2))
+        self.assertEqual(Reponse.objects.get(point_de_controle=self.points[3]).valeur, 'NOK')
+
+    def test_sauvegarde_sans_changement(self):
+        """Un formulaire inchangé n'écrit rien et garde la version"""
+        sauvegarder_reponses(self.rapport, self._valeurs('OK'), self.technicien)
+        with self.assertNumQueries(5):
+            resultat = sauvegarder_reponses(self.rapport, self._valeurs('OK'), self.technicien, version_client=1)
+        self.assertEqual(resultat['crees'] + resultat['modifiees'], 0)
+        self.assertEqual(resultat['version'], 1)
+        self.assertFalse(resultat['modifie_ailleurs'])
+
+        resultat = sauvegarder_reponses(self.rapport, {}, self.technicien, version_client=0)
+        self.assertTrue(resultat['modifie_ailleurs'])
+
+    def test_points_inconnus_et_vides(self):
+        resultat = sauvegarder_reponses(
+            self.rapport, {self.points[0].pk: '', 999999: 'OK'}, self.technicien, ignorer_vides=True
+        )
+        self.assertEqual(resultat['ignorees'], 2)
+        self.assertEqual(resultat['version'], 0)
+        self.assertFalse(Reponse.objects.exists())
+
+    def test_vues(self):
+        """La sauvegarde AJAX de l'exécution renvoie la version du rapport"""
+        client = Client()
+        client.login(username='technicien', password='pass')
+        url = reverse('executer_intervention', args=[self.ordre.pk])
+        formulaire = {f'point_{point.pk}': 'OK' for point in self.points[:5]}
+
+        donnees = client.post(
+            url, {'action': 'sauvegarder_reponses', **formulaire, 'version': 0},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        ).json()
+        self.assertEqual(donnees['version'], 1)
+        self.assertFalse(donnees['modifie_ailleurs'])
+
+        donnees = client.post(
+            url, {'action': 'sauvegarder_reponses', **formulaire, f'point_{self.points[0].pk}': 'NOK', 'version': 1},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        ).json()
+        self.assertEqual(donnees['version'], 2)
+        self.assertEqual(Reponse.objects.get(point_de_controle=self.points[0]).valeur, 'NOK')
+        self.assertEqual(Reponse.objects.count(), 5)
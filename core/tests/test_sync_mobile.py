@@ -0,0 +1,473 @@
+# Fichier: core/tests/test_sync_mobile.py
+
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import (
+    Asset, Intervention, Operation, PointDeControle,
+    OrdreDeTravail, StatutWorkflow, Equipe, ElementSupprime,
+    RapportExecution, Reponse, FichierMedia, DemandeReparation
+)
+from core.tests.donnees import (
+    creer_asset, creer_execution, creer_intervention, creer_ordre, creer_points, creer_utilisateur
+)
+
+
+class PullDataDeltaTest(TestCase):
+    """
+    Tests de la synchronisation différentielle mobile (pull_data)
+    """
+
+    url = '/api/mobile/sync/pull_data/'
+
+    def setUp(self):
+        """Création des données de test"""
+        self.technicien = creer_utilisateur('tech')
+        self.autre = creer_utilisateur('autre')
+        self.client = APIClient()
+        self.client.force_authenticate(self.technicien)
+
+        self.asset = creer_asset()
+        self.intervention = creer_intervention(statut='VALIDATED')
+        self.operation = Operation.objects.create(intervention=self.intervention, nom='Ouverture', ordre=1)
+        self.point = PointDeControle.objects.create(
+            operation=self.operation, label='Photo', type_champ='TEXT', ordre=1
+        )
+        statut = StatutWorkflow.objects.create(nom='PLANIFIE')
+
+        def creer_ot(titre, technicien=None, **kwargs):
+            return creer_ordre(self.intervention, self.asset, technicien, titre=titre, statut=statut, **kwargs)
+
+        self.ot = creer_ot('OT technicien', self.technicien)
+        equipe = Equipe.objects.create(nom='Equipe A')
+        equipe.membres.add(self.technicien)
+        self.ot_equipe = creer_ot('OT équipe', assigne_a_equipe=equipe)
+        self.ot_autre = creer_ot('OT autre', self.autre)
+
+    def _pull(self, cursor=None):
+        params = {'cursor': cursor} if cursor else {}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _vieillir(self, secondes=60):
+        """Recule les dates de modification pour simuler une synchro passée"""
+        passe = timezone.now() - timedelta(seconds=secondes)
+        for model in (OrdreDeTravail, Intervention, Operation, PointDeControle, Asset):
+            model.objects.update(date_derniere_maj=passe)
+
+    def test_full_sync_sans_curseur(self):
+        """Sans curseur, tout le périmètre de l'utilisateur est renvoyé"""
+        data = self._pull()
+
+        self.assertTrue(data['full_sync'])
+        self.assertIn('cursor', data)
+        ids = {ot['id'] for ot in data['data']['ordres_travail']}
+        self.assertEqual(ids, {self.ot.id, self.ot_equipe.id})
+        self.assertEqual(set(data['ordres_travail_ids']), ids)
+        self.assertEqual(data['counts']['interventions'], 1)
+        self.assertEqual(data['counts']['assets'], 1)
+
+    def test_delta_vide(self):
+        """Aucune modification depuis le curseur : réponse vide"""
+        self._vieillir()
+        cursor = (timezone.now() - timedelta(seconds=10)).isoformat()
+
+        data = self._pull(cursor)
+
+        self.assertFalse(data['full_sync'])
+        self.assertEqual(data['counts']['ordres_travail'], 0)
+        self.assertEqual(data['counts']['interventions'], 0)
+        self.assertEqual(data['counts']['assets'], 0)
+        self.assertEqual(len(data['ordres_travail_ids']), 2)
+
+    def test_delta_point_modifie(self):
+        """La modification d'un point renvoie son intervention"""
+        self._vieillir()
+        cursor = (timezone.now() - timedelta(seconds=10)).isoformat()
+        self.point.label = 'Photo du boîtier'
+        self.point.save()
+
+        data = self._pull(cursor)
+
+        self.assertEqual(data['counts']['ordres_travail'], 0)
+        self.assertEqual(data['counts']['interventions'], 1)
+        self.assertEqual(data['counts']['assets'], 0)
+
+    def test_delta_suppression(self):
+        """Les suppressions depuis le curseur sont signalées"""
+        self._vieillir()
+        cursor = (timezone.now() - timedelta(seconds=10)).isoformat()
+        point_id = self.point.id
+        self.point.delete()
+
+        data = self._pull(cursor)
+
+        self.assertIn(point_id, data['suppressions']['POINT_CONTROLE'])
+        self.assertTrue(ElementSupprime.objects.filter(objet_id=point_id).exists())
+
+    def test_curseur_trop_ancien(self):
+        """Un curseur au-delà de la rétention force une synchro complète"""
+        cursor = (timezone.now() - timedelta(days=365)).isoformat()
+
+        data = self._pull(cursor)
+
+        self.assertTrue(data['full_sync'])
+        self.assertEqual(data['counts']['ordres_travail'], 2)
+
+    def test_curseur_invalide(self):
+        """Un curseur illisible est refusé"""
+        response = self.client.get(self.url, {'cursor': 'pas-une-date'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PushDataBatchTest(TestCase):
+    """
+    Tests de l'ingestion groupée et idempotente (push_data)
+    """
+
+    url = '/api/mobile/sync/push_data/'
+
+    def setUp(self):
+        """Création des données de test"""
+        self.technicien = creer_utilisateur('tech')
+        self.client = APIClient()
+        self.client.force_authenticate(self.technicien)
+
+        donnees = creer_execution(
+            self.technicien, nb_points=0, operation='Ouverture', intervention={'statut': 'VALIDATED'}
+        )
+        self.points = creer_points(donnees['operation'], 60, debut=1, type_champ='TEXT')
+        self.ot, self.rapport = donnees['ordre'], donnees['rapport']
+
+    def _reponses(self, nb, prefixe='k', valeur='OK'):
+        return [
+            {
+                'cle_idempotence': f'{prefixe}-{point.id}',
+                'rapport_execution': self.rapport.id,
+                'point_de_controle': point.id,
+                'valeur': valeur,
+            }
+            for point in self.points[:nb]
+        ]
+
+    def _push(self, payload):
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_creation_reponses(self):
+        """Les réponses du lot sont créées"""
+        data = self._push({'reponses': self._reponses(10)})
+
+        self.assertEqual(data['processed'], 10)
+        self.assertEqual(Reponse.objects.filter(rapport_execution=self.rapport).count(), 10)
+        self.assertTrue(all(r['statut'] == 'cree' for r in data['resultats']['reponses']))
+
+    def test_envoi_rejoue(self):
+        """Un envoi rejoué n'applique rien une seconde fois"""
+        payload = {'reponses': self._reponses(5)}
+        self._push(payload)
+        Reponse.objects.update(valeur='Modifié au bureau')
+
+        data = self._push(payload)
+
+        self.assertEqual(data['processed'], 0)
+        self.assertEqual(len(data['warnings']), 5)
+        self.assertFalse(Reponse.objects.exclude(valeur='Modifié au bureau').exists())
+
+    def test_mise_a_jour(self):
+        """Une nouvelle clé sur une réponse existante la met à jour"""
+        self._push({'reponses': self._reponses(3)})
+
+        data = self._push({'reponses': self._reponses(3, prefixe='k2', valeur='NOK')})
+
+        self.assertTrue(all(r['statut'] == 'mis_a_jour' for r in data['resultats']['reponses']))
+        self.assertEqual(Reponse.objects.filter(valeur='NOK').count(), 3)
+
+    def test_point_inconnu(self):
+        """Un point inexistant est signalé sans bloquer le reste du lot"""
+        reponses = self._reponses(2)
+        reponses.append({'rapport_execution': self.rapport.id, 'point_de_controle': 999999, 'valeur': 'X'})
+
+        data = self._push({'reponses': reponses})
+
+        self.assertEqual(data['processed'], 2)
+        self.assertEqual(len(data['errors']), 1)
+        self.assertEqual(data['resultats']['reponses'][2]['statut'], 'erreur')
+
+    def test_rapport_avec_reponses_imbriquees(self):
+        """Un rapport et ses réponses imbriquées sont appliqués ensemble"""
+        payload = {'rapports_execution': [{
+            'cle_idempotence': 'rapport-1',
+            'ordre_de_travail': self.ot.id,
+            'statut_rapport': 'EN_COURS',
+            'reponses': [
+                {'point_de_controle': point.id, 'valeur': 'OK', 'cle_idempotence': f'r-{point.id}'}
+                for point in self.points[:4]
+            ],
+        }]}
+
+        data = self._push(payload)
+
+        self.rapport.refresh_from_db()
+        self.assertEqual(self.rapport.statut_rapport, 'EN_COURS')
+        self.assertEqual(data['processed'], 5)
+        self.assertEqual(self.rapport.reponses.count(), 4)
+
+    def test_envoi_concurrent(self):
+        """Une clé réservée par un envoi concurrent n'est pas appliquée une seconde fois"""
+        PointDeControle.objects.filter(pk=self.points[0].pk).update(peut_demander_reparation=True)
+        demande = {
+            'cle_idempotence': 'dr-1', 'ordre_de_travail': self.ot.id,
+            'point_de_controle': self.points[0].id, 'titre': 'Boîtier cassé', 'description': 'À remplacer',
+        }
+        self._push({'demandes_reparation': [demande]})
+
+        # Second envoi dont la lecture des clés précède l'enregistrement du premier
+        with mock.patch('core.utils.sync_utils.cles_deja_traitees', return_value={}):
+            data = self._push({'demandes_reparation': [demande]})
+
+        self.assertEqual(data['resultats']['demandes_reparation'][0]['statut'], 'deja_traite')
+        self.assertEqual(DemandeReparation.objects.count(), 1)
+
+    def test_rapport_reponse_en_erreur(self):
+        """Une réponse imbriquée en erreur laisse le rapport rejouable"""
+        rapport = {
+            'cle_idempotence': 'rapport-1',
+            'ordre_de_travail': self.ot.id,
+            'reponses': [
+                {'point_de_controle': self.points[0].id, 'valeur': 'OK', 'cle_idempotence': 'r-1'},
+                {'point_de_controle': 999999, 'valeur': 'OK', 'cle_idempotence': 'r-2'},
+            ],
+        }
+        self._push({'rapports_execution': [rapport]})
+
+        rapport['reponses'][1]['point_de_controle'] = self.points[1].id
+        data = self._push({'rapports_execution': [rapport]})
+
+        self.assertEqual(data['resultats']['rapports_execution'][0]['statut'], 'mis_a_jour')
+        self.assertEqual(self.rapport.reponses.count(), 2)
+
+    def test_acces_refuse(self):
+        """Un utilisateur non assigné à l'OT ne peut rien y écrire"""
+        PointDeControle.objects.filter(pk=self.points[0].pk).update(peut_demander_reparation=True)
+        self.client.force_authenticate(creer_utilisateur('intrus', 'TECHNICIEN'))
+
+        data = self._push({
+            'reponses': self._reponses(2),
+            'rapports_execution': [{'ordre_de_travail': self.ot.id, 'commentaire_global': 'Piraté'}],
+            'demandes_reparation': [{
+                'ordre_de_travail': self.ot.id, 'point_de_controle': self.points[0].id,
+                'titre': 'Boîtier cassé', 'description': 'À remplacer',
+            }],
+        })
+
+        self.assertEqual(data['processed'], 0)
+        for resultats in data['resultats'].values():
+            self.assertEqual({r['error'] for r in resultats}, {'Permission refusée'})
+        self.assertFalse(Reponse.objects.exists())
+        self.assertFalse(DemandeReparation.objects.exists())
+        self.rapport.refresh_from_db()
+        self.assertIsNone(self.rapport.commentaire_global)
+
+    def test_finalisation_refusee(self):
+        """La finalisation passe par l'action finaliser, pas par un envoi groupé"""
+        data = self._push({'rapports_execution': [{'ordre_de_travail': self.ot.id, 'statut_rapport': 'FINALISE'}]})
+        self.assertEqual(data['resultats']['rapports_execution'][0]['statut'], 'erreur')
+        self.rapport.refresh_from_db()
+        self.assertEqual(self.rapport.statut_rapport, 'BROUILLON')
+
+        # Un rapport finalisé n'est plus modifiable par lot
+        RapportExecution.objects.filter(pk=self.rapport.pk).update(statut_rapport='FINALISE')
+        data = self._push({'rapports_execution': [{'ordre_de_travail': self.ot.id, 'statut_rapport': 'EN_COURS'}]})
+        self.assertEqual(data['resultats']['rapports_execution'][0]['statut'], 'erreur')
+        self.rapport.refresh_from_db()
+        self.assertEqual(self.rapport.statut_rapport, 'FINALISE')
+
+    def test_point_hors_gamme(self):
+        """Point d'une autre gamme ou n'autorisant pas les demandes : refusé"""
+        autre = creer_execution(self.technicien, intervention={'nom': 'Autre gamme'})['points'][0]
+        PointDeControle.objects.filter(pk=autre.pk).update(peut_demander_reparation=True)
+        demande = {'ordre_de_travail': self.ot.id, 'titre': 'Boîtier cassé', 'description': 'À remplacer'}
+
+        data = self._push({
+            'reponses': [{'rapport_execution': self.rapport.id, 'point_de_controle': autre.id, 'valeur': 'OK'}],
+            'demandes_reparation': [
+                dict(demande, point_de_controle=autre.id),
+                dict(demande, point_de_controle=self.points[0].id),
+            ],
+        })
+
+        self.assertEqual(data['processed'], 0)
+        self.assertEqual(
+            [r['error'] for r in data['resultats']['reponses'] + data['resultats']['demandes_reparation']],
+            ["Point de contrôle hors de la gamme de l'ordre de travail"] * 2 +
+            ["Ce point de contrôle n'autorise pas les demandes de réparation"]
+        )
+        self.assertFalse(Reponse.objects.exists())
+        self.assertFalse(DemandeReparation.objects.exists())
+
+    def test_synchroniser_modifications(self):
+        """Les modifications unitaires hors ligne passent par les mêmes lots"""
+        reponse = self._reponses(1)[0]
+        modifications = [
+            {'type': 'reponse', 'action': 'create_or_update', 'id_local': 'l1', 'data': reponse},
+            {'type': 'inconnu', 'action': 'create', 'id_local': 'l2'},
+        ]
+        response = self.client.post(
+            '/api/mobile/sync/synchroniser_modifications/', {'modifications': modifications}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        resultats = response.json()['resultats']
+        self.assertEqual([r['success'] for r in resultats], [True, False])
+        self.assertEqual(resultats[0]['data']['statut'], 'cree')
+        self.assertEqual(Reponse.objects.get().valeur, 'OK')
+
+    def test_nombre_de_requetes_constant(self):
+        """Le nombre de requêtes ne dépend pas de la taille du lot"""
+        with CaptureQueriesContext(connection) as petit_lot:
+            self._push({'reponses': self._reponses(5, prefixe='a')})
+        Reponse.objects.all().delete()
+        # Utilisateur rechargé : droits relus comme au premier envoi
+        self.client.force_authenticate(User.objects.get(pk=self.technicien.pk))
+        with CaptureQueriesContext(connection) as grand_lot:
+            self._push({'reponses': self._reponses(60, prefixe='b')})
+
+        self.assertEqual(len(petit_lot), len(grand_lot))
+
+
+class OrdreDeTravailMobileRequetesTest(TestCase):
+    """
+    Tests du nombre de requêtes de la sérialisation des OT mobile
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.technicien = creer_utilisateur('tech')
+        self.client = APIClient()
+        self.client.force_authenticate(self.technicien)
+
+        self.equipe = Equipe.objects.create(nom='Equipe A')
+        self.equipe.membres.add(self.technicien)
+        self.statut = StatutWorkflow.objects.create(nom='PLANIFIE')
+
+    def _creer_ots(self, nb):
+        for i in range(nb):
+            intervention = creer_intervention(f'Intervention {i}', statut='VALIDATED')
+            operation = Operation.objects.create(intervention=intervention, nom='Ouverture', ordre=1)
+            points = creer_points(operation, 4, debut=1, type_champ='TEXT')
+            ot = creer_ordre(
+                intervention, creer_asset(f'PB {i}'), titre=f'OT {i}', statut=self.statut,
+                assigne_a_equipe=self.equipe
+            )
+            rapport = RapportExecution.objects.create(ordre_de_travail=ot, cree_par=self.technicien)
+            Reponse.objects.create(rapport_execution=rapport, point_de_controle=points[0], valeur='OK')
+
+    def _compter_requetes(self, url, nb_ots):
+        OrdreDeTravail.objects.all().delete()
+        self._creer_ots(nb_ots)
+        # Utilisateur rechargé : pas de profil déjà en cache d'un appel à l'autre
+        self.client.force_authenticate(User.objects.get(pk=self.technicien.pk))
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(requetes), response.json()
+
+    def test_mes_taches_requetes_constantes(self):
+        """mes_taches ne fait pas de requête par OT"""
+        url = '/api/mobile/ordres-travail/mes_taches/'
+        petit, _ = self._compter_requetes(url, 2)
+        grand, data = self._compter_requetes(url, 8)
+
+        self.assertEqual(petit, grand)
+        self.assertEqual(data['statistiques']['total'], 8)
+        tache = data['taches'][0]
+        self.assertEqual(tache['progression'], 25)
+        self.assertTrue(tache['peut_etre_execute'])
+
+    def test_pull_data_requetes_constantes(self):
+        """pull_data ne fait pas de requête par OT"""
+        url = '/api/mobile/sync/pull_data/'
+        petit, _ = self._compter_requetes(url, 2)
+        grand, data = self._compter_requetes(url, 8)
+
+        self.assertEqual(petit, grand)
+        self.assertEqual(data['counts']['ordres_travail'], 8)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ExecutionDetailsTest(TestCase):
+    """
+    Tests du payload d'exécution mobile (execution_details)
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        cache.clear()
+        self.technicien = creer_utilisateur('tech')
+        self.client = APIClient()
+        self.client.force_authenticate(self.technicien)
+
+        self.asset = creer_asset()
+
+    def _creer_ot(self, nb_points):
+        intervention = creer_intervention(f'Audit {nb_points}', statut='VALIDATED')
+        points = []
+        for num_op in range(1, 4):
+            operation = Operation.objects.create(intervention=intervention, nom=f'Op {num_op}', ordre=num_op)
+            points += creer_points(operation, nb_points // 3, debut=1)
+        ot = creer_ordre(intervention, self.asset, self.technicien)
+        rapport = RapportExecution.objects.create(ordre_de_travail=ot, cree_par=self.technicien)
+        for point in points:
+            reponse = Reponse.objects.create(rapport_execution=rapport, point_de_controle=point, valeur='OK')
+            FichierMedia.objects.create(
+                reponse=reponse, type_fichier='PHOTO', fichier='media_rapports/photo.jpg',
+                nom_original='photo.jpg', taille_octets=1024
+            )
+        return ot, points
+
+    def _details(self, ot):
+        url = f'/api/mobile/ordres-travail/{ot.id}/execution_details/'
+        self.client.force_authenticate(User.objects.get(pk=self.technicien.pk))
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(requetes), response.json()
+
+    def test_requetes_constantes(self):
+        """Le nombre de requêtes ne dépend pas du nombre de points"""
+        petit_ot, _ = self._creer_ot(6)
+        grand_ot, _ = self._creer_ot(150)
+
+        petit, _ = self._details(petit_ot)
+        grand, data = self._details(grand_ot)
+
+        self.assertEqual(petit, grand)
+        self.assertEqual(len(data['operations']), 3)
+        point = data['operations'][0]['points_de_controle'][0]
+        self.assertEqual(point['reponse']['valeur'], 'OK')
+        self.assertEqual(len(point['reponse']['fichiers_media']), 1)
+
+    def test_checklist_en_cache_par_version(self):
+        """La checklist est réutilisée puis reconstruite après modification"""
+        ot, points = self._creer_ot(6)
+
+        premier, _ = self._details(ot)
+        second, _ = self._details(ot)
+        self.assertLess(second, premier)
+
+        points[0].label = 'Nouveau libellé'
+        points[0].save()
+        _, data = self._details(ot)
+
+        self.assertEqual(data['operations'][0]['points_de_controle'][0]['label'], 'Nouveau libellé')
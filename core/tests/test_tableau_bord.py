@@ -0,0 +1,239 @@
+# Fichier: core/tests/test_tableau_bord.py
+
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, Client, override_settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import (
+    CompteurTableauBord, Equipe, OrdreDeTravail, StatistiqueJournaliere, StatutWorkflow
+)
+from core.tests.donnees import creer_asset, creer_intervention, creer_ordre, creer_utilisateur
+from core.utils.compteurs import (
+    evolution_terminees, recalculer_compteurs, statistiques_en_cache, statistiques_globales,
+    statistiques_utilisateur
+)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class CompteursTableauBordTest(TestCase):
+    """
+    Tests des compteurs dénormalisés du tableau de bord
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        self.manager = creer_utilisateur('manager', 'MANAGER')
+        self.technicien = creer_utilisateur('tech', 'TECHNICIEN')
+        self.equipe = Equipe.objects.create(nom='Équipe Nord')
+        self.equipe.membres.add(self.technicien)
+
+        self.statut_ouvert = StatutWorkflow.objects.create(nom='Ouvert')
+        self.statut_termine = StatutWorkflow.objects.create(nom='Terminé', est_statut_final=True)
+
+        self.asset = creer_asset()
+        self.intervention = creer_intervention()
+        self.maintenant = timezone.now()
+
+    def _ot(self, decalage_jours=0, **champs):
+        champs.setdefault('statut', self.statut_ouvert)
+        return creer_ordre(
+            self.intervention, self.asset, cree_par=self.manager,
+            date_prevue_debut=self.maintenant + timedelta(days=decalage_jours), **champs
+        )
+
+    def _etat_compteurs(self):
+        return (
+            set(CompteurTableauBord.objects.values_list('portee', 'cible_id', 'nom', 'valeur')),
+            set(StatistiqueJournaliere.objects.values_list('jour', 'portee', 'cible_id', 'nom', 'valeur')),
+        )
+
+    def test_increments_egaux_au_recalcul(self):
+        """Créations, modifications et suppressions tiennent les compteurs exacts"""
+        ot_retard = self._ot(-3, assigne_a_technicien=self.technicien)
+        self._ot(0, assigne_a_equipe=self.equipe)
+        ot_futur = self._ot(5, assigne_a_technicien=self.technicien)
+        self._ot(-1).delete()
+
+        ot_futur.statut = self.statut_termine
+        ot_futur.date_fin_reelle = self.maintenant
+        ot_futur.save()
+        ot_retard.assigne_a_technicien = None
+        ot_retard.assigne_a_equipe = self.equipe
+        ot_retard.save()
+        self.asset.statut = 'EN_PANNE'
+        self.asset.criticite = 4
+        self.asset.save()
+
+        incremental = self._etat_compteurs()
+        recalculer_compteurs()
+        self.assertEqual(self._etat_compteurs(), incremental)
+
+    def test_enregistrements_concurrents(self):
+        """Copies périmées du même OT (web et mobile) : chaque différence part de la ligne en base"""
+        ot = self._ot(0, assigne_a_technicien=self.technicien)
+        copie_web, copie_mobile = OrdreDeTravail.objects.get(pk=ot.pk), OrdreDeTravail.objects.get(pk=ot.pk)
+
+        with mock.patch.object(
+            QuerySet, 'select_for_update', autospec=True, side_effect=QuerySet.select_for_update
+        ) as verrou:
+            for copie in (copie_web, copie_mobile):
+                copie.statut = self.statut_termine
+                copie.date_fin_reelle = self.maintenant
+                copie.save()
+        self.assertEqual(verrou.call_count, 2)
+
+        # Suppression depuis une copie chargée avant la finalisation
+        ot.delete()
+        incremental = self._etat_compteurs()
+        recalculer_compteurs()
+        self.assertEqual(self._etat_compteurs(), incremental)
+
+    def test_statistiques_globales(self):
+        """Mêmes indicateurs que les agrégats sur les tables"""
+        self._ot(-3)
+        self._ot(0)
+        self._ot(-2, statut=self.statut_termine)
+        self.asset.statut = 'EN_PANNE'
+        self.asset.save()
+
+        stats = statistiques_globales(self.maintenant + timedelta(minutes=1))
+
+        self.assertEqual(stats['ordres_actifs'], 2)
+        self.assertEqual(stats['ordres_en_retard'], 2)
+        self.assertEqual(stats['ordres_aujourdhui'], 1)
+        self.assertEqual(stats['assets_total'], 1)
+        self.assertEqual(stats['assets_en_panne'], 1)
+        self.assertEqual(stats['assets_critiques'], 0)
+
+    def test_lecture_en_requetes_constantes(self):
+        """Le coût de lecture ne dépend pas du nombre d'OT"""
+        self._ot(-1)
+        with self.assertNumQueries(3):
+            statistiques_globales()
+
+        for decalage in range(-10, 10):
+            self._ot(decalage, assigne_a_technicien=self.technicien)
+        with self.assertNumQueries(3):
+            statistiques_globales()
+        with self.assertNumQueries(4):
+            stats = statistiques_utilisateur(self.technicien)
+        self.assertEqual(stats['mes_taches_total'], 20)
+
+    def test_evolution_terminees(self):
+        """OT terminés par jour local de fin, jours vides compris"""
+        aujourdhui = timezone.localdate()
+        self._ot(-2, statut=self.statut_termine, date_fin_reelle=self.maintenant - timedelta(days=2))
+        self._ot(0, statut=self.statut_termine, date_fin_reelle=self.maintenant)
+        self._ot(0, statut=self.statut_termine, date_fin_reelle=self.maintenant)
+
+        evolution = evolution_terminees(aujourdhui - timedelta(days=6))
+
+        self.assertEqual(len(evolution), 7)
+        self.assertEqual(evolution[-1], {'date': aujourdhui.strftime('%Y-%m-%d'), 'completed': 2})
+        self.assertEqual(evolution[-3]['completed'], 1)
+        self.assertEqual(sum(jour['completed'] for jour in evolution), 3)
+
+    def test_statut_devenu_final(self):
+        """Un statut qui devient final retire ses OT des actifs"""
+        self._ot(1)
+        self._ot(2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.statut_ouvert.est_statut_final = True
+            self.statut_ouvert.save()
+
+        self.assertEqual(statistiques_globales()['ordres_actifs'], 0)
+
+    def test_commande_apres_mise_a_jour_en_masse(self):
+        """Les update() en masse sont rattrapés par la commande de recalcul"""
+        self._ot(1)
+        OrdreDeTravail.objects.update(statut=self.statut_termine)
+        self.assertEqual(statistiques_globales()['ordres_actifs'], 1)
+
+        call_command('recalculer_compteurs', stdout=StringIO())
+
+        self.assertEqual(statistiques_globales()['ordres_actifs'], 0)
+
+    def test_api_statistiques(self):
+        """L'API du tableau de bord lit les compteurs selon le rôle"""
+        self._ot(0, assigne_a_technicien=self.technicien)
+        self._ot(1)
+        client = Client()
+
+        client.login(username='manager', password='pass')
+        stats = client.get(reverse('statistiques_dashboard')).json()
+        self.assertEqual(stats['statistiques']['ordres_actifs'], 2)
+        self.assertEqual(stats['statistiques']['techniciens_actifs'], 1)
+        self.assertEqual(len(stats['evolution_semaine']), 7)
+
+        client.login(username='tech', password='pass')
+        stats = client.get(reverse('statistiques_dashboard')).json()
+        self.assertEqual(stats['statistiques']['mes_taches_total'], 1)
+        self.assertEqual(stats['statistiques']['mes_taches_aujourdhui'], 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CacheStatistiquesTest(TestCase):
+    """
+    Tests du cache des statistiques du tableau de bord par portée
+    """
+
+    def setUp(self):
+        """Création des données de test"""
+        cache.clear()
+        self.manager = creer_utilisateur('manager', 'MANAGER')
+        self.tech1 = creer_utilisateur('tech1', 'TECHNICIEN')
+        self.tech2 = creer_utilisateur('tech2', 'TECHNICIEN')
+        self.equipe = Equipe.objects.create(nom='Équipe Sud')
+        self.equipe.membres.add(self.tech2)
+
+        self.asset = creer_asset()
+        self.intervention = creer_intervention()
+
+    def _ot(self, **champs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return creer_ordre(
+                self.intervention, self.asset, cree_par=self.manager,
+                date_prevue_debut=timezone.now() + timedelta(days=1), **champs
+            )
+
+    def _stats(self, username):
+        client = Client()
+        client.login(username=username, password='pass')
+        return client.get(reverse('statistiques_dashboard')).json()['statistiques']
+
+    def test_cache_propre_a_chaque_utilisateur(self):
+        """Chaque rôle et utilisateur voit ses propres chiffres"""
+        self._ot(assigne_a_technicien=self.tech1)
+
+        self.assertEqual(self._stats('manager')['ordres_actifs'], 1)
+        self.assertEqual(self._stats('tech1')['mes_taches_total'], 1)
+        self.assertEqual(self._stats('tech2')['mes_taches_total'], 0)
+        self.assertNotIn('ordres_actifs', self._stats('tech2'))
+
+    def test_invalidation_par_portee(self):
+        """Un OT d'équipe invalide l'équipe et le global, pas les autres utilisateurs"""
+        self.assertEqual(self._stats('tech1')['mes_taches_total'], 0)
+        self.assertEqual(self._stats('tech2')['mes_taches_total'], 0)
+        self.assertEqual(self._stats('manager')['ordres_actifs'], 0)
+
+        ot = self._ot(assigne_a_equipe=self.equipe)
+
+        self.assertEqual(self._stats('tech2')['mes_taches_total'], 1)
+        self.assertEqual(self._stats('manager')['ordres_actifs'], 1)
+        with self.assertNumQueries(0):
+            stats = statistiques_en_cache(
+                [('UTILISATEUR', self.tech1.pk)], ['personnel'], lambda: statistiques_utilisateur(self.tech1, equipes=[])
+            )
+        self.assertEqual(stats['mes_taches_total'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ot.delete()
+        self.assertEqual(self._stats('tech2')['mes_taches_total'], 0)
@@ -0,0 +1,145 @@
+# Fichier: core/tests/test_validation.py
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Operation, PointDeControle, RapportExecution, Reponse
+from core.tests.donnees import creer_asset, creer_intervention, creer_ordre, creer_utilisateur
+from core.utils.gamme_utils import publier_version
+from core.utils.validation_utils import condition_remplie, points_obligatoires_manquants
+
+
+class PointsObligatoiresTest(TestCase):
+    """
+    Tests de la vérification des points obligatoires avant finalisation
+    """
+
+    def setUp(self):
+        """Création des données de test : audit de 200 points obligatoires"""
+        self.technicien = creer_utilisateur('technicien', 'TECHNICIEN')
+        self.intervention = creer_intervention('Audit PB')
+        self.operations = [
+            Operation.objects.create(intervention=self.intervention, nom=f'Opération {i}', ordre=i)
+            for i in range(4)
+        ]
+        PointDeControle.objects.bulk_create([
+            PointDeControle(operation=operation, label=f'Point {i}', ordre=i, est_obligatoire=True)
+            for operation in self.operations for i in range(50)
+        ])
+        self.points = list(PointDeControle.objects.order_by('operation__ordre', 'ordre'))
+        self.ordre = creer_ordre(self.intervention, creer_asset(), self.technicien)
+        self.rapport = RapportExecution.objects.create(ordre_de_travail=self.ordre, cree_par=self.technicien)
+
+    def _repondre(self, points, valeur='OK'):
+        Reponse.objects.bulk_create([
+            Reponse(rapport_execution=self.rapport, point_de_controle=point, valeur=valeur, saisi_par=self.technicien)
+            for point in points
+        ])
+
+    def test_une_requete(self):
+        """200 points : une seule requête, points manquants dans l'ordre de la gamme"""
+        self._repondre(self.points[:-2])
+        with self.assertNumQueries(1):
+            manquants = points_obligatoires_manquants(self.ordre, self.rapport)
+        self.assertEqual(
+            manquants,
+            [
+                {'point_id': point.pk, 'point': point.label,
+                 'operation_id': self.operations[3].pk, 'operation': 'Opération 3'}
+                for point in self.points[-2:]
+            ]
+        )
+
+        self._repondre(self.points[-2:])
+        self.assertEqual(points_obligatoires_manquants(self.ordre, self.rapport), [])
+
+    def test_points_conditionnels(self):
+        """Un point conditionnel n'est exigé que s'il est affiché, y compris en chaîne"""
+        parent = PointDeControle.objects.create(
+            operation=self.operations[0], label='Boîtier conforme', ordre=100, type_champ='SELECT',
+            options='CONFORME;NON CONFORME'
+        )
+        defaut = PointDeControle.objects.create(
+            operation=self.operations[0], label='Défaut', ordre=101, est_obligatoire=True,
+            depend_de=parent, condition_affichage='NON CONFORME'
+        )
+        photo = PointDeControle.objects.create(
+            operation=self.operations[0], label='Photo du défaut', ordre=102, est_obligatoire=True,
+            depend_de=defaut
+        )
+        self._repondre(self.points)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(points_obligatoires_manquants(self.ordre, self.rapport), [])
+
+        self._repondre([parent], 'NON CONFORME')
+        self.assertEqual(
+            [point['point_id'] for point in points_obligatoires_manquants(self.ordre, self.rapport)],
+            [defaut.pk, photo.pk]
+        )
+
+    def test_parent_masque(self):
+        """Un point dont le parent est masqué est masqué, quelle que soit la réponse du parent"""
+        parent = PointDeControle.objects.create(
+            operation=self.operations[0], label='Boîtier conforme', ordre=100, type_champ='SELECT',
+            options='CONFORME;NON CONFORME'
+        )
+        defaut = PointDeControle.objects.create(
+            operation=self.operations[0], label='Défaut visible', ordre=101, est_obligatoire=True,
+            depend_de=parent, condition_affichage='NON CONFORME'
+        )
+        precision = PointDeControle.objects.create(
+            operation=self.operations[0], label='Précision', ordre=102, est_obligatoire=True,
+            depend_de=defaut, condition_affichage='OUI'
+        )
+        self._repondre(self.points)
+        # Réponse saisie avant que le parent ne passe à CONFORME
+        self._repondre([defaut], 'OUI')
+        self._repondre([parent], 'CONFORME')
+
+        self.assertEqual(points_obligatoires_manquants(self.ordre, self.rapport), [])
+
+        Reponse.objects.filter(point_de_controle=parent).update(valeur='NON CONFORME')
+        self.assertEqual(
+            [point['point_id'] for point in points_obligatoires_manquants(self.ordre, self.rapport)],
+            [precision.pk]
+        )
+
+    def test_gamme_figee(self):
+        """Un OT figé sur sa version ignore les changements ultérieurs de la gamme"""
+        self.ordre.version_intervention = publier_version(self.intervention)
+        self.ordre.save()
+        self._repondre(self.points[1:])
+
+        # Modifications de l'intervention après la création de l'OT
+        PointDeControle.objects.create(operation=self.operations[0], label='Nouveau', ordre=500, est_obligatoire=True)
+        PointDeControle.objects.filter(pk=self.points[0].pk).update(est_obligatoire=False)
+
+        self.assertEqual(
+            points_obligatoires_manquants(self.ordre, self.rapport),
+            [{'point_id': self.points[0].pk, 'point': 'Point 0',
+              'operation_id': self.operations[0].pk, 'operation': 'Opération 0'}]
+        )
+
+    def test_conditions(self):
+        self.assertTrue(condition_remplie('OUI', 'OUI'))
+        self.assertTrue(condition_remplie('OUI', '=OUI'))
+        self.assertTrue(condition_remplie('7', '> 5'))
+        self.assertFalse(condition_remplie('3', '>5'))
+        self.assertTrue(condition_remplie('3', '<5'))
+        self.assertFalse(condition_remplie('', '>5'))
+        self.assertFalse(condition_remplie(None, 'CONFORME'))
+        self.assertTrue(condition_remplie(None, ''))
+
+    def test_finalisation_mobile(self):
+        """L'API mobile renvoie la liste structurée des points manquants"""
+        self._repondre(self.points[1:])
+        api = APIClient()
+        api.force_authenticate(self.technicien)
+        response = api.post(f'/api/mobile/ordres-travail/{self.ordre.pk}/finaliser/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()['points_manquants'],
+            [{'point_id': self.points[0].pk, 'point': 'Point 0',
+              'operation_id': self.operations[0].pk, 'operation': 'Opération 0'}]
+        )
@@ -18,6 +18,7 @@ mobile_router.register('auth', api_views_mobile.MobileAuthViewSet, basename='mob
 mobile_router.register('ordres-travail', api_views_mobile.OrdreDeTravailMobileViewSet, basename='mobile-ot')
 mobile_router.register('reponses', api_views_mobile.ReponseMobileViewSet, basename='mobile-reponses')
 mobile_router.register('medias', api_views_mobile.FichierMediaMobileViewSet, basename='mobile-medias')
+mobile_router.register('televersements', api_views_mobile.TeleversementMobileViewSet, basename='mobile-televersements')
 mobile_router.register('demandes-reparation', api_views_mobile.DemandeReparationMobileViewSet, basename='mobile-demandes')
 mobile_router.register('assets', api_views_mobile.AssetMobileViewSet, basename='mobile-assets')
 mobile_router.register('sync', api_views_mobile.SynchronisationMobileViewSet, basename='mobile-sync')
@@ -151,6 +152,7 @@ urlpatterns = [
     # RAPPORTS ET EXPORTS
     # ==============================================================================
     path('rapports/<int:pk>/export-pdf/', views.export_rapport_pdf_weasy, name='export_rapport_pdf'),
+    path('rapports/export-zip/', views.export_rapports_zip, name='export_rapports_zip'),
     
     # ==============================================================================
     # APIs UTILITAIRES
@@ -184,6 +186,8 @@ urlpatterns = [
     # Dans urls.py
     path('api/ftth/equipment/list/', views.equipment_list_api, name='equipment_list_api'),
     path('api/ftth/equipment/nearby/', views.find_nearby_equipment_api, name='find_nearby_equipment_api'),
+    path('api/ftth/equipment/tiles/', views.equipment_tiles_api, name='equipment_tiles_api'),
+    path('api/ftth/equipment/tiles/<int:z>/<int:x>/<int:y>/', views.equipment_tiles_api, name='equipment_tile_xyz_api'),
    
 
 ]
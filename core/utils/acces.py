@@ -0,0 +1,134 @@
+# Fichier : core/utils/acces.py
+
+"""
+Contrôle d'accès aux ordres de travail
+
+Le rôle d'un utilisateur et les identifiants de ses équipes sont chargés
+une seule fois, à la première vérification, puis mémorisés sur l'objet
+utilisateur, donc pour la durée de la requête. Ensuite :
+
+- une vérification par objet compare des identifiants en mémoire
+  (assigne_a_technicien_id, assigne_a_equipe_id, cree_par_id), sans
+  requête et sans charger les membres de l'équipe ;
+- une liste filtre sur ces mêmes clés étrangères indexées de l'OT, sans
+  jointure sur les membres d'équipe (ni doublons, ni DISTINCT).
+
+Règles :
+
+- managers et administrateurs voient et exécutent tous les OT ;
+- un OT est exécutable par son technicien et par les membres de son équipe ;
+- il est visible par ceux qui peuvent l'exécuter et par son créateur.
+"""
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from ..models import Equipe
+
+ROLES_GESTION = ('MANAGER', 'ADMIN')
+ROLE_DEFAUT = 'OPERATEUR'
+ATTRIBUT_DROITS = '_droits_acces'
+
+
+class DroitsAcces:
+    """
+    Rôle et équipes d'un utilisateur, chargés à la demande puis mémorisés
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.user_id = user.pk if user.is_authenticated else None
+
+    @cached_property
+    def role(self):
+        try:
+            return self.user.profil.role
+        except (AttributeError, ObjectDoesNotExist):
+            return ROLE_DEFAUT
+
+    @cached_property
+    def equipes_ids(self):
+        if self.user_id is None:
+            return frozenset()
+        return frozenset(
+            Equipe.membres.through.objects.filter(user_id=self.user_id).values_list('equipe_id', flat=True)
+        )
+
+    @property
+    def est_gestionnaire(self):
+        return self.role in ROLES_GESTION
+
+    # ==========================================================================
+    # VÉRIFICATIONS PAR OBJET
+    # ==========================================================================
+
+    def est_assigne(self, ordre):
+        """
+        L'OT est assigné à l'utilisateur ou à l'une de ses équipes
+        """
+        if self.user_id is None:
+            return False
+        return (
+            ordre.assigne_a_technicien_id == self.user_id or
+            (ordre.assigne_a_equipe_id is not None and ordre.assigne_a_equipe_id in self.equipes_ids)
+        )
+
+    def peut_executer(self, ordre):
+        return self.est_gestionnaire or self.est_assigne(ordre)
+
+    def peut_voir(self, ordre):
+        return (
+            self.peut_executer(ordre) or
+            (self.user_id is not None and ordre.cree_par_id == self.user_id)
+        )
+
+    # ==========================================================================
+    # FILTRES DE LISTES
+    # ==========================================================================
+
+    def filtre_assignes(self, prefixe=''):
+        """
+        Condition « OT assigné à l'utilisateur ou à ses équipes »
+
+        Args:
+            prefixe: Chemin vers l'OT depuis un autre modèle
+                (ex. 'ordre_de_travail__')
+        """
+        if self.user_id is None:
+            return Q(pk__in=[])
+        return (
+            Q(**{f'{prefixe}assigne_a_technicien_id': self.user_id}) |
+            Q(**{f'{prefixe}assigne_a_equipe_id__in': sorted(self.equipes_ids)})
+        )
+
+    def filtre_personnels(self, prefixe=''):
+        """
+        Condition « OT assigné à l'utilisateur, à ses équipes ou créé par lui »
+        """
+        if self.user_id is None:
+            return Q(pk__in=[])
+        return self.filtre_assignes(prefixe) | Q(**{f'{prefixe}cree_par_id': self.user_id})
+
+    def ordres_executables(self, queryset):
+        if self.est_gestionnaire:
+            return queryset
+        return queryset.filter(self.filtre_assignes())
+
+    def ordres_visibles(self, queryset):
+        if self.est_gestionnaire:
+            return queryset
+        return queryset.filter(self.filtre_personnels())
+
+
+def droits(user):
+    """
+    Droits de l'utilisateur, mémorisés sur l'objet utilisateur (une seule
+    lecture du profil et des équipes par requête)
+    """
+    droits_user = getattr(user, ATTRIBUT_DROITS, None)
+    if droits_user is None:
+        droits_user = DroitsAcces(user)
+        setattr(user, ATTRIBUT_DROITS, droits_user)
+    return droits_user
+
@@ -0,0 +1,199 @@
+# Fichier : core/utils/brouillons.py
+
+"""
+Brouillons d'exécution (écriture différée des réponses)
+
+La sauvegarde automatique n'écrit pas dans Reponse : les valeurs saisies
+s'accumulent dans un document JSON par rapport d'exécution
+({point_id: valeur}, BrouillonIntervention.donnees_json). Une sauvegarde
+est une seule mise à jour conditionnelle (UPDATE ... WHERE version = v)
+et les valeurs à moitié saisies restent hors de la table des réponses.
+Elles ne deviennent des réponses qu'à la sauvegarde explicite ou à la
+finalisation (materialiser_brouillon), qui supprime le brouillon.
+
+Versionnement optimiste : le client renvoie la version du brouillon sur
+laquelle il a travaillé. Si le brouillon a changé entre-temps (autre
+tablette), l'écriture est refusée (ConflitBrouillon) avec le brouillon
+courant, que le client fusionne avant de renvoyer.
+
+Stockage : base de données par défaut. Avec GMAO_BROUILLONS_CACHE = alias
+d'un cache (ex. 'mobile_sync', Redis), les brouillons vivent dans ce
+cache pendant GMAO_BROUILLONS_CACHE_DUREE secondes (7 jours par défaut) ;
+le contrôle de version y est fait sous un verrou court (cache.add).
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import BrouillonIntervention
+from .sauvegarde_reponses import sauvegarder_reponses
+
+logger = logging.getLogger(__name__)
+
+DUREE_VERROU = 5  # secondes
+
+
+class ConflitBrouillon(Exception):
+    """Le brouillon a été modifié depuis la version du client"""
+
+    def __init__(self, donnees, version):
+        super().__init__("Brouillon modifié depuis un autre poste")
+        self.donnees = donnees
+        self.version = version
+
+
+# ==============================================================================
+# STOCKAGE
+# ==============================================================================
+
+def _cache():
+    alias = getattr(settings, 'GMAO_BROUILLONS_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _cle(rapport_id):
+    return f"brouillon_rapport:{rapport_id}"
+
+
+def _lire(rapport_id):
+    """
+    Returns:
+        tuple: (données {point_id (str): valeur}, version ; 0 sans brouillon)
+    """
+    cache = _cache()
+    if cache is not None:
+        brouillon = cache.get(_cle(rapport_id))
+        return (dict(brouillon['donnees']), brouillon['version']) if brouillon else ({}, 0)
+
+    ligne = BrouillonIntervention.objects.filter(
+        rapport_execution_id=rapport_id
+    ).values_list('donnees_json', 'version').first()
+    return (dict(ligne[0] or {}), ligne[1]) if ligne else ({}, 0)
+
+
+def _ecrire(rapport_id, donnees, version):
+    """
+    Écrit la version suivante si le brouillon stocké est toujours à `version`
+
+    Returns:
+        bool: False si le brouillon a changé entre-temps
+    """
+    cache = _cache()
+    if cache is not None:
+        verrou = f"{_cle(rapport_id)}:verrou"
+        if not cache.add(verrou, 1, DUREE_VERROU):
+            return False
+        try:
+            if _lire(rapport_id)[1] != version:
+                return False
+            cache.set(
+                _cle(rapport_id), {'donnees': donnees, 'version': version + 1},
+                getattr(settings, 'GMAO_BROUILLONS_CACHE_DUREE', 7 * 24 * 3600)
+            )
+            return True
+        finally:
+            cache.delete(verrou)
+
+    if version == 0:
+        try:
+            with transaction.atomic():
+                BrouillonIntervention.objects.create(rapport_execution_id=rapport_id, donnees_json=donnees, version=1)
+            return True
+        except IntegrityError:
+            return False
+    return BrouillonIntervention.objects.filter(rapport_execution_id=rapport_id, version=version).update(
+        donnees_json=donnees, version=version + 1, derniere_modification=timezone.now()
+    ) == 1
+
+
+def _supprimer(rapport_id, version):
+    """
+    Supprime le brouillon s'il est toujours à `version` (une sauvegarde
+    arrivée entre-temps est conservée)
+    """
+    cache = _cache()
+    if cache is not None:
+        if _lire(rapport_id)[1] == version:
+            cache.delete(_cle(rapport_id))
+    else:
+        BrouillonIntervention.objects.filter(rapport_execution_id=rapport_id, version=version).delete()
+
+
+# ==============================================================================
+# API
+# ==============================================================================
+
+def lire_brouillon(rapport):
+    """
+    Returns:
+        tuple: ({point_id (int): valeur}, version du brouillon ; 0 sans brouillon)
+    """
+    donnees, version = _lire(rapport.pk)
+    return {int(point_id): valeur for point_id, valeur in donnees.items()}, version
+
+
+def enregistrer_brouillon(rapport, valeurs, version_client=None):
+    """
+    Fusionne des valeurs dans le brouillon du rapport
+
+    Args:
+        valeurs: {point_id: valeur}
+        version_client: Version du brouillon connue du client (None : pas
+            de contrôle)
+
+    Returns:
+        int: Version du brouillon après sauvegarde (inchangée si les
+        valeurs n'apportent rien de nouveau)
+
+    Raises:
+        ConflitBrouillon: Le brouillon a changé depuis version_client
+    """
+    try:
+        version_client = int(version_client) if version_client not in (None, '') else None
+    except (TypeError, ValueError):
+        version_client = None
+
+    donnees, version = _lire(rapport.pk)
+    if version_client is not None and version_client != version:
+        raise ConflitBrouillon(donnees, version)
+
+    fusion = dict(donnees)
+    fusion.update({str(point_id): '' if valeur is None else str(valeur) for point_id, valeur in valeurs.items()})
+    if fusion == donnees and version:
+        return version
+
+    if not _ecrire(rapport.pk, fusion, version):
+        donnees, version = _lire(rapport.pk)
+        raise ConflitBrouillon(donnees, version)
+    return version + 1
+
+
+def materialiser_brouillon(rapport, user, valeurs=None, **options):
+    """
+    Enregistre le brouillon dans les réponses puis le supprime
+
+    Les valeurs vides du brouillon sont ignorées ; `valeurs` (formulaire
+    envoyé explicitement) l'emportent sur le brouillon.
+
+    Args:
+        options: Transmises à sauvegarder_reponses (version_client...)
+
+    Returns:
+        dict: Résultat de sauvegarder_reponses
+    """
+    brouillon, version = lire_brouillon(rapport)
+    a_enregistrer = {point_id: valeur for point_id, valeur in brouillon.items() if valeur != ''}
+    a_enregistrer.update(valeurs or {})
+
+    with transaction.atomic():
+        resultat = sauvegarder_reponses(rapport, a_enregistrer, user, **options)
+        if version:
+            if _cache() is not None:
+                transaction.on_commit(lambda: _supprimer(rapport.pk, version))
+            else:
+                _supprimer(rapport.pk, version)
+    return resultat
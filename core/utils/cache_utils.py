@@ -0,0 +1,106 @@
+# Fichier : core/utils/cache_utils.py
+
+"""
+Cache applicatif avec invalidation par espace de noms
+
+Chaque espace de noms (ex. 'carte_stats') porte un numéro de version stocké
+dans le cache. Les clés incluent cette version : invalider un espace revient
+à incrémenter la version, sans avoir à connaître ni supprimer chaque clé
+(une entrée par rôle, par utilisateur...). Les anciennes entrées expirent
+d'elles-mêmes.
+
+Toutes les opérations tolèrent l'indisponibilité du serveur de cache : on
+recalcule simplement la valeur, on ne fait jamais échouer la requête.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Espaces de noms utilisés par l'application
+CARTE_STATS_NAMESPACE = 'carte_stats'
+CHECKLIST_NAMESPACE = 'checklist_intervention'
+GAMME_NAMESPACE = 'gamme_version'
+DASHBOARD_STATS_NAMESPACE = 'dashboard_stats'
+
+
+def _get_cache(alias='default'):
+    return caches[alias]
+
+
+def _version_key(namespace):
+    return f"{namespace}:version"
+
+
+def get_namespace_version(namespace, alias='default'):
+    """
+    Version courante d'un espace de noms (1 si jamais invalidé)
+    """
+    try:
+        return _get_cache(alias).get(_version_key(namespace)) or 1
+    except Exception as e:
+        logger.warning(f"Cache indisponible (lecture version {namespace}): {e}")
+        return 1
+
+
+def build_cache_key(namespace, *parts, alias='default'):
+    """
+    Construit une clé versionnée : "<namespace>:v<version>:<part1>:<part2>..."
+    """
+    version = get_namespace_version(namespace, alias)
+    suffix = ':'.join(str(part) for part in parts)
+    return f"{namespace}:v{version}:{suffix}"
+
+
+def invalidate_namespace(namespace, alias='default'):
+    """
+    Invalide toutes les entrées d'un espace de noms
+    """
+    cache = _get_cache(alias)
+    key = _version_key(namespace)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Clé absente : la version implicite était 1
+            cache.set(key, 2, None)
+    except Exception as e:
+        logger.warning(f"Cache indisponible (invalidation {namespace}): {e}")
+
+
+def cached_value(namespace, parts, compute, timeout=None, alias='default'):
+    """
+    Retourne la valeur en cache ou la calcule via `compute()` et la stocke
+
+    Args:
+        namespace: Espace de noms (unité d'invalidation)
+        parts: Éléments complémentaires de la clé (scope, rôle, utilisateur...)
+        compute: Fonction sans argument produisant la valeur
+        timeout: Durée en secondes (défaut GMAO_CACHE_DURATION)
+    """
+    if not getattr(settings, 'GMAO_USE_CACHE', True):
+        return compute()
+
+    if timeout is None:
+        timeout = getattr(settings, 'GMAO_CACHE_DURATION', 300)
+
+    cache = _get_cache(alias)
+    key = build_cache_key(namespace, *parts, alias=alias)
+
+    try:
+        value = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Cache indisponible (lecture {key}): {e}")
+        return compute()
+
+    if value is None:
+        value = compute()
+        try:
+            cache.set(key, value, timeout)
+        except Exception as e:
+            logger.warning(f"Cache indisponible (écriture {key}): {e}")
+
+    return value
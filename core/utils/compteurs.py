@@ -0,0 +1,392 @@
+# Fichier : core/utils/compteurs.py
+
+"""
+Compteurs dénormalisés du tableau de bord
+
+Chaque objet suivi (OrdreDeTravail, Asset, Intervention, DemandeReparation)
+apporte une contribution aux compteurs, calculée à partir de quelques
+champs : un OT actif compte dans `ordres_actifs` globalement, pour son
+technicien et pour son équipe, dans `ordres_prevus` au jour prévu, etc.
+
+À chaque enregistrement, les signaux (core.signals) appliquent la
+différence entre l'ancienne et la nouvelle contribution par incréments
+(F('valeur') + delta) ; à la suppression, la contribution est retirée.
+Le tableau de bord lit alors quelques lignes, quel que soit le volume des
+tables :
+
+- CompteurTableauBord : totaux (portée GLOBAL, UTILISATEUR ou EQUIPE) ;
+- StatistiqueJournaliere : compteurs par jour (OT prévus, OT actifs par
+  jour prévu, OT terminés), d'où « aujourd'hui », « en retard » et
+  l'évolution sur 7 jours, sans SQL de date propre au moteur.
+
+Seul le retard du jour courant (OT prévus avant maintenant) est compté
+sur la table des OT, limité à la journée par l'index sur date_prevue_debut.
+
+Les mises à jour en masse (QuerySet.update) ne déclenchent pas de
+signaux : la commande `recalculer_compteurs` reconstruit tout.
+
+Les statistiques calculées sur ces compteurs sont mises en cache par
+portée (global, utilisateur, équipe) : chaque modification de compteurs
+invalide, après commit, les seules portées touchées.
+"""
+
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from ..models import CompteurTableauBord, StatistiqueJournaliere, OrdreDeTravail
+from .cache_utils import (
+    cached_value, get_namespace_version, invalidate_namespace, DASHBOARD_STATS_NAMESPACE
+)
+
+logger = logging.getLogger(__name__)
+
+GLOBAL = ('GLOBAL', 0)
+
+
+# ==============================================================================
+# CONTRIBUTIONS
+# ==============================================================================
+# Clé d'une contribution : (jour ou None, portée, cible_id, nom)
+
+def contributions_ordre(valeurs):
+    contributions = Counter()
+    actif = not valeurs['statut_final']
+    cibles = [GLOBAL]
+    if valeurs['assigne_a_technicien_id']:
+        cibles.append(('UTILISATEUR', valeurs['assigne_a_technicien_id']))
+    if valeurs['assigne_a_equipe_id']:
+        cibles.append(('EQUIPE', valeurs['assigne_a_equipe_id']))
+    jour_prevu = timezone.localdate(valeurs['date_prevue_debut']) if valeurs['date_prevue_debut'] else None
+
+    for portee, cible_id in cibles:
+        if actif:
+            contributions[(None, portee, cible_id, 'ordres_actifs')] += 1
+        if jour_prevu:
+            contributions[(jour_prevu, portee, cible_id, 'ordres_prevus')] += 1
+            if actif:
+                contributions[(jour_prevu, portee, cible_id, 'ordres_actifs_prevus')] += 1
+
+    if valeurs['date_fin_reelle']:
+        contributions[(timezone.localdate(valeurs['date_fin_reelle']), *GLOBAL, 'ordres_termines')] += 1
+    return contributions
+
+
+def contributions_asset(valeurs):
+    contributions = Counter({(None, *GLOBAL, 'assets_total'): 1})
+    if valeurs['statut'] == 'EN_PANNE':
+        contributions[(None, *GLOBAL, 'assets_en_panne')] += 1
+        if valeurs['criticite'] >= 3:
+            contributions[(None, *GLOBAL, 'assets_critiques')] += 1
+    return contributions
+
+
+def contributions_intervention(valeurs):
+    if valeurs['statut'] == 'VALIDATED':
+        return Counter({(None, *GLOBAL, 'interventions_validees'): 1})
+    return Counter()
+
+
+def contributions_demande(valeurs):
+    contributions = Counter()
+    if valeurs['statut'] == 'EN_ATTENTE':
+        contributions[(None, *GLOBAL, 'demandes_reparation_en_attente')] += 1
+    if valeurs['cree_par_id']:
+        contributions[(None, 'UTILISATEUR', valeurs['cree_par_id'], 'demandes_reparation')] += 1
+    return contributions
+
+
+# Modèle suivi -> (champs, champs liés {nom: chemin}, fonction de contribution)
+SUIVIS = {
+    'OrdreDeTravail': (
+        ('date_prevue_debut', 'date_fin_reelle', 'assigne_a_technicien_id', 'assigne_a_equipe_id'),
+        {'statut_final': 'statut__est_statut_final'},
+        contributions_ordre,
+    ),
+    'Asset': (('statut', 'criticite'), {}, contributions_asset),
+    'Intervention': (('statut',), {}, contributions_intervention),
+    'DemandeReparation': (('statut', 'cree_par_id'), {}, contributions_demande),
+}
+
+
+def _valeurs_base(modele, pk):
+    champs, lies, _ = SUIVIS[modele.__name__]
+    objets = modele.objects.filter(pk=pk)
+    if transaction.get_connection().in_atomic_block:
+        # Ligne verrouillée jusqu'à l'application de la différence
+        objets = objets.select_for_update(of=('self',))
+    return objets.values(*champs, **{nom: F(chemin) for nom, chemin in lies.items()}).first()
+
+
+def _valeurs_instance(instance):
+    champs, lies, _ = SUIVIS[type(instance).__name__]
+    valeurs = {champ: getattr(instance, champ) for champ in champs}
+    for nom, chemin in lies.items():
+        objet = instance
+        for attribut in chemin.split('__'):
+            objet = getattr(objet, attribut) if objet is not None else None
+        valeurs[nom] = objet
+    return valeurs
+
+
+def contributions(modele, valeurs):
+    if valeurs is None:
+        return Counter()
+    return SUIVIS[modele.__name__][2](valeurs)
+
+
+def contributions_en_base(instance):
+    """
+    Contribution de l'objet tel qu'enregistré en base (avant modification),
+    relue verrouillée dans une transaction (voir EnregistrementCompteurs)
+    """
+    if instance.pk is None:
+        return Counter()
+    return contributions(type(instance), _valeurs_base(type(instance), instance.pk))
+
+
+def contributions_instance(instance):
+    return contributions(type(instance), _valeurs_instance(instance))
+
+
+# ==============================================================================
+# MISE À JOUR
+# ==============================================================================
+
+def _incrementer(cle, delta):
+    jour, portee, cible_id, nom = cle
+    modele = StatistiqueJournaliere if jour else CompteurTableauBord
+    filtre = {'portee': portee, 'cible_id': cible_id, 'nom': nom}
+    if jour:
+        filtre['jour'] = jour
+
+    if modele.objects.filter(**filtre).update(valeur=F('valeur') + delta):
+        if delta < 0:
+            # Pas de lignes à zéro : le nombre de lignes suit les objets comptés
+            modele.objects.filter(valeur=0, **filtre).delete()
+        return
+    try:
+        with transaction.atomic():
+            modele.objects.create(valeur=delta, **filtre)
+    except IntegrityError:
+        # Ligne créée en parallèle
+        modele.objects.filter(**filtre).update(valeur=F('valeur') + delta)
+
+
+def appliquer(avant, apres):
+    """
+    Applique la différence entre deux contributions (None : aucune)
+
+    Returns:
+        set: Portées (portee, cible_id) dont un compteur a changé
+    """
+    avant, apres = Counter(avant or {}), Counter(apres or {})
+    portees = set()
+    with transaction.atomic():
+        for cle in set(avant) | set(apres):
+            delta = apres[cle] - avant[cle]
+            if delta:
+                _incrementer(cle, delta)
+                portees.add(cle[1:3])
+    return portees
+
+
+def recalculer_compteurs(get_model=None):
+    """
+    Reconstruit tous les compteurs à partir des tables
+
+    Args:
+        get_model: Fonction nom -> modèle (modèles historiques d'une
+            migration) ; modèles courants par défaut
+
+    Returns:
+        int: Nombre de lignes de compteurs
+    """
+    get_model = get_model or (lambda nom: apps.get_model('core', nom))
+    totaux = Counter()
+    for nom_modele, (champs, lies, contribution) in SUIVIS.items():
+        valeurs = get_model(nom_modele).objects.values(*champs, **{nom: F(chemin) for nom, chemin in lies.items()})
+        for ligne in valeurs.iterator(chunk_size=2000):
+            totaux.update(contribution(ligne))
+
+    Compteur = get_model('CompteurTableauBord')
+    Statistique = get_model('StatistiqueJournaliere')
+    with transaction.atomic():
+        Compteur.objects.all().delete()
+        Statistique.objects.all().delete()
+        Compteur.objects.bulk_create([
+            Compteur(portee=portee, cible_id=cible_id, nom=nom, valeur=valeur)
+            for (jour, portee, cible_id, nom), valeur in totaux.items() if jour is None and valeur
+        ], batch_size=1000)
+        Statistique.objects.bulk_create([
+            Statistique(jour=jour, portee=portee, cible_id=cible_id, nom=nom, valeur=valeur)
+            for (jour, portee, cible_id, nom), valeur in totaux.items() if jour is not None and valeur
+        ], batch_size=1000)
+
+    transaction.on_commit(lambda: invalidate_namespace(DASHBOARD_STATS_NAMESPACE))
+    logger.info(f"Compteurs du tableau de bord recalculés ({len(totaux)} lignes)")
+    return len(totaux)
+
+
+# ==============================================================================
+# LECTURE
+# ==============================================================================
+
+def _debut_du_jour(maintenant):
+    return timezone.localtime(maintenant).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _lire(cibles, maintenant):
+    """
+    Compteurs cumulés des cibles, avec les indicateurs datés
+    """
+    aujourdhui = timezone.localdate(maintenant)
+    valeurs = dict(
+        CompteurTableauBord.objects.filter(cibles).values('nom')
+        .annotate(total=Sum('valeur')).values_list('nom', 'total')
+    )
+    valeurs.update(StatistiqueJournaliere.objects.filter(cibles).aggregate(
+        ordres_en_retard=Sum('valeur', filter=Q(nom='ordres_actifs_prevus', jour__lt=aujourdhui)),
+        ordres_aujourdhui=Sum('valeur', filter=Q(nom='ordres_prevus', jour=aujourdhui)),
+    ))
+    return {nom: valeur or 0 for nom, valeur in valeurs.items()}
+
+
+def _en_retard_du_jour(ordres, maintenant):
+    return ordres.filter(
+        date_prevue_debut__gte=_debut_du_jour(maintenant),
+        date_prevue_debut__lt=maintenant,
+    ).exclude(statut__est_statut_final=True).count()
+
+
+def statistiques_globales(maintenant=None):
+    """
+    Indicateurs globaux du tableau de bord, en un nombre fixe de requêtes
+
+    Returns:
+        dict: ordres_actifs, ordres_en_retard, ordres_aujourdhui,
+        assets_total, assets_en_panne, assets_critiques,
+        interventions_validees, demandes_reparation_en_attente
+    """
+    maintenant = maintenant or timezone.now()
+    stats = _lire(Q(portee='GLOBAL', cible_id=0), maintenant)
+    stats['ordres_en_retard'] += _en_retard_du_jour(OrdreDeTravail.objects.all(), maintenant)
+    for nom in (
+        'ordres_actifs', 'assets_total', 'assets_en_panne', 'assets_critiques',
+        'interventions_validees', 'demandes_reparation_en_attente',
+    ):
+        stats.setdefault(nom, 0)
+    return stats
+
+
+def statistiques_utilisateur(user, maintenant=None, equipes=None):
+    """
+    Indicateurs personnels : OT du technicien et de ses équipes
+
+    Un OT attribué à la fois au technicien et à l'une de ses équipes compte
+    pour chacune des deux attributions.
+
+    Args:
+        equipes: Identifiants des équipes de l'utilisateur, s'ils sont
+            déjà connus
+
+    Returns:
+        dict: mes_taches_total, mes_taches_en_retard,
+        mes_taches_aujourdhui, mes_demandes_reparation
+    """
+    maintenant = maintenant or timezone.now()
+    if equipes is None:
+        equipes = list(user.equipes.values_list('id', flat=True))
+    stats = _lire(
+        Q(portee='UTILISATEUR', cible_id=user.pk) | Q(portee='EQUIPE', cible_id__in=equipes),
+        maintenant,
+    )
+    ordres = OrdreDeTravail.objects.filter(Q(assigne_a_technicien=user) | Q(assigne_a_equipe__in=equipes))
+    return {
+        'mes_taches_total': stats.get('ordres_actifs', 0),
+        'mes_taches_en_retard': stats['ordres_en_retard'] + _en_retard_du_jour(ordres, maintenant),
+        'mes_taches_aujourdhui': stats['ordres_aujourdhui'],
+        'mes_demandes_reparation': stats.get('demandes_reparation', 0),
+    }
+
+
+def evolution_terminees(debut, nb_jours=7):
+    """
+    OT terminés par jour, à partir du jour `debut` (date)
+
+    Returns:
+        list: [{'date': 'AAAA-MM-JJ', 'completed': n}, ...]
+    """
+    par_jour = dict(
+        StatistiqueJournaliere.objects.filter(
+            portee='GLOBAL', cible_id=0, nom='ordres_termines',
+            jour__gte=debut, jour__lt=debut + timedelta(days=nb_jours),
+        ).values_list('jour', 'valeur')
+    )
+    return [
+        {'date': jour.strftime('%Y-%m-%d'), 'completed': par_jour.get(jour, 0)}
+        for jour in (debut + timedelta(days=i) for i in range(nb_jours))
+    ]
+
+
+# ==============================================================================
+# CACHE DES STATISTIQUES
+# ==============================================================================
+# Un espace de noms par portée ; l'espace racine DASHBOARD_STATS_NAMESPACE
+# invalide toutes les portées à la fois (recalcul complet).
+
+def namespace_portee(portee, cible_id):
+    return f"{DASHBOARD_STATS_NAMESPACE}:{portee}:{cible_id}"
+
+
+def invalider_portees(portees):
+    """
+    Invalide, après commit, les statistiques en cache des portées modifiées
+
+    Avant le commit, une requête concurrente recalculerait et remettrait en
+    cache les anciennes valeurs.
+    """
+    if not portees:
+        return
+
+    def invalider():
+        for portee, cible_id in portees:
+            invalidate_namespace(namespace_portee(portee, cible_id))
+
+    transaction.on_commit(invalider)
+
+
+def statistiques_en_cache(portees, parts, compute, maintenant=None):
+    """
+    Statistiques calculées sur les compteurs de `portees`, en cache jusqu'à
+    la prochaine modification de l'une d'elles
+
+    La première portée porte l'entrée ; les versions des autres entrent
+    dans la clé. Le jour courant aussi : « aujourd'hui » et « en retard »
+    changent à minuit sans modification de compteur ; en cours de journée,
+    la durée de l'entrée (GMAO_DASHBOARD_CACHE_DURATION) borne le retard
+    pris sur les OT qui dépassent leur heure prévue.
+
+    Args:
+        portees: Liste de (portee, cible_id), non vide
+        parts: Éléments complémentaires de la clé (rôle...)
+        compute: Fonction sans argument produisant la valeur
+    """
+    maintenant = maintenant or timezone.now()
+    (portee, cible_id), *autres = portees
+    cle = [
+        get_namespace_version(DASHBOARD_STATS_NAMESPACE),
+        timezone.localdate(maintenant).isoformat(),
+        *parts,
+        *(f"{p}{c}v{get_namespace_version(namespace_portee(p, c))}" for p, c in autres),
+    ]
+    return cached_value(
+        namespace_portee(portee, cible_id), cle, compute,
+        timeout=getattr(settings, 'GMAO_DASHBOARD_CACHE_DURATION', 120),
+    )
@@ -0,0 +1,207 @@
+# Fichier : core/utils/export_rapports.py
+
+"""
+Export groupé des rapports d'exécution en archive ZIP diffusée en flux
+
+L'archive contient, pour chaque rapport finalisé retenu par le filtre
+(zone, période de fin d'exécution, intervention, type d'OT) :
+
+    OT_<id>/rapport_OT_<id>.pdf
+    OT_<id>/medias/<id média>_<nom original>
+
+Elle est construite au fil de l'eau : chaque fichier est lu et compressé
+par blocs, et les octets produits sont rendus immédiatement (zipfile écrit
+sur un flux non positionnable, avec descripteurs de données). La réponse
+part dès le premier bloc et la mémoire reste bornée quelle que soit la
+taille de l'archive.
+
+Les PDF viennent du cache de rapport_pdf ; un PDF absent est rendu à la
+volée (et mis en cache). Les éléments impossibles à inclure sont listés
+dans un fichier ELEMENTS_MANQUANTS.txt en fin d'archive.
+"""
+
+import logging
+import os
+import zipfile
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+from ..models import RapportExecution, OrdreDeTravail
+from .rapport_pdf import generer_pdf_rapport, pdf_disponible, pdf_en_cache, STATUTS_FIGES
+
+logger = logging.getLogger(__name__)
+
+FICHIER_MANQUANTS = 'ELEMENTS_MANQUANTS.txt'
+TAILLE_PAQUET_RAPPORTS = 100
+
+
+def taille_bloc():
+    return getattr(settings, 'GMAO_EXPORT_ZIP_BLOCK_SIZE', 256 * 1024)
+
+
+# ==============================================================================
+# SÉLECTION DES RAPPORTS
+# ==============================================================================
+
+def _entier(valeur, nom):
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        raise ValueError(f"{nom} doit être un identifiant numérique")
+
+
+def _date(valeur, nom):
+    try:
+        return datetime.strptime(valeur, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f"{nom} doit être une date AAAA-MM-JJ")
+
+
+def lire_filtre(donnees):
+    """
+    Filtre d'export depuis des paramètres texte (GET ou options de commande)
+
+    Clés reconnues : zone, intervention, type_ot, debut, fin.
+
+    Raises:
+        ValueError: Paramètre invalide
+    """
+    filtre = {}
+    for cle in ('zone', 'intervention'):
+        if donnees.get(cle):
+            filtre[cle] = _entier(donnees[cle], cle)
+    for cle in ('debut', 'fin'):
+        if donnees.get(cle):
+            filtre[cle] = _date(donnees[cle], cle)
+    if donnees.get('type_ot'):
+        if donnees['type_ot'] not in dict(OrdreDeTravail.TYPE_OT_CHOIX):
+            raise ValueError(f"type_ot inconnu : {donnees['type_ot']}")
+        filtre['type_ot'] = donnees['type_ot']
+    if 'debut' in filtre and 'fin' in filtre and filtre['debut'] > filtre['fin']:
+        raise ValueError("debut doit précéder fin")
+    return filtre
+
+
+def rapports_a_exporter(zone=None, intervention=None, type_ot=None, debut=None, fin=None):
+    """
+    Rapports finalisés correspondant au filtre, par identifiant croissant
+    """
+    rapports = RapportExecution.objects.filter(statut_rapport__in=STATUTS_FIGES)
+    if zone:
+        rapports = rapports.filter(ordre_de_travail__asset__zone_geographique_id=zone)
+    if intervention:
+        rapports = rapports.filter(ordre_de_travail__intervention_id=intervention)
+    if type_ot:
+        rapports = rapports.filter(ordre_de_travail__type_OT=type_ot)
+    if debut:
+        rapports = rapports.filter(date_execution_fin__date__gte=debut)
+    if fin:
+        rapports = rapports.filter(date_execution_fin__date__lte=fin)
+    return rapports.order_by('pk')
+
+
+# ==============================================================================
+# ARCHIVE EN FLUX
+# ==============================================================================
+
+class _FluxSortie:
+    """
+    Destination de zipfile qui accumule les octets jusqu'au prochain `vider`
+
+    Sans seek ni tell utilisables : zipfile suit lui-même la position et
+    écrit les tailles après chaque fichier.
+    """
+
+    def __init__(self):
+        self._morceaux = []
+
+    def write(self, donnees):
+        self._morceaux.append(bytes(donnees))
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        donnees = b''.join(self._morceaux)
+        self._morceaux = []
+        return donnees
+
+
+def _ajouter_fichier(archive, sortie, nom, fichier):
+    """
+    Ajoute un fichier ouvert à l'archive, bloc par bloc (générateur)
+    """
+    with archive.open(nom, 'w', force_zip64=True) as destination:
+        for bloc in iter(lambda: fichier.read(taille_bloc()), b''):
+            destination.write(bloc)
+            donnees = sortie.vider()
+            if donnees:
+                yield donnees
+    yield sortie.vider()
+
+
+def _chemin_pdf(rapport):
+    chemin = pdf_en_cache(rapport)
+    if chemin is None and pdf_disponible():
+        chemin = generer_pdf_rapport(rapport.pk)
+    return chemin
+
+
+def flux_zip_rapports(rapports):
+    """
+    Générateur des octets de l'archive ZIP des rapports et de leurs médias
+
+    Args:
+        rapports: QuerySet de RapportExecution (rapports_a_exporter)
+    """
+    sortie = _FluxSortie()
+    manquants = []
+
+    rapports = (
+        rapports.select_related('ordre_de_travail')
+        .prefetch_related('reponses__fichiers_media')
+        .iterator(chunk_size=TAILLE_PAQUET_RAPPORTS)
+    )
+
+    # PDF et photos sont déjà compressés : niveau minimal, le plus rapide
+    with zipfile.ZipFile(sortie, 'w', zipfile.ZIP_DEFLATED, allowZip64=True, compresslevel=1) as archive:
+        for rapport in rapports:
+            dossier = f"OT_{rapport.ordre_de_travail_id}"
+
+            try:
+                chemin = _chemin_pdf(rapport)
+            except Exception as e:
+                logger.error(f"PDF du rapport {rapport.pk} non généré: {e}", exc_info=True)
+                chemin = None
+            pdf = None
+            if chemin:
+                # Une version plus récente peut avoir remplacé ce PDF entre-temps
+                try:
+                    pdf = open(chemin, 'rb')
+                except OSError as e:
+                    logger.warning(f"PDF du rapport {rapport.pk} illisible: {e}")
+            if pdf:
+                with pdf:
+                    yield from _ajouter_fichier(archive, sortie, f"{dossier}/rapport_{dossier}.pdf", pdf)
+            else:
+                manquants.append(f"{dossier} : PDF du rapport indisponible")
+
+            for reponse in rapport.reponses.all():
+                for media in reponse.fichiers_media.all():
+                    nom = get_valid_filename(os.path.basename(media.nom_original or media.fichier.name))
+                    try:
+                        fichier = media.fichier.open('rb')
+                    except (OSError, ValueError) as e:
+                        manquants.append(f"{dossier} : média {media.pk} ({nom}) illisible ({e})")
+                        continue
+                    with fichier:
+                        yield from _ajouter_fichier(archive, sortie, f"{dossier}/medias/{media.pk}_{nom}", fichier)
+
+        if manquants:
+            archive.writestr(FICHIER_MANQUANTS, '\n'.join(manquants) + '\n')
+            logger.warning(f"Export ZIP : {len(manquants)} élément(s) manquant(s)")
+
+    yield sortie.vider()
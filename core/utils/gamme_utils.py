@@ -0,0 +1,206 @@
+# Fichier : core/utils/gamme_utils.py
+
+"""
+Gammes d'intervention compilées
+
+Une gamme est la structure d'une intervention (opérations ordonnées, points
+de contrôle, options déjà découpées, graphe des dépendances entre points)
+sous forme de dictionnaire JSON. Elle est compilée à la validation de
+l'intervention et stockée dans VersionIntervention : les OT créés ensuite
+référencent cette version figée et ne relisent plus les lignes vivantes.
+
+Les OT sans version (interventions jamais validées, données antérieures)
+utilisent la structure courante, mise en cache par signature.
+"""
+
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+
+from ..models import Intervention, Operation, PointDeControle, VersionIntervention
+from .cache_utils import cached_value, CHECKLIST_NAMESPACE, GAMME_NAMESPACE
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================================================================
+# COMPILATION
+# ==============================================================================
+
+def _decouper(valeur, separateur, majuscules=False):
+    if not valeur:
+        return []
+    elements = [element.strip() for element in valeur.split(separateur) if element.strip()]
+    return [element.upper() for element in elements] if majuscules else elements
+
+
+def compiler_point(point):
+    """
+    Représentation figée d'un point de contrôle
+    """
+    return {
+        'id': point.id,
+        'label': point.label,
+        'type_champ': point.type_champ,
+        'aide': point.aide,
+        'options': _decouper(point.options, ';'),
+        'est_obligatoire': point.est_obligatoire,
+        'ordre': point.ordre,
+        'permettre_photo': point.permettre_photo,
+        'permettre_audio': point.permettre_audio,
+        'permettre_video': point.permettre_video,
+        'permettre_fichiers': point.permettre_fichiers,
+        'peut_demander_reparation': point.peut_demander_reparation,
+        'types_fichiers_autorises': _decouper(point.types_fichiers_autorises, ',', majuscules=True),
+        'taille_max_fichier_mb': point.taille_max_fichier_mb,
+        'depend_de': point.depend_de_id,
+        'condition_affichage': point.condition_affichage,
+    }
+
+
+def compiler_operations(intervention_id):
+    """
+    Opérations ordonnées et leurs points (2 requêtes)
+    """
+    operations = Operation.objects.filter(
+        intervention_id=intervention_id
+    ).order_by('ordre').prefetch_related(
+        Prefetch('points_de_controle', queryset=PointDeControle.objects.order_by('ordre'))
+    )
+    return [
+        {
+            'id': operation.id,
+            'nom': operation.nom,
+            'ordre': operation.ordre,
+            'points_de_controle': [compiler_point(point) for point in operation.points_de_controle.all()],
+        }
+        for operation in operations
+    ]
+
+
+def compiler_intervention(intervention):
+    """
+    Compile la gamme complète d'une intervention
+
+    Returns:
+        dict: intervention, operations, dependances {parent: [enfants]},
+        points_obligatoires, nb_points
+    """
+    operations = compiler_operations(intervention.pk)
+    points = [point for operation in operations for point in operation['points_de_controle']]
+
+    dependances = {}
+    for point in points:
+        if point['depend_de']:
+            dependances.setdefault(str(point['depend_de']), []).append(point['id'])
+
+    return {
+        'intervention': {
+            'id': intervention.pk,
+            'nom': intervention.nom,
+            'description': intervention.description,
+            'duree_estimee_heures': intervention.duree_estimee_heures,
+            'techniciens_requis': intervention.techniciens_requis,
+        },
+        'operations': operations,
+        'dependances': dependances,
+        'points_obligatoires': [point['id'] for point in points if point['est_obligatoire']],
+        'nb_points': len(points),
+    }
+
+
+def empreinte_contenu(contenu):
+    return hashlib.md5(json.dumps(contenu, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def publier_version(intervention, user=None):
+    """
+    Fige la gamme d'une intervention dans une nouvelle version
+
+    Si la structure n'a pas changé depuis la dernière version, celle-ci est
+    réutilisée (revalider n'ajoute pas de version).
+
+    Returns:
+        VersionIntervention: Version en vigueur
+    """
+    contenu = compiler_intervention(intervention)
+    empreinte = empreinte_contenu(contenu)
+
+    with transaction.atomic():
+        derniere = VersionIntervention.objects.select_for_update().filter(
+            intervention=intervention
+        ).order_by('-numero').first()
+
+        if derniere and derniere.empreinte == empreinte:
+            return derniere
+
+        numero = derniere.numero + 1 if derniere else 1
+        contenu['version'] = numero
+        version = VersionIntervention.objects.create(
+            intervention=intervention,
+            numero=numero,
+            contenu=contenu,
+            empreinte=empreinte,
+            cree_par=user,
+        )
+
+    logger.info(f"Gamme de l'intervention {intervention.pk} figée en version {numero}")
+    return version
+
+
+# ==============================================================================
+# ACCÈS EN CACHE
+# ==============================================================================
+
+def get_gamme_version(version_id):
+    """
+    Contenu d'une version figée (immuable : jamais invalidé)
+    """
+    return cached_value(
+        GAMME_NAMESPACE,
+        (version_id,),
+        lambda: VersionIntervention.objects.values_list('contenu', flat=True).get(pk=version_id),
+        timeout=getattr(settings, 'GMAO_GAMME_CACHE_DURATION', 7 * 86400),
+    )
+
+
+def signature_intervention(intervention_id):
+    """
+    Signature de la structure courante d'une intervention
+
+    Une seule requête d'agrégat : toute modification, ajout ou suppression
+    d'une opération ou d'un point change la signature.
+    """
+    agregat = Intervention.objects.filter(pk=intervention_id).aggregate(
+        maj=Max('date_derniere_maj'),
+        maj_operations=Max('operations__date_derniere_maj'),
+        nb_operations=Count('operations', distinct=True),
+        maj_points=Max('operations__points_de_controle__date_derniere_maj'),
+        nb_points=Count('operations__points_de_controle', distinct=True),
+    )
+    return hashlib.md5(repr(sorted(agregat.items())).encode()).hexdigest()
+
+
+def checklist_intervention(intervention_id):
+    """
+    Opérations courantes d'une intervention, en cache par signature
+    """
+    return cached_value(
+        CHECKLIST_NAMESPACE,
+        (intervention_id, signature_intervention(intervention_id)),
+        lambda: compiler_operations(intervention_id),
+        timeout=getattr(settings, 'GMAO_CHECKLIST_CACHE_DURATION', 86400),
+    )
+
+
+def operations_ordre(ordre):
+    """
+    Opérations à exécuter pour un OT : gamme figée si disponible
+    """
+    if ordre.version_intervention_id:
+        return get_gamme_version(ordre.version_intervention_id)['operations']
+    return checklist_intervention(ordre.intervention_id)
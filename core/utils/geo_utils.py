@@ -0,0 +1,213 @@
+# Fichier : core/utils/geo_utils.py
+
+"""
+Outils géographiques pour l'indexation spatiale des assets
+
+Index par geohash : chaque asset stocke le geohash de sa position. Deux points
+proches partagent le même préfixe, une recherche de voisinage se ramène donc à
+quelques requêtes d'intervalle sur une colonne indexée (cellule centrale + 8
+cellules voisines) au lieu d'un parcours complet de la table.
+"""
+
+from math import radians, cos, sin, asin, sqrt, ceil, floor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_DECODE_MAP = {char: index for index, char in enumerate(GEOHASH_ALPHABET)}
+
+# Caractère suivant 'z' en ASCII : borne haute d'un intervalle de préfixe
+GEOHASH_PREFIX_END = '{'
+
+RAYON_TERRE_M = 6371000
+METRES_PAR_DEGRE = 111320
+
+
+# ==============================================================================
+# ENCODAGE / DÉCODAGE GEOHASH
+# ==============================================================================
+
+def encode_geohash(latitude, longitude, precision=9):
+    """
+    Encode une position en geohash
+
+    Args:
+        latitude: Latitude en degrés
+        longitude: Longitude en degrés
+        precision: Nombre de caractères (9 ≈ cellule de 5 m)
+
+    Returns:
+        str: Geohash de la position
+    """
+    lat_min, lat_max = -90.0, 90.0
+    lng_min, lng_max = -180.0, 180.0
+    latitude, longitude = float(latitude), float(longitude)
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True  # Les bits pairs portent la longitude
+
+    while len(geohash) < precision:
+        if even:
+            milieu = (lng_min + lng_max) / 2
+            if longitude >= milieu:
+                bits = (bits << 1) | 1
+                lng_min = milieu
+            else:
+                bits = bits << 1
+                lng_max = milieu
+        else:
+            milieu = (lat_min + lat_max) / 2
+            if latitude >= milieu:
+                bits = (bits << 1) | 1
+                lat_min = milieu
+            else:
+                bits = bits << 1
+                lat_max = milieu
+
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def decode_geohash_bbox(geohash):
+    """
+    Retourne l'emprise d'une cellule geohash
+
+    Returns:
+        tuple: (lat_min, lat_max, lng_min, lng_max)
+    """
+    lat_min, lat_max = -90.0, 90.0
+    lng_min, lng_max = -180.0, 180.0
+    even = True
+
+    for char in geohash:
+        valeur = GEOHASH_DECODE_MAP[char]
+        for shift in range(4, -1, -1):
+            bit = (valeur >> shift) & 1
+            if even:
+                milieu = (lng_min + lng_max) / 2
+                if bit:
+                    lng_min = milieu
+                else:
+                    lng_max = milieu
+            else:
+                milieu = (lat_min + lat_max) / 2
+                if bit:
+                    lat_min = milieu
+                else:
+                    lat_max = milieu
+            even = not even
+
+    return lat_min, lat_max, lng_min, lng_max
+
+
+def geohash_cell_size_m(precision, latitude=0):
+    """
+    Dimensions approximatives (hauteur, largeur) en mètres d'une cellule geohash
+    """
+    nb_bits = precision * 5
+    lat_bits = floor(nb_bits / 2)
+    lng_bits = ceil(nb_bits / 2)
+
+    hauteur = 180.0 / (2 ** lat_bits) * METRES_PAR_DEGRE
+    largeur = 360.0 / (2 ** lng_bits) * METRES_PAR_DEGRE * cos(radians(float(latitude)))
+    return hauteur, largeur
+
+
+def precision_for_radius(radius_meters, latitude=0, max_precision=9):
+    """
+    Précision geohash la plus fine dont les cellules couvrent le rayon donné
+
+    Avec une cellule au moins aussi grande que le rayon, la cellule centrale et
+    ses 8 voisines contiennent forcément tout le cercle de recherche.
+    """
+    for precision in range(max_precision, 0, -1):
+        hauteur, largeur = geohash_cell_size_m(precision, latitude)
+        if min(hauteur, largeur) >= radius_meters:
+            return precision
+    return 1
+
+
+def geohash_neighbours(geohash):
+    """
+    Retourne la cellule et ses 8 voisines (sans doublons près des pôles)
+    """
+    lat_min, lat_max, lng_min, lng_max = decode_geohash_bbox(geohash)
+    hauteur = lat_max - lat_min
+    largeur = lng_max - lng_min
+    centre_lat = (lat_min + lat_max) / 2
+    centre_lng = (lng_min + lng_max) / 2
+
+    cellules = []
+    for d_lat in (-1, 0, 1):
+        lat = centre_lat + d_lat * hauteur
+        if not -90.0 <= lat <= 90.0:
+            continue
+        for d_lng in (-1, 0, 1):
+            lng = centre_lng + d_lng * largeur
+            # Passage de l'antiméridien
+            lng = (lng + 180.0) % 360.0 - 180.0
+            cellule = encode_geohash(lat, lng, len(geohash))
+            if cellule not in cellules:
+                cellules.append(cellule)
+
+    return cellules
+
+
+# ==============================================================================
+# DISTANCES
+# ==============================================================================
+
+def haversine_distances(latitude, longitude, latitudes, longitudes):
+    """
+    Distances de Haversine (en mètres) entre un point et une liste de points
+
+    Le calcul est vectorisé avec numpy quand il est disponible.
+
+    Args:
+        latitude, longitude: Point de référence
+        latitudes, longitudes: Séquences de coordonnées des candidats
+
+    Returns:
+        list: Distances en mètres, dans l'ordre des candidats
+    """
+    if not latitudes:
+        return []
+
+    lat_ref, lng_ref = radians(float(latitude)), radians(float(longitude))
+
+    if np is not None:
+        lats = np.radians(np.asarray(latitudes, dtype=float))
+        lngs = np.radians(np.asarray(longitudes, dtype=float))
+        a = (np.sin((lats - lat_ref) / 2) ** 2 +
+             np.cos(lat_ref) * np.cos(lats) * np.sin((lngs - lng_ref) / 2) ** 2)
+        return (2 * RAYON_TERRE_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).tolist()
+
+    distances = []
+    cos_ref = cos(lat_ref)
+    for lat, lng in zip(latitudes, longitudes):
+        lat, lng = radians(float(lat)), radians(float(lng))
+        a = sin((lat - lat_ref) / 2) ** 2 + cos_ref * cos(lat) * sin((lng - lng_ref) / 2) ** 2
+        distances.append(2 * RAYON_TERRE_M * asin(sqrt(min(a, 1.0))))
+    return distances
+
+
+def metres_to_degrees(radius_meters, latitude):
+    """
+    Convertit un rayon en mètres en deltas (latitude, longitude) en degrés
+    """
+    delta_lat = radius_meters / METRES_PAR_DEGRE
+    delta_lng = radius_meters / (METRES_PAR_DEGRE * max(cos(radians(float(latitude))), 1e-6))
+    return delta_lat, delta_lng
@@ -0,0 +1,499 @@
+# Fichier : core/utils/media_processor.py
+
+"""
+Traitement des médias en arrière-plan
+
+Les vues d'upload enregistrent le fichier brut dans le stockage par contenu
+(stockage_media) et répondent immédiatement (statut_traitement EN_ATTENTE).
+Le traitement est ensuite confié à un pool de threads, après validation de
+la transaction. Il porte sur le contenu, une seule fois par empreinte :
+
+- pour les images : résolution, coordonnées GPS EXIF (latitude_capture /
+  longitude_capture), vignettes multi-tailles et compression unique à la
+  qualité configurée (MEDIA_COMPRESSION), conservée seulement si elle
+  réduit le fichier ;
+- statut_traitement TERMINE ou ERREUR.
+
+Le résultat est recopié sur tous les FichierMedia qui référencent ce
+contenu ; un nouvel upload d'un contenu déjà traité est terminé d'emblée.
+
+Les médias restés EN_ATTENTE (arrêt du serveur, historique antérieur) sont
+traités par lots, le travail Pillow réparti sur un pool de processus
+(traiter_file_attente, commande `traiter_medias`).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from ..models import FichierMedia, ContenuMedia
+from .stockage_media import (
+    acquerir_upload, acquerir_fichier_local, chemin_contenu, chemin_vignette
+)
+from .traitement_image import Image, traiter_image_fichier, traiter_image_isolee
+
+logger = logging.getLogger(__name__)
+
+STATUT_EN_ATTENTE = 'EN_ATTENTE'
+STATUT_EN_COURS = 'EN_COURS'
+STATUT_TERMINE = 'TERMINE'
+STATUT_ERREUR = 'ERREUR'
+STATUTS_FINAUX = (STATUT_TERMINE, STATUT_ERREUR)
+
+TAILLES_VIGNETTES = (160, 480, 1024)
+EXTENSIONS_IMAGE = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff')
+
+# ==============================================================================
+# ÉTAPES DU TRAITEMENT
+# ==============================================================================
+
+def calculer_empreinte(fichier, taille_bloc=64 * 1024):
+    """
+    SHA-256 d'un fichier du stockage, lu par blocs
+    """
+    empreinte = hashlib.sha256()
+    fichier.open('rb')
+    try:
+        for bloc in fichier.chunks(taille_bloc):
+            empreinte.update(bloc)
+    finally:
+        fichier.close()
+    return empreinte.hexdigest()
+
+
+def est_image(media):
+    extension = os.path.splitext(media.nom_original or media.fichier.name)[1].lower()
+    return media.type_fichier == 'PHOTO' or extension in EXTENSIONS_IMAGE
+
+
+def arguments_image(contenu):
+    """
+    Arguments de traiter_image_fichier pour un contenu (noms de sortie compris)
+    """
+    tailles = getattr(settings, 'GMAO_MEDIA_VIGNETTES', TAILLES_VIGNETTES)
+    return (
+        str(settings.MEDIA_ROOT),
+        contenu.fichier.name,
+        {str(taille): chemin_vignette(contenu.empreinte, taille) for taille in tailles},
+        chemin_contenu(contenu.empreinte, '.jpg', suffixe='_compresse'),
+        dict(getattr(settings, 'MEDIA_COMPRESSION', {})),
+    )
+
+
+def appliquer_resultat(contenu, resultats=None, erreur=None):
+    """
+    Reporte le résultat d'un traitement sur le contenu (sans l'enregistrer)
+
+    Returns:
+        str: Ancien nom du fichier à supprimer après propagation, ou None
+    """
+    if erreur is not None:
+        contenu.resultats = {'erreur': str(erreur)}
+        contenu.statut_traitement = STATUT_ERREUR
+        return None
+
+    resultats = dict(resultats or {})
+    ancien_nom = None
+    nouveau_nom = resultats.pop('fichier', None)
+    if nouveau_nom and nouveau_nom != contenu.fichier.name:
+        ancien_nom = contenu.fichier.name
+        contenu.fichier.name = nouveau_nom
+    contenu.resultats = resultats
+    contenu.statut_traitement = STATUT_TERMINE
+    return ancien_nom
+
+
+def traiter_contenu(contenu, media):
+    """
+    Traite un contenu réservé (EN_COURS) et enregistre le résultat
+
+    `media` (une des références) sert à reconnaître le type de fichier.
+
+    Returns:
+        str: Ancien nom du fichier à supprimer après propagation, ou None
+    """
+    try:
+        resultats = {}
+        if Image is not None and est_image(media):
+            resultats = traiter_image_fichier(*arguments_image(contenu))
+        ancien_nom = appliquer_resultat(contenu, resultats)
+    except Exception as e:
+        logger.exception(f"Erreur de traitement du contenu {contenu.empreinte}")
+        ancien_nom = appliquer_resultat(contenu, erreur=e)
+
+    contenu.save(update_fields=['fichier', 'resultats', 'statut_traitement'])
+    return ancien_nom
+
+
+CHAMPS_RESULTAT = [
+    'fichier', 'hash_fichier', 'taille_originale', 'statut_traitement', 'metadonnees',
+    'taille_compresse', 'taille_octets', 'traite_automatiquement', 'resolution',
+    'latitude_capture', 'longitude_capture', 'coordonnees_gps',
+]
+
+
+def champs_resultat(contenu):
+    """
+    Valeurs des champs de FichierMedia issues du traitement d'un contenu
+    """
+    resultats = contenu.resultats or {}
+    champs = {
+        'fichier': contenu.fichier.name,
+        'hash_fichier': contenu.empreinte,
+        'taille_originale': contenu.taille_originale,
+        'statut_traitement': contenu.statut_traitement,
+    }
+    if contenu.statut_traitement == STATUT_ERREUR:
+        champs['metadonnees'] = {'erreur_traitement': resultats.get('erreur')}
+        return champs
+
+    taille = resultats.get('taille_compresse') or contenu.taille_originale
+    champs.update(
+        taille_compresse=taille,
+        taille_octets=taille,
+        traite_automatiquement=True,
+        metadonnees={'vignettes': resultats.get('vignettes', {})},
+    )
+    if resultats.get('resolution'):
+        champs['resolution'] = resultats['resolution']
+    if resultats.get('latitude') is not None:
+        champs.update(
+            latitude_capture=resultats['latitude'],
+            longitude_capture=resultats['longitude'],
+            coordonnees_gps={
+                'latitude': resultats['latitude'],
+                'longitude': resultats['longitude'],
+                'source': 'EXIF',
+            },
+        )
+    return champs
+
+
+def propager_resultat(contenu):
+    """
+    Recopie le résultat du traitement sur toutes les références (1 requête)
+    """
+    return FichierMedia.objects.filter(hash_fichier=contenu.empreinte).update(**champs_resultat(contenu))
+
+
+def _contenu_du_media(media):
+    """
+    Contenu référencé par un média
+
+    Un média antérieur au stockage par contenu est adopté : son fichier est
+    déplacé sous son empreinte (ou supprimé si ce contenu existe déjà).
+    """
+    if media.hash_fichier:
+        contenu = ContenuMedia.objects.filter(empreinte=media.hash_fichier).first()
+        if contenu is not None:
+            return contenu
+
+    empreinte = media.hash_fichier or calculer_empreinte(media.fichier)
+    contenu, _ = acquerir_fichier_local(media.fichier.path, empreinte, media.nom_original or media.fichier.name)
+    FichierMedia.objects.filter(pk=media.pk).update(fichier=contenu.fichier.name, hash_fichier=empreinte)
+    media.fichier.name, media.hash_fichier = contenu.fichier.name, empreinte
+    return contenu
+
+
+def _reserver_contenu(contenu):
+    return ContenuMedia.objects.filter(
+        pk=contenu.pk, statut_traitement=STATUT_EN_ATTENTE
+    ).update(statut_traitement=STATUT_EN_COURS)
+
+
+def traiter_media(media_id):
+    """
+    Traite un média enregistré brut
+
+    Returns:
+        str: Statut de traitement du média (None si le média n'existe plus
+        ou est déjà pris en charge)
+    """
+    # Réserve le média : un autre worker ne le traitera pas en parallèle
+    reserve = FichierMedia.objects.filter(
+        pk=media_id, statut_traitement=STATUT_EN_ATTENTE
+    ).update(statut_traitement=STATUT_EN_COURS)
+    if not reserve:
+        return None
+
+    media = FichierMedia.objects.get(pk=media_id)
+    try:
+        contenu = _contenu_du_media(media)
+    except Exception as e:
+        logger.exception(f"Erreur de traitement du média {media_id}")
+        FichierMedia.objects.filter(pk=media_id).update(
+            statut_traitement=STATUT_ERREUR,
+            metadonnees=dict(media.metadonnees or {}, erreur_traitement=str(e)),
+        )
+        return STATUT_ERREUR
+
+    # Contenu déjà traité (autre référence) : simple recopie
+    if contenu.statut_traitement in STATUTS_FINAUX:
+        propager_resultat(contenu)
+        return contenu.statut_traitement
+
+    if not _reserver_contenu(contenu):
+        # Traité par un autre worker, qui propagera le résultat
+        FichierMedia.objects.filter(pk=media_id).update(statut_traitement=STATUT_EN_ATTENTE)
+        contenu.refresh_from_db()
+        if contenu.statut_traitement in STATUTS_FINAUX:
+            propager_resultat(contenu)
+            return contenu.statut_traitement
+        return STATUT_EN_ATTENTE
+
+    ancien_nom = traiter_contenu(contenu, media)
+    propager_resultat(contenu)
+    if ancien_nom:
+        contenu.fichier.storage.delete(ancien_nom)
+    return contenu.statut_traitement
+
+
+# ==============================================================================
+# CRÉATION DES MÉDIAS
+# ==============================================================================
+
+def referencer_contenu(contenu, **champs):
+    """
+    Crée un FichierMedia sur un contenu déjà référencé (acquerir_*)
+
+    Si le contenu a déjà été traité, le média est créé terminé ; sinon il
+    est confié au pool de traitement.
+    """
+    media = FichierMedia(**champs)
+    if contenu.statut_traitement in STATUTS_FINAUX:
+        for champ, valeur in champs_resultat(contenu).items():
+            setattr(media, champ, valeur)
+    else:
+        media.fichier = contenu.fichier.name
+        media.hash_fichier = contenu.empreinte
+        media.statut_traitement = STATUT_EN_ATTENTE
+    media.save()
+
+    if media.statut_traitement == STATUT_EN_ATTENTE:
+        planifier_traitement(media)
+    return media
+
+
+def creer_media(fichier, **champs):
+    """
+    Enregistre un fichier uploadé et crée le FichierMedia correspondant
+
+    Le fichier n'est écrit que si son contenu n'est pas déjà stocké.
+    """
+    contenu, _ = acquerir_upload(fichier)
+    champs.setdefault('nom_original', fichier.name)
+    champs.setdefault('taille_octets', fichier.size)
+    return referencer_contenu(contenu, **champs)
+
+
+# ==============================================================================
+# POOL DE TRAITEMENT
+# ==============================================================================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'GMAO_MEDIA_WORKERS', 2),
+                thread_name_prefix='gmao-media',
+            )
+        return _executor
+
+
+def _traiter_en_arriere_plan(media_id):
+    close_old_connections()
+    try:
+        traiter_media(media_id)
+    except Exception:
+        logger.exception(f"Traitement du média {media_id} interrompu")
+    finally:
+        close_old_connections()
+
+
+def _soumettre(media_id):
+    if getattr(settings, 'GMAO_MEDIA_TRAITEMENT_SYNCHRONE', False):
+        traiter_media(media_id)
+    else:
+        _get_executor().submit(_traiter_en_arriere_plan, media_id)
+
+
+def planifier_traitement(media):
+    """
+    Confie un média brut au pool de traitement, après validation de la transaction
+    """
+    transaction.on_commit(lambda: _soumettre(media.pk))
+
+
+# ==============================================================================
+# TRAITEMENT PAR LOTS
+# ==============================================================================
+
+def traiter_lot(taille_lot, apres_id=0, executor=None):
+    """
+    Traite un lot de la file d'attente (FichierMedia EN_ATTENTE, par
+    identifiant croissant au-delà de `apres_id`)
+
+    Le travail Pillow est réparti sur `executor` (pool de processus) ; seul
+    le processus appelant accède à la base. Les résultats sont enregistrés
+    par bulk_update, en un nombre de requêtes indépendant de la taille du
+    lot (hors réservation des contenus et adoption des médias antérieurs
+    au stockage par contenu).
+
+    Returns:
+        dict: Métriques du lot, None si la file est vide
+    """
+    debut = time.monotonic()
+    media_ids = list(
+        FichierMedia.objects.filter(statut_traitement=STATUT_EN_ATTENTE, pk__gt=apres_id)
+        .order_by('pk').values_list('pk', flat=True)[:taille_lot]
+    )
+    if not media_ids:
+        return None
+
+    FichierMedia.objects.filter(
+        pk__in=media_ids, statut_traitement=STATUT_EN_ATTENTE
+    ).update(statut_traitement=STATUT_EN_COURS)
+    medias = list(FichierMedia.objects.filter(pk__in=media_ids, statut_traitement=STATUT_EN_COURS))
+
+    contenus = ContenuMedia.objects.in_bulk(
+        {media.hash_fichier for media in medias if media.hash_fichier}, field_name='empreinte'
+    )
+    a_traiter = {}      # empreinte -> (contenu réservé, média représentatif)
+    finis = {}          # empreinte -> contenu au statut final
+    ailleurs = []       # médias dont le contenu est traité par un autre worker
+    medias_en_erreur = []
+
+    for media in medias:
+        contenu = contenus.get(media.hash_fichier)
+        if contenu is None:
+            try:
+                contenu = _contenu_du_media(media)
+            except Exception as e:
+                logger.warning(f"Média {media.pk} non traité: {e}")
+                media.statut_traitement = STATUT_ERREUR
+                media.metadonnees = dict(media.metadonnees or {}, erreur_traitement=str(e))
+                medias_en_erreur.append(media)
+                continue
+            contenus[contenu.empreinte] = contenu
+
+        if contenu.empreinte in a_traiter or contenu.empreinte in finis:
+            continue
+        if contenu.statut_traitement in STATUTS_FINAUX:
+            finis[contenu.empreinte] = contenu
+        elif _reserver_contenu(contenu):
+            a_traiter[contenu.empreinte] = (contenu, media)
+        else:
+            ailleurs.append(media.pk)
+
+    # Travail Pillow réparti sur le pool
+    images = [contenu for contenu, media in a_traiter.values() if Image is not None and est_image(media)]
+    appliquer = executor.map if executor is not None else map
+    sorties = appliquer(traiter_image_isolee, [arguments_image(contenu) for contenu in images])
+
+    anciens_noms = []
+    octets_avant = octets_apres = 0
+    for contenu, (resultats, erreur) in zip(images, sorties):
+        if erreur is not None:
+            logger.warning(f"Erreur de traitement du contenu {contenu.empreinte}: {erreur}")
+        else:
+            octets_avant += contenu.taille_originale
+            octets_apres += resultats['taille_compresse']
+        ancien_nom = appliquer_resultat(contenu, resultats, erreur)
+        if ancien_nom:
+            anciens_noms.append(ancien_nom)
+    for contenu, _ in a_traiter.values():
+        if contenu.statut_traitement == STATUT_EN_COURS:
+            appliquer_resultat(contenu, {})
+        finis[contenu.empreinte] = contenu
+
+    with transaction.atomic():
+        ContenuMedia.objects.bulk_update(
+            [contenu for contenu, _ in a_traiter.values()],
+            ['fichier', 'resultats', 'statut_traitement'],
+        )
+        references = list(FichierMedia.objects.filter(hash_fichier__in=list(finis)))
+        for reference in references:
+            for champ, valeur in champs_resultat(finis[reference.hash_fichier]).items():
+                setattr(reference, champ, valeur)
+        FichierMedia.objects.bulk_update(references, CHAMPS_RESULTAT, batch_size=taille_lot)
+        FichierMedia.objects.bulk_update(medias_en_erreur, ['statut_traitement', 'metadonnees'])
+        FichierMedia.objects.filter(pk__in=ailleurs).update(statut_traitement=STATUT_EN_ATTENTE)
+
+    for nom in anciens_noms:
+        default_storage.delete(nom)
+
+    duree = time.monotonic() - debut
+    return {
+        'dernier_id': media_ids[-1],
+        'medias': len(medias),
+        'contenus': len(a_traiter),
+        'erreurs': len(medias_en_erreur) + sum(
+            1 for contenu, _ in a_traiter.values() if contenu.statut_traitement == STATUT_ERREUR
+        ),
+        'octets_avant': octets_avant,
+        'octets_apres': octets_apres,
+        'duree': duree,
+        'debit': len(medias) / duree if duree else 0.0,
+    }
+
+
+def traiter_file_attente(taille_lot=None, processus=None, limite=None, rapport=None):
+    """
+    Vide la file d'attente des médias, lot par lot
+
+    Args:
+        taille_lot: Médias par lot (GMAO_MEDIA_BATCH_SIZE, 200 par défaut)
+        processus: Taille du pool de processus (nombre de cœurs par défaut ;
+            1 pour tout traiter dans le processus courant)
+        limite: Nombre maximal de médias traités
+        rapport: Fonction appelée avec les métriques de chaque lot
+
+    Returns:
+        dict: Métriques cumulées
+    """
+    taille_lot = taille_lot or getattr(settings, 'GMAO_MEDIA_BATCH_SIZE', 200)
+    processus = processus or os.cpu_count() or 1
+
+    # Processus démarrés par spawn : aucun verrou ni connexion hérités du
+    # serveur ; traitement_image ne dépend pas de Django
+    executor = None
+    if processus > 1:
+        executor = ProcessPoolExecutor(max_workers=processus, mp_context=get_context('spawn'))
+
+    totaux = dict.fromkeys(('medias', 'contenus', 'erreurs', 'octets_avant', 'octets_apres', 'duree'), 0)
+    apres_id = 0
+    try:
+        while limite is None or totaux['medias'] < limite:
+            taille = taille_lot if limite is None else min(taille_lot, limite - totaux['medias'])
+            metriques = traiter_lot(taille, apres_id, executor)
+            if metriques is None:
+                break
+
+            apres_id = metriques['dernier_id']
+            for cle in totaux:
+                totaux[cle] += metriques[cle]
+            logger.info(
+                f"Lot de {metriques['medias']} média(s) traité en {metriques['duree']:.2f}s "
+                f"({metriques['debit']:.1f} média(s)/s, {metriques['erreurs']} erreur(s))"
+            )
+            if rapport:
+                rapport(metriques)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    totaux['debit'] = totaux['medias'] / totaux['duree'] if totaux['duree'] else 0.0
+    return totaux
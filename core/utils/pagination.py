@@ -0,0 +1,249 @@
+# Fichier : core/utils/pagination.py
+
+"""
+Pagination par clé (keyset) pour les longues listes (OT, demandes...)
+
+Une page est lue après (ou avant) la dernière ligne de la page courante
+sur l'ordre décroissant (date_creation, id) :
+
+    WHERE (date_creation, id) < (:date, :id) ORDER BY date_creation DESC, id DESC LIMIT n
+
+Le coût d'une page ne dépend pas de sa profondeur, contrairement à OFFSET,
+et aucun COUNT(*) n'est nécessaire pour savoir s'il y a une page suivante
+(on lit une ligne de plus). Le total, facultatif, est compté jusqu'à un
+plafond (GMAO_COMPTE_PLAFOND) puis estimé par le planificateur sous
+PostgreSQL.
+
+Le curseur est opaque : base64 de [sens, valeurs de la clé].
+"""
+
+import base64
+import json
+import logging
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+logger = logging.getLogger(__name__)
+
+CLE_DEFAUT = ('date_creation', 'id')
+SUIVANT = 's'
+PRECEDENT = 'p'
+
+
+# ==============================================================================
+# CURSEURS
+# ==============================================================================
+
+def encoder_curseur(sens, valeurs):
+    donnees = json.dumps([sens] + [str(valeur) for valeur in valeurs])
+    return base64.urlsafe_b64encode(donnees.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur, modele, cle):
+    """
+    Sens et valeurs typées de la clé d'un curseur
+
+    Raises:
+        ValueError: Curseur invalide
+    """
+    try:
+        donnees = json.loads(base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4)))
+        sens, *valeurs = donnees
+        if sens not in (SUIVANT, PRECEDENT) or len(valeurs) != len(cle):
+            raise ValueError
+        valeurs = [modele._meta.get_field(champ).to_python(valeur) for champ, valeur in zip(cle, valeurs)]
+    except Exception:
+        raise ValueError("Curseur invalide")
+    if any(valeur is None for valeur in valeurs):
+        raise ValueError("Curseur invalide")
+    return sens, valeurs
+
+
+def _avant(cle, valeurs):
+    """
+    Condition « clé < valeurs » en ordre lexicographique
+    """
+    condition = Q()
+    for i, champ in enumerate(cle):
+        egalites = {cle[j]: valeurs[j] for j in range(i)}
+        condition |= Q(**egalites, **{f"{champ}__lt": valeurs[i]})
+    return condition
+
+
+def _apres(cle, valeurs):
+    condition = Q()
+    for i, champ in enumerate(cle):
+        egalites = {cle[j]: valeurs[j] for j in range(i)}
+        condition |= Q(**egalites, **{f"{champ}__gt": valeurs[i]})
+    return condition
+
+
+# ==============================================================================
+# PAGE
+# ==============================================================================
+
+class PageCurseur:
+    """
+    Page d'une pagination par clé (itérable comme une page de Paginator)
+    """
+
+    def __init__(self, object_list, cle, a_precedente, a_suivante):
+        self.object_list = object_list
+        self.has_previous = a_precedente
+        self.has_next = a_suivante
+        self._cle = cle
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+    def _valeurs(self, objet):
+        return [getattr(objet, champ) for champ in self._cle]
+
+    @property
+    def curseur_suivant(self):
+        if self.has_next and self.object_list:
+            return encoder_curseur(SUIVANT, self._valeurs(self.object_list[-1]))
+        return None
+
+    @property
+    def curseur_precedent(self):
+        if self.has_previous and self.object_list:
+            return encoder_curseur(PRECEDENT, self._valeurs(self.object_list[0]))
+        return None
+
+
+def paginer(queryset, curseur=None, taille=20, cle=CLE_DEFAUT):
+    """
+    Page de `queryset` dans l'ordre décroissant de `cle`
+
+    Args:
+        curseur: Curseur reçu d'une page précédente (None : première page)
+        taille: Nombre d'objets par page
+        cle: Champs de la clé, le dernier unique (id)
+
+    Raises:
+        ValueError: Curseur invalide
+    """
+    ordre_decroissant = [f"-{champ}" for champ in cle]
+
+    if not curseur:
+        objets = list(queryset.order_by(*ordre_decroissant)[:taille + 1])
+        return PageCurseur(objets[:taille], cle, False, len(objets) > taille)
+
+    sens, valeurs = decoder_curseur(curseur, queryset.model, cle)
+    if sens == SUIVANT:
+        objets = list(queryset.filter(_avant(cle, valeurs)).order_by(*ordre_decroissant)[:taille + 1])
+        return PageCurseur(objets[:taille], cle, True, len(objets) > taille)
+
+    # Page précédente : lue en ordre croissant à partir du curseur, puis remise à l'endroit
+    objets = list(queryset.filter(_apres(cle, valeurs)).order_by(*cle)[:taille + 1])
+    return PageCurseur(objets[:taille][::-1], cle, len(objets) > taille, True)
+
+
+def compter(queryset, plafond=None):
+    """
+    Nombre d'objets, exact jusqu'au plafond, estimé au-delà
+
+    Returns:
+        tuple: (nombre, exact)
+    """
+    if plafond is None:
+        plafond = getattr(settings, 'GMAO_COMPTE_PLAFOND', 1000)
+    queryset = queryset.order_by()
+    nombre = queryset[:plafond + 1].count()
+    if nombre <= plafond:
+        return nombre, True
+
+    if connections[queryset.db].vendor == 'postgresql':
+        try:
+            plan = json.loads(queryset.explain(format='json'))
+            return max(int(plan[0]['Plan']['Plan Rows']), plafond), False
+        except Exception as e:
+            logger.warning(f"Estimation du nombre de lignes impossible: {e}")
+    return plafond, False
+
+
+# ==============================================================================
+# API REST
+# ==============================================================================
+
+class PaginationCurseur(BasePagination):
+    """
+    Pagination DRF par clé
+
+    Paramètres : ?cursor=<curseur>&page_size=<taille>&count=1 (total
+    facultatif, plafonné). Réponse : {"next", "previous", "results"} et,
+    sur demande, {"count", "count_exact"}.
+
+    La clé est l'attribut `pagination_cle` de la vue (défaut date_creation, id).
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        taille = api_settings.PAGE_SIZE or 20
+        try:
+            taille = int(request.query_params.get(self.page_size_query_param, taille))
+        except ValueError:
+            pass
+        return max(1, min(taille, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cle = getattr(view, 'pagination_cle', CLE_DEFAUT)
+        self.compte = None
+        try:
+            self.page = paginer(
+                queryset, request.query_params.get(self.cursor_query_param),
+                self.get_page_size(request), self.cle
+            )
+        except ValueError as e:
+            raise NotFound(str(e))
+
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.compte = compter(queryset)
+        return list(self.page)
+
+    def _lien(self, curseur):
+        if curseur is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(remove_query_param(url, 'page'), self.cursor_query_param, curseur)
+
+    def get_paginated_response(self, data):
+        reponse = {
+            'next': self._lien(self.page.curseur_suivant),
+            'previous': self._lien(self.page.curseur_precedent),
+        }
+        if self.compte is not None:
+            reponse['count'], reponse['count_exact'] = self.compte
+        reponse['results'] = data
+        return Response(reponse)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_exact': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
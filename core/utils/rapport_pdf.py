@@ -0,0 +1,322 @@
+# Fichier : core/utils/rapport_pdf.py
+
+"""
+Génération des rapports d'exécution en PDF (WeasyPrint)
+
+Un rapport finalisé est rendu une seule fois, en arrière-plan, dès sa
+finalisation (signal post_save) : le PDF est rangé hors de MEDIA_ROOT sous
+la date de dernière modification du rapport
+(GMAO_RAPPORTS_PDF_ROOT/<id>/<date_derniere_maj>.pdf) et les
+téléchargements suivants sont servis directement depuis le disque. Toute
+modification du rapport change la clé : l'ancienne version est remplacée
+au rendu suivant.
+
+Les rapports non finalisés sont rendus à la demande, sans cache.
+
+Les ressources du template (/media/, /static/) sont lues sur le disque
+local, jamais via le serveur web.
+
+Le rendu par lots (commande `generer_rapports_pdf`) répartit les rapports
+d'une zone ou d'un mois sur un pool de processus.
+"""
+
+import functools
+import glob
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import get_context
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.db import close_old_connections, transaction
+from django.template.loader import get_template
+from django.utils import timezone
+
+from ..models import RapportExecution, DemandeReparation
+from .traitement_image import ecrire_atomique
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_RAPPORT = 'core/export/rapport_pdf_weasy.html'
+STATUTS_FIGES = ('FINALISE', 'ARCHIVE')
+
+
+@functools.lru_cache(maxsize=None)
+def charger_weasyprint():
+    """
+    Module weasyprint, ou None s'il n'est pas utilisable
+
+    Importé à la première utilisation seulement : l'import est lent et
+    affiche un avertissement quand les bibliothèques système manquent.
+    """
+    try:
+        import weasyprint
+    except (ImportError, OSError):
+        # OSError : bibliothèques système (Pango) absentes
+        return None
+    return weasyprint
+
+
+def pdf_disponible():
+    return charger_weasyprint() is not None
+
+
+def dossier_pdf():
+    return str(getattr(settings, 'GMAO_RAPPORTS_PDF_ROOT', settings.BASE_DIR / 'rapports_pdf'))
+
+
+def chemin_pdf(rapport):
+    """
+    Chemin du PDF de la version courante du rapport
+    """
+    version = rapport.date_derniere_maj.strftime('%Y%m%d%H%M%S%f')
+    return os.path.join(dossier_pdf(), str(rapport.pk), f"{version}.pdf")
+
+
+def pdf_en_cache(rapport):
+    """
+    Chemin du PDF déjà rendu pour la version courante du rapport, ou None
+    """
+    if rapport.statut_rapport not in STATUTS_FIGES:
+        return None
+    chemin = chemin_pdf(rapport)
+    return chemin if os.path.exists(chemin) else None
+
+
+def nom_telechargement(rapport):
+    return f"rapport_moderne_OT_{rapport.ordre_de_travail_id}.pdf"
+
+
+# ==============================================================================
+# RENDU
+# ==============================================================================
+
+def contexte_rapport(rapport):
+    """
+    Contexte du template PDF, en un nombre fixe de requêtes
+
+    Les compteurs de photos et documents sont calculés sur les médias
+    préchargés.
+    """
+    reponses = (
+        rapport.reponses
+        .select_related('point_de_controle__operation', 'saisi_par')
+        .prefetch_related('fichiers_media')
+        .order_by('point_de_controle__operation__ordre', 'point_de_controle__ordre')
+    )
+
+    reponses_avec_medias = []
+    for reponse in reponses:
+        medias = list(reponse.fichiers_media.all())
+        reponses_avec_medias.append({
+            'reponse': reponse,
+            'medias': medias,
+            'nb_photos': sum(1 for media in medias if media.type_fichier == 'PHOTO'),
+            'nb_documents': sum(1 for media in medias if media.type_fichier == 'DOCUMENT'),
+        })
+
+    return {
+        'rapport': rapport,
+        'ordre': rapport.ordre_de_travail,
+        'reponses_avec_medias': reponses_avec_medias,
+        'demandes_reparation': list(
+            DemandeReparation.objects.filter(ordre_de_travail=rapport.ordre_de_travail_id)
+            .order_by('-date_creation')
+        ),
+        'date_export': timezone.now(),
+    }
+
+
+def _chemin_local(chemin_url):
+    """
+    Fichier local d'une URL /media/ ou /static/, ou None
+    """
+    if chemin_url.startswith(settings.MEDIA_URL):
+        chemin = os.path.join(str(settings.MEDIA_ROOT), chemin_url[len(settings.MEDIA_URL):])
+        return chemin if os.path.isfile(chemin) else None
+    if chemin_url.startswith(settings.STATIC_URL):
+        return finders.find(chemin_url[len(settings.STATIC_URL):])
+    return None
+
+
+def charger_ressource(url):
+    """
+    url_fetcher WeasyPrint : médias et fichiers statiques lus sur le disque
+    """
+    if url.startswith('file:'):
+        chemin = _chemin_local(unquote(urlparse(url).path))
+        if chemin is None:
+            # Pas d'accès au reste du système de fichiers
+            raise ValueError(f"Ressource introuvable: {url}")
+        return {'file_obj': open(chemin, 'rb'), 'filename': chemin}
+    return charger_weasyprint().default_url_fetcher(url)
+
+
+def rendre_pdf(rapport):
+    """
+    Rend le PDF d'un rapport
+
+    Returns:
+        bytes: Contenu du PDF
+
+    Raises:
+        RuntimeError: WeasyPrint indisponible
+    """
+    weasyprint = charger_weasyprint()
+    if weasyprint is None:
+        raise RuntimeError("WeasyPrint n'est pas installé")
+
+    html = get_template(TEMPLATE_RAPPORT).render(contexte_rapport(rapport))
+    return weasyprint.HTML(
+        string=html, base_url='file:///', url_fetcher=charger_ressource
+    ).write_pdf()
+
+
+def generer_pdf_rapport(rapport_id):
+    """
+    Rend et enregistre le PDF de la version courante d'un rapport figé
+
+    Sans effet si cette version est déjà rendue ; les versions précédentes
+    sont supprimées.
+
+    Returns:
+        str: Chemin du PDF, None si le rapport n'existe plus ou n'est pas figé
+    """
+    rapport = (
+        RapportExecution.objects.select_related('ordre_de_travail', 'cree_par')
+        .filter(pk=rapport_id, statut_rapport__in=STATUTS_FIGES).first()
+    )
+    if rapport is None:
+        return None
+
+    chemin = chemin_pdf(rapport)
+    if os.path.exists(chemin):
+        return chemin
+
+    ecrire_atomique(chemin, rendre_pdf(rapport))
+    for ancien in glob.glob(os.path.join(os.path.dirname(chemin), '*.pdf')):
+        if ancien != chemin:
+            os.remove(ancien)
+
+    logger.info(f"PDF du rapport {rapport_id} généré")
+    return chemin
+
+
+# ==============================================================================
+# RENDU EN ARRIÈRE-PLAN
+# ==============================================================================
+
+_executor = None
+_executor_lock = threading.Lock()
+_en_cours = set()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'GMAO_PDF_WORKERS', 1),
+                thread_name_prefix='gmao-pdf',
+            )
+        return _executor
+
+
+def _generer_en_arriere_plan(rapport_id):
+    close_old_connections()
+    try:
+        generer_pdf_rapport(rapport_id)
+    except Exception:
+        logger.exception(f"Génération du PDF du rapport {rapport_id} interrompue")
+    finally:
+        with _executor_lock:
+            _en_cours.discard(rapport_id)
+        close_old_connections()
+
+
+def _soumettre(rapport_id):
+    if getattr(settings, 'GMAO_PDF_GENERATION_SYNCHRONE', False):
+        generer_pdf_rapport(rapport_id)
+        return
+
+    with _executor_lock:
+        if rapport_id in _en_cours:
+            return
+        _en_cours.add(rapport_id)
+    _get_executor().submit(_generer_en_arriere_plan, rapport_id)
+
+
+def planifier_pdf(rapport):
+    """
+    Confie le rendu du PDF au pool, après validation de la transaction
+    """
+    if rapport.statut_rapport not in STATUTS_FIGES or not pdf_disponible():
+        return
+    transaction.on_commit(lambda: _soumettre(rapport.pk))
+
+
+def generation_en_cours(rapport):
+    with _executor_lock:
+        return rapport.pk in _en_cours
+
+
+# ==============================================================================
+# RENDU PAR LOTS
+# ==============================================================================
+
+def _initialiser_processus():
+    import django
+    django.setup()
+
+
+def generer_pdf_rapports(rapport_ids, processus=None, rapport=None):
+    """
+    Rend les PDF de plusieurs rapports figés, répartis sur un pool de processus
+
+    Args:
+        rapport_ids: Identifiants des rapports
+        processus: Taille du pool (nombre de cœurs par défaut ; 1 pour tout
+            rendre dans le processus courant)
+        rapport: Fonction appelée avec (rapport_id, chemin, erreur) pour
+            chaque rapport
+
+    Returns:
+        tuple: (nombre de PDF disponibles, nombre d'erreurs)
+    """
+    rapport_ids = list(rapport_ids)
+    processus = min(processus or os.cpu_count() or 1, len(rapport_ids) or 1)
+    nb_ok = nb_erreurs = 0
+
+    def resultat(rapport_id, chemin, erreur):
+        nonlocal nb_ok, nb_erreurs
+        if erreur is None:
+            nb_ok += 1
+        else:
+            nb_erreurs += 1
+            logger.error(f"PDF du rapport {rapport_id} non généré: {erreur}")
+        if rapport:
+            rapport(rapport_id, chemin, erreur)
+
+    if processus <= 1:
+        for rapport_id in rapport_ids:
+            try:
+                resultat(rapport_id, generer_pdf_rapport(rapport_id), None)
+            except Exception as e:
+                resultat(rapport_id, None, e)
+        return nb_ok, nb_erreurs
+
+    # Processus démarrés par spawn, configurés par django.setup() : aucune
+    # connexion à la base héritée du processus parent
+    with ProcessPoolExecutor(
+        max_workers=processus, mp_context=get_context('spawn'), initializer=_initialiser_processus
+    ) as executor:
+        futures = {executor.submit(generer_pdf_rapport, rapport_id): rapport_id for rapport_id in rapport_ids}
+        for future in as_completed(futures):
+            try:
+                resultat(futures[future], future.result(), None)
+            except Exception as e:
+                resultat(futures[future], None, e)
+    return nb_ok, nb_erreurs
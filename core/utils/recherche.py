@@ -0,0 +1,319 @@
+# Fichier : core/utils/recherche.py
+
+"""
+Index de recherche plein texte (OT, assets, interventions, demandes de
+réparation, médias)
+
+Chaque objet indexé a une ligne IndexRecherche dont le texte est normalisé
+(minuscules, accents retirés, ponctuation remplacée par des espaces) : la
+recherche « equipement » trouve « Équipement », « pb 001 » trouve
+« PB-001 ». Une recherche retient les objets dont chaque mot commence par
+l'un des termes saisis (préfixes de mots, pour la saisie semi-automatique).
+
+Moteurs :
+
+- SQLite : table virtuelle FTS5 à contenu externe (core_indexrecherche_fts)
+  tenue à jour par triggers, avec index de préfixes de 2 et 3 caractères ;
+- PostgreSQL : index GIN trigramme (pg_trgm) sur le texte, interrogé par
+  LIKE '% terme%' (le texte commence par une espace) ;
+- autres moteurs : même LIKE, sans index.
+
+Les signaux (core.signals) réindexent un objet à chaque enregistrement :
+le texte est calculé depuis l'instance et la ligne n'est réécrite que s'il
+a changé, en place (même id, donc même rang dans la saisie semi-automatique).
+Les objets qui reprennent ce texte (OT d'un asset renommé) sont réindexés
+après validation de la transaction. Les mises à jour en masse (QuerySet.update) n'en déclenchent pas : la
+commande `reindexer_recherche` reconstruit l'index.
+"""
+
+import logging
+import re
+import unicodedata
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from ..models import IndexRecherche
+
+logger = logging.getLogger(__name__)
+
+TABLE_FTS = 'core_indexrecherche_fts'
+NB_TERMES_MAX = 8
+TAILLE_PAQUET = 1000
+
+# Type d'objet -> (modèle, champs indexés, libellé ajouté au texte)
+TYPES_INDEXES = {
+    'ot': ('OrdreDeTravail', ('id', 'titre', 'asset__nom', 'intervention__nom'), 'OT'),
+    'asset': ('Asset', ('nom', 'reference', 'localisation_texte'), ''),
+    'intervention': ('Intervention', ('nom', 'description'), ''),
+    'demande': ('DemandeReparation', ('numero_demande', 'titre', 'description'), ''),
+    'media': ('FichierMedia', ('nom_original', 'legende', 'mots_cles'), ''),
+}
+TYPE_PAR_MODELE = {modele: type_objet for type_objet, (modele, _, _) in TYPES_INDEXES.items()}
+
+# Objets dont le texte reprend celui d'un autre : (type, champ de liaison)
+DEPENDANTS = {
+    'asset': [('ot', 'asset')],
+    'intervention': [('ot', 'intervention')],
+}
+
+
+# ==============================================================================
+# NORMALISATION
+# ==============================================================================
+
+def normaliser(texte):
+    """
+    Minuscules sans accents, mots séparés par une espace
+    """
+    texte = unicodedata.normalize('NFKD', str(texte))
+    texte = ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+    return ' '.join(re.findall(r'\w+', texte))
+
+
+def termes(requete):
+    """
+    Termes de recherche (mots normalisés, au plus NB_TERMES_MAX)
+    """
+    return normaliser(requete).split()[:NB_TERMES_MAX]
+
+
+def texte_index(valeurs, champs, libelle=''):
+    """
+    Texte indexé d'un objet, précédé d'une espace (recherche de début de mot par LIKE)
+    """
+    morceaux = [libelle] + [valeurs[champ] for champ in champs if valeurs[champ] not in (None, '')]
+    return ' ' + normaliser(' '.join(str(morceau) for morceau in morceaux))
+
+
+# ==============================================================================
+# STRUCTURES PROPRES AU MOTEUR (migration)
+# ==============================================================================
+
+def creer_structures(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABLE_FTS} USING fts5("
+            "type_objet, texte, content='core_indexrecherche', content_rowid='id', "
+            "tokenize=\"unicode61 remove_diacritics 2\", prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER core_indexrecherche_ai AFTER INSERT ON core_indexrecherche BEGIN "
+            f"INSERT INTO {TABLE_FTS}(rowid, type_objet, texte) VALUES (new.id, new.type_objet, new.texte); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER core_indexrecherche_ad AFTER DELETE ON core_indexrecherche BEGIN "
+            f"INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, type_objet, texte) "
+            f"VALUES ('delete', old.id, old.type_objet, old.texte); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER core_indexrecherche_au AFTER UPDATE ON core_indexrecherche BEGIN "
+            f"INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, type_objet, texte) "
+            f"VALUES ('delete', old.id, old.type_objet, old.texte); "
+            f"INSERT INTO {TABLE_FTS}(rowid, type_objet, texte) VALUES (new.id, new.type_objet, new.texte); END"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX core_indexrecherche_texte_trgm "
+            "ON core_indexrecherche USING gin (texte gin_trgm_ops)"
+        )
+
+
+def supprimer_structures(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for trigger in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS core_indexrecherche_{trigger}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE_FTS}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS core_indexrecherche_texte_trgm")
+
+
+# ==============================================================================
+# INDEXATION
+# ==============================================================================
+
+def indexer(type_objet, ids, get_model=None):
+    """
+    (Ré)indexe les objets `ids` d'un type ; les objets disparus sont retirés
+
+    Seules les lignes dont le texte change sont réécrites, en place.
+
+    Args:
+        get_model: Fonction nom -> modèle (modèles historiques d'une
+            migration) ; modèles courants par défaut
+
+    Returns:
+        int: Nombre d'objets indexés
+    """
+    get_model = get_model or (lambda nom: apps.get_model('core', nom))
+    nom_modele, champs, libelle = TYPES_INDEXES[type_objet]
+    Index = get_model('IndexRecherche')
+    ids = list(ids)
+
+    textes = {
+        ligne['pk']: texte_index(ligne, champs, libelle)
+        for ligne in get_model(nom_modele).objects.filter(pk__in=ids).values('pk', *champs)
+    }
+    existantes = {
+        entree.objet_id: entree
+        for entree in Index.objects.filter(type_objet=type_objet, objet_id__in=ids).only('objet_id', 'texte')
+    }
+
+    a_creer = [
+        Index(type_objet=type_objet, objet_id=objet_id, texte=texte)
+        for objet_id, texte in textes.items() if objet_id not in existantes
+    ]
+    a_modifier = []
+    for objet_id, entree in existantes.items():
+        if objet_id in textes and entree.texte != textes[objet_id]:
+            entree.texte = textes[objet_id]
+            a_modifier.append(entree)
+    disparues = [entree.pk for objet_id, entree in existantes.items() if objet_id not in textes]
+
+    with transaction.atomic():
+        if disparues:
+            Index.objects.filter(pk__in=disparues).delete()
+        Index.objects.bulk_update(a_modifier, ['texte'], batch_size=TAILLE_PAQUET)
+        Index.objects.bulk_create(a_creer, batch_size=TAILLE_PAQUET)
+    return len(textes)
+
+
+def _valeurs_instance(instance, champs):
+    valeurs = {}
+    for champ in champs:
+        objet = instance
+        for attribut in champ.split('__'):
+            objet = getattr(objet, attribut) if objet is not None else None
+        valeurs[champ] = objet
+    return valeurs
+
+
+def _reindexer_dependants(type_objet, objet_id):
+    for type_dependant, champ in DEPENDANTS[type_objet]:
+        modele = apps.get_model('core', TYPES_INDEXES[type_dependant][0])
+        ids = list(modele.objects.filter(**{champ: objet_id}).values_list('pk', flat=True))
+        for debut in range(0, len(ids), TAILLE_PAQUET):
+            indexer(type_dependant, ids[debut:debut + TAILLE_PAQUET])
+
+
+def indexer_objet(instance):
+    """
+    Réindexe un objet enregistré si son texte a changé ; les objets qui
+    reprennent son texte (nom d'asset ou d'intervention dans les OT) sont
+    réindexés après validation de la transaction
+    """
+    type_objet = TYPE_PAR_MODELE[type(instance).__name__]
+    _, champs, libelle = TYPES_INDEXES[type_objet]
+    texte = texte_index(_valeurs_instance(instance, champs), champs, libelle)
+
+    entrees = IndexRecherche.objects.filter(type_objet=type_objet, objet_id=instance.pk)
+    ancien = entrees.values_list('texte', flat=True).first()
+    if ancien == texte:
+        return
+    if ancien is None:
+        IndexRecherche.objects.create(type_objet=type_objet, objet_id=instance.pk, texte=texte)
+        return
+
+    entrees.update(texte=texte)
+    if type_objet in DEPENDANTS:
+        objet_id = instance.pk
+        transaction.on_commit(lambda: _reindexer_dependants(type_objet, objet_id))
+
+
+def desindexer_objet(instance):
+    IndexRecherche.objects.filter(
+        type_objet=TYPE_PAR_MODELE[type(instance).__name__], objet_id=instance.pk
+    ).delete()
+
+
+def reindexer_tout(get_model=None):
+    """
+    Reconstruit l'index de tous les types d'objets
+
+    Returns:
+        dict: Nombre d'objets indexés par type
+    """
+    get_model = get_model or (lambda nom: apps.get_model('core', nom))
+    totaux = {}
+    with transaction.atomic():
+        get_model('IndexRecherche').objects.all().delete()
+        for type_objet, (nom_modele, _, _) in TYPES_INDEXES.items():
+            ids = list(get_model(nom_modele).objects.order_by('pk').values_list('pk', flat=True))
+            totaux[type_objet] = sum(
+                indexer(type_objet, ids[debut:debut + TAILLE_PAQUET], get_model)
+                for debut in range(0, len(ids), TAILLE_PAQUET)
+            )
+    logger.info(f"Index de recherche reconstruit : {totaux}")
+    return totaux
+
+
+# ==============================================================================
+# RECHERCHE
+# ==============================================================================
+
+def _expression_fts(type_objet, mots):
+    prefixes = ' '.join(f'"{mot}"*' for mot in mots)
+    return f'type_objet:"{type_objet}" AND texte:({prefixes})'
+
+
+def _filtre_like(entrees, mots):
+    for mot in mots:
+        entrees = entrees.filter(texte__contains=f' {mot}')
+    return entrees
+
+
+def identifiants(type_objet, requete, limite):
+    """
+    Identifiants des `limite` objets correspondants les plus récemment indexés
+
+    Sous SQLite, FTS5 parcourt l'index par rowid décroissant et s'arrête à
+    `limite` : le coût ne dépend pas du nombre total de correspondances.
+    """
+    mots = termes(requete)
+    if not mots:
+        return []
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT i.objet_id FROM {TABLE_FTS} f JOIN core_indexrecherche i ON i.id = f.rowid "
+                f"WHERE {TABLE_FTS} MATCH %s ORDER BY f.rowid DESC LIMIT %s",
+                [_expression_fts(type_objet, mots), limite]
+            )
+            return [ligne[0] for ligne in cursor.fetchall()]
+
+    entrees = _filtre_like(IndexRecherche.objects.filter(type_objet=type_objet), mots)
+    return list(entrees.order_by('-id').values_list('objet_id', flat=True)[:limite])
+
+
+def objets(queryset, type_objet, requete, limite):
+    """
+    Objets de `queryset` correspondant à la requête, dans l'ordre de l'index
+    """
+    ids = identifiants(type_objet, requete, limite)
+    par_id = queryset.in_bulk(ids)
+    return [par_id[pk] for pk in ids if pk in par_id]
+
+
+def filtrer(queryset, type_objet, requete):
+    """
+    Restreint un QuerySet aux objets correspondant à la requête (listes
+    paginées, combinable avec les autres filtres)
+    """
+    mots = termes(requete)
+    if not mots:
+        return queryset
+
+    entrees = IndexRecherche.objects.filter(type_objet=type_objet)
+    if connection.vendor == 'sqlite':
+        entrees = entrees.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s",
+            [_expression_fts(type_objet, mots)]
+        ))
+    else:
+        entrees = _filtre_like(entrees, mots)
+    return queryset.filter(pk__in=entrees.values('objet_id'))
@@ -0,0 +1,131 @@
+# Fichier : core/utils/sauvegarde_reponses.py
+
+"""
+Sauvegarde automatique des réponses d'un rapport d'exécution
+
+Les formulaires d'exécution (tablettes) renvoient toutes leurs valeurs à
+chaque sauvegarde automatique. Les valeurs reçues sont comparées aux
+réponses du rapport, lues en une requête ; seules les réponses nouvelles
+ou modifiées sont écrites (bulk_create / bulk_update) dans une seule
+transaction. Le coût d'une sauvegarde ne dépend plus du nombre de points.
+
+Chaque sauvegarde qui modifie au moins une réponse incrémente la version
+du rapport (RapportExecution.version_reponses). Le client renvoie la
+dernière version reçue : il sait ainsi si le rapport a été modifié
+ailleurs et peut ne pas renvoyer un formulaire inchangé.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import PointDeControle, RapportExecution, Reponse
+
+logger = logging.getLogger(__name__)
+
+
+def _batch_size():
+    return getattr(settings, 'GMAO_SYNC_BATCH_SIZE', 500)
+
+
+def valeurs_formulaire(donnees, prefixe):
+    """
+    {point_id: valeur} à partir des clés « <prefixe><point_id> » d'un
+    formulaire ou d'un JSON ; les clés invalides sont ignorées
+    """
+    valeurs = {}
+    for cle, valeur in donnees.items():
+        if not cle.startswith(prefixe):
+            continue
+        try:
+            valeurs[int(cle[len(prefixe):])] = valeur
+        except ValueError:
+            continue
+    return valeurs
+
+
+def sauvegarder_reponses(rapport, valeurs, user, ignorer_vides=False, version_client=None):
+    """
+    Enregistre les valeurs modifiées d'un rapport en un nombre constant de
+    requêtes
+
+    Args:
+        rapport: RapportExecution
+        valeurs: {point_id: valeur}
+        user: Auteur des réponses écrites
+        ignorer_vides: Ne pas écrire les valeurs vides (brouillons)
+        version_client: Dernière version reçue par le client, le cas échéant
+
+    Returns:
+        dict: {crees, modifiees, ignorees (point inconnu ou valeur vide),
+        version du rapport après sauvegarde, modifie_ailleurs (le rapport
+        a changé depuis la version du client)}
+    """
+    try:
+        version_client = int(version_client) if version_client not in (None, '') else None
+    except (TypeError, ValueError):
+        version_client = None
+
+    ignorees = 0
+    a_ecrire = {}
+    for point_id, valeur in valeurs.items():
+        valeur = '' if valeur is None else str(valeur)
+        if ignorer_vides and not valeur:
+            ignorees += 1
+        else:
+            a_ecrire[point_id] = valeur
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Verrou du rapport : deux sauvegardes simultanées (plusieurs
+        # tablettes sur le même OT) sont appliquées l'une après l'autre
+        version = RapportExecution.objects.select_for_update().filter(pk=rapport.pk).values_list(
+            'version_reponses', flat=True
+        ).first() or 0
+        modifie_ailleurs = version_client is not None and version_client != version
+
+        points = set(PointDeControle.objects.filter(pk__in=a_ecrire).values_list('pk', flat=True))
+        existantes = {
+            reponse.point_de_controle_id: reponse
+            for reponse in Reponse.objects.filter(rapport_execution=rapport, point_de_controle_id__in=points)
+        }
+
+        a_creer = []
+        a_mettre_a_jour = []
+        for point_id, valeur in a_ecrire.items():
+            if point_id not in points:
+                ignorees += 1
+                continue
+            reponse = existantes.get(point_id)
+            if reponse is None:
+                a_creer.append(Reponse(
+                    rapport_execution=rapport, point_de_controle_id=point_id,
+                    valeur=valeur, date_reponse=now, saisi_par=user,
+                ))
+            elif reponse.valeur != valeur:
+                reponse.valeur = valeur
+                reponse.date_reponse = now
+                reponse.saisi_par = user
+                a_mettre_a_jour.append(reponse)
+
+        if a_creer or a_mettre_a_jour:
+            Reponse.objects.bulk_create(a_creer, batch_size=_batch_size())
+            Reponse.objects.bulk_update(
+                a_mettre_a_jour, ['valeur', 'date_reponse', 'saisi_par'], batch_size=_batch_size()
+            )
+            version += 1
+            RapportExecution.objects.filter(pk=rapport.pk).update(
+                version_reponses=F('version_reponses') + 1, date_derniere_maj=now
+            )
+
+    rapport.version_reponses = version
+    return {
+        'crees': len(a_creer),
+        'modifiees': len(a_mettre_a_jour),
+        'ignorees': ignorees,
+        'version': version,
+        'modifie_ailleurs': modifie_ailleurs,
+    }
@@ -0,0 +1,157 @@
+# Fichier : core/utils/stockage_media.py
+
+"""
+Stockage des médias adressé par contenu
+
+Chaque fichier reçu est rangé sous son empreinte SHA-256
+(media_contenus/ab/cd/<sha256>.<ext>) et décrit par un ContenuMedia qui
+compte ses références. Une photo jointe à vingt réponses est écrite une
+fois, traitée une fois, et supprimée avec sa dernière référence.
+
+Les FichierMedia pointent vers le contenu par hash_fichier et partagent le
+même nom de fichier dans le stockage : ils ne doivent jamais supprimer ce
+fichier eux-mêmes. La libération passe par le signal post_delete de
+FichierMedia (liberer_media).
+"""
+
+import hashlib
+import logging
+import os
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import ContenuMedia
+
+logger = logging.getLogger(__name__)
+
+DOSSIER_CONTENUS = 'media_contenus/'
+DOSSIER_VIGNETTES = f'{DOSSIER_CONTENUS}vignettes/'
+
+
+def empreinte_flux(fichier):
+    """
+    SHA-256 d'un fichier uploadé, lu par morceaux (le fichier reste ouvert)
+    """
+    empreinte = hashlib.sha256()
+    for bloc in fichier.chunks():
+        empreinte.update(bloc)
+    fichier.seek(0)
+    return empreinte.hexdigest()
+
+
+def chemin_contenu(empreinte, extension, suffixe=''):
+    return f"{DOSSIER_CONTENUS}{empreinte[:2]}/{empreinte[2:4]}/{empreinte}{suffixe}{extension.lower()}"
+
+
+def chemin_vignette(empreinte, taille):
+    return f"{DOSSIER_VIGNETTES}{empreinte[:2]}/{empreinte}_{taille}.jpg"
+
+
+def acquerir_contenu(empreinte, nom_original, taille, ecrire):
+    """
+    Ajoute une référence au contenu d'empreinte donnée
+
+    Args:
+        ecrire: fonction (nom) -> nom effectif, appelée seulement si le
+            contenu n'est pas encore stocké
+
+    Returns:
+        tuple: (ContenuMedia, cree)
+    """
+    with transaction.atomic():
+        if ContenuMedia.objects.filter(empreinte=empreinte).update(nb_references=F('nb_references') + 1):
+            return ContenuMedia.objects.get(empreinte=empreinte), False
+
+        nom = ecrire(chemin_contenu(empreinte, os.path.splitext(nom_original)[1]))
+        try:
+            with transaction.atomic():
+                contenu = ContenuMedia.objects.create(
+                    empreinte=empreinte,
+                    fichier=nom,
+                    taille_originale=taille,
+                    nb_references=1,
+                )
+            return contenu, True
+        except IntegrityError:
+            # Même contenu stocké en parallèle : on garde le premier
+            default_storage.delete(nom)
+            ContenuMedia.objects.filter(empreinte=empreinte).update(nb_references=F('nb_references') + 1)
+            return ContenuMedia.objects.get(empreinte=empreinte), False
+
+
+def acquerir_upload(fichier):
+    """
+    Référence le contenu d'un fichier uploadé, écrit seulement s'il est nouveau
+    """
+    return acquerir_contenu(
+        empreinte_flux(fichier),
+        fichier.name,
+        fichier.size,
+        lambda nom: default_storage.save(nom, fichier),
+    )
+
+
+def acquerir_fichier_local(chemin, empreinte, nom_original):
+    """
+    Référence le contenu d'un fichier déjà sur disque (déplacé, pas copié)
+    """
+    def deplacer(nom):
+        nom = default_storage.get_available_name(nom)
+        destination = default_storage.path(nom)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(chemin, destination)
+        return nom
+
+    contenu, cree = acquerir_contenu(empreinte, nom_original, os.path.getsize(chemin), deplacer)
+    if not cree and os.path.exists(chemin):
+        os.remove(chemin)
+    return contenu, cree
+
+
+def _supprimer_fichiers(noms):
+    for nom in noms:
+        try:
+            default_storage.delete(nom)
+        except Exception as e:
+            logger.warning(f"Fichier {nom} non supprimé: {e}")
+
+
+def liberer_contenu(empreinte):
+    """
+    Retire une référence ; supprime le contenu et ses vignettes à la dernière
+
+    Les fichiers sont effacés après validation de la transaction.
+
+    Returns:
+        bool: True si le contenu a été supprimé, None s'il n'existe pas
+    """
+    with transaction.atomic():
+        contenu = ContenuMedia.objects.select_for_update().filter(empreinte=empreinte).first()
+        if contenu is None:
+            return None
+        if contenu.nb_references > 1:
+            ContenuMedia.objects.filter(pk=contenu.pk).update(nb_references=F('nb_references') - 1)
+            return False
+
+        noms = [contenu.fichier.name] + list(contenu.resultats.get('vignettes', {}).values())
+        contenu.delete()
+        transaction.on_commit(lambda: _supprimer_fichiers(noms))
+    return True
+
+
+def liberer_media(media):
+    """
+    Libère le fichier d'un FichierMedia supprimé
+
+    Un média antérieur au stockage par contenu possède son propre fichier,
+    supprimé directement.
+    """
+    if media.hash_fichier and liberer_contenu(media.hash_fichier) is not None:
+        return
+
+    noms = list((media.metadonnees or {}).get('vignettes', {}).values())
+    if media.fichier:
+        noms.append(media.fichier.name)
+    transaction.on_commit(lambda: _supprimer_fichiers(noms))
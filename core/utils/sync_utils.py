@@ -0,0 +1,452 @@
+# Fichier : core/utils/sync_utils.py
+
+"""
+Ingestion groupée des données envoyées par l'application mobile
+
+Un lot (fin de journée d'une équipe : plusieurs milliers de réponses) est
+appliqué en un nombre constant de requêtes : les rapports et points de
+contrôle sont préchargés, les réponses sont créées / mises à jour par
+bulk_create / bulk_update dans une seule transaction.
+
+Chaque élément peut porter une `cle_idempotence` choisie par le client. La
+clé est réservée (insertion dans la table unique (utilisateur, cle)) dans
+la transaction qui applique l'élément, avant de l'appliquer : un envoi
+rejoué après une coupure réseau, même en parallèle du premier, voit sa
+réservation refusée et n'applique jamais deux fois la même modification.
+
+Chaque élément est contrôlé comme dans les vues unitaires : l'OT doit être
+exécutable par l'utilisateur (voir acces.droits) et le point de contrôle
+doit appartenir à la gamme de l'OT. Un rapport ne peut pas être finalisé
+par lot : la finalisation passe par l'action `finaliser` de l'OT, qui
+vérifie les points obligatoires et les demandes de réparation bloquantes.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import (
+    OrdreDeTravail, RapportExecution, PointDeControle, Reponse,
+    DemandeReparation, CleIdempotenceSync
+)
+
+from .acces import droits
+from .gamme_utils import operations_ordre
+
+logger = logging.getLogger(__name__)
+
+STATUT_CREE = 'cree'
+STATUT_MIS_A_JOUR = 'mis_a_jour'
+STATUT_DEJA_TRAITE = 'deja_traite'
+STATUT_ERREUR = 'erreur'
+
+
+def _batch_size():
+    return getattr(settings, 'GMAO_SYNC_BATCH_SIZE', 500)
+
+
+def _parse_id(valeur):
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(valeur, defaut):
+    if not valeur:
+        return defaut
+    try:
+        date = parse_datetime(str(valeur))
+    except ValueError:
+        date = None
+    if date is None:
+        return defaut
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _points_gamme(ordre, gammes):
+    """
+    Identifiants des points de la gamme exécutée par l'OT (lue une fois par
+    OT du lot et mémorisée dans `gammes`)
+    """
+    if ordre.pk not in gammes:
+        gammes[ordre.pk] = {
+            point['id'] for operation in operations_ordre(ordre) for point in operation['points_de_controle']
+        }
+    return gammes[ordre.pk]
+
+
+def _refus(user, ordre, point_id, gammes):
+    """
+    Motif de refus d'un élément portant sur un OT (et un point), None si
+    l'utilisateur peut l'appliquer
+    """
+    if not droits(user).peut_executer(ordre):
+        return 'Permission refusée'
+    if point_id is not None and point_id not in _points_gamme(ordre, gammes):
+        return "Point de contrôle hors de la gamme de l'ordre de travail"
+    return None
+
+
+def _resultat(item, statut, objet_id=None, erreur=None):
+    resultat = {'cle': item.get('cle_idempotence'), 'statut': statut, 'id': objet_id}
+    if erreur:
+        resultat['error'] = erreur
+    return resultat
+
+
+# ==============================================================================
+# CLÉS D'IDEMPOTENCE
+# ==============================================================================
+
+def cles_deja_traitees(user, items):
+    """
+    Retourne {cle: objet_id} pour les clés du lot déjà enregistrées
+    """
+    cles = {item.get('cle_idempotence') for item in items if item.get('cle_idempotence')}
+    if not cles:
+        return {}
+    return dict(
+        CleIdempotenceSync.objects.filter(utilisateur=user, cle__in=cles)
+        .values_list('cle', 'objet_id')
+    )
+
+
+def _reserver(user, type_objet, cles):
+    """
+    Insère les clés (objet_id provisoire à 0)
+
+    Returns:
+        set: Clés déjà réservées par un autre envoi
+    """
+    try:
+        with transaction.atomic():
+            CleIdempotenceSync.objects.bulk_create(
+                [CleIdempotenceSync(utilisateur=user, cle=cle, type_objet=type_objet, objet_id=0) for cle in cles],
+                batch_size=_batch_size(),
+            )
+        return set()
+    except IntegrityError:
+        pass
+
+    # Conflit dans le lot : réservation clé par clé
+    refusees = set()
+    for cle in cles:
+        try:
+            with transaction.atomic():
+                CleIdempotenceSync.objects.create(utilisateur=user, cle=cle, type_objet=type_objet, objet_id=0)
+        except IntegrityError:
+            refusees.add(cle)
+    return refusees
+
+
+def reserver_cles(user, type_objet, items):
+    """
+    Réserve les clés du lot et sépare les éléments déjà appliqués (clé
+    connue, réservée par un envoi concurrent ou répétée dans le lot)
+
+    À appeler dans la transaction qui applique le lot, puis confirmer_cles.
+
+    Returns:
+        tuple: (liste (position, élément) à appliquer, résultats indexés
+        comme le lot, déjà remplis pour les éléments ignorés)
+    """
+    connues = cles_deja_traitees(user, items)
+    nouvelles = []
+    for item in items:
+        cle = item.get('cle_idempotence')
+        if cle and cle not in connues and cle not in nouvelles:
+            nouvelles.append(cle)
+    refusees = _reserver(user, type_objet, nouvelles) if nouvelles else set()
+
+    a_traiter = []
+    resultats = [None] * len(items)
+    vues = set()
+
+    for index, item in enumerate(items):
+        cle = item.get('cle_idempotence')
+        if cle and cle in connues:
+            resultats[index] = _resultat(item, STATUT_DEJA_TRAITE, connues[cle])
+        elif cle and (cle in refusees or cle in vues):
+            resultats[index] = _resultat(item, STATUT_DEJA_TRAITE)
+        else:
+            if cle:
+                vues.add(cle)
+            a_traiter.append((index, item))
+
+    return a_traiter, resultats
+
+
+def confirmer_cles(user, a_traiter, cles_objets):
+    """
+    Renseigne l'objet des clés appliquées ({cle: objet_id}) et libère les
+    clés des éléments en erreur (un nouvel envoi pourra les appliquer)
+    """
+    reservees = {item['cle_idempotence'] for _, item in a_traiter if item.get('cle_idempotence')}
+    liberees = reservees - cles_objets.keys()
+    if liberees:
+        CleIdempotenceSync.objects.filter(utilisateur=user, cle__in=liberees).delete()
+    if cles_objets:
+        CleIdempotenceSync.objects.filter(utilisateur=user, cle__in=cles_objets.keys()).update(
+            objet_id=Case(
+                *[When(cle=cle, then=Value(objet_id)) for cle, objet_id in cles_objets.items()],
+                output_field=IntegerField(),
+            )
+        )
+
+
+# ==============================================================================
+# RÉPONSES
+# ==============================================================================
+
+def appliquer_reponses(items, user):
+    """
+    Crée ou met à jour un lot de réponses en un nombre constant de requêtes
+
+    Chaque élément : {rapport_execution, point_de_controle, valeur,
+    date_reponse?, cle_idempotence?}. Pour un même couple rapport/point
+    présent plusieurs fois dans le lot, la dernière valeur l'emporte.
+
+    Returns:
+        list: Un résultat par élément ({cle, statut, id, error?}), dans
+        l'ordre du lot
+    """
+    with transaction.atomic():
+        a_traiter, resultats = reserver_cles(user, 'REPONSE', items)
+        if a_traiter:
+            _appliquer_reponses(a_traiter, resultats, user)
+    return resultats
+
+
+def _appliquer_reponses(a_traiter, resultats, user):
+    now = timezone.now()
+
+    # Préchargement des rapports et points référencés
+    rapport_ids = {_parse_id(item.get('rapport_execution')) for _, item in a_traiter} - {None}
+    point_ids = {_parse_id(item.get('point_de_controle')) for _, item in a_traiter} - {None}
+    rapports = RapportExecution.objects.select_related('ordre_de_travail').in_bulk(rapport_ids)
+    points = PointDeControle.objects.in_bulk(point_ids)
+    gammes = {}
+
+    existantes = {
+        (reponse.rapport_execution_id, reponse.point_de_controle_id): reponse
+        for reponse in Reponse.objects.filter(
+            rapport_execution_id__in=rapports.keys(),
+            point_de_controle_id__in=points.keys(),
+        )
+    }
+
+    a_creer = {}
+    a_mettre_a_jour = {}
+    valides = []  # (position, élément, couple rapport/point)
+
+    for index, item in a_traiter:
+        rapport_id = _parse_id(item.get('rapport_execution'))
+        point_id = _parse_id(item.get('point_de_controle'))
+
+        if rapport_id not in rapports:
+            resultats[index] = _resultat(item, STATUT_ERREUR, erreur="Rapport d'exécution introuvable")
+            continue
+        if point_id not in points:
+            resultats[index] = _resultat(item, STATUT_ERREUR, erreur='Point de contrôle introuvable')
+            continue
+        refus = _refus(user, rapports[rapport_id].ordre_de_travail, point_id, gammes)
+        if refus:
+            resultats[index] = _resultat(item, STATUT_ERREUR, erreur=refus)
+            continue
+
+        couple = (rapport_id, point_id)
+        valeur = item.get('valeur')
+        date_reponse = _parse_date(item.get('date_reponse'), now)
+
+        reponse = existantes.get(couple) or a_creer.get(couple)
+        if reponse is None:
+            a_creer[couple] = Reponse(
+                rapport_execution_id=rapport_id,
+                point_de_controle_id=point_id,
+                valeur=valeur,
+                date_reponse=date_reponse,
+                saisi_par=user,
+            )
+        else:
+            reponse.valeur = valeur
+            reponse.date_reponse = date_reponse
+            reponse.saisi_par = user
+            if couple in existantes:
+                a_mettre_a_jour[couple] = reponse
+
+        valides.append((index, item, couple))
+
+    Reponse.objects.bulk_create(a_creer.values(), batch_size=_batch_size())
+    Reponse.objects.bulk_update(
+        a_mettre_a_jour.values(),
+        ['valeur', 'date_reponse', 'saisi_par'],
+        batch_size=_batch_size(),
+    )
+
+    if valides:
+        RapportExecution.objects.filter(
+            id__in={rapport_id for _, _, (rapport_id, _) in valides}
+        ).update(date_derniere_maj=now, version_reponses=F('version_reponses') + 1)
+
+    cles = {}
+    for index, item, couple in valides:
+        reponse = a_creer.get(couple) or a_mettre_a_jour[couple]
+        statut = STATUT_CREE if couple in a_creer else STATUT_MIS_A_JOUR
+        resultats[index] = _resultat(item, statut, reponse.pk)
+        if item.get('cle_idempotence') and reponse.pk:
+            cles[item['cle_idempotence']] = reponse.pk
+
+    confirmer_cles(user, a_traiter, cles)
+
+
+# ==============================================================================
+# RAPPORTS D'EXÉCUTION
+# ==============================================================================
+
+CHAMPS_RAPPORT = ['statut_rapport', 'commentaire_global']
+# Statuts qu'un envoi mobile peut donner à un rapport (et seuls statuts
+# d'un rapport encore modifiable par lot)
+STATUTS_RAPPORT_MOBILE = ('BROUILLON', 'EN_COURS')
+CHAMPS_DATE_RAPPORT = ['date_execution_debut', 'date_execution_fin']
+
+
+def appliquer_rapports(items, user):
+    """
+    Crée ou met à jour les rapports d'exécution d'un lot
+
+    Chaque élément : {ordre_de_travail, statut_rapport?, commentaire_global?,
+    date_execution_debut?, date_execution_fin?, reponses?, cle_idempotence?}.
+    Les réponses imbriquées sont appliquées ensemble par appliquer_reponses.
+
+    Returns:
+        tuple: (résultats des rapports, résultats des réponses imbriquées)
+    """
+    with transaction.atomic():
+        a_traiter, resultats = reserver_cles(user, 'RAPPORT', items)
+
+        ot_ids = {_parse_id(item.get('ordre_de_travail')) for _, item in a_traiter} - {None}
+        ordres = OrdreDeTravail.objects.in_bulk(ot_ids)
+        # Rapports verrouillés jusqu'à l'application des réponses imbriquées
+        rapports = {
+            rapport.ordre_de_travail_id: rapport
+            for rapport in RapportExecution.objects.select_for_update().filter(ordre_de_travail_id__in=ot_ids)
+        }
+
+        cles = {}
+        reponses = []
+        cle_par_reponse = []  # clé du rapport de chaque réponse imbriquée
+        for index, item in a_traiter:
+            ot_id = _parse_id(item.get('ordre_de_travail'))
+            if ot_id not in ordres:
+                resultats[index] = _resultat(item, STATUT_ERREUR, erreur='Ordre de travail introuvable')
+                continue
+            refus = _refus(user, ordres[ot_id], None, None)
+            if refus is None and 'statut_rapport' in item and item['statut_rapport'] not in STATUTS_RAPPORT_MOBILE:
+                refus = "Statut non modifiable par synchronisation (finalisation par l'action finaliser)"
+            if refus is None and ot_id in rapports and rapports[ot_id].statut_rapport not in STATUTS_RAPPORT_MOBILE:
+                refus = 'Rapport finalisé : modification impossible'
+            if refus:
+                resultats[index] = _resultat(item, STATUT_ERREUR, erreur=refus)
+                continue
+
+            rapport = rapports.get(ot_id)
+            statut = STATUT_MIS_A_JOUR
+            if rapport is None:
+                # Rapport créé entre-temps par un envoi concurrent : repris
+                rapport, cree = RapportExecution.objects.get_or_create(
+                    ordre_de_travail_id=ot_id, defaults={'cree_par': user}
+                )
+                rapports[ot_id] = rapport
+                statut = STATUT_CREE if cree else STATUT_MIS_A_JOUR
+
+            for champ in CHAMPS_RAPPORT:
+                if champ in item:
+                    setattr(rapport, champ, item[champ])
+            for champ in CHAMPS_DATE_RAPPORT:
+                if champ in item:
+                    setattr(rapport, champ, _parse_date(item[champ], None))
+            rapport.save()
+
+            resultats[index] = _resultat(item, statut, rapport.pk)
+            if item.get('cle_idempotence'):
+                cles[item['cle_idempotence']] = rapport.pk
+
+            for reponse in item.get('reponses') or []:
+                reponses.append(dict(reponse, rapport_execution=rapport.pk))
+                cle_par_reponse.append(item.get('cle_idempotence'))
+
+        resultats_reponses = appliquer_reponses(reponses, user) if reponses else []
+        # Une réponse imbriquée en erreur laisse la clé du rapport libre : un
+        # nouvel envoi du rapport appliquera les réponses manquantes
+        for cle, resultat in zip(cle_par_reponse, resultats_reponses):
+            if resultat['statut'] == STATUT_ERREUR:
+                cles.pop(cle, None)
+        confirmer_cles(user, a_traiter, cles)
+
+    return resultats, resultats_reponses
+
+
+# ==============================================================================
+# DEMANDES DE RÉPARATION
+# ==============================================================================
+
+def appliquer_demandes(items, user):
+    """
+    Crée les demandes de réparation d'un lot
+
+    Chaque élément : {ordre_de_travail, point_de_controle, titre, description,
+    priorite?, cle_idempotence?}. Les créations restent unitaires (numéro de
+    demande généré au save) mais les références sont préchargées.
+    """
+    with transaction.atomic():
+        a_traiter, resultats = reserver_cles(user, 'DEMANDE_REPARATION', items)
+
+        ot_ids = {_parse_id(item.get('ordre_de_travail')) for _, item in a_traiter} - {None}
+        point_ids = {_parse_id(item.get('point_de_controle')) for _, item in a_traiter} - {None}
+        ordres = OrdreDeTravail.objects.in_bulk(ot_ids)
+        points = PointDeControle.objects.in_bulk(point_ids)
+        gammes = {}
+
+        cles = {}
+        for index, item in a_traiter:
+            ot_id = _parse_id(item.get('ordre_de_travail'))
+            point_id = _parse_id(item.get('point_de_controle'))
+
+            if ot_id not in ordres:
+                resultats[index] = _resultat(item, STATUT_ERREUR, erreur='Ordre de travail introuvable')
+                continue
+            if point_id not in points:
+                resultats[index] = _resultat(item, STATUT_ERREUR, erreur='Point de contrôle introuvable')
+                continue
+            refus = _refus(user, ordres[ot_id], point_id, gammes)
+            if refus is None and not points[point_id].peut_demander_reparation:
+                refus = "Ce point de contrôle n'autorise pas les demandes de réparation"
+            if refus:
+                resultats[index] = _resultat(item, STATUT_ERREUR, erreur=refus)
+                continue
+            if not item.get('titre') or not item.get('description'):
+                resultats[index] = _resultat(item, STATUT_ERREUR, erreur='Titre et description requis')
+                continue
+
+            demande = DemandeReparation.objects.create(
+                ordre_de_travail_id=ot_id,
+                point_de_controle_id=point_id,
+                titre=item['titre'],
+                description=item['description'],
+                priorite=item.get('priorite', 2),
+                cree_par=user,
+            )
+            resultats[index] = _resultat(item, STATUT_CREE, demande.pk)
+            if item.get('cle_idempotence'):
+                cles[item['cle_idempotence']] = demande.pk
+
+        confirmer_cles(user, a_traiter, cles)
+
+    return resultats
@@ -0,0 +1,240 @@
+# Fichier : core/utils/televersement_utils.py
+
+"""
+Uploads reprenables en plusieurs morceaux
+
+Protocole (API mobile, TeleversementMobileViewSet) :
+
+1. initialisation : le client annonce nom, taille et SHA-256 éventuel, et
+   reçoit un identifiant de téléversement et la taille des morceaux ;
+2. envoi des morceaux numérotés (PUT, corps brut), dans n'importe quel
+   ordre, éventuellement plusieurs fois : chaque morceau est écrit sur
+   disque par blocs puis renommé, un morceau interrompu n'est jamais
+   considéré comme reçu ;
+3. après une coupure, le client relit la liste des morceaux reçus et
+   n'envoie que les manquants ;
+4. finalisation : les morceaux sont concaténés dans MEDIA_ROOT (empreinte
+   calculée au passage), le fichier assemblé est déplacé dans le stockage
+   par contenu et le FichierMedia est créé, sans relecture du fichier.
+
+Un fichier identique (même SHA-256) déjà attaché à la réponse n'est pas
+stocké une seconde fois : le média existant est renvoyé. Déjà présent
+ailleurs, le contenu est simplement référencé (stockage_media).
+
+Les morceaux sont écrits sur le système de fichiers local
+(FileSystemStorage).
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import FichierMedia, TeleversementMedia
+from .media_processor import referencer_contenu
+from .stockage_media import acquerir_fichier_local
+
+logger = logging.getLogger(__name__)
+
+TAILLE_BLOC = 64 * 1024
+SUFFIXE_MORCEAU = '.part'
+
+
+class ErreurTeleversement(Exception):
+    """Morceau ou fichier assemblé invalide"""
+
+
+def taille_morceau_defaut():
+    return getattr(settings, 'GMAO_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+
+
+def nb_morceaux(taille_totale, taille_morceau):
+    return max(1, -(-taille_totale // taille_morceau))
+
+
+def dossier_morceaux(televersement):
+    return os.path.join(settings.MEDIA_ROOT, 'televersements', str(televersement.pk))
+
+
+def _chemin_morceau(televersement, index):
+    return os.path.join(dossier_morceaux(televersement), f"{index}{SUFFIXE_MORCEAU}")
+
+
+def taille_attendue(televersement, index):
+    """
+    Taille du morceau `index` (le dernier peut être plus court)
+    """
+    if index == televersement.nb_morceaux - 1:
+        return televersement.taille_totale - index * televersement.taille_morceau
+    return televersement.taille_morceau
+
+
+def morceaux_recus(televersement):
+    """
+    Index des morceaux complets présents sur disque
+    """
+    try:
+        noms = os.listdir(dossier_morceaux(televersement))
+    except FileNotFoundError:
+        return []
+    return sorted(
+        int(nom[:-len(SUFFIXE_MORCEAU)])
+        for nom in noms
+        if nom.endswith(SUFFIXE_MORCEAU) and nom[:-len(SUFFIXE_MORCEAU)].isdigit()
+    )
+
+
+def media_existant(reponse_id, empreinte):
+    """
+    Média de même contenu déjà attaché à la réponse, ou None
+    """
+    if not empreinte:
+        return None
+    return FichierMedia.objects.filter(reponse_id=reponse_id, hash_fichier=empreinte).first()
+
+
+# ==============================================================================
+# MORCEAUX
+# ==============================================================================
+
+def ecrire_morceau(televersement, index, flux):
+    """
+    Écrit un morceau depuis un flux, sans le charger en mémoire
+
+    Le morceau est écrit dans un fichier temporaire puis renommé : il n'est
+    visible comme reçu qu'une fois complet.
+
+    Raises:
+        ErreurTeleversement: index hors limites ou taille incorrecte
+    """
+    if not 0 <= index < televersement.nb_morceaux:
+        raise ErreurTeleversement(f"Morceau {index} hors limites (0 à {televersement.nb_morceaux - 1})")
+
+    attendu = taille_attendue(televersement, index)
+    dossier = dossier_morceaux(televersement)
+    os.makedirs(dossier, exist_ok=True)
+    chemin = _chemin_morceau(televersement, index)
+    temporaire = f"{chemin}.{uuid.uuid4().hex}.tmp"
+
+    recu = 0
+    try:
+        with open(temporaire, 'wb') as sortie:
+            while True:
+                bloc = flux.read(min(TAILLE_BLOC, attendu + 1 - recu))
+                if not bloc:
+                    break
+                recu += len(bloc)
+                if recu > attendu:
+                    break
+                sortie.write(bloc)
+
+        if recu != attendu:
+            raise ErreurTeleversement(f"Morceau {index} : {recu} octet(s) reçu(s), {attendu} attendu(s)")
+        os.replace(temporaire, chemin)
+    finally:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+
+    return recu
+
+
+def supprimer_morceaux(televersement):
+    shutil.rmtree(dossier_morceaux(televersement), ignore_errors=True)
+
+
+# ==============================================================================
+# FINALISATION
+# ==============================================================================
+
+def assembler(televersement):
+    """
+    Concatène les morceaux dans un fichier du dossier de téléversement
+
+    Le nom est propre à l'appel : deux finalisations simultanées n'écrivent
+    jamais dans le même fichier.
+
+    Returns:
+        tuple: (chemin du fichier assemblé, SHA-256)
+
+    Raises:
+        ErreurTeleversement: morceaux manquants ou empreinte différente de
+        celle annoncée
+    """
+    manquants = sorted(set(range(televersement.nb_morceaux)) - set(morceaux_recus(televersement)))
+    if manquants:
+        raise ErreurTeleversement(f"Morceaux manquants : {manquants}")
+
+    chemin = os.path.join(dossier_morceaux(televersement), f"assemblage.{uuid.uuid4().hex}")
+
+    empreinte = hashlib.sha256()
+    try:
+        with open(chemin, 'wb') as sortie:
+            for index in range(televersement.nb_morceaux):
+                with open(_chemin_morceau(televersement, index), 'rb') as morceau:
+                    for bloc in iter(lambda: morceau.read(TAILLE_BLOC), b''):
+                        empreinte.update(bloc)
+                        sortie.write(bloc)
+    except FileNotFoundError:
+        # Morceaux supprimés entre-temps (finalisation ou abandon concurrent)
+        if os.path.exists(chemin):
+            os.remove(chemin)
+        raise ErreurTeleversement("Morceaux supprimés pendant l'assemblage")
+
+    empreinte = empreinte.hexdigest()
+    if televersement.empreinte_attendue and empreinte != televersement.empreinte_attendue.lower():
+        os.remove(chemin)
+        raise ErreurTeleversement("Empreinte SHA-256 différente de celle annoncée")
+
+    return chemin, empreinte
+
+
+def finaliser_televersement(televersement):
+    """
+    Assemble le fichier et crée le FichierMedia
+
+    Le téléversement est verrouillé et son statut relu avant l'assemblage :
+    une finalisation rejouée en parallèle attend la première et renvoie le
+    même média au lieu d'en créer un second.
+
+    Returns:
+        tuple: (FichierMedia, doublon) ; doublon vaut True si un média de
+        même contenu existait déjà sur la réponse
+
+    Raises:
+        ErreurTeleversement: téléversement annulé, morceaux manquants ou
+        empreinte différente de celle annoncée
+    """
+    with transaction.atomic():
+        televersement = TeleversementMedia.objects.select_for_update().select_related(
+            'fichier_media'
+        ).get(pk=televersement.pk)
+        if televersement.statut == 'TERMINE' and televersement.fichier_media_id:
+            return televersement.fichier_media, False
+        if televersement.statut != 'EN_COURS':
+            raise ErreurTeleversement("Téléversement annulé")
+
+        chemin, empreinte = assembler(televersement)
+        media = media_existant(televersement.reponse_id, empreinte)
+        doublon = media is not None
+        if not doublon:
+            contenu, _ = acquerir_fichier_local(chemin, empreinte, televersement.nom_original)
+            media = referencer_contenu(
+                contenu,
+                reponse_id=televersement.reponse_id,
+                type_fichier=televersement.type_fichier,
+                nom_original=televersement.nom_original,
+                taille_octets=televersement.taille_totale,
+                uploade_par=televersement.utilisateur,
+            )
+
+        televersement.statut = 'TERMINE'
+        televersement.fichier_media = media
+        televersement.save(update_fields=['statut', 'fichier_media', 'date_derniere_maj'])
+
+    supprimer_morceaux(televersement)
+    logger.info(f"Téléversement {televersement.pk} finalisé (média {media.pk}, doublon={doublon})")
+    return media, doublon
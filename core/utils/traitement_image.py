@@ -0,0 +1,132 @@
+# Fichier : core/utils/traitement_image.py
+
+"""
+Traitement d'image pur (Pillow, système de fichiers local)
+
+Ce module n'importe ni Django ni les modèles : ses fonctions s'exécutent
+aussi bien dans les threads du serveur que dans les processus de travail
+du traitement par lots (media_processor.traiter_file_attente), démarrés
+sans configuration Django.
+"""
+
+import os
+import uuid
+from io import BytesIO
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+# Tags EXIF
+GPS_IFD = 0x8825
+GPS_LATITUDE_REF, GPS_LATITUDE = 1, 2
+GPS_LONGITUDE_REF, GPS_LONGITUDE = 3, 4
+
+QUALITE_VIGNETTES = 80
+
+
+def ecrire_atomique(chemin, donnees):
+    """
+    Écrit un fichier dans un temporaire voisin puis le renomme
+
+    Un lecteur voit l'ancien fichier ou le nouveau, jamais un fichier partiel.
+    """
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    temporaire = f"{chemin}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporaire, 'wb') as sortie:
+            sortie.write(donnees)
+        os.replace(temporaire, chemin)
+    finally:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+
+
+def _en_degres(valeurs, reference):
+    degres, minutes, secondes = (float(valeur) for valeur in valeurs)
+    resultat = degres + minutes / 60 + secondes / 3600
+    return -resultat if reference in ('S', 'W') else resultat
+
+
+def coordonnees_exif(image):
+    """
+    Coordonnées GPS (latitude, longitude) des métadonnées EXIF, ou None
+    """
+    try:
+        gps = image.getexif().get_ifd(GPS_IFD)
+        if GPS_LATITUDE not in gps or GPS_LONGITUDE not in gps:
+            return None
+        latitude = _en_degres(gps[GPS_LATITUDE], gps.get(GPS_LATITUDE_REF, 'N'))
+        longitude = _en_degres(gps[GPS_LONGITUDE], gps.get(GPS_LONGITUDE_REF, 'E'))
+    except Exception:
+        return None
+
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return round(latitude, 6), round(longitude, 6)
+
+
+def encoder_jpeg(image, qualite):
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    sortie = BytesIO()
+    image.save(sortie, format='JPEG', quality=qualite, optimize=True)
+    return sortie.getvalue()
+
+
+def traiter_image_fichier(racine, nom, vignettes, nom_compresse, compression):
+    """
+    Traite une image : EXIF, vignettes, compression unique
+
+    Chaque fichier produit est écrit par ecrire_atomique. La version
+    compressée n'est conservée que si elle réduit le fichier.
+
+    Args:
+        racine: MEDIA_ROOT
+        nom: Nom du fichier source relatif à la racine
+        vignettes: {taille: nom de la vignette}
+        nom_compresse: Nom de la version compressée
+        compression: Réglages MEDIA_COMPRESSION
+
+    Returns:
+        dict: resolution, latitude/longitude éventuelles, vignettes,
+        taille_compresse et `fichier` si une version compressée a été écrite
+    """
+    chemin = os.path.join(racine, nom)
+    with Image.open(chemin) as source:
+        coordonnees = coordonnees_exif(source)
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    resultats = {'resolution': f"{image.width}x{image.height}"}
+    if coordonnees:
+        resultats['latitude'], resultats['longitude'] = coordonnees
+
+    for taille, nom_vignette in vignettes.items():
+        vignette = image.copy()
+        vignette.thumbnail((int(taille), int(taille)), Image.Resampling.LANCZOS)
+        ecrire_atomique(os.path.join(racine, nom_vignette), encoder_jpeg(vignette, QUALITE_VIGNETTES))
+    resultats['vignettes'] = dict(vignettes)
+
+    resultats['taille_compresse'] = os.path.getsize(chemin)
+    if compression.get('ENABLE_IMAGE_COMPRESSION', False):
+        image.thumbnail(tuple(compression.get('MAX_IMAGE_RESOLUTION', (1920, 1080))), Image.Resampling.LANCZOS)
+        donnees = encoder_jpeg(image, compression.get('IMAGE_QUALITY', 85))
+        if len(donnees) < resultats['taille_compresse']:
+            ecrire_atomique(os.path.join(racine, nom_compresse), donnees)
+            resultats['fichier'] = nom_compresse
+            resultats['taille_compresse'] = len(donnees)
+
+    return resultats
+
+
+def traiter_image_isolee(arguments):
+    """
+    Variante pour un pool de processus : (résultats, erreur), sans lever
+    """
+    try:
+        return traiter_image_fichier(*arguments), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
@@ -0,0 +1,141 @@
+# Fichier : core/utils/validation_utils.py
+
+"""
+Validation d'un rapport d'exécution avant finalisation
+
+Les points exigés sont ceux de la gamme exécutée par l'OT : sa version
+figée (VersionIntervention, voir gamme_utils) si l'OT en a une, sinon les
+points courants de l'intervention. Les points obligatoires sans réponse
+sont obtenus en une requête (anti-jointure NOT EXISTS sur les réponses du
+rapport), quel que soit le nombre de points de la gamme.
+
+Un point conditionnel (depend_de / condition_affichage) n'est exigé que
+s'il est affiché : la visibilité est évaluée en mémoire, à partir des
+réponses lues en une seconde requête, seulement si un point manquant est
+conditionnel. Les conditions sont celles du formulaire
+(intervention_forms.js, evaluateCondition), mais un point dont le parent
+est masqué est masqué à son tour, alors que le formulaire ne teste que la
+valeur du parent : un point masqué par le formulaire n'est jamais exigé.
+"""
+
+from django.db.models import Exists, OuterRef, Subquery
+
+from ..models import PointDeControle, Reponse
+from .gamme_utils import get_gamme_version
+
+
+def condition_remplie(valeur, condition):
+    """
+    Condition d'affichage d'un point selon la valeur de son parent
+
+    '=X' ou 'X' : égalité ; '>N' / '<N' : comparaison numérique
+    """
+    if not condition:
+        return True
+    valeur = valeur or ''
+    if condition[0] in '<>':
+        try:
+            nombre, seuil = float(valeur), float(condition[1:])
+        except ValueError:
+            return False
+        return nombre > seuil if condition[0] == '>' else nombre < seuil
+    if condition.startswith('='):
+        condition = condition[1:]
+    return valeur == condition
+
+
+def _points_visibles(points, valeurs):
+    """
+    Identifiants des points affichés (condition remplie et parent affiché)
+
+    Args:
+        points: {point_id: {'depend_de', 'condition_affichage'}}
+        valeurs: {point_id: valeur} des réponses du rapport
+    """
+    visibles = {}
+
+    def est_visible(point_id, chemin=()):
+        if point_id not in visibles:
+            parent_id = points[point_id]['depend_de'] if point_id in points else None
+            if parent_id is None or parent_id in chemin:
+                visibles[point_id] = True
+            else:
+                visibles[point_id] = (
+                    est_visible(parent_id, chemin + (point_id,)) and
+                    condition_remplie(valeurs.get(parent_id), points[point_id]['condition_affichage'])
+                )
+        return visibles[point_id]
+
+    return {point_id for point_id in points if est_visible(point_id)}
+
+
+def points_obligatoires_manquants(ordre, rapport):
+    """
+    Points obligatoires affichés et sans réponse
+
+    Returns:
+        list: [{point_id, point (libellé), operation_id, operation (nom)}]
+        dans l'ordre de la gamme
+    """
+    sans_reponse = ~Exists(Reponse.objects.filter(rapport_execution=rapport, point_de_controle=OuterRef('pk')))
+
+    if ordre.version_intervention_id:
+        # Gamme figée : points et dépendances de la version, réponses en base
+        gamme = [
+            dict(point, operation_id=operation['id'], operation=operation['nom'])
+            for operation in get_gamme_version(ordre.version_intervention_id)['operations']
+            for point in operation['points_de_controle']
+        ]
+        points = {point['id']: point for point in gamme}
+        ids_manquants = set(PointDeControle.objects.filter(
+            pk__in=[point['id'] for point in gamme if point['est_obligatoire']]
+        ).filter(sans_reponse).values_list('id', flat=True))
+        manquants = [point for point in gamme if point['id'] in ids_manquants]
+    else:
+        manquants = [
+            {
+                'id': point['id'], 'label': point['label'], 'depend_de': point['depend_de_id'],
+                'operation_id': point['operation_id'], 'operation': point['operation__nom'],
+            }
+            for point in PointDeControle.objects.filter(
+                operation__intervention_id=ordre.intervention_id, est_obligatoire=True
+            ).filter(sans_reponse).order_by('operation__ordre', 'ordre').values(
+                'id', 'label', 'operation_id', 'operation__nom', 'depend_de_id'
+            )
+        ]
+        points = None
+
+    if any(point['depend_de'] for point in manquants):
+        if points is None:
+            lignes = PointDeControle.objects.filter(
+                operation__intervention_id=ordre.intervention_id
+            ).annotate(
+                valeur=Subquery(
+                    Reponse.objects.filter(
+                        rapport_execution=rapport, point_de_controle=OuterRef('pk')
+                    ).values('valeur')[:1]
+                )
+            ).values('id', 'depend_de_id', 'condition_affichage', 'valeur')
+            points, valeurs = {}, {}
+            for ligne in lignes:
+                points[ligne['id']] = {
+                    'depend_de': ligne['depend_de_id'], 'condition_affichage': ligne['condition_affichage']
+                }
+                valeurs[ligne['id']] = ligne['valeur']
+        else:
+            valeurs = dict(
+                Reponse.objects.filter(rapport_execution=rapport, point_de_controle_id__in=points)
+                .values_list('point_de_controle_id', 'valeur')
+            )
+        visibles = _points_visibles(points, valeurs)
+        manquants = [point for point in manquants if point['id'] in visibles]
+
+    return [
+        {
+            'point_id': point['id'],
+            'point': point['label'],
+            'operation_id': point['operation_id'],
+            'operation': point['operation'],
+        }
+        for point in manquants
+    ]
@@ -3,9 +3,10 @@
 # ==============================================================================
 # IMPORTS STANDARD PYTHON
 # ==============================================================================
+import hashlib
 import json
+import math
 import os
-import uuid
 from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
 from io import BytesIO
@@ -19,23 +20,24 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import PermissionDenied
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, transaction
 from django.db.models import (
     Count, Sum, Avg, F, Q, Case, When, IntegerField, 
-    Exists, OuterRef, BooleanField, CharField, Max
+    Exists, OuterRef, BooleanField, CharField, Max, Min, FloatField
 )
-from django.http import JsonResponse, HttpResponse
+from django.db.models.functions import Cast, Floor
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template.loader import get_template
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-from django.views.decorators.cache import cache_page
 
 # ==============================================================================
 # IMPORTS TIERS
@@ -57,6 +59,23 @@ except ImportError:
 
 from .models import *
 from .forms import *
+from .utils.cache_utils import cached_value, CARTE_STATS_NAMESPACE
+from .utils.gamme_utils import publier_version, operations_ordre
+from .utils.media_processor import creer_media
+from .utils.recherche import filtrer as filtrer_recherche, objets as objets_recherche
+from .utils.pagination import paginer, compter
+from .utils.acces import droits
+from .utils.validation_utils import points_obligatoires_manquants
+from .utils.sauvegarde_reponses import valeurs_formulaire
+from .utils.brouillons import ConflitBrouillon, enregistrer_brouillon, lire_brouillon, materialiser_brouillon
+from .utils.compteurs import (
+    statistiques_globales, statistiques_utilisateur, evolution_terminees, statistiques_en_cache, GLOBAL
+)
+from .utils.export_rapports import flux_zip_rapports, lire_filtre, rapports_a_exporter
+from .utils.rapport_pdf import (
+    contexte_rapport, nom_telechargement, pdf_disponible, pdf_en_cache, planifier_pdf, rendre_pdf,
+    STATUTS_FIGES
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -66,11 +85,8 @@ logger = logging.getLogger(__name__)
 # ==============================================================================
 
 def get_user_role(user):
-    """Récupère le rôle d'un utilisateur"""
-    try:
-        return user.profil.role
-    except AttributeError:
-        return 'OPERATEUR'
+    """Récupère le rôle d'un utilisateur (mémorisé pour la requête)"""
+    return droits(user).role
 
 def is_manager_or_admin(user):
     """Vérifie si l'utilisateur est manager ou admin"""
@@ -162,44 +178,16 @@ def deconnexion_view(request):
 @login_required
 def dashboard(request):
     """Tableau de bord adapté selon le rôle utilisateur"""
-    user_role = get_user_role(request.user)
-    
-    # OPTIMISATION : Une seule requête pour toutes les stats
-    from django.db.models import Count, Case, When, IntegerField
-    
-    # Stats globales en une requête
-    stats_query = OrdreDeTravail.objects.aggregate(
-        ordres_actifs=Count('id', filter=~Q(statut__est_statut_final=True)),
-        ordres_en_retard=Count('id', filter=Q(
-            date_prevue_debut__lt=timezone.now(),
-            statut__est_statut_final=False
-        )),
-        ordres_aujourdhui=Count('id', filter=Q(
-            date_prevue_debut__date=timezone.now().date()
-        ))
-    )
+    acces = droits(request.user)
+    user_role = acces.role
     
-    # Stats assets en une requête
-    assets_stats = Asset.objects.aggregate(
-        assets_total=Count('id'),
-        assets_en_panne=Count('id', filter=Q(statut='EN_PANNE')),
-        assets_critiques=Count('id', filter=Q(statut='EN_PANNE', criticite__gte=3))
-    )
-    
-    # Stats interventions (cache simple)
-    interventions_validees = Intervention.objects.filter(statut='VALIDATED').count()
-    
-    stats = {
-        **stats_query,
-        **assets_stats,
-        'interventions_validees': interventions_validees,
-    }
+    # Compteurs dénormalisés : coût indépendant du volume des tables
+    stats = statistiques_globales()
     
     # OPTIMISATION : Requêtes optimisées selon le rôle
     if user_role == 'TECHNICIEN':
         mes_ordres = OrdreDeTravail.objects.filter(
-            Q(assigne_a_technicien=request.user) | 
-            Q(assigne_a_equipe__membres=request.user)
+            acces.filtre_assignes()
         ).exclude(statut__est_statut_final=True).select_related(
             'intervention', 'asset', 'statut', 'cree_par'
         ).prefetch_related('assigne_a_equipe__membres')[:5]
@@ -208,9 +196,7 @@ def dashboard(request):
         
     elif user_role in ['MANAGER', 'ADMIN']:
         mes_ordres = OrdreDeTravail.objects.filter(
-            Q(assigne_a_technicien=request.user) | 
-            Q(assigne_a_equipe__membres=request.user) |
-            Q(cree_par=request.user)
+            acces.filtre_personnels()
         ).exclude(statut__est_statut_final=True).select_related(
             'intervention', 'asset', 'statut', 'cree_par'
         ).prefetch_related('assigne_a_equipe__membres')[:5]
@@ -221,9 +207,7 @@ def dashboard(request):
         
     else:
         mes_ordres = OrdreDeTravail.objects.filter(
-            Q(cree_par=request.user) |
-            Q(assigne_a_technicien=request.user) | 
-            Q(assigne_a_equipe__membres=request.user)
+            acces.filtre_personnels()
         ).exclude(statut__est_statut_final=True).select_related(
             'intervention', 'asset', 'statut', 'cree_par'
         ).prefetch_related('assigne_a_equipe__membres')[:5]
@@ -259,10 +243,7 @@ def liste_interventions(request):
     interventions_list = Intervention.objects.all()
     
     if query:
-        interventions_list = interventions_list.filter(
-            Q(nom__icontains=query) | 
-            Q(description__icontains=query)
-        )
+        interventions_list = filtrer_recherche(interventions_list, 'intervention', query)
     
     interventions_list = interventions_list.order_by('-id')
     
@@ -398,8 +379,10 @@ def valider_intervention(request, pk):
         intervention = get_object_or_404(Intervention, pk=pk)
         intervention.statut = 'VALIDATED'
         intervention.save()
+        # Figer la gamme : les OT créés ensuite utiliseront cette version
+        version = publier_version(intervention, request.user)
         messages.success(request, 'Intervention validée avec succès.')
-        return JsonResponse({'success': True})
+        return JsonResponse({'success': True, 'version': version.numero})
     return JsonResponse({'success': False})
 @login_required
 @user_passes_test(is_manager_or_admin)
@@ -476,26 +459,11 @@ def liste_ordres_travail(request):
     ).annotate(
         cout_total=F('cout_main_oeuvre_reel') + F('cout_pieces_reel')
     )
-    print(ordres)
-    # Filtrer selon le rôle
-    user_role = get_user_role(request.user)
-    
-    if user_role == 'TECHNICIEN':
-        # Les techniciens ne voient que leurs ordres assignés
-        ordres = ordres.filter(
-            Q(assigne_a_technicien=request.user) | 
-            Q(assigne_a_equipe__membres=request.user)
-        )
-    elif user_role in ['MANAGER', 'ADMIN']:
-        # Managers et admins voient tout
-        pass
-    else:
-        # Autres rôles voient leurs ordres créés/assignés
-        ordres = ordres.filter(
-            Q(cree_par=request.user) |
-            Q(assigne_a_technicien=request.user) | 
-            Q(assigne_a_equipe__membres=request.user)
-        )
+    # Filtrer selon le rôle : managers et admins voient tout, les autres
+    # leurs ordres assignés (à eux ou à leurs équipes) ou créés
+    acces = droits(request.user)
+    user_role = acces.role
+    ordres = acces.ordres_visibles(ordres)
     
     ordres = ordres.order_by('-date_creation')
     
@@ -515,16 +483,15 @@ def liste_ordres_travail(request):
         ordres = ordres.filter(type_OT=type_filter)
     
     if search:
-        ordres = ordres.filter(
-            Q(titre__icontains=search) |
-            Q(asset__nom__icontains=search) |
-            Q(intervention__nom__icontains=search)
-        )
+        ordres = filtrer_recherche(ordres, 'ot', search)
     
-    # Pagination
-    paginator = Paginator(ordres, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par clé (date_creation, id) : coût constant quelle que
+    # soit la profondeur, total plafonné au lieu d'un COUNT(*) complet
+    try:
+        page_obj = paginer(ordres, request.GET.get('cursor'), 10)
+    except ValueError:
+        page_obj = paginer(ordres, None, 10)
+    nb_ordres, nb_ordres_exact = compter(ordres)
     
     # Données pour les filtres
     statuts = StatutWorkflow.objects.all()
@@ -533,6 +500,8 @@ def liste_ordres_travail(request):
     
     context = {
         'ordres_page': page_obj,
+        'nb_ordres': nb_ordres,
+        'nb_ordres_exact': nb_ordres_exact,
         'statuts': statuts,
         'priorites': priorites,
         'types_ot': types_ot,
@@ -581,8 +550,7 @@ def detail_ordre_travail(request, pk):
             'intervention', 'asset', 'asset__categorie', 'statut', 
             'cree_par', 'assigne_a_technicien'
         ).prefetch_related(
-            'assigne_a_equipe__membres',
-            'intervention__operations__points_de_controle'
+            'assigne_a_equipe__membres'
         ), 
         pk=pk
     )
@@ -590,12 +558,7 @@ def detail_ordre_travail(request, pk):
     # Vérifier les permissions d'accès
     user_role = get_user_role(request.user)
     
-    can_view = (
-        user_role in ['MANAGER', 'ADMIN'] or
-        ordre.cree_par == request.user or
-        ordre.assigne_a_technicien == request.user or
-        (ordre.assigne_a_equipe and request.user in ordre.assigne_a_equipe.membres.all())
-    )
+    can_view = droits(request.user).peut_voir(ordre)
     
     if not can_view:
         messages.error(request, "Vous n'avez pas accès à cet ordre de travail.")
@@ -640,14 +603,11 @@ def detail_ordre_travail(request, pk):
     ).order_by('-date_creation')
     
     # Vérifier si l'utilisateur peut commencer l'intervention
-    peut_executer = (
-        ordre.assigne_a_technicien == request.user or
-        (ordre.assigne_a_equipe and request.user in ordre.assigne_a_equipe.membres.all()) or
-        user_role in ['MANAGER', 'ADMIN']
-    )
+    peut_executer = droits(request.user).peut_executer(ordre)
     
     context = {
         'ordre_de_travail': ordre,
+        'gamme_operations': operations_ordre(ordre),
         'rapport': rapport,
         'commentaires': commentaires,
         'actions_correctives': actions_correctives,
@@ -705,13 +665,7 @@ def commencer_intervention(request, pk):
     ordre = get_object_or_404(OrdreDeTravail, pk=pk)
     
     # Vérifier que l'utilisateur peut commencer cette intervention
-    user_role = get_user_role(request.user)
-    
-    peut_commencer = (
-        ordre.assigne_a_technicien == request.user or
-        (ordre.assigne_a_equipe and request.user in ordre.assigne_a_equipe.membres.all()) or
-        user_role in ['MANAGER', 'ADMIN']
-    )
+    peut_commencer = droits(request.user).peut_executer(ordre)
     
     if not peut_commencer:
         messages.error(request, "Vous n'êtes pas autorisé à commencer cette intervention.")
@@ -755,18 +709,15 @@ def executer_intervention(request, pk):
     
     # Vérifications de permissions existantes...
     user_role = get_user_role(request.user)
-    peut_executer = (
-        ordre.assigne_a_technicien == request.user or
-        (ordre.assigne_a_equipe and request.user in ordre.assigne_a_equipe.membres.all()) or
-        user_role in ['MANAGER', 'ADMIN']
-    )
+    peut_executer = droits(request.user).peut_executer(ordre)
     
     if not peut_executer:
         messages.error(request, "Vous n'êtes pas autorisé à exécuter cette intervention.")
         return redirect('detail_ordre_travail', pk=pk)
     
     rapport = get_object_or_404(RapportExecution, ordre_de_travail=ordre)
-    operations = ordre.intervention.operations.all().order_by('ordre')
+    # Gamme figée de l'OT (en cache) pour l'affichage
+    gamme_operations = operations_ordre(ordre)
     
     # Vérifier s'il y a des demandes de réparation bloquantes
     demandes_bloquantes = DemandeReparation.objects.filter(
@@ -780,78 +731,84 @@ def executer_intervention(request, pk):
         action = request.POST.get('action')
         
         if action == 'sauvegarder_reponses':
-            # Sauvegarde automatique améliorée
-            reponses_sauvees = 0
-            
-            for key, value in request.POST.items():
-                if key.startswith('point_'):
-                    point_id = key.replace('point_', '')
-                    try:
-                        point = PointDeControle.objects.get(id=point_id)
-                        reponse, created = Reponse.objects.get_or_create(
-                            rapport_execution=rapport,
-                            point_de_controle=point,
-                            defaults={'saisi_par': request.user}
-                        )
-                        
-                        if reponse.valeur != value:  # Seulement si changement
-                            reponse.valeur = value
-                            reponse.saisi_par = request.user
-                            reponse.date_reponse = timezone.now()
-                            reponse.save()
-                            reponses_sauvees += 1
-                            
-                    except PointDeControle.DoesNotExist:
-                        continue
+            # Sauvegarde explicite : brouillon et formulaire deviennent des
+            # réponses (seules les réponses modifiées sont écrites)
+            resultat = materialiser_brouillon(
+                rapport, request.user, valeurs_formulaire(request.POST, 'point_'),
+                version_client=request.POST.get('version')
+            )
+            reponses_sauvees = resultat['crees'] + resultat['modifiees']
             
             # Réponse JSON pour AJAX
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
                     'success': True,
                     'message': f'{reponses_sauvees} réponse(s) sauvegardée(s)',
-                    'auto_save': True
+                    'auto_save': True,
+                    'version': resultat['version'],
+                    'modifie_ailleurs': resultat['modifie_ailleurs']
                 })
             
             messages.success(request, f"Réponses sauvegardées! ({reponses_sauvees} modifications)")
         
         elif action == 'finaliser_intervention':
+            valeurs = valeurs_formulaire(request.POST, 'reponse_')
+            
+            def conserver_saisie():
+                # Finalisation refusée : la saisie reste dans le brouillon
+                try:
+                    enregistrer_brouillon(rapport, {
+                        point_id: valeur for point_id, valeur in valeurs.items() if valeur != ''
+                    })
+                except ConflitBrouillon:
+                    pass
+            
             # Vérification avancée avant finalisation
             if demandes_bloquantes.exists():
+                conserver_saisie()
                 messages.error(request, f"Impossible de finaliser: {demandes_bloquantes.count()} demande(s) de réparation en attente.")
                 return redirect('executer_intervention', pk=pk)
             
-            # Vérifier les points obligatoires
-            points_obligatoires_manquants = []
-            for operation in operations:
-                for point in operation.points_de_controle.filter(est_obligatoire=True):
-                    if not rapport.reponses.filter(point_de_controle=point).exists():
-                        points_obligatoires_manquants.append(f"{operation.nom} > {point.label}")
-            
-            if points_obligatoires_manquants:
-                messages.error(request, f"Points obligatoires manquants: {', '.join(points_obligatoires_manquants)}")
-            else:
-                # Finaliser avec historique
-                rapport.statut_rapport = 'FINALISE'
-                rapport.date_execution_fin = timezone.now()
-                rapport.save()
-                
-                ordre.date_fin_reelle = timezone.now()
-                statut_termine = StatutWorkflow.objects.filter(nom='TERMINE').first()
-                if statut_termine:
-                    ordre.statut = statut_termine
-                ordre.save()
+            # Le brouillon et les valeurs envoyées deviennent des réponses dans
+            # la transaction de finalisation : annulées si elle est refusée
+            with transaction.atomic():
+                materialiser_brouillon(rapport, request.user, valeurs, ignorer_vides=True)
                 
-                # Créer historique
-                HistoriqueModification.objects.create(
-                    type_objet='ORDRE_TRAVAIL',
-                    objet_id=ordre.id,
-                    type_action='CHANGEMENT_STATUT',
-                    description=f"Intervention finalisée par {request.user.get_full_name()}",
-                    utilisateur=request.user
-                )
+                # Vérifier les points obligatoires (affichés et sans réponse)
+                manquants = points_obligatoires_manquants(ordre, rapport)
                 
+                if manquants:
+                    transaction.set_rollback(True)
+                else:
+                    # Finaliser avec historique
+                    rapport.statut_rapport = 'FINALISE'
+                    rapport.date_execution_fin = timezone.now()
+                    rapport.save()
+                    
+                    ordre.date_fin_reelle = timezone.now()
+                    statut_termine = StatutWorkflow.objects.filter(nom='TERMINE').first()
+                    if statut_termine:
+                        ordre.statut = statut_termine
+                    ordre.save()
+                    
+                    # Créer historique
+                    HistoriqueModification.objects.create(
+                        type_objet='ORDRE_TRAVAIL',
+                        objet_id=ordre.id,
+                        type_action='CHANGEMENT_STATUT',
+                        description=f"Intervention finalisée par {request.user.get_full_name()}",
+                        utilisateur=request.user
+                    )
+            
+            if not manquants:
                 messages.success(request, "Intervention finalisée avec succès!")
                 return redirect('detail_ordre_travail', pk=pk)
+            
+            rapport.refresh_from_db(fields=['version_reponses'])
+            conserver_saisie()
+            messages.error(request, "Points obligatoires manquants: " + ', '.join(
+                f"{point['operation']} > {point['point']}" for point in manquants
+            ))
     
     # Récupérer les réponses existantes avec médias
     reponses_existantes = {}
@@ -860,12 +817,16 @@ def executer_intervention(request, pk):
     for reponse in rapport.reponses.all():
         reponses_existantes[reponse.point_de_controle.id] = reponse.valeur
         medias_par_reponse[reponse.point_de_controle.id] = reponse.fichiers_media.all()
+    # Les valeurs du brouillon (non encore enregistrées) priment
+    brouillon, version_brouillon = lire_brouillon(rapport)
+    reponses_existantes.update(brouillon)
     
     context = {
         'ordre_de_travail': ordre,
         'rapport': rapport,
-        'operations': operations,
+        'operations': gamme_operations,
         'reponses_existantes': reponses_existantes,
+        'version_brouillon': version_brouillon,
         'medias_par_reponse': medias_par_reponse,
         'demandes_bloquantes': demandes_bloquantes,
         'user_role': user_role,
@@ -1032,9 +993,12 @@ def ajax_reorder_operations(request):
                     )
                 
                 # Ensuite, les remettre dans le bon ordre
+                # update() contourne auto_now : date_derniere_maj est posée
+                # explicitement pour la synchronisation mobile différentielle
                 for index, operation_id in enumerate(operation_ids, 1):
                     Operation.objects.filter(pk=int(operation_id)).update(
-                        ordre=index
+                        ordre=index,
+                        date_derniere_maj=timezone.now()
                     )
             
             return JsonResponse({
@@ -1108,15 +1072,9 @@ def export_rapport_pdf(request, pk):
     )
     
     # Vérifier les permissions
-    user_role = get_user_role(request.user)
     ordre = rapport.ordre_de_travail
     
-    can_export = (
-        user_role in ['MANAGER', 'ADMIN'] or
-        ordre.cree_par == request.user or
-        ordre.assigne_a_technicien == request.user or
-        (ordre.assigne_a_equipe and request.user in ordre.assigne_a_equipe.membres.all())
-    )
+    can_export = droits(request.user).peut_voir(ordre)
     
     if not can_export:
         messages.error(request, "Vous n'avez pas accès à ce rapport.")
@@ -1233,11 +1191,7 @@ def liste_demandes_reparation(request):
         demandes = demandes.filter(priorite=priorite_filter)
     
     if search:
-        demandes = demandes.filter(
-            Q(numero_demande__icontains=search) |
-            Q(titre__icontains=search) |
-            Q(description__icontains=search)
-        )
+        demandes = filtrer_recherche(demandes, 'demande', search)
     
     demandes = demandes.order_by('-date_creation')
     
@@ -1279,11 +1233,7 @@ def creer_demande_reparation(request, ordre_id, point_id, reponse_id=None):
         return redirect('executer_intervention', pk=ordre_id)
     
     # Vérifier les permissions
-    peut_creer = (
-        ordre.assigne_a_technicien == request.user or
-        (ordre.assigne_a_equipe and request.user in ordre.assigne_a_equipe.membres.all()) or
-        get_user_role(request.user) in ['MANAGER', 'ADMIN']
-    )
+    peut_creer = droits(request.user).peut_executer(ordre)
     
     if not peut_creer:
         messages.error(request, "Vous n'êtes pas autorisé à créer une demande de réparation pour cet ordre.")
@@ -1453,7 +1403,9 @@ def reorder_operations(request):
             # Mettre à jour l'ordre de chaque opération
             for index, operation_id in enumerate(operation_ids, 1):
                 from .models import Operation
-                Operation.objects.filter(pk=operation_id).update(ordre=index)
+                Operation.objects.filter(pk=operation_id).update(
+                    ordre=index, date_derniere_maj=timezone.now()
+                )
             
             return JsonResponse({
                 'success': True,
@@ -1522,7 +1474,8 @@ def reorder_points_controle(request):
                 for index, point_id in enumerate(point_ids, 1):
                     PointDeControle.objects.filter(pk=int(point_id)).update(
                         operation=operation,
-                        ordre=index
+                        ordre=index,
+                        date_derniere_maj=timezone.now()
                     )
                 
                 # Réorganiser les points restants dans les opérations sources
@@ -1539,7 +1492,7 @@ def reorder_points_controle(request):
                     for idx, point in enumerate(points_restants, 1):
                         if point.ordre != idx:
                             point.ordre = idx
-                            point.save(update_fields=['ordre'])
+                            point.save(update_fields=['ordre', 'date_derniere_maj'])
             
             return JsonResponse({
                 'success': True,
@@ -1613,12 +1566,10 @@ def upload_media_avance(request):
                     type_fichier = 'VIDEO'
                 
                 # Créer le fichier média
-                fichier_media = FichierMedia.objects.create(
+                fichier_media = creer_media(
+                    file,
                     reponse=reponse,
-                    type_fichier=type_fichier,
-                    fichier=file,
-                    nom_original=file.name,
-                    taille_octets=file.size
+                    type_fichier=type_fichier
                 )
                 
                 # Créer l'enrichissement
@@ -1668,10 +1619,8 @@ def supprimer_media(request, media_id):
                     'error': 'Permission refusée'
                 }, status=403)
             
-            # Supprimer le fichier physique
-            if fichier.fichier:
-                default_storage.delete(fichier.fichier.name)
-            
+            # Le fichier physique est libéré par le signal post_delete
+            # (supprimé avec la dernière référence à son contenu)
             fichier.delete()
             
             return JsonResponse({
@@ -1755,12 +1704,10 @@ def upload_media_simple(request):
         )
         
         # Sauvegarder le fichier média
-        fichier_media = FichierMedia.objects.create(
+        fichier_media = creer_media(
+            fichier,
             reponse=reponse,
-            type_fichier=type_fichier.upper(),
-            fichier=fichier,
-            nom_original=fichier.name,
-            taille_octets=fichier.size
+            type_fichier=type_fichier.upper()
         )
         
         # Déterminer le type de fichier
@@ -1821,14 +1768,8 @@ def delete_media_simple(request):
         try:
             media = FichierMedia.objects.get(id=media_id)
             
-            # Supprimer le fichier physique
-            if media.fichier:
-                try:
-                    media.fichier.delete(save=False)
-                except Exception as e:
-                    print(f"Erreur suppression fichier physique: {e}")
-            
-            # Supprimer l'enregistrement
+            # Supprimer l'enregistrement (fichier libéré par le signal
+            # post_delete, partagé entre médias identiques)
             media.delete()
             
             print(f"DEBUG: média {media_id} supprimé avec succès")
@@ -1958,45 +1899,15 @@ def export_rapport_pdf(request, pk):
     ordre = rapport.ordre_de_travail
     
     # Vérifications de permissions...
-    user_role = get_user_role(request.user)
-    can_export = (
-        user_role in ['MANAGER', 'ADMIN'] or
-        ordre.cree_par == request.user or
-        ordre.assigne_a_technicien == request.user or
-        (ordre.assigne_a_equipe and request.user in ordre.assigne_a_equipe.membres.all())
-    )
+    can_export = droits(request.user).peut_voir(ordre)
     
     if not can_export:
         messages.error(request, "Vous n'avez pas accès à ce rapport.")
         return redirect('liste_ordres_travail')
     
-    # Préparer les données
-    reponses_avec_medias = []
-    for reponse in rapport.reponses.all().order_by(
-        'point_de_controle__operation__ordre', 
-        'point_de_controle__ordre'
-    ):
-        medias = reponse.fichiers_media.all()
-        reponses_avec_medias.append({
-            'reponse': reponse,
-            'medias': medias,
-            'nb_photos': medias.filter(type_fichier='PHOTO').count(),
-            'nb_documents': medias.filter(type_fichier='DOCUMENT').count(),
-        })
-    
-    # Demandes de réparation liées
-    demandes_reparation = DemandeReparation.objects.filter(
-        ordre_de_travail=ordre
-    ).order_by('-date_creation')
-    
-    context = {
-        'rapport': rapport,
-        'ordre': ordre,
-        'reponses_avec_medias': reponses_avec_medias,
-        'demandes_reparation': demandes_reparation,
-        'date_export': timezone.now(),
-        'exporte_par': request.user,
-    }
+    # Préparer les données (médias préchargés, compteurs calculés en mémoire)
+    context = contexte_rapport(rapport)
+    context['exporte_par'] = request.user
     
     try:
         from django.template.loader import get_template
@@ -2062,85 +1973,49 @@ def get_notifications_utilisateur(request):
 
 
 @login_required
-@cache_page(60 * 2)  # Cache 2 minutes
 def get_statistiques_dashboard(request):
     """
     API pour les statistiques du dashboard - OPTIMISÉE
+
+    Lue sur les compteurs dénormalisés (core.utils.compteurs), en cache par
+    portée : globale pour les managers, utilisateur et équipes pour les
+    autres rôles. Le cache est invalidé à chaque modification des
+    compteurs de la portée.
     """
     user = request.user
     user_role = get_user_role(user)
     
-    # OPTIMISATION : Requêtes agrégées
     if user_role in ['MANAGER', 'ADMIN']:
-        # Une seule requête agrégée pour les OT
-        ot_stats = OrdreDeTravail.objects.aggregate(
-            ordres_actifs=Count('id', filter=~Q(statut__est_statut_final=True)),
-            ordres_en_retard=Count('id', filter=Q(
-                date_prevue_debut__lt=timezone.now(),
-                statut__est_statut_final=False
-            ))
-        )
-        
-        # Une seule requête pour les autres stats
-        autres_stats = {
-            'demandes_reparation_en_attente': DemandeReparation.objects.filter(
-                statut='EN_ATTENTE'
-            ).count(),
-            'assets_en_panne': Asset.objects.filter(statut='EN_PANNE').count(),
-            'techniciens_actifs': User.objects.filter(
+        def calculer_stats():
+            globales = statistiques_globales()
+            stats = {
+                cle: globales[cle] for cle in (
+                    'ordres_actifs', 'ordres_en_retard', 'demandes_reparation_en_attente', 'assets_en_panne'
+                )
+            }
+            stats['techniciens_actifs'] = User.objects.filter(
                 profil__role='TECHNICIEN',
                 is_active=True
-            ).count(),
-        }
-        
-        stats = {**ot_stats, **autres_stats}
+            ).count()
+            return stats
+
+        stats = statistiques_en_cache([GLOBAL], ['manager'], calculer_stats)
         
     else:
-        # Stats personnelles optimisées
-        mes_ot = OrdreDeTravail.objects.filter(
-            Q(assigne_a_technicien=user) | 
-            Q(assigne_a_equipe__membres=user)
+        # Stats personnelles : OT du technicien et de ses équipes
+        equipes = sorted(user.equipes.values_list('id', flat=True))
+        stats = statistiques_en_cache(
+            [('UTILISATEUR', user.pk)] + [('EQUIPE', equipe_id) for equipe_id in equipes],
+            ['personnel'],
+            lambda: statistiques_utilisateur(user, equipes=equipes),
         )
-        
-        stats = mes_ot.aggregate(
-            mes_taches_total=Count('id', filter=~Q(statut__est_statut_final=True)),
-            mes_taches_en_retard=Count('id', filter=Q(
-                date_prevue_debut__lt=timezone.now(),
-                statut__est_statut_final=False
-            )),
-            mes_taches_aujourdhui=Count('id', filter=Q(
-                date_prevue_debut__date=timezone.now().date()
-            ))
-        )
-        
-        # Ajout des demandes de réparation
-        stats['mes_demandes_reparation'] = DemandeReparation.objects.filter(
-            cree_par=user
-        ).count()
-    
-    # OPTIMISATION : Graphique évolution optimisé
-    debut_semaine = timezone.now() - timedelta(days=7)
-    
-    # Une seule requête avec GROUP BY
-    evolution_data = OrdreDeTravail.objects.filter(
-        date_fin_reelle__gte=debut_semaine
-    ).extra(
-        select={'day': 'date(date_fin_reelle)'}
-    ).values('day').annotate(
-        completed=Count('id')
-    ).order_by('day')
-    
-    # Formater pour le frontend
-    evolution_semaine = []
-    evolution_dict = {item['day'].strftime('%Y-%m-%d'): item['completed'] for item in evolution_data}
-    
-    for i in range(7):
-        date = debut_semaine + timedelta(days=i)
-        date_str = date.strftime('%Y-%m-%d')
-        evolution_semaine.append({
-            'date': date_str,
-            'completed': evolution_dict.get(date_str, 0)
-        })
+    
+    # Graphique évolution : OT terminés par jour sur les 7 derniers jours,
+    # commun à tous les utilisateurs
+    debut_semaine = timezone.localdate() - timedelta(days=7)
+    evolution_semaine = statistiques_en_cache(
+        [GLOBAL], ['evolution'], lambda: evolution_terminees(debut_semaine)
+    )
     
     return JsonResponse({
         'statistiques': stats,
@@ -2161,11 +2036,11 @@ def recherche_globale(request):
     
     results = []
     
-    # OPTIMISATION : Recherche dans les OT avec select_related
-    ots = OrdreDeTravail.objects.filter(
-        Q(titre__icontains=query) |
-        Q(id__icontains=query)
-    ).select_related('asset', 'intervention', 'statut')[:5]
+    # OPTIMISATION : Index de recherche (préfixes de mots, sans accents),
+    # puis chargement des objets trouvés avec select_related
+    ots = objets_recherche(
+        OrdreDeTravail.objects.select_related('asset', 'intervention', 'statut'), 'ot', query, 5
+    )
     
     for ot in ots:
         results.append({
@@ -2178,10 +2053,7 @@ def recherche_globale(request):
         })
     
     # OPTIMISATION : Recherche dans les assets avec select_related
-    assets = Asset.objects.filter(
-        Q(nom__icontains=query) |
-        Q(reference__icontains=query)
-    ).select_related('categorie')[:5]
+    assets = objets_recherche(Asset.objects.select_related('categorie'), 'asset', query, 5)
     
     for asset in assets:
         results.append({
@@ -2194,10 +2066,7 @@ def recherche_globale(request):
         })
     
     # OPTIMISATION : Recherche dans les interventions
-    interventions = Intervention.objects.filter(
-        Q(nom__icontains=query) |
-        Q(description__icontains=query)
-    )[:3]
+    interventions = objets_recherche(Intervention.objects.all(), 'intervention', query, 3)
     
     for intervention in interventions:
         results.append({
@@ -2209,6 +2078,53 @@ def recherche_globale(request):
             'icon': 'fas fa-clipboard-list'
         })
     
+    # Demandes et médias : seulement ceux des OT visibles par l'utilisateur.
+    # Hors gestionnaires, le filtre de droits est appliqué avant la limite
+    # (sinon les dernières correspondances, invisibles, masqueraient les autres)
+    acces = droits(request.user)
+
+    def objets_visibles(queryset, type_objet, condition, limite):
+        if acces.est_gestionnaire:
+            return objets_recherche(queryset, type_objet, query, limite)
+        queryset = filtrer_recherche(queryset.filter(condition), type_objet, query)
+        return list(queryset.order_by('-pk')[:limite])
+
+    ordres_visibles = acces.ordres_visibles(OrdreDeTravail.objects.all())
+
+    # Demandes de réparation (mêmes droits que le détail de la demande)
+    demandes = objets_visibles(
+        DemandeReparation.objects.all(), 'demande',
+        Q(ordre_de_travail__in=ordres_visibles) | Q(cree_par=request.user) | Q(assignee_a=request.user),
+        3
+    )
+    
+    for demande in demandes:
+        results.append({
+            'type': 'demande_reparation',
+            'id': demande.id,
+            'title': demande.titre,
+            'subtitle': f"{demande.numero_demande} - {demande.get_statut_display()}",
+            'url': reverse('detail_demande_reparation', args=[demande.id]),
+            'icon': 'fas fa-tools'
+        })
+    
+    # Médias (nom, légende, mots-clés), ouverts sur leur OT
+    medias = objets_visibles(
+        FichierMedia.objects.select_related('reponse__rapport_execution'), 'media',
+        Q(reponse__rapport_execution__ordre_de_travail__in=ordres_visibles), 3
+    )
+    
+    for media in medias:
+        ordre_id = media.reponse.rapport_execution.ordre_de_travail_id
+        results.append({
+            'type': 'media',
+            'id': media.id,
+            'title': media.legende or media.nom_original,
+            'subtitle': f"OT-{ordre_id} - {media.mots_cles}" if media.mots_cles else f"OT-{ordre_id}",
+            'url': reverse('detail_ordre_travail', args=[ordre_id]),
+            'icon': 'fas fa-image'
+        })
+    
     return JsonResponse({'results': results})
 
 # ==============================================================================
@@ -2768,51 +2684,6 @@ def _validate_file_type(fichier, point):
     return file_ext in types_autorises
 
 
-def _process_image(fichier, max_size_mb):
-    """
-    Traite et compresse une image si nécessaire
-    """
-    try:
-        # Ouvrir l'image avec Pillow
-        image = Image.open(fichier)
-        
-        # Redimensionner si trop grande
-        max_dimension = 1920  # pixels
-        if image.width > max_dimension or image.height > max_dimension:
-            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
-        
-        # Convertir en RGB si nécessaire
-        if image.mode in ('RGBA', 'P'):
-            image = image.convert('RGB')
-        
-        # Sauvegarder avec compression
-        from io import BytesIO
-        output = BytesIO()
-        quality = 85
-        
-        # Ajuster la qualité selon la taille cible
-        max_size_bytes = max_size_mb * 1024 * 1024
-        
-        while True:
-            output.seek(0)
-            output.truncate()
-            image.save(output, format='JPEG', quality=quality, optimize=True)
-            
-            if output.tell() <= max_size_bytes or quality <= 20:
-                break
-            
-            quality -= 10
-        
-        # Créer un nouveau fichier Django
-        output.seek(0)
-        new_name = f"compressed_{uuid.uuid4().hex}.jpg"
-        return ContentFile(output.read(), name=new_name)
-        
-    except Exception:
-        # En cas d'erreur, retourner le fichier original
-        return fichier
-
-
 def _format_file_size(size_bytes):
     """
     Formate la taille du fichier en unités lisibles
@@ -2835,23 +2706,9 @@ def _can_delete_media(user, media):
     """
     Vérifie si l'utilisateur peut supprimer ce média
     """
-    user_role = get_user_role(user)
-    
-    # Admin et Manager peuvent toujours supprimer
-    if user_role in ['ADMIN', 'MANAGER']:
-        return True
-    
-    # Le technicien assigné peut supprimer pendant l'exécution
-    ordre_travail = media.reponse.rapport_execution.ordre_de_travail
-    
-    if ordre_travail.assigne_a_technicien == user:
-        return True
-    
-    if (ordre_travail.assigne_a_equipe and 
-        user in ordre_travail.assigne_a_equipe.membres.all()):
-        return True
-    
-    return False
+    # Admin et Manager peuvent toujours supprimer, le technicien ou
+    # l'équipe assignés pendant l'exécution
+    return droits(user).peut_executer(media.reponse.rapport_execution.ordre_de_travail)
 
 
 # ==============================================================================
@@ -2926,26 +2783,17 @@ def _sync_media_data(user, media_item):
 def save_draft_intervention(request, pk):
     """
     Sauvegarde des données de brouillon SANS validation des champs obligatoires
+
+    Les valeurs sont fusionnées dans le brouillon du rapport, sans écrire
+    de réponses (voir utils.brouillons). Le client renvoie la version du
+    brouillon reçue (clé `version`) ; si le brouillon a changé depuis, la
+    réponse est un 409 avec le brouillon courant et sa version.
     """
-    print(f"DEBUG: save_draft_intervention appelée avec pk={pk}")
-    print(f"DEBUG: content_type={request.content_type}")
-    print(f"DEBUG: user={request.user}")
-    
     try:
         ordre_travail = get_object_or_404(OrdreDeTravail, pk=pk)
-        print(f"DEBUG: ordre_travail trouvé - {ordre_travail}")
         
         # Vérifier les permissions
-        user_role = get_user_role(request.user)
-        print(f"DEBUG: user_role={user_role}")
-        
-        peut_executer = (
-            ordre_travail.assigne_a_technicien == request.user or
-            (ordre_travail.assigne_a_equipe and request.user in ordre_travail.assigne_a_equipe.membres.all()) or
-            user_role in ['MANAGER', 'ADMIN']
-        )
-        
-        print(f"DEBUG: peut_executer={peut_executer}")
+        peut_executer = droits(request.user).peut_executer(ordre_travail)
         
         if not peut_executer:
             return JsonResponse({
@@ -2958,9 +2806,7 @@ def save_draft_intervention(request, pk):
             draft_data = json.loads(request.body)
         else:
             # Fallback pour form data
-            draft_data = {key: value for key, value in request.POST.items() if key.startswith('reponse_')}
-        
-        print(f"DEBUG: draft_data={draft_data}")
+            draft_data = request.POST.dict()
         
         # Créer ou mettre à jour le rapport
         rapport, created = RapportExecution.objects.get_or_create(
@@ -2972,48 +2818,27 @@ def save_draft_intervention(request, pk):
             }
         )
         
-        print(f"DEBUG: rapport {'créé' if created else 'existant'} - ID {rapport.id}")
-        
-        # Sauvegarder les réponses individuelles (SANS validation)
-        saved_count = 0
-        for key, value in draft_data.items():
-            if key.startswith('reponse_') and value:
-                try:
-                    point_id = int(key.replace('reponse_', ''))
-                    point = PointDeControle.objects.get(pk=point_id)
-                    
-                    # Créer ou mettre à jour la réponse
-                    reponse, created = Reponse.objects.get_or_create(
-                        rapport_execution=rapport,
-                        point_de_controle=point,
-                        defaults={
-                            'valeur': str(value),
-                            'est_conforme': True  # Par défaut conforme pour brouillon
-                        }
-                    )
-                    
-                    if not created:
-                        reponse.valeur = str(value)
-                        reponse.save()
-                    
-                    saved_count += 1
-                    print(f"DEBUG: réponse {'créée' if created else 'mise à jour'} pour point {point_id}")
-                        
-                except (ValueError, PointDeControle.DoesNotExist) as e:
-                    print(f"DEBUG: erreur pour {key}: {e}")
-                    continue  # Ignorer les erreurs pour les brouillons
-        
-        print(f"DEBUG: {saved_count} réponses sauvegardées")
+        # Fusionner dans le brouillon (SANS validation ni écriture des réponses)
+        try:
+            version = enregistrer_brouillon(
+                rapport, valeurs_formulaire(draft_data, 'reponse_'), draft_data.get('version')
+            )
+        except ConflitBrouillon as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e),
+                'version': e.version,
+                'draft': {f'reponse_{point_id}': valeur for point_id, valeur in e.donnees.items()}
+            }, status=409)
         
         return JsonResponse({
             'success': True,
-            'message': f'Brouillon sauvegardé ({saved_count} réponses)'
+            'message': 'Brouillon sauvegardé',
+            'version': version
         })
         
     except Exception as e:
-        print(f"ERREUR save_draft_intervention: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Erreur save_draft_intervention: {e}")
         return JsonResponse({
             'success': False,
             'error': f'Erreur serveur: {str(e)}'
@@ -3029,12 +2854,7 @@ def load_draft_intervention(request, pk):
         ordre_travail = get_object_or_404(OrdreDeTravail, pk=pk)
         
         # Vérifier les permissions
-        user_role = get_user_role(request.user)
-        peut_executer = (
-            ordre_travail.assigne_a_technicien == request.user or
-            (ordre_travail.assigne_a_equipe and request.user in ordre_travail.assigne_a_equipe.membres.all()) or
-            user_role in ['MANAGER', 'ADMIN']
-        )
+        peut_executer = droits(request.user).peut_executer(ordre_travail)
         
         if not peut_executer:
             return JsonResponse({
@@ -3045,23 +2865,29 @@ def load_draft_intervention(request, pk):
         try:
             rapport = RapportExecution.objects.get(ordre_de_travail=ordre_travail)
             
-            # Charger les réponses existantes
+            # Charger les réponses existantes, complétées par le brouillon
             reponses = Reponse.objects.filter(rapport_execution=rapport)
             draft_data = {}
             
             for reponse in reponses:
-                key = f'reponse_{reponse.point_de_controle.id}'
+                key = f'reponse_{reponse.point_de_controle_id}'
                 draft_data[key] = reponse.valeur
             
+            brouillon, version = lire_brouillon(rapport)
+            for point_id, valeur in brouillon.items():
+                draft_data[f'reponse_{point_id}'] = valeur
+            
             return JsonResponse({
                 'success': True,
-                'draft': draft_data
+                'draft': draft_data,
+                'version': version
             })
             
         except RapportExecution.DoesNotExist:
             return JsonResponse({
                 'success': True,
-                'draft': {}
+                'draft': {},
+                'version': 0
             })
         
     except Exception as e:
@@ -3094,12 +2920,7 @@ def upload_media_ajax(request):
         ordre_travail = get_object_or_404(OrdreDeTravail, pk=ordre_travail_id)
         
         # Vérifier permissions
-        user_role = get_user_role(request.user)
-        peut_executer = (
-            ordre_travail.assigne_a_technicien == request.user or
-            (ordre_travail.assigne_a_equipe and request.user in ordre_travail.assigne_a_equipe.membres.all()) or
-            user_role in ['MANAGER', 'ADMIN']
-        )
+        peut_executer = droits(request.user).peut_executer(ordre_travail)
         
         if not peut_executer:
             return JsonResponse({
@@ -3143,12 +2964,12 @@ def upload_media_ajax(request):
         )
         
         # Créer le média
-        media = FichierMedia.objects.create(
+        # Contenu écrit une seule fois par empreinte ; vignettes et
+        # compression hors de la requête
+        media = creer_media(
+            fichier,
             reponse=reponse,
-            fichier=fichier,
-            nom_original=fichier.name,
             type_fichier=type_fichier.upper(),
-            taille_octets=fichier.size,
             uploade_par=request.user
         )
         
@@ -3161,7 +2982,8 @@ def upload_media_ajax(request):
                 'type_fichier': media.type_fichier,
                 'fichier_url': media.fichier.url,
                 'point_id': point.id,
-                'taille_octets': media.taille_octets
+                'taille_octets': media.taille_octets,
+                'statut_traitement': media.statut_traitement
             }
         })
         
@@ -3183,13 +3005,7 @@ def delete_media_ajax(request, media_id):
         
         # Vérifier permissions
         ordre_travail = media.reponse.rapport_execution.ordre_de_travail
-        user_role = get_user_role(request.user)
-        peut_supprimer = (
-            ordre_travail.assigne_a_technicien == request.user or
-            (ordre_travail.assigne_a_equipe and request.user in ordre_travail.assigne_a_equipe.membres.all()) or
-            media.uploade_par == request.user or
-            user_role in ['MANAGER', 'ADMIN']
-        )
+        peut_supprimer = droits(request.user).peut_executer(ordre_travail) or media.uploade_par_id == request.user.id
         
         if not peut_supprimer:
             return JsonResponse({
@@ -3197,14 +3013,8 @@ def delete_media_ajax(request, media_id):
                 'error': 'Permission refusée'
             }, status=403)
         
-        # Supprimer le fichier physique
-        if media.fichier:
-            try:
-                media.fichier.delete(save=False)
-            except:
-                pass  # Ignorer les erreurs de suppression de fichier
-        
-        # Supprimer l'enregistrement
+        # Supprimer l'enregistrement (fichier libéré par le signal
+        # post_delete, partagé entre médias identiques)
         media.delete()
         
         return JsonResponse({
@@ -3229,12 +3039,7 @@ def get_medias_intervention(request, pk):
         ordre_travail = get_object_or_404(OrdreDeTravail, pk=pk)
         
         # Vérifier permissions
-        user_role = get_user_role(request.user)
-        peut_voir = (
-            ordre_travail.assigne_a_technicien == request.user or
-            (ordre_travail.assigne_a_equipe and request.user in ordre_travail.assigne_a_equipe.membres.all()) or
-            user_role in ['MANAGER', 'ADMIN']
-        )
+        peut_voir = droits(request.user).peut_executer(ordre_travail)
         
         if not peut_voir:
             return JsonResponse({
@@ -3294,8 +3099,6 @@ def upload_media_complete(request):
         type_fichier = request.POST.get('type_fichier', 'PHOTO')
         ordre_travail_id = request.POST.get('ordre_travail_id')
         
-        print(f"DEBUG upload_media_complete: fichier={fichier}, point_id={point_id}, type_fichier={type_fichier}, ordre_travail_id={ordre_travail_id}")
-        
         if not fichier or not point_id or not ordre_travail_id:
             return JsonResponse({
                 'success': False,
@@ -3320,12 +3123,7 @@ def upload_media_complete(request):
             }, status=403)
         
         # Vérifier permissions utilisateur
-        user_role = get_user_role(request.user)
-        peut_executer = (
-            ordre_travail.assigne_a_technicien == request.user or
-            (ordre_travail.assigne_a_equipe and request.user in ordre_travail.assigne_a_equipe.membres.all()) or
-            user_role in ['MANAGER', 'ADMIN']
-        )
+        peut_executer = droits(request.user).peut_executer(ordre_travail)
         
         if not peut_executer:
             return JsonResponse({
@@ -3367,12 +3165,12 @@ def upload_media_complete(request):
             reponse.save()
         
         # Créer le fichier média
-        fichier_media = FichierMedia.objects.create(
+        # Contenu écrit une seule fois par empreinte ; vignettes et
+        # compression hors de la requête
+        fichier_media = creer_media(
+            fichier,
             reponse=reponse,
             type_fichier=type_fichier.upper(),
-            fichier=fichier,
-            nom_original=fichier.name,
-            taille_octets=fichier.size,
             uploade_par=request.user
         )
         
@@ -3395,11 +3193,10 @@ def upload_media_complete(request):
             'is_audio': is_audio,
             'extension': file_ext[1:] if file_ext else '',
             'point_id': point.id,
-            'reponse_id': reponse.id
+            'reponse_id': reponse.id,
+            'statut_traitement': fichier_media.statut_traitement
         }
         
-        print(f"DEBUG: Média créé avec succès - {media_data}")
-        
         return JsonResponse({
             'success': True,
             'message': f'Fichier {fichier.name} uploadé avec succès',
@@ -3407,9 +3204,7 @@ def upload_media_complete(request):
         })
         
     except Exception as e:
-        print(f"ERREUR dans upload_media_complete: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erreur dans upload_media_complete")
         return JsonResponse({
             'success': False,
             'error': f'Erreur serveur: {str(e)}'
@@ -3487,13 +3282,7 @@ def delete_media_complete(request, media_id):
         
         # Vérifier permissions
         ordre_travail = media.reponse.rapport_execution.ordre_de_travail
-        user_role = get_user_role(request.user)
-        peut_supprimer = (
-            ordre_travail.assigne_a_technicien == request.user or
-            (ordre_travail.assigne_a_equipe and request.user in ordre_travail.assigne_a_equipe.membres.all()) or
-            media.uploade_par == request.user or
-            user_role in ['MANAGER', 'ADMIN']
-        )
+        peut_supprimer = droits(request.user).peut_executer(ordre_travail) or media.uploade_par_id == request.user.id
         
         if not peut_supprimer:
             return JsonResponse({
@@ -3501,14 +3290,8 @@ def delete_media_complete(request, media_id):
                 'error': 'Permission refusée pour supprimer ce média'
             }, status=403)
         
-        # Supprimer le fichier physique
-        if media.fichier:
-            try:
-                media.fichier.delete(save=False)
-            except Exception as e:
-                print(f"Erreur suppression fichier physique: {e}")
-        
-        # Supprimer l'enregistrement
+        # Supprimer l'enregistrement (fichier libéré par le signal
+        # post_delete, partagé entre médias identiques)
         media_name = media.nom_original
         media.delete()
         
@@ -4024,31 +3807,38 @@ def update_equipment_api(request, asset_id):
 def find_nearby_equipment_api(request):
     """
     API pour trouver les équipements proches d'un point
+    
+    Paramètres GET : lat, lng, radius (m, défaut GMAO_NEARBY_ASSETS_RADIUS),
+    k (nombre max de résultats, défaut GMAO_NEARBY_MAX_RESULTS)
     """
     try:
         latitude = float(request.GET.get('lat'))
         longitude = float(request.GET.get('lng'))
-        radius = int(request.GET.get('radius', 100))  # 100m par défaut
-        
-        # Utiliser la nouvelle méthode find_nearby
-        nearby_assets = Asset.find_nearby(latitude, longitude, radius)
+        radius = int(request.GET.get('radius', getattr(settings, 'GMAO_NEARBY_ASSETS_RADIUS', 100)))
+        k = int(request.GET.get('k', getattr(settings, 'GMAO_NEARBY_MAX_RESULTS', 50)))
+        
+        if not validate_coordinates(latitude, longitude) or radius <= 0 or k <= 0:
+            raise ValueError("Paramètres hors limites")
+        
+        # k plus proches voisins via l'index geohash, déjà triés par distance
+        nearby_assets = Asset.find_nearest(
+            latitude, longitude,
+            k=k,
+            radius_meters=radius,
+            queryset=Asset.objects.select_related('categorie')
+        )
         
         equipment_list = []
         for asset in nearby_assets:
-            if asset.is_geolocated:
-                distance = asset.distance_to_point(latitude, longitude)
-                equipment_list.append({
-                    'id': asset.id,
-                    'name': asset.nom,
-                    'type': asset.categorie.nom if asset.categorie else 'Inconnu',
-                    'reference': asset.reference,
-                    'coordinates': asset.coordinates_dict,
-                    'distance': round(distance, 1) if distance else None,
-                    'status': asset.statut
-                })
-        
-        # Trier par distance
-        equipment_list.sort(key=lambda x: x['distance'] if x['distance'] else float('inf'))
+            equipment_list.append({
+                'id': asset.id,
+                'name': asset.nom,
+                'type': asset.categorie.nom if asset.categorie else 'Inconnu',
+                'reference': asset.reference,
+                'coordinates': asset.coordinates_dict,
+                'distance': round(asset.distance, 1),
+                'status': asset.statut
+            })
         
         return JsonResponse({
             'success': True,
@@ -4068,50 +3858,126 @@ def find_nearby_equipment_api(request):
         }, status=500)
 
 
+def serialize_equipment(asset):
+    """
+    Sérialise un asset pour les APIs de la carte FTTH
+    """
+    return {
+        'id': asset.id,
+        'name': asset.nom,
+        'reference': asset.reference,
+        'type': asset.categorie.nom if asset.categorie else 'Inconnu',
+        'brand': asset.marque,
+        'model': asset.modele,
+        'status': asset.statut,
+        'criticality': asset.criticite,
+        'coordinates': asset.coordinates_dict,
+        'geometrie_geojson': asset.geometrie_geojson,
+        'fibers_total': asset.nb_fibres_total,
+        'fibers_used': asset.nb_fibres_utilisees,
+        'location': asset.localisation_texte,
+        'service_date': asset.date_mise_en_service.isoformat() if asset.date_mise_en_service else None,
+        'warranty_end': asset.fin_garantie.isoformat() if asset.fin_garantie else None
+    }
+
+def _stream_equipments(assets, limit, ndjson):
+    """
+    Générateur du flux de equipment_list_api
+    
+    Les assets sont lus par paquets (.iterator) et envoyés au fil de l'eau :
+    la mémoire serveur reste constante quelle que soit la taille du réseau.
+    Le curseur suivant n'est connu qu'en fin de parcours, il est donc émis
+    à la fin (dernière ligne en NDJSON, dernières clés en JSON), avec le
+    statut : une erreur en cours de parcours donne "success": false et
+    "truncated": true (NDJSON : "_meta" avec "error"), jamais une fin de
+    flux normale. Le curseur pointe alors après le dernier équipement
+    envoyé, pour reprendre.
+    """
+    chunk_size = getattr(settings, 'GMAO_STREAM_CHUNK_SIZE', 2000)
+    
+    count = 0
+    last_id = None
+    
+    erreur = None
+    
+    if not ndjson:
+        yield '{"equipments": ['
+    
+    try:
+        for asset in assets.iterator(chunk_size=chunk_size):
+            data = json.dumps(serialize_equipment(asset), cls=DjangoJSONEncoder)
+            if ndjson:
+                yield data + '\n'
+            else:
+                yield (',' if count else '') + data
+            count += 1
+            last_id = asset.id
+    except Exception as e:
+        # Les en-têtes sont déjà partis : le flux est marqué comme tronqué
+        logger.error(f"Erreur pendant le streaming des équipements: {e}", exc_info=True)
+        erreur = 'Flux interrompu par une erreur serveur'
+    
+    if erreur:
+        meta = {'truncated': True, 'error': erreur, 'count': count, 'next_cursor': last_id}
+    else:
+        # Curseur vers la page suivante seulement si la page est pleine
+        meta = {'count': count, 'next_cursor': last_id if limit and count == limit else None}
+    
+    if ndjson:
+        yield json.dumps({'_meta': meta}) + '\n'
+    else:
+        yield '], %s' % json.dumps({'success': erreur is None, **meta})[1:]
+
 @require_http_methods(["GET"])
 def equipment_list_api(request):
     """
     API pour lister tous les équipements géolocalisés
+    
+    La réponse est diffusée en flux (StreamingHttpResponse) :
+    - format=json (défaut) : {"equipments", "success", "count", "next_cursor"}
+      (+ "truncated", "error" si le flux a été interrompu)
+    - format=ndjson : un équipement par ligne, puis une ligne {"_meta": {...}}
+      ("error" si le flux a été interrompu)
+    
+    Pagination par curseur : ?cursor=<dernier id reçu>&limit=<taille de page>.
+    Sans limit, tout le réseau est envoyé en un seul flux.
     """
     try:
-        # Filtrer les assets géolocalisés
-        assets = Asset.objects.filter(
-            geometrie_geojson__isnull=False
-        ).exclude(geometrie_geojson='').select_related('categorie')
-        
-        equipment_list = []
-        for asset in assets:
-            equipment_list.append({
-                'id': asset.id,
-                'name': asset.nom,
-                'reference': asset.reference,
-                'type': asset.categorie.nom if asset.categorie else 'Inconnu',
-                'brand': asset.marque,
-                'model': asset.modele,
-                'status': asset.statut,
-                'criticality': asset.criticite,
-                'coordinates': asset.coordinates_dict,
-                'geometrie_geojson': asset.geometrie_geojson,
-                'fibers_total': asset.nb_fibres_total,
-                'fibers_used': asset.nb_fibres_utilisees,
-                'location': asset.localisation_texte,
-                'service_date': asset.date_mise_en_service.isoformat() if asset.date_mise_en_service else None,
-                'warranty_end': asset.fin_garantie.isoformat() if asset.fin_garantie else None
-            })
+        output_format = request.GET.get('format', 'json')
+        if output_format not in ('json', 'ndjson'):
+            raise ValueError("Format inconnu")
         
-        return JsonResponse({
-            'success': True,
-            'count': len(equipment_list),
-            'equipments': equipment_list
-        })
+        cursor = request.GET.get('cursor')
+        cursor = int(cursor) if cursor else None
         
-    except Exception as e:
+        limit = request.GET.get('limit')
+        limit = int(limit) if limit else None
+        if limit is not None and limit <= 0:
+            raise ValueError("limit doit être positif")
+    except (ValueError, TypeError):
         return JsonResponse({
             'success': False,
-            'error': f'Erreur: {str(e)}'
-        }, status=500)
+            'error': 'Paramètres format/cursor/limit invalides'
+        }, status=400)
+    
+    # Filtrer les assets géolocalisés
+    assets = Asset.objects.filter(
+        geometrie_geojson__isnull=False
+    ).exclude(geometrie_geojson='').select_related('categorie').order_by('id')
+    
+    if cursor is not None:
+        assets = assets.filter(id__gt=cursor)
+    if limit is not None:
+        assets = assets[:limit]
+    
+    ndjson = output_format == 'ndjson'
+    response = StreamingHttpResponse(
+        _stream_equipments(assets, limit, ndjson),
+        content_type='application/x-ndjson' if ndjson else 'application/json'
+    )
+    response['X-Accel-Buffering'] = 'no'  # Pas de mise en tampon côté proxy nginx
+    return response
     
-
 
 # Configuration des coordonnées par défaut selon la région
 DEFAULT_COORDINATES = {
@@ -4292,6 +4158,7 @@ def prepare_asset_geojson(asset):
                 "reference": asset.reference or "",
                 "categorie": asset.categorie.nom if asset.categorie else "Non définie",
                 "statut": asset.get_statut_display(),
+                "statut_code": asset.statut,
                 "criticite": asset.get_criticite_display(),
                 "localisation": asset.localisation_texte or "",
                 "adresse": asset.adresse_complete or "",
@@ -4309,6 +4176,266 @@ def prepare_asset_geojson(asset):
         logger.error(f"Erreur lors de la préparation GeoJSON pour asset {asset.id}: {e}")
         return None
 
+# ==============================================================================
+# TUILES GEOJSON DE LA CARTE FTTH (CHARGEMENT PAR EMPRISE)
+# ==============================================================================
+
+def tile_to_bbox(z, x, y):
+    """
+    Convertit une tuile XYZ (Web Mercator) en emprise géographique
+    
+    Returns:
+        tuple: (min_lng, min_lat, max_lng, max_lat)
+    """
+    n = 2 ** z
+    min_lng = x / n * 360.0 - 180.0
+    max_lng = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lng, min_lat, max_lng, max_lat
+
+def parse_bbox(bbox_string):
+    """
+    Parse un paramètre bbox au format "min_lng,min_lat,max_lng,max_lat"
+    
+    Raises:
+        ValueError: si le format ou les valeurs sont invalides
+    """
+    values = [float(v) for v in bbox_string.split(',')]
+    if len(values) != 4 or any(v != v for v in values):
+        raise ValueError("Format attendu: 'min_lng,min_lat,max_lng,max_lat'")
+    
+    min_lng, min_lat, max_lng, max_lat = values
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError("Emprise inversée")
+    
+    # Borner aux limites GPS
+    return max(min_lng, -180.0), max(min_lat, -90.0), min(max_lng, 180.0), min(max_lat, 90.0)
+
+def get_cluster_cell_size(zoom):
+    """
+    Taille (en degrés) d'une cellule de regroupement pour un niveau de zoom
+    """
+    cell_px = getattr(settings, 'GMAO_MAP_CLUSTER_CELL_PX', 60)
+    return 360.0 / (256 * 2 ** zoom) * cell_px
+
+def cluster_assets_geojson(assets, zoom):
+    """
+    Regroupe les assets par cellule de grille, le calcul étant fait en base
+    
+    La grille est globale : un cluster garde la même position quelle que soit
+    la tuile qui le contient, ce qui évite les sauts entre deux tuiles voisines.
+    
+    Args:
+        assets: QuerySet d'assets déjà filtré sur l'emprise
+        zoom: Niveau de zoom de la carte
+        
+    Returns:
+        list: Features GeoJSON des clusters
+    """
+    cell = get_cluster_cell_size(zoom)
+    
+    cellules = assets.annotate(
+        cell_x=Floor(Cast('longitude', FloatField()) / cell),
+        cell_y=Floor(Cast('latitude', FloatField()) / cell),
+    ).values('cell_x', 'cell_y').annotate(
+        nb_assets=Count('id'),
+        lat_moyenne=Avg('latitude'),
+        lng_moyenne=Avg('longitude'),
+        premier_id=Min('id'),
+        nb_en_panne=Count('id', filter=Q(statut='EN_PANNE')),
+    ).order_by()
+    
+    features = []
+    for cellule in cellules:
+        features.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [
+                    round(float(cellule['lng_moyenne']), 6),
+                    round(float(cellule['lat_moyenne']), 6)
+                ]
+            },
+            "properties": {
+                "cluster": True,
+                "cluster_id": f"{zoom}:{int(cellule['cell_x'])}:{int(cellule['cell_y'])}",
+                "point_count": cellule['nb_assets'],
+                "en_panne": cellule['nb_en_panne'],
+                # Un cluster d'un seul asset reste cliquable vers sa fiche
+                "asset_id": cellule['premier_id'] if cellule['nb_assets'] == 1 else None,
+            }
+        })
+    
+    return features
+
+@login_required
+@require_http_methods(["GET"])
+def equipment_tiles_api(request, z=None, x=None, y=None):
+    """
+    API GeoJSON des équipements visibles dans une emprise de la carte
+    
+    Deux modes d'appel :
+    - tuile XYZ : /api/ftth/equipment/tiles/<z>/<x>/<y>/
+    - emprise libre : /api/ftth/equipment/tiles/?bbox=min_lng,min_lat,max_lng,max_lat&zoom=13
+    
+    En dessous de GMAO_MAP_CLUSTER_MAX_ZOOM (ou au-delà de GMAO_MAX_ASSETS_ON_MAP
+    assets dans l'emprise), les points sont regroupés côté serveur. Les réponses
+    portent ETag et Last-Modified : le navigateur revalide une tuile et reçoit
+    un 304 tant qu'aucun asset de l'emprise n'a changé.
+    """
+    try:
+        if z is not None:
+            if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+                raise ValueError("Tuile hors limites")
+            min_lng, min_lat, max_lng, max_lat = tile_to_bbox(z, x, y)
+            zoom = z
+        else:
+            min_lng, min_lat, max_lng, max_lat = parse_bbox(request.GET.get('bbox', ''))
+            zoom = int(request.GET.get('zoom', 13))
+    except (ValueError, TypeError):
+        return JsonResponse({
+            'success': False,
+            'error': 'Paramètres bbox/zoom invalides'
+        }, status=400)
+    
+    assets = Asset.objects.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lng, max_lng)
+    ).exclude(
+        Q(latitude=0) | Q(longitude=0)
+    )
+    
+    # Signature de l'emprise en une seule requête agrégée
+    signature = assets.aggregate(
+        nb_assets=Count('id'),
+        dernier_id=Max('id'),
+        derniere_maj=Max('date_derniere_maj')
+    )
+    derniere_maj = signature['derniere_maj']
+    
+    clustered = (
+        zoom < getattr(settings, 'GMAO_MAP_CLUSTER_MAX_ZOOM', 14) or
+        signature['nb_assets'] > getattr(settings, 'GMAO_MAX_ASSETS_ON_MAP', 1000)
+    )
+    
+    etag_source = '|'.join([
+        f"{min_lng:.6f},{min_lat:.6f},{max_lng:.6f},{max_lat:.6f}",
+        str(zoom),
+        str(clustered),
+        str(signature['nb_assets']),
+        str(signature['dernier_id']),
+        derniere_maj.isoformat() if derniere_maj else '',
+    ])
+    etag = '"%s"' % hashlib.md5(etag_source.encode('utf-8')).hexdigest()
+    last_modified = int(derniere_maj.timestamp()) if derniere_maj else None
+    
+    # 304 si le navigateur possède déjà cette version de la tuile
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    
+    if response is None:
+        try:
+            if clustered:
+                features = cluster_assets_geojson(assets, zoom)
+            else:
+                features = []
+                for asset in assets.select_related('categorie').prefetch_related('attributs_perso'):
+                    feature = prepare_asset_geojson(asset)
+                    if feature:
+                        features.append(feature)
+            
+            response = JsonResponse({
+                'type': 'FeatureCollection',
+                'features': features,
+                'success': True,
+                'clustered': clustered,
+                'zoom': zoom,
+                'count': signature['nb_assets'],
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la génération de la tuile carte: {e}", exc_info=True)
+            return JsonResponse({
+                'success': False,
+                'error': f'Erreur: {str(e)}'
+            }, status=500)
+    
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(
+        response,
+        private=True,
+        max_age=getattr(settings, 'GMAO_MAP_TILE_MAX_AGE', 0)
+    )
+    
+    return response
+
+# ==============================================================================
+# STATISTIQUES DE LA CARTE FTTH (AGRÉGAT UNIQUE + CACHE)
+# ==============================================================================
+
+def carte_assets_queryset():
+    """
+    Assets affichables sur la carte (coordonnées renseignées et non nulles)
+    """
+    return Asset.objects.filter(
+        latitude__isnull=False,
+        longitude__isnull=False
+    ).exclude(
+        # Exclure les coordonnées évidemment invalides
+        Q(latitude=0) | Q(longitude=0)
+    )
+
+def compute_carte_stats():
+    """
+    Calcule les statistiques de la carte en une seule requête
+    
+    Un GROUP BY par catégorie avec des comptages conditionnels par statut :
+    les totaux globaux sont la somme des lignes.
+    """
+    lignes = carte_assets_queryset().values('categorie__nom').annotate(
+        total=Count('id'),
+        en_service=Count('id', filter=Q(statut='EN_SERVICE')),
+        en_panne=Count('id', filter=Q(statut='EN_PANNE')),
+        en_maintenance=Count('id', filter=Q(statut='EN_MAINTENANCE')),
+        hors_service=Count('id', filter=Q(statut='HORS_SERVICE')),
+    ).order_by('-total')
+    
+    stats = {
+        'total_assets': 0,
+        'en_service': 0,
+        'en_panne': 0,
+        'en_maintenance': 0,
+        'hors_service': 0,
+        'categories': []
+    }
+    
+    for ligne in lignes:
+        for cle in ('en_service', 'en_panne', 'en_maintenance', 'hors_service'):
+            stats[cle] += ligne[cle]
+        stats['total_assets'] += ligne['total']
+        
+        if ligne['categorie__nom']:
+            stats['categories'].append({
+                'nom': ligne['categorie__nom'],
+                'count': ligne['total']
+            })
+    
+    return stats
+
+def get_carte_stats(scope='global'):
+    """
+    Statistiques de la carte, mises en cache par périmètre
+    
+    Le cache est invalidé à chaque création, modification ou suppression
+    d'Asset (voir core/signals.py).
+    
+    Args:
+        scope: Périmètre des assets visibles (toute la carte par défaut)
+    """
+    return cached_value(CARTE_STATS_NAMESPACE, [scope], compute_carte_stats)
+
 @login_required
 def carte_ftth(request):
     """
@@ -4318,15 +4445,12 @@ def carte_ftth(request):
         logger.info(f"Chargement de la carte FTTH pour l'utilisateur {request.user.username}")
         
         # Récupérer tous les assets avec coordonnées potentiellement valides
-        assets = Asset.objects.filter(
-            latitude__isnull=False,
-            longitude__isnull=False
-        ).exclude(
-            # Exclure les coordonnées évidemment invalides
-            Q(latitude=0) | Q(longitude=0)
-        ).select_related('categorie').prefetch_related('attributs_perso')
+        assets = carte_assets_queryset().select_related('categorie').prefetch_related('attributs_perso')
         
-        logger.info(f"Nombre d'assets trouvés: {assets.count()}")
+        # Statistiques en cache (une seule requête agrégée en cas d'absence)
+        stats = dict(get_carte_stats())
+        nb_assets = stats['total_assets']
+        logger.info(f"Nombre d'assets trouvés: {nb_assets}")
         
         # Préparer les données GeoJSON avec validation stricte
         assets_geojson = {
@@ -4337,38 +4461,33 @@ def carte_ftth(request):
         assets_valides = 0
         assets_ignores = 0
         
-        for asset in assets:
-            feature = prepare_asset_geojson(asset)
-            if feature:
-                assets_geojson["features"].append(feature)
-                assets_valides += 1
-            else:
-                assets_ignores += 1
-        
-        # Calculer le centre de la carte
-        center_lat, center_lng = calculate_map_center(assets)
+        # Au-delà du seuil, la page n'embarque plus les features : le navigateur
+        # charge les assets de l'emprise visible via equipment_tiles_api
+        use_tiles = nb_assets > getattr(settings, 'GMAO_MAX_ASSETS_ON_MAP', 1000)
         
-        # Calculer les statistiques
-        stats = {
-            'total_assets': assets_valides,
-            'en_service': assets.filter(statut='en_service').count(),
-            'en_panne': assets.filter(statut='en_panne').count(),
-            'en_maintenance': assets.filter(statut='en_maintenance').count(),
-            'hors_service': assets.filter(statut='hors_service').count(),
-            'categories': []
-        }
+        if use_tiles:
+            assets_valides = nb_assets
+            
+            # Centre calculé en base plutôt qu'en itérant sur tous les assets
+            centre = assets.aggregate(lat=Avg('latitude'), lng=Avg('longitude'))
+            if validate_coordinates(centre['lat'], centre['lng']):
+                center_lat, center_lng = float(centre['lat']), float(centre['lng'])
+            else:
+                default_center = get_default_center()
+                center_lat, center_lng = default_center['lat'], default_center['lng']
+        else:
+            for asset in assets:
+                feature = prepare_asset_geojson(asset)
+                if feature:
+                    assets_geojson["features"].append(feature)
+                    assets_valides += 1
+                else:
+                    assets_ignores += 1
+            
+            # Calculer le centre de la carte
+            center_lat, center_lng = calculate_map_center(assets)
         
-        # Statistiques par catégorie
-        categories_stats = assets.values('categorie__nom').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        for cat_stat in categories_stats:
-            if cat_stat['categorie__nom']:
-                stats['categories'].append({
-                    'nom': cat_stat['categorie__nom'],
-                    'count': cat_stat['count']
-                })
+        stats['total_assets'] = assets_valides
         
         # Préparer le contexte
         context = {
@@ -4379,6 +4498,8 @@ def carte_ftth(request):
             'categories': CategorieAsset.objects.all(),
             'assets_valides': assets_valides,
             'assets_ignores': assets_ignores,
+            'use_tiles': use_tiles,
+            'tiles_url': reverse('equipment_tiles_api'),
             'default_region': getattr(settings, 'GMAO_DEFAULT_REGION', 'france'),
         }
         
@@ -4408,6 +4529,8 @@ def carte_ftth(request):
             'categories': CategorieAsset.objects.all(),
             'assets_valides': 0,
             'assets_ignores': 0,
+            'use_tiles': False,
+            'tiles_url': reverse('equipment_tiles_api'),
             'error_message': "Erreur lors du chargement des données cartographiques",
             'default_region': getattr(settings, 'GMAO_DEFAULT_REGION', 'france'),
         }
@@ -4481,12 +4604,10 @@ def api_assets_search(request):
                 'results': []
             })
         
-        # Recherche dans les assets
-        assets = Asset.objects.filter(
-            Q(nom__icontains=query) |
-            Q(reference__icontains=query) |
-            Q(localisation_texte__icontains=query)
-        ).select_related('categorie')[:20]  # Limiter à 20 résultats
+        # Recherche dans les assets (index de recherche)
+        assets = objets_recherche(
+            Asset.objects.select_related('categorie'), 'asset', query, 20
+        )  # Limiter à 20 résultats
         
         results = []
         for asset in assets:
@@ -4560,70 +4681,75 @@ import io
 
 @login_required
 def export_rapport_pdf_weasy(request, pk):
-    """Export PDF avec WeasyPrint - Design moderne"""
-    rapport = get_object_or_404(RapportExecution, pk=pk)
+    """
+    Export PDF avec WeasyPrint - Design moderne
+
+    Un rapport finalisé est servi depuis le PDF rendu en arrière-plan ; s'il
+    n'est pas encore prêt, son rendu est lancé. Les autres rapports sont
+    rendus à la demande.
+    """
+    rapport = get_object_or_404(RapportExecution.objects.select_related('ordre_de_travail', 'cree_par'), pk=pk)
     ordre = rapport.ordre_de_travail
     
     # Vérifications permissions (même code qu'avant)
-    user_role = get_user_role(request.user)
-    can_export = (
-        user_role in ['MANAGER', 'ADMIN'] or
-        ordre.cree_par == request.user or
-        ordre.assigne_a_technicien == request.user or
-        (ordre.assigne_a_equipe and request.user in ordre.assigne_a_equipe.membres.all())
-    )
+    can_export = droits(request.user).peut_voir(ordre)
     
     if not can_export:
         messages.error(request, "Vous n'avez pas accès à ce rapport.")
         return redirect('liste_ordres_travail')
     
-    # Préparer les données
-    reponses_avec_medias = []
-    for reponse in rapport.reponses.all().order_by(
-        'point_de_controle__operation__ordre', 
-        'point_de_controle__ordre'
-    ):
-        medias = reponse.fichiers_media.all()
-        reponses_avec_medias.append({
-            'reponse': reponse,
-            'medias': medias,
-            'nb_photos': medias.filter(type_fichier='PHOTO').count(),
-            'nb_documents': medias.filter(type_fichier='DOCUMENT').count(),
-        })
+    chemin = pdf_en_cache(rapport)
+    if chemin:
+        return FileResponse(
+            open(chemin, 'rb'), as_attachment=True,
+            filename=nom_telechargement(rapport), content_type='application/pdf'
+        )
     
-    demandes_reparation = DemandeReparation.objects.filter(
-        ordre_de_travail=ordre
-    ).order_by('-date_creation')
+    if not pdf_disponible():
+        messages.error(request, "WeasyPrint n'est pas installé. Installez-le avec: pip install weasyprint")
+        return redirect('detail_ordre_travail', pk=ordre.pk)
     
-    context = {
-        'rapport': rapport,
-        'ordre': ordre,
-        'reponses_avec_medias': reponses_avec_medias,
-        'demandes_reparation': demandes_reparation,
-        'date_export': timezone.now(),
-        'exporte_par': request.user,
-    }
+    if rapport.statut_rapport in STATUTS_FIGES:
+        planifier_pdf(rapport)
+        messages.info(request, "Le PDF du rapport est en cours de génération. Réessayez dans quelques instants.")
+        return redirect('detail_ordre_travail', pk=ordre.pk)
     
     try:
-        import weasyprint
-        
-        # Template avec CSS moderne
-        template_path = 'core/export/rapport_pdf_weasy.html'
-        template = get_template(template_path)
-        html = template.render(context, request)
-        
-        # Générer PDF avec WeasyPrint
-        pdf_file = weasyprint.HTML(string=html, base_url=request.build_absolute_uri())
-        pdf = pdf_file.write_pdf()
-        
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="rapport_moderne_OT_{ordre.id}.pdf"'
-        
-        return response
-        
-    except ImportError:
-        messages.error(request, "WeasyPrint n'est pas installé. Installez-le avec: pip install weasyprint")
-        return redirect('detail_ordre_travail', pk=ordre.pk)
+        pdf = rendre_pdf(rapport)
     except Exception as e:
+        logger.exception(f"Erreur génération PDF du rapport {pk}")
         messages.error(request, f"Erreur lors de la génération du PDF: {str(e)}")
-        return redirect('detail_ordre_travail', pk=ordre.pk)
\ No newline at end of file
+        return redirect('detail_ordre_travail', pk=ordre.pk)
+    
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{nom_telechargement(rapport)}"'
+    return response
+
+
+@login_required
+@user_passes_test(is_manager_or_admin)
+@require_http_methods(["GET"])
+def export_rapports_zip(request):
+    """
+    Export groupé des rapports finalisés et de leurs médias (ZIP en flux)
+
+    Filtres : ?zone=<id>&intervention=<id>&type_ot=<type>&debut=AAAA-MM-JJ&fin=AAAA-MM-JJ
+    (période sur la date de fin d'exécution). L'archive est produite au fil
+    de l'eau : le téléchargement démarre immédiatement.
+    """
+    try:
+        filtre = lire_filtre(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    rapports = rapports_a_exporter(**filtre)
+    if not rapports.exists():
+        return JsonResponse({'success': False, 'error': 'Aucun rapport finalisé pour ce filtre'}, status=404)
+    
+    response = StreamingHttpResponse(flux_zip_rapports(rapports), content_type='application/zip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="rapports_{timezone.localtime():%Y%m%d_%H%M%S}.zip"'
+    )
+    response['X-Accel-Buffering'] = 'no'  # Pas de mise en tampon côté proxy nginx
+    logger.info(f"Export ZIP des rapports par {request.user.username} : {filtre}")
+    return response
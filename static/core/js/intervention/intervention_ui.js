@@ -7,6 +7,7 @@ class InterventionUI {
         this.autoSaveInterval = 30000; // 30 secondes
         this.ordreTravailiId = null;
         this.csrfToken = null;
+        this.draftVersion = null; // Version du brouillon renvoyée par le serveur
         this.isDirty = false;
         
         this.init();
@@ -228,13 +229,17 @@ class InterventionUI {
                 'X-CSRFToken': this.csrfToken,
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify(data)
+            body: JSON.stringify({...data, version: this.draftVersion})
         })
         .then(response => response.json())
         .then(result => {
             if (result.success) {
+                this.draftVersion = result.version ?? this.draftVersion;
                 this.showConnectionStatus('online');
                 this.isDirty = false;
+            } else if (result.version !== undefined) {
+                // Conflit : la prochaine sauvegarde fusionne dans la version courante
+                this.draftVersion = result.version;
             }
         })
         .catch(error => {